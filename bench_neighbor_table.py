@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+性能测试 - 对比直接读取邻居表与fork `arp -n` 的耗时
+"""
+import sys
+import os
+import time
+import tempfile
+import subprocess
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from neighbor_table import (read_proc_arp, parse_arp_output, read_neighbor_table,
+                            read_arp_command)
+
+
+def _write_synthetic_table(entries):
+    """生成包含指定条目数的 /proc/net/arp 格式文件"""
+    lines = ["IP address       HW type     Flags       HW address            Mask     Device"]
+    for i in range(entries):
+        ip = f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+        mac = "02:00:" + ":".join(f"{(i >> shift) & 0xff:02x}" for shift in (24, 16, 8, 0))
+        lines.append(f"{ip:<16} 0x1         0x2         {mac}     *        eth0")
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.arp', delete=False) as f:
+        f.write("\n".join(lines) + "\n")
+        return f.name
+
+
+def _timeit(func, rounds):
+    """返回每次调用的平均耗时(毫秒)"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    """运行性能测试"""
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    path = _write_synthetic_table(entries)
+    
+    try:
+        print("=" * 60)
+        print(f"邻居表读取性能测试 ({entries} 条目, {rounds} 轮)")
+        print("=" * 60)
+        
+        native = _timeit(lambda: read_proc_arp(path), rounds)
+        forked = _timeit(lambda: parse_arp_output(
+            subprocess.run(['cat', path], capture_output=True, text=True, timeout=5).stdout), rounds)
+        print(f"直接读取文件:         {native:8.3f} ms")
+        print(f"fork子进程 + 文本解析: {forked:8.3f} ms  ({forked / native:.1f}x)")
+        
+        print("\n当前系统邻居表:")
+        for backend in ('netlink', 'proc'):
+            try:
+                cost = _timeit(lambda: read_neighbor_table(backend), rounds)
+                print(f"{backend:<8}: {cost:8.3f} ms")
+            except OSError as e:
+                print(f"{backend:<8}: 不可用 ({e})")
+        try:
+            cost = _timeit(read_arp_command, rounds)
+            print(f"{'arp -n':<8}: {cost:8.3f} ms")
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"{'arp -n':<8}: 不可用 ({e})")
+    finally:
+        os.remove(path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
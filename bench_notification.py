@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+性能测试 - 对比每次新建连接(冷)与复用长连接(热)时单次通知的发送耗时
+
+在本地启动一个使用自签名证书的HTTPS桩服务器 (需要 openssl 命令)
+"""
+import sys
+import os
+import ssl
+import json
+import time
+import tempfile
+import statistics
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ROUNDS = 50
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 桩，返回PushDeer格式的成功应答"""
+    
+    protocol_version = 'HTTP/1.1'
+    # 头部和正文一次写出，避免Nagle与延迟ACK叠加出的40ms等待掩盖握手开销
+    wbufsize = 65536
+    disable_nagle_algorithm = True
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps({"code": 0}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory):
+    """用openssl生成localhost自签名证书，返回 (cert, key)"""
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+                    '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1'],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def start_tls_stub(cert, key):
+    """启动HTTPS桩服务器，返回 (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"https://127.0.0.1:{server.server_address[1]}/message/push"
+
+
+def make_service(url, cert):
+    """创建指向桩服务器、信任自签名证书的PushDeer服务"""
+    from notification import PushDeerNotification
+    service = PushDeerNotification("bench_key")
+    service.api_url = url
+    session = service._get_session()
+    session.trust_env = False  # 避免 REQUESTS_CA_BUNDLE 等环境变量覆盖证书设置
+    session.verify = cert
+    return service
+
+
+def timed_send(service):
+    """发送一次并返回耗时(ms)"""
+    start = time.perf_counter()
+    assert service.send("bench", "msg"), "发送失败"
+    return (time.perf_counter() - start) * 1000
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<28}{statistics.median(samples):>10.2f}{p95:>10.2f}{statistics.mean(samples):>10.2f}")
+
+
+def main():
+    """运行性能测试"""
+    import logging
+    logging.getLogger('notification').setLevel(logging.WARNING)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            cert, key = make_certificate(directory)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"无法生成自签名证书，跳过: {e}")
+            return 0
+        server, url = start_tls_stub(cert, key)
+        
+        try:
+            print("=" * 60)
+            print(f"通知发送性能测试 (本地HTTPS桩, {ROUNDS}次)")
+            print("=" * 60)
+            print(f"{'场景':<28}{'中位数(ms)':>10}{'P95(ms)':>10}{'平均(ms)':>10}")
+            
+            # 冷: 每次新建服务，即每次都要TCP+TLS握手（等同于旧的 requests.post）
+            cold = []
+            for _ in range(ROUNDS):
+                service = make_service(url, cert)
+                cold.append(timed_send(service))
+                service.close()
+            report("冷连接 (每次握手)", cold)
+            
+            # 热: 复用同一个服务的长连接
+            service = make_service(url, cert)
+            timed_send(service)
+            warm = [timed_send(service) for _ in range(ROUNDS)]
+            service.close()
+            report("热连接 (keep-alive复用)", warm)
+            
+            print(f"\n热连接中位数耗时为冷连接的 {statistics.median(warm) / statistics.median(cold):.0%}")
+        finally:
+            server.shutdown()
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
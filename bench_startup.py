@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+性能测试 - 测量各模块的启动耗时和内存占用
+"""
+import sys
+import os
+import json
+import subprocess
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 每个场景在独立的子进程中执行，避免模块缓存影响结果
+SCENARIOS = [
+    ("import notification", "import notification"),
+    ("import network_detector", "import network_detector"),
+    ("import boss_detect", "import boss_detect"),
+    ("network_detector.load_scapy()", "import network_detector; network_detector.load_scapy()"),
+    ("import scapy.all (旧方式)", "import scapy.all"),
+]
+
+MEASURE = """
+import time, resource, sys, json
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "ms": elapsed * 1000,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "scapy_modules": sum(1 for name in sys.modules if name.startswith("scapy")),
+}}))
+"""
+
+
+def measure(code):
+    """在子进程中执行代码并返回耗时、RSS和已加载的scapy模块数"""
+    result = subprocess.run([sys.executable, "-c", MEASURE.format(code=code)],
+                            capture_output=True, text=True, cwd=HERE, timeout=60)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    """运行性能测试"""
+    print("=" * 60)
+    print("启动性能测试")
+    print("=" * 60)
+    print(f"{'场景':<32}{'耗时(ms)':>10}{'RSS(MB)':>10}{'scapy模块':>10}")
+    for name, code in SCENARIOS:
+        stats = measure(code)
+        print(f"{name:<32}{stats['ms']:>10.1f}{stats['rss_mb']:>10.1f}{stats['scapy_modules']:>10}")
+    
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+"""
+性能基准套件 - 在合成数据上测量检测与通知热路径，并与保存的基线比较
+
+不访问真实网络：邻居表、ARP应答流均为合成数据，通知发往本地HTTP桩服务器
+
+用法:
+    python bench_suite.py                 # 运行全部基准并与基线比较，重新测量后仍超过阈值时返回1
+    python bench_suite.py --save          # 运行3遍，取中位数保存为新基线
+    python bench_suite.py sweep_replies_16 --rounds 20
+"""
+import sys
+import os
+import gc
+import json
+import time
+import socket
+import struct
+import logging
+import argparse
+import platform
+import statistics
+import threading
+import contextlib
+from unittest.mock import patch
+from http.server import ThreadingHTTPServer
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+BASELINE_VERSION = 1
+DEFAULT_THRESHOLD = 0.25
+# 超过阈值的基准重新测量的次数，每次都超过阈值才算退化
+DEFAULT_RETRIES = 2
+# 保存基线时运行的遍数
+SAVE_PASSES = 3
+
+# {名称: (setup, 每轮处理的条目数, 容差)}
+BENCHMARKS = {}
+
+
+def benchmark(name, items=1, tolerance=None):
+    """
+    注册基准
+    
+    被装饰的函数是生成器: yield 之前准备数据，yield 出每轮执行的函数，之后清理
+    
+    Args:
+        name: 基准名称
+        items: 每轮处理的条目数 (用于计算单条耗时)
+        tolerance: 该基准允许的变慢比例，默认使用全局阈值 (受网络/调度影响较大的基准可放宽)
+    """
+    def register(func):
+        BENCHMARKS[name] = (contextlib.contextmanager(func), items, tolerance)
+        return func
+    return register
+
+
+def synthetic_mac(i):
+    """第i个合成设备的MAC地址 (本地管理地址段)"""
+    return "02:00:" + ":".join(f"{(i >> shift) & 0xff:02x}" for shift in (24, 16, 8, 0))
+
+
+def synthetic_proc_arp(entries):
+    """生成 /proc/net/arp 格式文本"""
+    lines = ["IP address       HW type     Flags       HW address            Mask     Device"]
+    for i in range(entries):
+        ip = f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+        lines.append(f"{ip:<16} 0x1         0x2         {synthetic_mac(i)}     *        eth0")
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_netlink_dump(entries):
+    """生成 RTM_NEWNEIGH 消息流"""
+    from neighbor_table import NLMSG_HEADER, NDMSG, RTATTR, RTM_NEWNEIGH, NDA_DST, NDA_LLADDR
+    
+    def attr(attr_type, payload):
+        data = RTATTR.pack(RTATTR.size + len(payload), attr_type) + payload
+        return data + b'\0' * (-len(data) % 4)
+    
+    messages = []
+    for i in range(entries):
+        ip = f"10.{(i >> 16) & 0xff}.{(i >> 8) & 0xff}.{i & 0xff}"
+        body = (NDMSG.pack(socket.AF_INET, 0, 0, 2, 0x02, 0, 1)
+                + attr(NDA_DST, socket.inet_aton(ip))
+                + attr(NDA_LLADDR, bytes.fromhex(synthetic_mac(i).replace(':', ''))))
+        messages.append(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(body), RTM_NEWNEIGH, 2, 1, 0) + body)
+    return b''.join(messages)
+
+
+def synthetic_arp_reply(ip, mac):
+    """生成以太网ARP应答帧"""
+    mac = bytes.fromhex(mac.replace(':', ''))
+    ether = b'\xff' * 6 + mac + struct.pack('!H', 0x0806)
+    return ether + struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, 2, mac, socket.inet_aton(ip),
+                               b'\0' * 6, b'\0' * 4)
+
+
+class ReplayProber:
+    """重放预先生成的ARP应答帧的探测器，代替 RawProber"""
+    
+    def __init__(self, frames):
+        self.frames = frames
+    
+    def arp_scan(self, ip_range, timeout=3, inter=0, on_reply=None):
+        from raw_prober import parse_arp_reply
+        
+        devices = []
+        for frame in self.frames.get(ip_range, ()):
+            reply = parse_arp_reply(frame)
+            if reply is None:
+                continue
+            devices.append(reply)
+            if on_reply is not None:
+                on_reply(*reply)
+        return devices
+    
+    def close(self):
+        pass
+
+
+@benchmark('neighbor_proc_parse_10k', items=10000)
+def bench_proc_parse():
+    from neighbor_table import parse_proc_arp
+    
+    text = synthetic_proc_arp(10000)
+    yield lambda: parse_proc_arp(text)
+
+
+@benchmark('neighbor_netlink_parse_10k', items=10000)
+def bench_netlink_parse():
+    from neighbor_table import _parse_netlink_messages
+    
+    data = synthetic_netlink_dump(10000)
+    yield lambda: _parse_netlink_messages(data, {})
+
+
+@benchmark('detector_arp_cache_10k', items=10000)
+def bench_detector_arp_cache():
+    from neighbor_table import parse_proc_arp
+    from network_detector import NetworkDetector
+    
+    text = synthetic_proc_arp(10000)
+    target = synthetic_mac(9999)
+    detector = NetworkDetector(target, neighbor_backend='proc')
+    with patch('network_detector.read_neighbor_table', lambda backend: parse_proc_arp(text)):
+        yield lambda: detector._check_arp_cache(target)
+
+
+@benchmark('sweep_replies_16', items=65534, tolerance=0.5)
+def bench_sweep_replies():
+    import ipaddress
+    from sweep import split_ranges
+    from network_detector import NetworkDetector
+    
+    network = '10.20.0.0/16'
+    # /16 中每个主机都应答，按所属的/24分片分组
+    frames = {shard: [] for shard in split_ranges([network], 24)}
+    for ip in ipaddress.ip_network(network).hosts():
+        shard = str(ipaddress.ip_network(f'{ip}/24', strict=False))
+        frames[shard].append(synthetic_arp_reply(str(ip), synthetic_mac(int(ip) & 0xffff)))
+    
+    detector = NetworkDetector("aa:bb:cc:dd:ee:ff", use_raw_prober=True, sweep_workers=4, shard_prefix=24)
+    detector._prober = ReplayProber(frames)
+    yield lambda: sum(1 for _ in detector.scan_network_iter(network))
+
+
+@benchmark('presence_advance_10k', items=10000)
+def bench_presence_advance():
+    from presence_state import INITIAL_STATE, PresencePolicy, advance
+    
+    policy = PresencePolicy(arrive_after=2, leave_after=3, grace_period=60)
+    keys = [synthetic_mac(i) for i in range(10000)]
+    states, _ = advance({key: INITIAL_STATE for key in keys}, set(keys), 1000.0, policy)
+    states, _ = advance(states, set(keys), 1030.0, policy)
+    # 每轮约10%的目标状态翻转 (一半离开、一半回来)
+    seen = set(keys[1000:]) | set(keys[:500])
+    yield lambda: advance(states, seen, 1060.0, policy)
+
+
+@benchmark('oui_lookup_10k', items=10000)
+def bench_oui_lookup():
+    from fingerprint import OuiDatabase
+    
+    # 与IEEE MA-L登记数量相当的合成数据库 (约4万个前缀)
+    database = OuiDatabase(((i * 419) & 0xFDFFFF, 24, f'Vendor {i % 5000}') for i in range(40000))
+    macs = []
+    for i in range(10000):
+        value = (i * 0x9E3779B97F4A7C15) & 0xFDFFFFFFFFFF
+        macs.append(':'.join(f'{(value >> shift) & 0xff:02x}' for shift in range(40, -8, -8)))
+    yield lambda: [database.lookup(mac) for mac in macs]
+
+
+@benchmark('fingerprint_match_16', items=65534)
+def bench_fingerprint_match():
+    from fingerprint import FingerprintRule
+    from network_detector import NetworkDetector
+    
+    targets = {f'00:1b:63:00:{i >> 8:02x}:{i & 0xff:02x}': f'target{i}' for i in range(100)}
+    detector = NetworkDetector(None, fingerprints=[(mac, FingerprintRule(f'host{i}', None, None))
+                                                   for i, mac in enumerate(targets)])
+    # /16 中每个主机都以随机MAC应答，每个目标有一个通过主机名关联的随机MAC
+    devices = [(f'10.20.{i >> 8}.{i & 0xff}', synthetic_mac(i)) for i in range(1, 65535)]
+    for i in range(100):
+        detector.fingerprints.observe(synthetic_mac(i * 600 + 1), hostname=f'host{i}')
+    with patch.object(detector, 'scan_network', return_value=devices):
+        yield lambda: detector.match_targets(targets)
+
+
+@benchmark('notification_throughput', items=200, tolerance=1.0)
+def bench_notification_throughput():
+    from bench_notification import StubHandler
+    from notification import WebhookNotification
+    from notification_queue import NotificationDispatcher
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    service = WebhookNotification(f'http://127.0.0.1:{server.server_address[1]}/hook', pool_size=4)
+    service._get_session().trust_env = False
+    dispatcher = NotificationDispatcher(workers=4, queue_size=1000, max_retries=0, dead_letter_file='')
+    
+    def run():
+        for i in range(200):
+            dispatcher.submit(service, "基准", f"第{i}条")
+        dispatcher.join()
+    
+    try:
+        yield run
+    finally:
+        dispatcher.stop()
+        service.close()
+        server.shutdown()
+        server.server_close()
+
+
+def measure(run, rounds, warmup=1):
+    """
+    执行基准并计时
+    
+    Args:
+        run: 每轮执行的函数
+        rounds: 计时轮数
+        warmup: 预热轮数 (不计时)
+    
+    Returns:
+        dict: {'min': 秒, 'median': 秒, 'rounds': 轮数}
+    """
+    for _ in range(warmup):
+        run()
+    timings = []
+    for _ in range(rounds):
+        # 上一轮留下的垃圾不计入本轮
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return {'min': min(timings), 'median': statistics.median(timings), 'rounds': rounds}
+
+
+def _calibration_work():
+    """固定的纯Python工作量，用来衡量当前机器/负载下解释器的速度"""
+    table = {}
+    for i in range(100000):
+        table[str(i)] = i
+    return sum(len(key) for key in table)
+
+
+def calibrate(rounds=5):
+    """
+    测量校准工作量的耗时
+    
+    基准结果除以校准耗时后再与基线比较，可抵消机器性能差异和CPU被其他进程占用带来的波动
+    
+    Returns:
+        float: 最小耗时(秒)
+    """
+    return measure(_calibration_work, rounds)['min']
+
+
+def run_benchmarks(names=None, rounds=10, warmup=1):
+    """
+    运行基准
+    
+    Args:
+        names: 要运行的基准名称列表，默认全部
+        rounds: 计时轮数
+        warmup: 预热轮数
+    
+    Returns:
+        dict: {名称: measure 的结果，另含 items 和 calibration}
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        setup, items, _ = BENCHMARKS[name]
+        before = calibrate()
+        with setup() as run:
+            result = measure(run, rounds, warmup)
+        # 前后各校准一次取较快的一次，单次校准碰上其他进程抢占CPU时会把结果换算得过慢
+        results[name] = dict(result, items=items, calibration=min(before, calibrate()))
+    return results
+
+
+def normalized(result, calibration):
+    """
+    将结果的最小耗时按校准耗时换算到另一台机器/另一时刻的速度
+    
+    Args:
+        result: run_benchmarks 的单条结果
+        calibration: 目标校准耗时 (为空时不换算)
+    
+    Returns:
+        float: 换算后的最小耗时(秒)
+    """
+    if calibration and result.get('calibration'):
+        return result['min'] * calibration / result['calibration']
+    return result['min']
+
+
+def merge_passes(passes):
+    """
+    合并多遍运行的结果: 各遍先换算到最快的一次校准，再取中位数
+    
+    单遍的最小耗时仍会受到偶发干扰，用多遍的中位数作为基线，基线本身不会偏快或偏慢
+    
+    Args:
+        passes: run_benchmarks 结果的列表
+    
+    Returns:
+        dict: 与 run_benchmarks 格式相同的结果，另含 passes
+    """
+    merged = {}
+    for name in passes[0]:
+        items = [results[name] for results in passes]
+        calibration = min(item['calibration'] for item in items)
+        merged[name] = dict(items[0],
+                            min=statistics.median(normalized(item, calibration) for item in items),
+                            median=statistics.median(item['median'] for item in items),
+                            calibration=calibration,
+                            passes=len(items))
+    return merged
+
+
+def recheck(results, baseline, threshold=DEFAULT_THRESHOLD, rounds=10, retries=DEFAULT_RETRIES):
+    """
+    重新测量超过阈值的基准，保留每个基准最快的一次结果
+    
+    只有每次测量都超过阈值才算退化，CPU被偶发抢占造成的假退化会在重测时消失
+    
+    Args:
+        results: run_benchmarks 的结果
+        baseline: load_baseline 的结果
+        threshold: 允许变慢的比例
+        rounds: 重测的计时轮数
+        retries: 最多重测几次
+    
+    Returns:
+        dict: 更新后的结果
+    """
+    results = dict(results)
+    for _ in range(retries):
+        flagged = [name for name, _, _, regressed in compare(results, baseline, threshold) if regressed]
+        if not flagged:
+            break
+        for name, result in run_benchmarks(flagged, rounds).items():
+            calibration = baseline[name].get('calibration')
+            if normalized(result, calibration) < normalized(results[name], calibration):
+                results[name] = result
+    return results
+
+
+def load_baseline(path=BASELINE_FILE):
+    """
+    读取基线文件
+    
+    Returns:
+        dict: {名称: {'min': 秒, ...}}，文件不存在或版本不符时为空
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != BASELINE_VERSION:
+        return {}
+    return data.get('benchmarks', {})
+
+
+def save_baseline(results, path=BASELINE_FILE):
+    """将结果保存为基线，已有但本次未运行的基准保持不变"""
+    benchmarks = load_baseline(path)
+    benchmarks.update(results)
+    data = {
+        'version': BASELINE_VERSION,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'benchmarks': dict(sorted(benchmarks.items())),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    与基线比较
+    
+    使用最小耗时 (受系统噪声影响最小)，两边都有校准耗时时先换算到基线机器的速度
+    
+    Args:
+        results: run_benchmarks 的结果
+        baseline: load_baseline 的结果
+        threshold: 允许变慢的比例 (0.25 表示慢25%以内不算退化)
+    
+    Returns:
+        list: [(名称, 换算后的当前耗时, 基线耗时或None, 是否退化), ...]
+    """
+    report = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            report.append((name, result['min'], None, False))
+            continue
+        current = normalized(result, base.get('calibration'))
+        tolerance = BENCHMARKS[name][2] if name in BENCHMARKS else None
+        limit = base['min'] * (1 + max(threshold, tolerance or 0))
+        report.append((name, current, base['min'], current > limit))
+    return report
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='Boss Detect 性能基准')
+    parser.add_argument('names', nargs='*', help=f"只运行指定基准 ({', '.join(BENCHMARKS)})")
+    parser.add_argument('--rounds', type=int, default=10, help='计时轮数')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='允许变慢的比例')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='基线文件')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='超过阈值的基准重新测量的次数')
+    parser.add_argument('--save', action='store_true', help='保存本次结果为基线')
+    parser.add_argument('--passes', type=int, default=None,
+                        help=f'运行几遍，保存基线时取中位数 (保存时默认{SAVE_PASSES}遍，否则1遍)')
+    args = parser.parse_args(argv)
+    
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知基准: {', '.join(unknown)}")
+    
+    # 被测代码的日志会淹没报告
+    logging.disable(logging.INFO)
+    passes = args.passes or (SAVE_PASSES if args.save else 1)
+    results = merge_passes([run_benchmarks(args.names, args.rounds) for _ in range(max(1, passes))])
+    baseline = load_baseline(args.baseline)
+    if not args.save:
+        results = recheck(results, baseline, args.threshold, args.rounds, args.retries)
+    
+    print("=" * 78)
+    print("最小/单条为换算到基线机器速度后的耗时，中位为实测值")
+    print(f"{'基准':<28}{'最小(ms)':>10}{'中位(ms)':>10}{'单条(µs)':>10}{'基线(ms)':>10}{'变化':>10}")
+    print("-" * 78)
+    regressed = []
+    for name, current, base, is_regression in compare(results, baseline, args.threshold):
+        result = results[name]
+        per_item = current / result['items'] * 1e6
+        if base is None:
+            change = '新增'
+        else:
+            change = f"{(current / base - 1) * 100:+.1f}%"
+        mark = ' ⚠️' if is_regression else ''
+        base_text = f"{base * 1000:.3f}" if base is not None else '-'
+        print(f"{name:<28}{current * 1000:>10.3f}{result['median'] * 1000:>10.3f}{per_item:>10.3f}"
+              f"{base_text:>10}{change:>10}{mark}")
+        if is_regression:
+            regressed.append(name)
+    print("=" * 78)
+    
+    if args.save:
+        save_baseline(results, args.baseline)
+        print(f"基线已保存: {args.baseline}")
+        return 0
+    if regressed:
+        print(f"⚠️  性能退化超过阈值: {', '.join(regressed)}")
+        return 1
+    print("✅ 未发现性能退化")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
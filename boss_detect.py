@@ -5,24 +5,137 @@ Boss Detect - 老板探测器主程序
 """
 import time
 import logging
-import configparser
 import os
 import sys
+import threading
 from datetime import datetime, timedelta
 
-from network_detector import NetworkDetector
+from network_detector import NetworkDetector, normalize_mac
 from notification import create_notification_service
+from notification_queue import NotificationDispatcher
+from notification_batch import NotificationCoalescer, NotificationEvent
+from presence_sniffer import PassivePresenceEngine
+from probe_backends import default_chain
+from scheduler import ScanScheduler
+from history_store import HistoryStore
+from metrics import REGISTRY, start_metrics_server, stop_metrics_server
+from router_backend import UbusSource, SnmpSource, DnsmasqLeaseSource
+from settings import SettingsError, SettingsWatcher, changed_fields, load_settings
+from state_store import StateStore, presence_to_dict, presence_from_dict
+from presence_state import (INITIAL_STATE, PENDING, LEAVING, PresencePolicy, transition,
+                            is_online as presence_online)
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.FileHandler('boss-detect.log'),
+        # 首次写日志时才创建文件，控制器的工作进程会换成各站点自己的日志
+        logging.FileHandler('boss-detect.log', delay=True),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
+CYCLE_SECONDS = REGISTRY.histogram('boss_detect_cycle_seconds', '一轮检测(探测+状态更新)耗时(秒)',
+                                   buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+TARGETS_ONLINE = REGISTRY.gauge('boss_detect_targets_online', '当前确认在线的目标数')
+
+# 被动模式下上线由目标自己发出的报文触发，离线已由引擎超时并主动探测确认，无需再次确认
+PASSIVE_POLICY = PresencePolicy(arrive_after=1, leave_after=1, grace_period=0)
+
+
+def create_channel(notification):
+    """
+    创建单个通知渠道
+    
+    Args:
+        notification: NotificationSettings
+    
+    Returns:
+        NotificationService: 通知服务实例
+    """
+    kwargs = {}
+    if notification.service_type == 'pushdeer':
+        kwargs['pushdeer_key'] = notification.pushdeer_key
+    elif notification.service_type == 'webhook':
+        kwargs['webhook_url'] = notification.webhook_url
+    
+    kwargs.update(
+        pool_size=notification.pool_size,
+        connect_timeout=notification.connect_timeout,
+        read_timeout=notification.read_timeout,
+        http2=notification.http2
+    )
+    return create_notification_service(notification.service_type, **kwargs)
+
+
+def get_notification_service(notifications, section, cache):
+    """
+    获取通知配置节对应的通知服务（按需创建并缓存），配置了 channels 时创建并行发送到多个渠道的组合服务
+    
+    Args:
+        notifications: {配置节名称: NotificationSettings}
+        section: 通知配置节名称
+        cache: 已创建的通知服务 {配置节名称: NotificationService}，新建的服务会写入其中
+    
+    Returns:
+        NotificationService: 通知服务实例
+    """
+    if section in cache:
+        return cache[section]
+    
+    notification = notifications[section]
+    if not notification.channels:
+        service = create_channel(notification)
+    else:
+        services = {}
+        for name in notification.channels:
+            # 渠道列表中包含自身时，使用本节的 service_type 等配置
+            if name == section:
+                services[name] = create_channel(notification)
+            else:
+                services[name] = get_notification_service(notifications, name, cache)
+        service = create_notification_service('composite', channels=services)
+    cache[section] = service
+    return service
+
+
+class TargetState:
+    """多目标模式下单个目标的检测状态"""
+    
+    def __init__(self, name, mac, ip=None, notification_section='notification'):
+        """
+        初始化目标状态
+        
+        Args:
+            name: 目标名称
+            mac: 目标MAC地址
+            ip: 目标IP地址 (可选)
+            notification_section: 该目标使用的通知配置节
+        """
+        self.name = name
+        self.mac = normalize_mac(mac)
+        self.ip = ip
+        self.notification_section = notification_section
+        
+        # 每个目标独立的在线状态机和冷却状态
+        self.presence = INITIAL_STATE
+        self.last_known_ip = None
+        self.last_notification_time = None
+    
+    @property
+    def online(self):
+        """是否在线（待确认离开期间仍视为在线）"""
+        return presence_online(self.presence)
+    
+    @property
+    def detection_count(self):
+        """待确认到达时已连续检测到的次数"""
+        return self.presence.hits
+    
+    def __repr__(self):
+        return f"TargetState({self.name!r}, {self.mac!r})"
+
 
 class BossDetector:
     """老板检测器主类"""
@@ -34,72 +147,371 @@ class BossDetector:
         Args:
             config_file: 配置文件路径
         """
-        self.config = self._load_config(config_file)
-        self.network_detector = self._init_network_detector()
-        self.notification_service = self._init_notification_service()
+        self.config_file = config_file
+        self.settings = self._load_settings(config_file)
+        self.targets = self._load_targets()
+        self._index_targets()
+        try:
+            self.network_detector = self._init_network_detector(self.settings)
+        except ValueError as e:
+            logger.error(f"探测链配置错误: {e}")
+            sys.exit(1)
+        self.notification_services = {}
+        self.notification_service = self._get_notification_service('notification')
+        self.dispatcher = self._init_dispatcher(self.settings)
+        self.coalescer = self._init_coalescer(self.settings, self.dispatcher)
+        try:
+            self.scheduler = self._init_scheduler(self.settings)
+        except ValueError as e:
+            logger.error(f"扫描调度配置错误: {e}")
+            sys.exit(1)
         
         # 状态追踪
+        self.presence = INITIAL_STATE
         self.boss_online = False
         self.last_notification_time = None
         self.detection_count = 0
         self.last_known_ip = None  # 记录最后已知的IP地址
         
+        self.history = self._init_history(self.settings)
+        self.state_store = self._init_state_store(self.settings)
+        self._restore_state()
+        self.metrics_server = self._init_metrics(self.settings)
+        
+        # 配置热加载: 监视线程暂存新配置，检测线程在两轮检测之间应用
+        self._pending_settings = None
+        self._settings_lock = threading.Lock()
+        self._wake = threading.Event()
+        self.settings_watcher = self._init_settings_watcher()
+        
         logger.info("Boss Detector 初始化完成")
     
-    def _load_config(self, config_file):
+    def _load_settings(self, config_file):
         """
         加载配置文件
         
         Args:
             config_file: 配置文件路径
-            
+        
         Returns:
-            configparser.ConfigParser: 配置对象
+            Settings: 不可变的配置对象
         """
         if not os.path.exists(config_file):
             logger.error(f"配置文件不存在: {config_file}")
             logger.error("请复制 config.ini.example 为 config.ini 并填写配置")
             sys.exit(1)
         
-        config = configparser.ConfigParser()
-        config.read(config_file, encoding='utf-8')
+        try:
+            settings = load_settings(config_file)
+        except SettingsError as e:
+            logger.error(f"配置错误: {e}")
+            sys.exit(1)
         
         logger.info(f"配置文件加载成功: {config_file}")
-        return config
+        return settings
     
-    def _init_network_detector(self):
-        """初始化网络检测器"""
-        boss_mac = self.config.get('network', 'boss_mac')
-        boss_ip = self.config.get('network', 'boss_ip', fallback='')
-        network_interface = self.config.get('network', 'network_interface', fallback='')
+    def _load_targets(self, previous=()):
+        """
+        根据 [targets] 配置创建目标列表
         
-        if not boss_mac:
-            logger.error("未配置老板的MAC地址")
-            sys.exit(1)
+        Args:
+            previous: 重新加载前的 TargetState 列表，名称和MAC都未变的目标沿用原对象，保留在线状态
+        
+        Returns:
+            list: TargetState 列表，未配置时为空列表
+        """
+        existing = {(target.name, target.mac): target for target in previous}
+        targets = []
+        for item in self.settings.targets:
+            target = existing.get((item.name, item.mac))
+            if target is None:
+                target = TargetState(item.name, item.mac, item.ip, item.notification_section)
+            else:
+                target.ip = item.ip
+                target.notification_section = item.notification_section
+            targets.append(target)
+        
+        if targets:
+            logger.info(f"多目标模式: 共 {len(targets)} 个目标")
+        return targets
+    
+    def _index_targets(self):
+        """重建按MAC和IP查找目标的索引"""
+        self.mac_index = {target.mac: target for target in self.targets}
+        self.ip_index = {target.ip: target for target in self.targets if target.ip}
+    
+    @staticmethod
+    def _detector_key(settings):
+        """
+        网络检测器依赖的配置，变化时才需要重建检测器
+        
+        Args:
+            settings: Settings
+        
+        Returns:
+            tuple: 可比较的配置值
+        """
+        network = settings.network
+        target = None if settings.targets else (network.boss_mac, network.boss_ip)
+        router = settings.router if 'router' in settings.detector.probe_chain else None
+        return (target, network.network_interface, network.scan_ranges, network.scan_interfaces,
+                settings.detector, router)
+    
+    def _init_network_detector(self, settings):
+        """
+        创建网络检测器
+        
+        Args:
+            settings: Settings
+        
+        Raises:
+            ValueError: 探测链配置错误
+        """
+        network = settings.network
+        options = settings.detector._asdict()
+        # 被动模式下由被动检测引擎监听报文，主动模式下由 sighting 后端自己监听
+        backend_options = {'sighting': {'sniff': network.detection_mode != 'passive'}}
+        if 'router' in options['probe_chain']:
+            backend_options['router'] = self._router_options(settings.router)
+        options.update(
+            network_interface=network.network_interface,
+            scan_ranges=list(network.scan_ranges),
+            scan_interfaces=list(network.scan_interfaces),
+            backend_options=backend_options
+        )
+        
+        if settings.targets:
+            # 多目标模式: 共享一个检测器，每轮只做一次ARP扫描
+            target = dict(target_mac=None)
+        else:
+            target = dict(target_mac=network.boss_mac, target_ip=network.boss_ip)
+        
+        # 主动模式下设备名称来自路由器DHCP租约 (router 不在默认探测链中)，
+        # 或单目标模式下 sighting 后端监听到的DHCP/mDNS报文
+        chain = settings.detector.probe_chain or default_chain()
+        sniffing = not settings.targets and settings.detector.sighting_ttl > 0 and 'sighting' in chain
+        if (settings.detector.fingerprints and network.detection_mode != 'passive'
+                and 'router' not in chain and not sniffing):
+            logger.warning("配置了 [fingerprints]，但探测链中没有 router 后端: 主动模式下没有设备名称来源，"
+                           "不会关联任何随机MAC (需在 probe_chain 中加入 router，单目标模式下开启 sighting_ttl，"
+                           "或使用被动模式)")
+        
+        return NetworkDetector(**target, **options)
+    
+    def _router_options(self, router):
+        """
+        根据 [router] 配置创建路由器数据源
+        
+        Args:
+            router: RouterSettings
+        """
+        sources = []
+        if router.ubus_url:
+            sources.append(UbusSource(
+                router.ubus_url,
+                username=router.ubus_username,
+                password=router.ubus_password,
+                interfaces=list(router.ubus_interfaces),
+                leases=router.ubus_leases
+            ))
+        if router.snmp_host:
+            sources.append(SnmpSource(router.snmp_host, community=router.snmp_community, port=router.snmp_port))
+        if router.dnsmasq_leases:
+            sources.append(DnsmasqLeaseSource(router.dnsmasq_leases))
+        if not sources:
+            logger.warning("探测链包含 router，但 [router] 未配置任何数据源")
+        
+        return dict(sources=sources, ttl=router.cache_ttl, authoritative=router.authoritative)
+    
+    def _init_dispatcher(self, settings):
+        """初始化通知分发队列，通知在后台线程中发送，不阻塞检测循环"""
+        dispatch = settings.dispatch
+        return NotificationDispatcher(
+            workers=dispatch.workers,
+            queue_size=dispatch.queue_size,
+            max_retries=dispatch.max_retries,
+            retry_backoff=dispatch.retry_backoff,
+            retry_max_delay=dispatch.retry_max_delay,
+            dead_letter_file=dispatch.dead_letter_file
+        )
+    
+    def _init_coalescer(self, settings, dispatcher):
+        """
+        初始化通知合并器，batch_window 为0时不合并
+        
+        开启后窗口内同一渠道的通知合并为一条摘要，并取代 notification_cooldown，保证最终状态一定送达
+        """
+        window = settings.dispatch.batch_window
+        if window <= 0:
+            return None
+        logger.info(f"通知合并窗口: {window}秒")
+        return NotificationCoalescer(dispatcher, window)
+    
+    def _dispatch(self, service, event, label='', on_success=None):
+        """
+        发送一条通知: 开启合并时放入合并窗口，否则直接放入分发队列
+        
+        Args:
+            service: NotificationService 实例
+            event: NotificationEvent 实例
+            label: 日志中使用的名称
+            on_success: 发送成功后的回调
+        """
+        if self.coalescer is not None:
+            self.coalescer.add(service, event, on_success=on_success)
+        else:
+            self.dispatcher.submit(service, event.title, event.message, label=label, on_success=on_success)
+    
+    def _init_history(self, settings):
+        """初始化在线历史记录，未配置 db_file 时不记录"""
+        if not settings.history.db_file:
+            return None
+        return HistoryStore(settings.history.db_file, record_probes=settings.history.record_probes)
+    
+    def _init_metrics(self, settings):
+        """启动 /metrics HTTP服务，未配置端口时不启动"""
+        port, bind = settings.metrics
+        if port <= 0:
+            return None
+        try:
+            return start_metrics_server(port, bind)
+        except OSError as e:
+            logger.error(f"指标服务启动失败 ({bind}:{port}): {e}")
+            return None
+    
+    def _record_history(self, mac, subject, is_online, ip, event):
+        """
+        记录本轮探测结果和状态变化（只入队，由后台线程批量写入）
+        
+        Args:
+            mac: 目标MAC地址
+            subject: 目标名称
+            is_online: 本轮是否检测到
+            ip: 本轮检测到的IP，离开事件时为最后已知IP
+            event: 状态机事件 ('arrival', 'departure' 或 None)
+        """
+        if self.history is None:
+            return
+        self.history.record_probe(mac, is_online, ip)
+        if event is not None:
+            self.history.record_transition(mac, event, ip, subject)
+    
+    def _init_state_store(self, settings):
+        """初始化状态快照存储，未配置 state_file 时不持久化"""
+        if not settings.state.state_file:
+            return None
+        return StateStore(settings.state.state_file, max_age=settings.state.max_age)
+    
+    def _snapshot(self):
+        """
+        生成当前状态的快照
+        
+        Returns:
+            dict: 可JSON序列化的状态
+        """
+        def entry(mac, presence, last_known_ip, last_notification_time):
+            return {
+                'mac': mac,
+                'presence': presence_to_dict(presence),
+                'last_known_ip': last_known_ip,
+                'last_notification_time': last_notification_time.timestamp() if last_notification_time else None,
+            }
+        
+        return {
+            'boss': entry(self.settings.network.boss_mac, self.presence,
+                          self.last_known_ip, self.last_notification_time),
+            'targets': {target.name: entry(target.mac, target.presence, target.last_known_ip,
+                                           target.last_notification_time)
+                        for target in self.targets},
+        }
+    
+    def _save_state(self):
+        """保存状态快照（状态变化或通知发送成功时调用）"""
+        if self.state_store is not None:
+            self.state_store.save(self._snapshot())
+    
+    def _refresh_state(self, changed):
+        """
+        每轮检测后调用：状态变化时立即保存快照，状态稳定时每 max_age/2 秒刷新一次
+        
+        Args:
+            changed: 本轮状态或最后已知IP是否发生变化
+        """
+        if self.state_store is not None and (changed or self.state_store.due()):
+            self._save_state()
+    
+    def _restore_state(self):
+        """
+        从快照恢复状态，快照过期或MAC地址与当前配置不符时忽略
         
-        return NetworkDetector(
-            target_mac=boss_mac,
-            target_ip=boss_ip if boss_ip else None,
-            network_interface=network_interface if network_interface else None
+        恢复后老板若仍在线，不会重新确认，也不会重复发送到达通知
+        """
+        if self.state_store is None:
+            return
+        snapshot = self.state_store.load()
+        if snapshot is None:
+            return
+        
+        def restore(data, mac):
+            if not isinstance(data, dict) or data.get('mac') != mac:
+                return None
+            sent = data.get('last_notification_time')
+            return (presence_from_dict(data.get('presence') or {}), data.get('last_known_ip'),
+                    datetime.fromtimestamp(sent) if sent else None)
+        
+        restored = restore(snapshot.get('boss'), self.settings.network.boss_mac)
+        if restored is not None and not self.targets:
+            self.presence, self.last_known_ip, self.last_notification_time = restored
+            self.boss_online = presence_online(self.presence)
+            self.detection_count = self.presence.hits
+            if self.last_known_ip:
+                self.network_detector.remember_ip(self.last_known_ip)
+            logger.info(f"已恢复老板状态: {self.presence.status}, IP: {self.last_known_ip}")
+        
+        saved_targets = snapshot.get('targets') or {}
+        for target in self.targets:
+            restored = restore(saved_targets.get(target.name), target.mac)
+            if restored is not None:
+                target.presence, target.last_known_ip, target.last_notification_time = restored
+                logger.info(f"已恢复 {target.name} 状态: {target.presence.status}, IP: {target.last_known_ip}")
+    
+    def _init_scheduler(self, settings):
+        """
+        初始化扫描调度器
+        
+        未开启自适应调度时，所有间隔都等于 scan_interval，行为与固定间隔相同
+        
+        Raises:
+            ValueError: 调度参数或工作时间配置错误
+        """
+        scan_interval = settings.network.scan_interval
+        schedule = settings.schedule
+        if not schedule.adaptive:
+            return ScanScheduler(base_interval=scan_interval)
+        
+        scheduler = ScanScheduler(
+            base_interval=scan_interval,
+            min_interval=schedule.min_interval,
+            max_interval=schedule.max_interval,
+            backoff_factor=schedule.backoff_factor,
+            fast_window=schedule.fast_window,
+            work_hours=schedule.work_hours
         )
+        
+        logger.info(f"自适应扫描: {scheduler.min_interval}~{scheduler.max_interval}秒，退避系数 {scheduler.backoff_factor}")
+        return scheduler
     
-    def _init_notification_service(self):
-        """初始化通知服务"""
-        service_type = self.config.get('notification', 'service_type')
+    def _get_notification_service(self, section):
+        """
+        获取指定配置节对应的通知服务（按需创建并缓存）
         
-        kwargs = {}
-        if service_type == 'pushdeer':
-            kwargs['pushdeer_key'] = self.config.get('notification', 'pushdeer_key')
-            if not kwargs['pushdeer_key']:
-                logger.error("未配置PushDeer Key")
-                sys.exit(1)
-        elif service_type == 'webhook':
-            kwargs['webhook_url'] = self.config.get('notification', 'webhook_url')
-            if not kwargs['webhook_url']:
-                logger.error("未配置Webhook URL")
-                sys.exit(1)
+        Args:
+            section: 通知配置节名称
         
-        return create_notification_service(service_type, **kwargs)
+        Returns:
+            NotificationService: 通知服务实例
+        """
+        return get_notification_service(self.settings.notifications, section, self.notification_services)
     
     def _should_send_notification(self):
         """
@@ -111,10 +523,8 @@ class BossDetector:
         if self.last_notification_time is None:
             return True
         
-        cooldown = self.config.getint('advanced', 'notification_cooldown', fallback=300)
         time_since_last = datetime.now() - self.last_notification_time
-        
-        return time_since_last.total_seconds() > cooldown
+        return time_since_last.total_seconds() > self.settings.advanced.notification_cooldown
     
     def _send_notification(self, ip, is_arrival=True):
         """
@@ -124,82 +534,538 @@ class BossDetector:
             ip: 检测到的IP地址
             is_arrival: True表示到达通知，False表示离开通知
         """
-        if not self._should_send_notification():
+        if self.coalescer is None and not self._should_send_notification():
             logger.info("通知在冷却期内，跳过发送")
             return
         
+        notification = self.settings.notifications['notification']
         if is_arrival:
-            title = self.config.get('notification', 'notification_title')
-            message = self.config.get('notification', 'notification_message')
+            title, message = notification.title, notification.message
         else:
-            title = self.config.get('notification', 'leave_notification_title', fallback='✅ 老板离开了！')
-            message = self.config.get('notification', 'leave_notification_message', fallback='老板的手机已从局域网断开，可以放松了~')
+            title, message = notification.leave_title, notification.leave_message
         
         # 添加详细信息
-        detail = f"\n\n**检测信息:**\n- 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n- IP地址: {ip if ip else '未知'}\n- MAC地址: {self.config.get('network', 'boss_mac')}"
+        boss_mac = self.settings.network.boss_mac
+        detail = f"\n\n**检测信息:**\n- 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n- IP地址: {ip if ip else '未知'}\n- MAC地址: {boss_mac}"
         full_message = message + detail
         
-        success = self.notification_service.send(title, full_message)
+        event = NotificationEvent('boss', 'arrival' if is_arrival else 'departure', title, full_message,
+                                  ip, boss_mac, time.time())
+        self._dispatch(self.notification_service, event, on_success=self._mark_notification_sent)
+    
+    def _mark_notification_sent(self):
+        """通知发送成功后开始计算冷却时间"""
+        self.last_notification_time = datetime.now()
+        self._save_state()
+    
+    def _send_target_notification(self, target, ip, is_arrival=True):
+        """
+        发送单个目标的通知（多目标模式）
+        
+        Args:
+            target: TargetState 实例
+            ip: 检测到的IP地址
+            is_arrival: True表示到达通知，False表示离开通知
+        """
+        if self.coalescer is None and target.last_notification_time is not None:
+            time_since_last = datetime.now() - target.last_notification_time
+            if time_since_last.total_seconds() <= self.settings.advanced.notification_cooldown:
+                logger.info(f"[{target.name}] 通知在冷却期内，跳过发送")
+                return
         
-        if success:
-            self.last_notification_time = datetime.now()
-            logger.info("通知发送成功")
+        section = target.notification_section
+        notification = self.settings.notifications[section]
+        if is_arrival:
+            title, message = notification.title, notification.message
         else:
-            logger.error("通知发送失败")
+            title, message = notification.leave_title, notification.leave_message
+        
+        detail = f"\n\n**检测信息:**\n- 目标: {target.name}\n- 时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n- IP地址: {ip if ip else '未知'}\n- MAC地址: {target.mac}"
+        full_message = message + detail
+        
+        def mark_sent():
+            target.last_notification_time = datetime.now()
+            self._save_state()
+        
+        event = NotificationEvent(target.name, 'arrival' if is_arrival else 'departure', title, full_message,
+                                  ip, target.mac, time.time())
+        self._dispatch(self._get_notification_service(section), event, label=target.name, on_success=mark_sent)
+    
+    def _presence_policy(self, confirmation_count):
+        """
+        根据配置创建在线状态机的判定参数
+        
+        Args:
+            confirmation_count: 确认到达所需的连续检测次数
+        
+        Returns:
+            PresencePolicy: 判定参数
+        """
+        return PresencePolicy(
+            arrive_after=confirmation_count,
+            leave_after=self.settings.advanced.departure_count,
+            grace_period=self.settings.advanced.departure_grace
+        )
+    
+    def _update_target(self, target, is_online, ip, policy):
+        """
+        根据本轮检测结果推进单个目标的状态机
+        
+        Args:
+            target: TargetState 实例
+            is_online: 本轮是否检测到目标
+            ip: 检测到的IP地址
+            policy: PresencePolicy
+        
+        Returns:
+            bool: 状态或最后已知IP是否发生变化（需要保存快照）
+        """
+        previous = (target.presence.status, target.last_known_ip)
+        target.presence, event = transition(target.presence, is_online, time.time(), policy)
+        self._record_history(target.mac, target.name, is_online,
+                             target.last_known_ip if event == 'departure' else ip, event)
+        
+        if event == 'arrival':
+            logger.warning(f"🚨 确认 {target.name} 在线！")
+            target.last_known_ip = ip
+            self._send_target_notification(target, ip, is_arrival=True)
+        elif event == 'departure':
+            logger.info(f"✅ {target.name} 已离线")
+            self._send_target_notification(target, target.last_known_ip, is_arrival=False)
+            target.last_known_ip = None
+        elif target.presence.status == PENDING:
+            logger.info(f"[{target.name}] 检测到目标设备 ({target.presence.hits}/{policy.arrive_after})")
+        elif target.presence.status == LEAVING:
+            logger.info(f"[{target.name}] 本轮未检测到目标 ({target.presence.misses}/{policy.leave_after})，等待确认离开")
+        elif is_online and ip:
+            target.last_known_ip = ip
+        
+        return (target.presence.status, target.last_known_ip) != previous
+    
+    def check_targets(self, confirmation_count):
+        """
+        执行一轮多目标检测：一次ARP扫描，按MAC索引匹配所有目标
+        
+        Args:
+            confirmation_count: 确认次数
+        
+        Returns:
+            dict: 本轮发现的目标 {target: ip}
+        """
+        with CYCLE_SECONDS.time():
+            found = self.network_detector.match_targets(self.mac_index, self.ip_index)
+            policy = self._presence_policy(confirmation_count)
+            changed = False
+            for target in self.targets:
+                ip = found.get(target)
+                changed |= self._update_target(target, target in found, ip, policy)
+            self._refresh_state(changed)
+        TARGETS_ONLINE.set(sum(target.online for target in self.targets))
+        return found
+    
+    def _update_boss(self, is_online, ip, policy):
+        """
+        根据本轮检测结果推进老板的在线状态机（单目标模式）
+        
+        Args:
+            is_online: 本轮是否检测到目标
+            ip: 检测到的IP地址
+            policy: PresencePolicy
+        """
+        previous = (self.presence.status, self.last_known_ip)
+        self.presence, event = transition(self.presence, is_online, time.time(), policy)
+        self._record_history(self.settings.network.boss_mac, 'boss', is_online,
+                             self.last_known_ip if event == 'departure' else ip, event)
+        self.boss_online = presence_online(self.presence)
+        self.detection_count = self.presence.hits
+        
+        if event == 'arrival':
+            logger.warning("🚨 确认老板在线！")
+            self.last_known_ip = ip
+            self._send_notification(ip, is_arrival=True)
+        elif event == 'departure':
+            logger.info("✅ 老板已离线")
+            self._send_notification(self.last_known_ip, is_arrival=False)
+            self.last_known_ip = None
+        elif self.presence.status == PENDING:
+            logger.info(f"检测到目标设备 ({self.presence.hits}/{policy.arrive_after})")
+        elif self.presence.status == LEAVING:
+            logger.info(f"本轮未检测到老板 ({self.presence.misses}/{policy.leave_after})，等待确认离开")
+        elif is_online:
+            # 持续在线，更新最后已知IP
+            if ip:
+                self.last_known_ip = ip
+            logger.debug("老板仍在线")
+        
+        self._refresh_state((self.presence.status, self.last_known_ip) != previous)
+    
+    def _init_settings_watcher(self):
+        """创建配置文件监视器，reload_interval 为0时不监视"""
+        interval = self.settings.advanced.reload_interval
+        if interval <= 0:
+            return None
+        return SettingsWatcher(self.config_file, self._queue_settings, interval)
+    
+    def _queue_settings(self, settings):
+        """
+        配置监视线程的回调: 暂存新配置并唤醒检测循环，由检测线程在两轮检测之间应用
+        
+        Args:
+            settings: 新的 Settings
+        """
+        with self._settings_lock:
+            self._pending_settings = settings
+        self._wake.set()
+    
+    def _apply_pending_settings(self):
+        """应用监视线程暂存的新配置（在检测线程中调用）"""
+        with self._settings_lock:
+            settings, self._pending_settings = self._pending_settings, None
+        if settings is not None:
+            self.apply_settings(settings)
+    
+    def _wait(self, timeout):
+        """
+        等待下一轮检测，配置文件变化时提前唤醒
+        
+        Args:
+            timeout: 最长等待时间(秒)
+        """
+        self._wake.wait(timeout)
+        self._wake.clear()
+    
+    def _stale_notification_sections(self, settings):
+        """
+        找出配置已变化的通知服务，组合服务的任一渠道变化时也需要重建
+        
+        Args:
+            settings: 新的 Settings
+        
+        Returns:
+            set: 需要重建的通知配置节
+        """
+        old = self.settings.notifications
+        stale = {section for section in self.notification_services
+                 if old.get(section) != settings.notifications.get(section)}
+        while True:
+            affected = {section for section in self.notification_services
+                        if section not in stale and stale.intersection(old[section].channels)}
+            if not affected:
+                return stale
+            stale |= affected
+    
+    def apply_settings(self, settings):
+        """
+        应用新配置: 先创建受影响的组件，全部成功后一次性替换，最后关闭旧组件
+        
+        未受影响的组件原样保留，在线状态、设备清单和探测统计都不会丢失；
+        判定参数、通知标题和冷却时间每次使用时直接读取配置，替换后立即生效
+        
+        Args:
+            settings: 新的 Settings
+        
+        Returns:
+            list: 重建的组件名称，配置未变化或新配置无法应用时为空列表
+        """
+        old = self.settings
+        changed = changed_fields(old, settings)
+        if not changed:
+            return []
+        if bool(settings.targets) != bool(old.targets):
+            logger.error("单目标/多目标模式切换需要重启程序才能生效，本次配置变化已忽略")
+            return []
+        if settings.network.detection_mode != old.network.detection_mode:
+            logger.warning("detection_mode 需要重启程序才能生效，其余配置照常应用")
+            settings = settings._replace(network=settings.network._replace(detection_mode=old.network.detection_mode))
+        
+        # 第一步: 创建可能因配置错误而失败的组件，失败时保持原配置不变
+        network_detector = scheduler = None
+        try:
+            if self._detector_key(settings) != self._detector_key(old):
+                network_detector = self._init_network_detector(settings)
+            if (settings.network.scan_interval, settings.schedule) != (old.network.scan_interval, old.schedule):
+                scheduler = self._init_scheduler(settings)
+        except ValueError as e:
+            logger.error(f"新配置无法应用，继续使用原配置: {e}")
+            if network_detector is not None:
+                network_detector.probe_chain.close()
+            return []
+        
+        # 第二步: 替换配置和组件
+        stale_services = {section: self.notification_services.pop(section)
+                          for section in self._stale_notification_sections(settings)}
+        self.settings = settings
+        rebuilt = []
+        
+        old_detector = None
+        if network_detector is not None:
+            network_detector.inherit_state(self.network_detector)
+            old_detector, self.network_detector = self.network_detector, network_detector
+            rebuilt.append('network_detector')
+        if scheduler is not None:
+            self.scheduler = scheduler
+            rebuilt.append('scheduler')
+        
+        if settings.targets != old.targets:
+            self.targets = self._load_targets(previous=self.targets)
+            self._index_targets()
+            rebuilt.append('targets')
+        elif not settings.targets and settings.network.boss_mac != old.network.boss_mac:
+            logger.info(f"老板的MAC地址已变更为 {settings.network.boss_mac}，重新开始检测")
+            self.presence = INITIAL_STATE
+            self.boss_online = False
+            self.detection_count = 0
+            self.last_known_ip = None
+            self.last_notification_time = None
+            rebuilt.append('boss')
+        
+        if stale_services:
+            self.notification_service = self._get_notification_service('notification')
+            rebuilt.append('notification_services')
+        
+        old_dispatcher = None
+        if settings.dispatch != old.dispatch:
+            # 合并窗口中的通知先发往原分发队列，原队列停止前会发送完已入队的通知
+            if self.coalescer is not None:
+                self.coalescer.flush_all()
+            if settings.dispatch._replace(batch_window=0) != old.dispatch._replace(batch_window=0):
+                old_dispatcher, self.dispatcher = self.dispatcher, self._init_dispatcher(settings)
+                rebuilt.append('dispatcher')
+            self.coalescer = self._init_coalescer(settings, self.dispatcher)
+            rebuilt.append('coalescer')
+        
+        if settings.history != old.history:
+            if self.history is not None:
+                self.history.close()
+            self.history = self._init_history(settings)
+            rebuilt.append('history')
+        if settings.state != old.state:
+            self.state_store = self._init_state_store(settings)
+            self._save_state()
+            rebuilt.append('state_store')
+        if settings.metrics != old.metrics:
+            # 端口可能相同，必须先关闭原服务的socket再绑定
+            if self.metrics_server is not None:
+                stop_metrics_server(self.metrics_server)
+            self.metrics_server = self._init_metrics(settings)
+            rebuilt.append('metrics_server')
+        if settings.advanced.reload_interval != old.advanced.reload_interval and self.settings_watcher is not None:
+            if settings.advanced.reload_interval > 0:
+                self.settings_watcher.interval = settings.advanced.reload_interval
+            else:
+                self.settings_watcher.stop()
+                self.settings_watcher = None
+        
+        # 第三步: 关闭被替换的组件
+        if old_detector is not None:
+            old_detector.probe_chain.close()
+        if old_dispatcher is not None:
+            old_dispatcher.stop()
+        for service in stale_services.values():
+            service.close()
+        
+        logger.info(f"配置已重新加载，变化: {', '.join(changed)}；重建组件: {', '.join(rebuilt) or '无'}")
+        return rebuilt
+    
+    def close(self):
+        """停止配置监视，发送完待发通知并释放所有资源（程序退出前调用）"""
+        if self.settings_watcher is not None:
+            self.settings_watcher.stop()
+        if self.coalescer is not None:
+            self.coalescer.flush_all()
+        self.dispatcher.stop()
+        if self.history is not None:
+            self.history.close()
+        if self.metrics_server is not None:
+            stop_metrics_server(self.metrics_server)
+        self.network_detector.probe_chain.close()
+        for service in self.notification_services.values():
+            service.close()
     
     def run(self):
         """运行检测循环"""
-        scan_interval = self.config.getint('network', 'scan_interval', fallback=30)
-        confirmation_count = self.config.getint('advanced', 'confirmation_count', fallback=2)
+        settings = self.settings
         
         logger.info("=" * 60)
         logger.info("Boss Detector 开始运行")
-        logger.info(f"扫描间隔: {scan_interval}秒")
-        logger.info(f"确认次数: {confirmation_count}次")
+        logger.info(f"扫描间隔: {settings.network.scan_interval}秒")
+        logger.info(f"确认次数: {settings.advanced.confirmation_count}次")
         logger.info("=" * 60)
         
+        if self.settings_watcher is not None:
+            self.settings_watcher.start()
+        
+        if settings.network.detection_mode == 'passive':
+            self._run_passive()
+            return
+        
+        if self.targets:
+            self._run_multi()
+            return
+        
         try:
             while True:
-                is_online, ip = self.network_detector.is_target_online()
-                
-                if is_online:
-                    if not self.boss_online:
-                        # 从离线变为在线，增加检测计数
-                        self.detection_count += 1
-                        logger.info(f"检测到目标设备 ({self.detection_count}/{confirmation_count})")
-                        
-                        if self.detection_count >= confirmation_count:
-                            # 确认在线
-                            logger.warning("🚨 确认老板在线！")
-                            self.boss_online = True
-                            self.last_known_ip = ip
-                            self.detection_count = 0
-                            self._send_notification(ip, is_arrival=True)
-                    else:
-                        # 持续在线，更新最后已知IP
-                        if ip:
-                            self.last_known_ip = ip
-                        logger.debug("老板仍在线")
+                self._apply_pending_settings()
+                if self.settings.network.concurrent_probes:
+                    detect = self.network_detector.is_target_online_concurrent
                 else:
-                    if self.boss_online:
-                        # 从在线变为离线
-                        logger.info("✅ 老板已离线")
-                        self.boss_online = False
-                        self._send_notification(self.last_known_ip, is_arrival=False)
-                        self.last_known_ip = None
-                    
-                    # 重置检测计数
-                    self.detection_count = 0
+                    detect = self.network_detector.is_target_online
+                policy = self._presence_policy(self.settings.advanced.confirmation_count)
+                
+                was_online = self.boss_online
+                with CYCLE_SECONDS.time():
+                    is_online, ip = detect()
+                    self._update_boss(is_online, ip, policy)
+                TARGETS_ONLINE.set(int(self.boss_online))
                 
                 # 等待下次扫描
-                time.sleep(scan_interval)
+                self.scheduler.observe(changed=self.boss_online != was_online,
+                                       pending=self.presence.status in (PENDING, LEAVING))
+                self._wait(self.scheduler.next_interval())
+        
+        except KeyboardInterrupt:
+            logger.info("\n检测程序已停止")
+            self.network_detector.log_tier_stats()
+        except Exception as e:
+            logger.error(f"运行时错误: {e}", exc_info=True)
+            raise
+    
+    def _run_multi(self):
+        """多目标检测循环"""
+        try:
+            while True:
+                self._apply_pending_settings()
+                was_online = [target.online for target in self.targets]
+                self.check_targets(self.settings.advanced.confirmation_count)
                 
+                changed = was_online != [target.online for target in self.targets]
+                pending = any(target.presence.status in (PENDING, LEAVING) for target in self.targets)
+                self.scheduler.observe(changed=changed, pending=pending)
+                self._wait(self.scheduler.next_interval())
+        
         except KeyboardInterrupt:
             logger.info("\n检测程序已停止")
+            self.network_detector.log_tier_stats()
         except Exception as e:
             logger.error(f"运行时错误: {e}", exc_info=True)
             raise
-
+    
+    
+    def _confirm_departure(self, mac, ip):
+        """
+        被动模式下设备静默超时后，主动探测确认是否离线
+        
+        Args:
+            mac: 目标MAC地址
+            ip: 最后已知IP地址
+        
+        Returns:
+            bool: True表示设备仍在线
+        """
+        if self.network_detector.probe_mac(mac, ip):
+            return True
+        if not self.targets:
+            is_online, _ = self.network_detector.is_target_online()
+            return is_online
+        return False
+    
+    def handle_presence_event(self, event):
+        """
+        处理被动检测引擎产生的上线/离线事件
+        
+        被动监听收到的是目标MAC自己发出的报文，因此上线无需多次确认
+        
+        Args:
+            event: PresenceEvent 实例
+        """
+        is_online = event.kind == 'arrive'
+        
+        if self.targets:
+            target = self.mac_index.get(event.mac)
+            if target is not None and self._update_target(target, is_online, event.ip, PASSIVE_POLICY):
+                self._save_state()
+            TARGETS_ONLINE.set(sum(target.online for target in self.targets))
+            return
+        
+        self._update_boss(is_online, event.ip, PASSIVE_POLICY)
+        TARGETS_ONLINE.set(int(self.boss_online))
+    
+    def _tracked_macs(self):
+        """被动模式下需要跟踪的MAC地址列表"""
+        if self.targets:
+            return list(self.mac_index)
+        return [self.network_detector.target_mac]
+    
+    def _init_presence_engine(self):
+        """创建被动检测引擎，跟踪当前配置中的所有目标MAC"""
+        return PassivePresenceEngine(
+            self._tracked_macs(),
+            confirm_departure=self._confirm_departure,
+            departure_timeout=self.settings.advanced.departure_timeout,
+            network_interface=self.network_detector.network_interface,
+            fingerprints=self.network_detector.fingerprints or None,
+            device_table=self.network_detector.device_table
+        )
+    
+    def _refresh_presence_engine(self, engine):
+        """
+        配置重新加载后更新被动检测引擎
+        
+        只有离线超时变化时直接修改；跟踪的MAC、接口或指纹规则变化时需要重新抓包，
+        新引擎沿用仍在跟踪的设备的在线记录，静默的设备照常超时确认离线
+        
+        Args:
+            engine: 正在运行的 PassivePresenceEngine
+        
+        Returns:
+            PassivePresenceEngine: 继续使用的引擎
+        """
+        if (set(self._tracked_macs()) == engine.macs
+                and self.network_detector.network_interface == engine.network_interface
+                and (self.network_detector.fingerprints or None) is engine.fingerprints
+                and self.network_detector.device_table is engine.device_table):
+            engine.departure_timeout = self.settings.advanced.departure_timeout
+            return engine
+        
+        engine.stop()
+        fresh = self._init_presence_engine()
+        for mac in fresh.macs & engine.present:
+            fresh.present.add(mac)
+            fresh.last_seen[mac] = engine.last_seen[mac]
+            if mac in engine.last_ip:
+                fresh.last_ip[mac] = engine.last_ip[mac]
+        fresh.start()
+        return fresh
+    
+    def _run_passive(self):
+        """被动检测循环：监听ARP/DHCP/mDNS报文，只在离线确认时主动探测"""
+        engine = self._init_presence_engine()
+        engine.start()
+        
+        try:
+            next_check = time.time() + self.settings.network.scan_interval
+            while True:
+                if self._pending_settings is not None:
+                    self._apply_pending_settings()
+                    engine = self._refresh_presence_engine(engine)
+                
+                event = engine.wait_event(timeout=max(0, next_check - time.time()))
+                if event is not None:
+                    self.handle_presence_event(event)
+                    continue
+                
+                engine.check_departures()
+                self._refresh_state(False)
+                self._wait(0)
+                next_check = time.time() + self.settings.network.scan_interval
+        
+        except KeyboardInterrupt:
+            logger.info("\n检测程序已停止")
+        except Exception as e:
+            logger.error(f"运行时错误: {e}", exc_info=True)
+            raise
+        finally:
+            engine.stop()
 
 def main():
     """主函数"""
@@ -220,7 +1086,10 @@ def main():
             pass  # 某些系统可能不支持geteuid
     
     detector = BossDetector()
-    detector.run()
+    try:
+        detector.run()
+    finally:
+        detector.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,688 @@
+#!/usr/bin/env python3
+"""
+多站点控制器 - 一个控制进程同时监控多个站点
+
+每个站点是一份独立的 config.ini (目标、接口、探测参数)。站点按网络接口分组到若干工作进程，
+工作进程中每个站点一个 BossDetector 检测线程；通知和每轮检测结果通过管道汇总到控制进程，
+由共享的分发队列发送，并统计每个站点的检测节奏。工作进程崩溃或停滞时按退避时间自动重启
+"""
+import os
+import sys
+import time
+import signal
+import logging
+import functools
+import threading
+import multiprocessing
+import multiprocessing.connection
+
+from boss_detect import BossDetector, get_notification_service
+from metrics import REGISTRY, start_metrics_server, stop_metrics_server
+from notification_queue import NotificationDispatcher
+from notification_batch import NotificationCoalescer
+from settings import SettingsError, SettingsWatcher, load_settings, load_controller_settings
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 站点检测线程名称的前缀，日志按它识别站点
+SITE_THREAD_PREFIX = 'site-'
+
+SITE_CYCLE_SECONDS = REGISTRY.histogram('boss_detect_site_cycle_seconds', '站点一轮检测耗时(秒)', ('site',),
+                                        buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+SITE_INTERVAL_SECONDS = REGISTRY.histogram('boss_detect_site_interval_seconds', '站点相邻两轮检测开始的间隔(秒)',
+                                           ('site',), buckets=(1, 2, 5, 10, 20, 30, 60, 120, 300, 600))
+SITE_TARGETS_ONLINE = REGISTRY.gauge('boss_detect_site_targets_online', '站点当前在线的目标数', ('site',))
+WORKER_RESTARTS = REGISTRY.counter('boss_detect_worker_restarts_total', '工作进程重启次数', ('worker',))
+
+
+def shard_sites(sites, processes):
+    """
+    按网络接口将站点分配到工作进程，同一接口的站点总在同一进程中，避免多个进程在同一链路上同时扫描
+    
+    Args:
+        sites: {站点名称: Settings}
+        processes: 工作进程数上限
+    
+    Returns:
+        list: 每个工作进程负责的站点名称列表
+    """
+    by_interface = {}
+    for name, settings in sites.items():
+        network = settings.network
+        interface = network.network_interface or ','.join(network.scan_interfaces)
+        by_interface.setdefault(interface, []).append(name)
+    
+    shards = [[] for _ in range(max(1, min(processes, len(by_interface))))]
+    # 站点多的接口优先分配，每次放入当前站点最少的进程
+    for interface in sorted(by_interface, key=lambda key: (-len(by_interface[key]), key)):
+        min(shards, key=len).extend(by_interface[interface])
+    return shards
+
+
+def longest_wait(settings):
+    """
+    站点两轮检测之间最长的等待时间
+    
+    Args:
+        settings: 站点的 Settings
+    
+    Returns:
+        float: 秒数，开启自适应调度时为退避上限 (也用于工作时间之外)，否则为 scan_interval
+    """
+    schedule = settings.schedule
+    if schedule.adaptive:
+        return max(schedule.min_interval, schedule.max_interval)
+    return settings.network.scan_interval
+
+
+class _NullDispatcher:
+    """工作进程中的站点不自己发送通知，由控制进程的共享分发队列发送"""
+    
+    def submit(self, *args, **kwargs):
+        return False
+    
+    def join(self, timeout=None):
+        return True
+    
+    def stop(self, timeout=10):
+        pass
+
+
+class _ResultSender:
+    """工作进程向控制进程发送结果的管道，多个站点线程共用"""
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self._lock = threading.Lock()
+    
+    def put(self, message):
+        with self._lock:
+            self.connection.send(message)
+
+
+class SiteDetector(BossDetector):
+    """
+    工作进程中运行的站点检测器
+    
+    通知事件和每轮检测结果发送给控制进程；通知服务只用配置节名称代替，
+    合并窗口和指标服务也由控制进程统一提供
+    """
+    
+    def __init__(self, site, config_file, results, stopping):
+        """
+        初始化站点检测器
+        
+        Args:
+            site: 站点名称
+            config_file: 站点配置文件
+            results: 结果发送端，提供 put(message)
+            stopping: threading.Event，设置后检测循环在本轮结束时退出
+        """
+        self.site = site
+        self.results = results
+        self.stopping = stopping
+        self._cycle_started = time.time()
+        super().__init__(config_file)
+    
+    def _get_notification_service(self, section):
+        return section
+    
+    def _init_dispatcher(self, settings):
+        return _NullDispatcher()
+    
+    def _init_coalescer(self, settings, dispatcher):
+        return None
+    
+    def _init_metrics(self, settings):
+        return None
+    
+    def _dispatch(self, service, event, label='', on_success=None):
+        self.results.put(('event', self.site, service, event))
+        # 发送由控制进程负责，入队即开始计算冷却时间
+        if on_success is not None:
+            on_success()
+    
+    def _online(self):
+        """当前在线的目标 [(名称, IP)]"""
+        if self.targets:
+            return [(target.name, target.last_known_ip) for target in self.targets if target.online]
+        return [('boss', self.last_known_ip)] if self.boss_online else []
+    
+    def _wait(self, timeout):
+        now = time.time()
+        self.results.put(('cycle', self.site, self._cycle_started, now - self._cycle_started,
+                          self._online(), max(1, len(self.targets))))
+        super()._wait(timeout)
+        if self.stopping.is_set():
+            # 复用检测循环中 Ctrl+C 的正常退出路径
+            raise KeyboardInterrupt
+        self._cycle_started = time.time()
+
+
+class _SiteFilter(logging.Filter):
+    """
+    给日志记录加上站点名称 (record.site)
+    
+    站点检测线程的日志取线程名中的站点，其他线程 (扫描、探测线程池等) 的日志记为本进程的所有站点
+    """
+    
+    def __init__(self, sites, only=None):
+        """
+        Args:
+            sites: 本进程负责的站点名称列表
+            only: 只保留属于该站点的日志 (可选，用于站点自己的日志文件)
+        """
+        super().__init__()
+        self.sites = ','.join(sites)
+        self.only = only
+    
+    def filter(self, record):
+        name = record.threadName or ''
+        record.site = name[len(SITE_THREAD_PREFIX):] if name.startswith(SITE_THREAD_PREFIX) else self.sites
+        return self.only is None or self.only in record.site.split(',')
+
+
+def configure_worker_logging(sites, log_dir=None):
+    """
+    配置工作进程的日志
+    
+    工作进程导入 boss_detect 时会带上写入 boss-detect.log 的处理器，多个进程同时追加且分不清站点；
+    这里替换为带站点名称的标准输出，配置了 log_dir 时每个站点另写一个日志文件
+    
+    Args:
+        sites: 本进程负责的站点名称列表
+        log_dir: 站点日志文件所在目录 (可选)
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    
+    handlers = [(logging.StreamHandler(sys.stdout), None)]
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+        handlers += [(logging.FileHandler(os.path.join(log_dir, f'{site}.log'), encoding='utf-8'), site)
+                     for site in sites]
+    formatter = logging.Formatter('%(asctime)s - [%(site)s] - %(levelname)s - %(message)s')
+    for handler, only in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(_SiteFilter(sites, only))
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def run_worker(sites, connection, stopping, log_dir=None):
+    """
+    工作进程入口: 每个站点一个检测线程，任一站点线程异常退出时整个进程退出，由控制进程重启
+    
+    Args:
+        sites: [(站点名称, 配置文件), ...]
+        connection: 发往控制进程的管道 (multiprocessing.Pipe 的写端)
+        stopping: multiprocessing.Event，控制进程要求退出时设置
+        log_dir: 站点日志文件所在目录 (可选)
+    """
+    # Ctrl+C 由控制进程统一处理
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    configure_worker_logging([name for name, _ in sites], log_dir)
+    
+    results = _ResultSender(connection)
+    local_stop = threading.Event()
+    detectors = [SiteDetector(name, path, results, local_stop) for name, path in sites]
+    threads = [threading.Thread(target=detector.run, name=f'{SITE_THREAD_PREFIX}{detector.site}', daemon=True)
+               for detector in detectors]
+    for thread in threads:
+        thread.start()
+    
+    exit_code = 0
+    try:
+        while not stopping.wait(1):
+            dead = [detector.site for detector, thread in zip(detectors, threads) if not thread.is_alive()]
+            if dead:
+                logger.error(f"站点检测线程异常退出: {', '.join(dead)}，工作进程退出等待重启")
+                exit_code = 1
+                break
+    finally:
+        local_stop.set()
+        for detector in detectors:
+            detector._wake.set()
+        for thread in threads:
+            thread.join(timeout=10)
+        for detector in detectors:
+            detector.close()
+    sys.exit(exit_code)
+
+
+class SiteStats:
+    """单个站点的检测节奏与在线状态"""
+    
+    __slots__ = ('expected_interval', 'cycles', 'last_started', 'last_finished', 'intervals',
+                 'total_interval', 'max_interval', 'total_duration', 'max_duration', 'last_duration',
+                 'online', 'targets', 'last_event')
+    
+    def __init__(self, expected_interval):
+        self.expected_interval = expected_interval
+        self.cycles = 0
+        self.last_started = None
+        self.last_finished = None
+        self.intervals = 0
+        self.total_interval = 0.0
+        self.max_interval = 0.0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_duration = 0.0
+        self.online = []
+        self.targets = 0
+        self.last_event = None
+    
+    def record(self, started, duration, online, targets):
+        """
+        记录一轮检测
+        
+        Args:
+            started: 本轮开始时间戳
+            duration: 本轮耗时(秒)
+            online: 在线目标 [(名称, IP)]
+            targets: 目标总数
+        
+        Returns:
+            float: 与上一轮开始的间隔(秒)，第一轮为None
+        """
+        interval = None
+        if self.last_started is not None:
+            interval = started - self.last_started
+            self.intervals += 1
+            self.total_interval += interval
+            self.max_interval = max(self.max_interval, interval)
+        self.cycles += 1
+        self.last_started = started
+        self.last_finished = started + duration
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.last_duration = duration
+        self.online = list(online)
+        self.targets = targets
+        return interval
+    
+    def as_dict(self):
+        return {
+            'cycles': self.cycles,
+            'online': self.online,
+            'targets': self.targets,
+            'expected_interval': self.expected_interval,
+            'avg_interval': self.total_interval / self.intervals if self.intervals else 0.0,
+            'max_interval': self.max_interval,
+            'avg_duration': self.total_duration / self.cycles if self.cycles else 0.0,
+            'max_duration': self.max_duration,
+            'last_duration': self.last_duration,
+            'last_finished': self.last_finished,
+            'last_event': self.last_event,
+        }
+
+
+class ResultAggregator:
+    """汇总所有站点的检测结果和检测节奏"""
+    
+    def __init__(self, expected_intervals):
+        """
+        初始化汇总器
+        
+        Args:
+            expected_intervals: {站点名称: 配置的扫描间隔(秒)}
+        """
+        self.sites = {name: SiteStats(interval) for name, interval in expected_intervals.items()}
+        self._lock = threading.Lock()
+    
+    def record_cycle(self, site, started, duration, online, targets):
+        """记录站点的一轮检测"""
+        with self._lock:
+            interval = self.sites[site].record(started, duration, online, targets)
+        SITE_CYCLE_SECONDS.labels(site).observe(duration)
+        if interval is not None:
+            SITE_INTERVAL_SECONDS.labels(site).observe(interval)
+        SITE_TARGETS_ONLINE.labels(site).set(len(online))
+    
+    def record_event(self, site, event):
+        """记录站点的到达/离开事件"""
+        with self._lock:
+            self.sites[site].last_event = (event.kind, event.subject, event.ip, event.timestamp)
+    
+    def set_expected_interval(self, site, interval):
+        with self._lock:
+            self.sites[site].expected_interval = interval
+    
+    def last_finished(self, site):
+        """站点最近一轮检测的结束时间，尚未完成过检测时返回None"""
+        with self._lock:
+            return self.sites[site].last_finished
+    
+    def snapshot(self):
+        """
+        获取所有站点的汇总
+        
+        Returns:
+            dict: {站点名称: {'cycles', 'online', 'targets', 'expected_interval', 'avg_interval', ...}}
+        """
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self.sites.items()}
+    
+    def log_summary(self):
+        """将每个站点的在线情况和检测节奏写入日志"""
+        for name, stats in self.snapshot().items():
+            online = ', '.join(subject for subject, _ in stats['online']) or '无'
+            logger.info(f"站点 {name}: 在线 {len(stats['online'])}/{stats['targets']} ({online}), "
+                        f"检测 {stats['cycles']} 轮, 平均间隔 {stats['avg_interval']:.1f}s "
+                        f"(配置 {stats['expected_interval']}s), 最大间隔 {stats['max_interval']:.1f}s, "
+                        f"平均耗时 {stats['avg_duration']:.2f}s")
+
+
+class WorkerProcess:
+    """
+    一个工作进程及其重启状态
+    
+    每次启动都新建结果管道和退出事件: 被强制杀死的进程可能停在持有锁的位置，
+    与所有进程共享的队列或事件会因此永久阻塞，独占的管道和事件随旧进程一起丢弃即可
+    """
+    
+    def __init__(self, index, sites):
+        """
+        Args:
+            index: 工作进程编号
+            sites: [(站点名称, 配置文件), ...]
+        """
+        self.index = index
+        self.sites = sites
+        self.process = None
+        self.connection = None
+        self.stopping = None
+        self.started_at = None
+        self.failures = 0
+        self.restarts = 0
+        self.next_start = 0.0
+    
+    @property
+    def names(self):
+        return [name for name, _ in self.sites]
+
+
+class Controller:
+    """多站点控制器"""
+    
+    def __init__(self, config_file='controller.ini', worker_target=run_worker):
+        """
+        初始化控制器
+        
+        Args:
+            config_file: 控制器配置文件路径
+            worker_target: 工作进程入口 (sites, connection, stopping, log_dir)
+        """
+        self.config_file = config_file
+        self.worker_target = worker_target
+        try:
+            self.settings = load_controller_settings(config_file)
+            self.site_settings = {name: load_settings(path) for name, path in self.settings.sites}
+        except SettingsError as e:
+            logger.error(f"配置错误: {e}")
+            sys.exit(1)
+        self.site_files = dict(self.settings.sites)
+        
+        # spawn 方式启动工作进程，不继承控制进程中的分发线程和锁
+        self.context = multiprocessing.get_context('spawn')
+        
+        dispatch = self.settings.dispatch
+        self.dispatcher = NotificationDispatcher(
+            workers=dispatch.workers,
+            queue_size=dispatch.queue_size,
+            max_retries=dispatch.max_retries,
+            retry_backoff=dispatch.retry_backoff,
+            retry_max_delay=dispatch.retry_max_delay,
+            dead_letter_file=dispatch.dead_letter_file
+        )
+        self.coalescer = NotificationCoalescer(self.dispatcher, dispatch.batch_window) if dispatch.batch_window > 0 else None
+        self.services = {name: {} for name in self.site_settings}
+        self._services_lock = threading.Lock()
+        
+        self.aggregator = ResultAggregator({name: settings.network.scan_interval
+                                            for name, settings in self.site_settings.items()})
+        shards = shard_sites(self.site_settings, self.settings.processes)
+        self.workers = [WorkerProcess(index, [(name, self.site_files[name]) for name in shard])
+                        for index, shard in enumerate(shards)]
+        self.watchers = [SettingsWatcher(path, functools.partial(self._update_site, name),
+                                         self.site_settings[name].advanced.reload_interval)
+                         for name, path in self.settings.sites
+                         if self.site_settings[name].advanced.reload_interval > 0]
+        self.metrics_server = None
+        logger.info(f"多站点控制器初始化完成: {len(self.site_settings)} 个站点, {len(self.workers)} 个工作进程")
+    
+    def _update_site(self, site, settings):
+        """
+        站点配置文件变化后更新控制进程中的通知服务（工作进程中的检测器自行热加载）
+        
+        Args:
+            site: 站点名称
+            settings: 新的 Settings
+        """
+        with self._services_lock:
+            stale = self.services[site]
+            self.site_settings[site] = settings
+            self.services[site] = {}
+        for service in stale.values():
+            service.close()
+        self.aggregator.set_expected_interval(site, settings.network.scan_interval)
+    
+    def _service(self, site, section):
+        """获取站点某个通知配置节对应的通知服务"""
+        with self._services_lock:
+            return get_notification_service(self.site_settings[site].notifications, section, self.services[site])
+    
+    def _start_worker(self, worker):
+        """启动工作进程"""
+        if worker.connection is not None:
+            self._drain(worker)
+        reader, writer = self.context.Pipe(duplex=False)
+        worker.stopping = self.context.Event()
+        process = self.context.Process(target=self.worker_target,
+                                       args=(worker.sites, writer, worker.stopping, self.settings.log_dir),
+                                       name=f'boss-detect-worker-{worker.index}', daemon=True)
+        process.start()
+        writer.close()
+        worker.process = process
+        worker.connection = reader
+        worker.started_at = time.time()
+        logger.info(f"启动工作进程 {worker.index} (pid {process.pid}): {', '.join(worker.names)}")
+    
+    def start(self):
+        """启动所有工作进程、配置监视和指标服务"""
+        for worker in self.workers:
+            self._start_worker(worker)
+        for watcher in self.watchers:
+            watcher.start()
+        port, bind = self.settings.metrics
+        if port > 0:
+            try:
+                self.metrics_server = start_metrics_server(port, bind)
+            except OSError as e:
+                logger.error(f"指标服务启动失败 ({bind}:{port}): {e}")
+    
+    def handle(self, message):
+        """
+        处理工作进程发来的一条消息
+        
+        Args:
+            message: ('cycle', site, started, duration, online, targets) 或 ('event', site, section, event)
+        """
+        kind, site = message[0], message[1]
+        if kind == 'cycle':
+            self.aggregator.record_cycle(site, *message[2:])
+            return
+        
+        section, event = message[2], message[3]
+        try:
+            service = self._service(site, section)
+        except KeyError:
+            # 工作进程已加载新配置而控制进程尚未发现，立即重新读取
+            try:
+                self._update_site(site, load_settings(self.site_files[site]))
+                service = self._service(site, section)
+            except (SettingsError, KeyError) as e:
+                logger.error(f"站点 {site} 的通知配置节 [{section}] 不可用，通知未发送: {e}")
+                return
+        
+        event = event._replace(subject=f"{site}/{event.subject}", title=f"[{site}] {event.title}")
+        self.aggregator.record_event(site, event)
+        if self.coalescer is not None:
+            self.coalescer.add(service, event)
+        else:
+            self.dispatcher.submit(service, event.title, event.message, label=event.subject)
+    
+    def _drain(self, worker):
+        """
+        处理工作进程管道中已到达的所有消息，进程已退出时关闭管道
+        
+        Returns:
+            int: 处理的消息数
+        """
+        handled = 0
+        connection = worker.connection
+        try:
+            while connection.poll():
+                self.handle(connection.recv())
+                handled += 1
+        except (EOFError, OSError):
+            connection.close()
+            worker.connection = None
+        return handled
+    
+    def poll(self, timeout=1):
+        """
+        处理工作进程发来的消息
+        
+        Args:
+            timeout: 等待第一条消息的最长时间(秒)
+        
+        Returns:
+            int: 处理的消息数
+        """
+        by_connection = {worker.connection: worker for worker in self.workers if worker.connection is not None}
+        if not by_connection:
+            time.sleep(timeout)
+            return 0
+        handled = 0
+        for connection in multiprocessing.connection.wait(list(by_connection), timeout):
+            handled += self._drain(by_connection[connection])
+        return handled
+    
+    def _stalled(self, worker, now):
+        """
+        工作进程中是否有主动检测的站点停滞: 超过站点最长的等待间隔再加 stall_timeout 秒没有完成一轮检测
+        
+        相邻两轮检测结束的间隔是等待时间加上扫描耗时，按站点自己的扫描间隔计算，
+        间隔很长的空闲站点不会被误判为停滞；被动模式的站点只在收到报文时产生事件，不参与检查
+        """
+        timeout = self.settings.stall_timeout
+        if timeout <= 0:
+            return []
+        stalled = []
+        for name in worker.names:
+            settings = self.site_settings[name]
+            if settings.network.detection_mode == 'passive':
+                continue
+            last = max(self.aggregator.last_finished(name) or 0, worker.started_at)
+            if now - last > longest_wait(settings) + timeout:
+                stalled.append(name)
+        return stalled
+    
+    def supervise(self, now=None):
+        """检查工作进程: 重启已退出的进程 (按退避时间)，终止停滞的进程"""
+        now = now if now is not None else time.time()
+        settings = self.settings
+        for worker in self.workers:
+            process = worker.process
+            if process is not None and process.is_alive():
+                stalled = self._stalled(worker, now)
+                if stalled:
+                    logger.error(f"工作进程 {worker.index} 中的站点 {', '.join(stalled)} 在扫描间隔之后 "
+                                 f"{settings.stall_timeout}秒仍未完成检测，终止并重启")
+                    process.terminate()
+                    process.join(5)
+                else:
+                    continue
+            
+            if process is not None:
+                # 运行足够久之后才崩溃视为偶发故障，退避从头开始
+                uptime = now - worker.started_at
+                worker.failures = 1 if uptime >= settings.stable_after else worker.failures + 1
+                delay = min(settings.restart_backoff * 2 ** (worker.failures - 1), settings.restart_max_delay)
+                logger.warning(f"工作进程 {worker.index} ({', '.join(worker.names)}) 已退出，退出码 "
+                               f"{process.exitcode}，{delay:.1f}秒后重启")
+                worker.process = None
+                worker.next_start = now + delay
+                worker.restarts += 1
+                WORKER_RESTARTS.labels(str(worker.index)).inc()
+            
+            if now >= worker.next_start:
+                self._start_worker(worker)
+    
+    def run(self):
+        """运行控制循环，直到 Ctrl+C"""
+        self.start()
+        next_report = time.time() + self.settings.report_interval
+        try:
+            while True:
+                self.poll(timeout=1)
+                self.supervise()
+                if time.time() >= next_report:
+                    self.aggregator.log_summary()
+                    next_report = time.time() + self.settings.report_interval
+        except KeyboardInterrupt:
+            logger.info("\n控制器已停止")
+        finally:
+            self.stop()
+    
+    def stop(self, timeout=15):
+        """
+        停止所有工作进程，发送完已收到的通知并释放资源
+        
+        Args:
+            timeout: 等待工作进程退出的最长时间(秒)
+        """
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                worker.stopping.set()
+        for watcher in self.watchers:
+            watcher.stop()
+        
+        # 等待期间继续读取队列，否则写入队列的工作进程无法退出
+        deadline = time.time() + timeout
+        while time.time() < deadline and any(worker.process is not None and worker.process.is_alive()
+                                             for worker in self.workers):
+            self.poll(timeout=0.2)
+        for worker in self.workers:
+            if worker.process is not None and worker.process.is_alive():
+                logger.warning(f"工作进程 {worker.index} 未按时退出，强制终止")
+                worker.process.terminate()
+                worker.process.join(5)
+        for worker in self.workers:
+            if worker.connection is not None:
+                self._drain(worker)
+        
+        if self.coalescer is not None:
+            self.coalescer.flush_all()
+        self.dispatcher.stop()
+        if self.metrics_server is not None:
+            stop_metrics_server(self.metrics_server)
+        with self._services_lock:
+            for services in self.services.values():
+                for service in services.values():
+                    service.close()
+        self.aggregator.log_summary()
+
+
+def main():
+    """主函数: python controller.py [controller.ini]"""
+    config_file = sys.argv[1] if len(sys.argv) > 1 else 'controller.ini'
+    Controller(config_file).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+设备清单模块 - 增量合并每次扫描结果，按MAC和IP索引设备
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 设备变化事件: kind 为 'appeared'、'disappeared' 或 'ip_changed'
+DeviceEvent = namedtuple('DeviceEvent', ['kind', 'mac', 'ip', 'old_ip', 'timestamp'])
+
+
+class DeviceRecord:
+    """单个设备的记录"""
+    
+    __slots__ = ('mac', 'ip', 'first_seen', 'last_seen', 'seen_count')
+    
+    def __init__(self, mac, ip, now):
+        self.mac = mac
+        self.ip = ip
+        self.first_seen = now
+        self.last_seen = now
+        self.seen_count = 1
+    
+    def __repr__(self):
+        return f"DeviceRecord({self.mac!r}, {self.ip!r}, seen_count={self.seen_count})"
+
+
+class DeviceTable:
+    """内存设备清单"""
+    
+    def __init__(self, expire_after=300, on_event=None, clock=time.time):
+        """
+        初始化设备清单
+        
+        Args:
+            expire_after: 设备多少秒未出现后视为消失
+            on_event: 设备变化回调 (DeviceEvent) (可选)
+            clock: 返回当前时间戳的函数 (测试时可注入)
+        """
+        self.expire_after = expire_after
+        self.on_event = on_event
+        self.clock = clock
+        self._by_mac = {}
+        self._by_ip = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._by_mac)
+    
+    def __iter__(self):
+        return iter(list(self._by_mac.values()))
+    
+    def _emit(self, event):
+        """分发设备变化事件"""
+        if self.on_event is not None:
+            self.on_event(event)
+    
+    def observe(self, ip, mac, now=None):
+        """
+        记录一次设备出现
+        
+        Args:
+            ip: IP地址
+            mac: MAC地址 (标准化后的小写冒号格式)
+            now: 出现时间 (默认当前时间)
+        
+        Returns:
+            DeviceEvent: 新设备或IP变化时返回事件，否则返回None
+        """
+        now = now if now is not None else self.clock()
+        with self._lock:
+            record = self._by_mac.get(mac)
+            if record is None:
+                record = DeviceRecord(mac, ip, now)
+                self._by_mac[mac] = record
+                self._by_ip[ip] = record
+                event = DeviceEvent('appeared', mac, ip, None, now)
+            else:
+                record.last_seen = now
+                record.seen_count += 1
+                if record.ip == ip:
+                    return None
+                old_ip = record.ip
+                if self._by_ip.get(old_ip) is record:
+                    del self._by_ip[old_ip]
+                record.ip = ip
+                self._by_ip[ip] = record
+                event = DeviceEvent('ip_changed', mac, ip, old_ip, now)
+        
+        self._emit(event)
+        return event
+    
+    def merge(self, devices, now=None):
+        """
+        合并一次完整扫描的结果，并清理长时间未出现的设备
+        
+        Args:
+            devices: [(ip, mac), ...]
+            now: 扫描时间 (默认当前时间)
+        
+        Returns:
+            list: 本次产生的 DeviceEvent 列表
+        """
+        now = now if now is not None else self.clock()
+        events = []
+        for ip, mac in devices:
+            event = self.observe(ip, mac, now)
+            if event is not None:
+                events.append(event)
+        events.extend(self.expire(now))
+        return events
+    
+    def expire(self, now=None):
+        """
+        移除超过 expire_after 秒未出现的设备
+        
+        Args:
+            now: 当前时间 (默认当前时间)
+        
+        Returns:
+            list: 'disappeared' 事件列表
+        """
+        now = now if now is not None else self.clock()
+        events = []
+        with self._lock:
+            stale = [record for record in self._by_mac.values()
+                     if now - record.last_seen > self.expire_after]
+            for record in stale:
+                del self._by_mac[record.mac]
+                if self._by_ip.get(record.ip) is record:
+                    del self._by_ip[record.ip]
+                events.append(DeviceEvent('disappeared', record.mac, record.ip, None, now))
+        
+        for event in events:
+            self._emit(event)
+        return events
+    
+    def get(self, mac):
+        """
+        按MAC查找设备
+        
+        Returns:
+            DeviceRecord: 未找到时返回None
+        """
+        return self._by_mac.get(mac)
+    
+    def get_by_ip(self, ip):
+        """
+        按IP查找设备
+        
+        Returns:
+            DeviceRecord: 未找到时返回None
+        """
+        return self._by_ip.get(ip)
+    
+    def is_present(self, mac, max_age, now=None):
+        """
+        判断设备是否在最近 max_age 秒内出现过
+        
+        Args:
+            mac: MAC地址
+            max_age: 最长时间(秒)
+            now: 当前时间 (默认当前时间)
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        record = self._by_mac.get(mac)
+        if record is None:
+            return False, None
+        now = now if now is not None else self.clock()
+        if now - record.last_seen > max_age:
+            return False, None
+        return True, record.ip
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+设备指纹模块 - OUI厂商查询、随机MAC识别，按主机名/mDNS名称/厂商类别把随机MAC关联到目标
+
+现代手机在每个Wi-Fi网络使用随机生成的MAC (本地管理地址)，只比较MAC会漏掉目标。
+DHCP租约、DHCP请求 (选项12主机名、选项60厂商类别) 和 mDNS 报文中带有设备名称，
+名称符合目标的指纹规则时，FingerprintIndex 把这个MAC关联到目标，之后该MAC的ARP应答即视为目标
+"""
+import re
+import csv
+import bisect
+import logging
+import threading
+from array import array
+from collections import namedtuple, OrderedDict, deque
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# IEEE 分配的前缀长度: MA-S (36位)、MA-M (28位)、MA-L (24位，即OUI)，查询时最长前缀优先
+PREFIX_BITS = (36, 28, 24)
+
+# 首字节的 U/L 位 (本地管理地址) 和 I/G 位 (组播地址)
+LOCALLY_ADMINISTERED = 0x02
+MULTICAST = 0x01
+
+OUI_TEXT_LINE = re.compile(r'^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+?)\s*$')
+
+# 目标的指纹规则，未配置的字段为None，值已经过 normalize_name 处理
+FingerprintRule = namedtuple('FingerprintRule', ['hostname', 'mdns_name', 'vendor_class'])
+
+# 某个MAC已观察到的指纹
+Fingerprint = namedtuple('Fingerprint', ['hostname', 'mdns_name', 'vendor_class'])
+
+RULE_KEYS = {'hostname': 'hostname', 'mdns': 'mdns_name', 'vendor_class': 'vendor_class'}
+
+
+def mac_to_int(mac):
+    """
+    MAC地址转换为48位整数
+    
+    Args:
+        mac: MAC地址 (支持:和-分隔符)
+    
+    Returns:
+        int: 整数值，格式无效时返回None
+    """
+    digits = mac.replace(':', '').replace('-', '')
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+
+def is_locally_administered(mac):
+    """
+    是否为本地管理地址 (手机的随机MAC、虚拟机和容器的MAC)，这类地址的前缀不对应任何厂商
+    
+    Args:
+        mac: MAC地址
+    
+    Returns:
+        bool
+    """
+    try:
+        return bool(int(mac.strip()[:2], 16) & LOCALLY_ADMINISTERED)
+    except ValueError:
+        return False
+
+
+def is_multicast(mac):
+    """是否为组播/广播地址"""
+    try:
+        return bool(int(mac.strip()[:2], 16) & MULTICAST)
+    except ValueError:
+        return False
+
+
+def normalize_name(name):
+    """
+    规范化主机名/mDNS名称/厂商类别: 转为小写，去掉末尾的点和 .local 后缀
+    
+    Args:
+        name: 名称 (str 或 bytes)
+    
+    Returns:
+        str: 规范化后的名称，为空时返回None
+    """
+    if name is None:
+        return None
+    if isinstance(name, bytes):
+        name = name.decode('utf-8', errors='replace')
+    name = name.strip().rstrip('.').lower()
+    if name.endswith('.local'):
+        name = name[:-len('.local')]
+    return name or None
+
+
+def parse_rule(text):
+    """
+    解析指纹规则，格式: hostname=名称, mdns=名称, vendor_class=厂商类别 (至少一项)
+    
+    Args:
+        text: 规则文本
+    
+    Returns:
+        FingerprintRule: 指纹规则
+    
+    Raises:
+        ValueError: 格式错误或没有任何有效项
+    """
+    fields = dict.fromkeys(FingerprintRule._fields)
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        key, sep, value = part.partition('=')
+        key = key.strip().lower()
+        if not sep or key not in RULE_KEYS:
+            raise ValueError(f"无效的指纹项: {part.strip()} (可用: {', '.join(RULE_KEYS)})")
+        fields[RULE_KEYS[key]] = normalize_name(value)
+    if not any(fields.values()):
+        raise ValueError(f"指纹规则为空: {text}")
+    return FingerprintRule(**fields)
+
+
+class OuiDatabase:
+    """
+    IEEE OUI 厂商数据库
+    
+    每种前缀长度一个有序的 array('Q')，厂商名称去重后按下标引用，
+    查询时按最长前缀依次二分查找，每次查询 O(log n)
+    """
+    
+    def __init__(self, entries=()):
+        """
+        Args:
+            entries: [(前缀整数, 前缀位数, 厂商名称), ...]
+        """
+        by_bits = {bits: {} for bits in PREFIX_BITS}
+        for prefix, bits, vendor in entries:
+            if bits in by_bits:
+                by_bits[bits][prefix] = vendor
+        
+        vendor_index = {}
+        self.vendors = []
+        self._tables = []
+        for bits in PREFIX_BITS:
+            prefixes = sorted(by_bits[bits])
+            if not prefixes:
+                continue
+            indexes = array('I')
+            for prefix in prefixes:
+                vendor = by_bits[bits][prefix]
+                if vendor not in vendor_index:
+                    vendor_index[vendor] = len(self.vendors)
+                    self.vendors.append(vendor)
+                indexes.append(vendor_index[vendor])
+            self._tables.append((bits, array('Q', prefixes), indexes))
+    
+    def __len__(self):
+        return sum(len(prefixes) for _, prefixes, _ in self._tables)
+    
+    @staticmethod
+    def parse(text):
+        """
+        解析IEEE发布的 oui.txt，或 oui.csv / mam.csv / oui36.csv
+        
+        Args:
+            text: 文件内容
+        
+        Returns:
+            list: [(前缀整数, 前缀位数, 厂商名称), ...]
+        """
+        entries = []
+        text = text.lstrip('\ufeff')
+        if text.startswith('Registry,'):
+            for row in csv.reader(text.splitlines()[1:]):
+                if len(row) < 3:
+                    continue
+                assignment = row[1].strip()
+                try:
+                    entries.append((int(assignment, 16), len(assignment) * 4, row[2].strip()))
+                except ValueError:
+                    continue
+            return entries
+        
+        for line in text.splitlines():
+            match = OUI_TEXT_LINE.match(line)
+            if match:
+                entries.append((int(''.join(match.group(1, 2, 3)), 16), 24, match.group(4)))
+        return entries
+    
+    @classmethod
+    def load(cls, *paths):
+        """
+        读取一个或多个厂商数据库文件 (例如 oui.txt 和 mam.csv)
+        
+        Returns:
+            OuiDatabase
+        
+        Raises:
+            OSError: 文件无法读取
+        """
+        entries = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                entries.extend(cls.parse(f.read()))
+        database = cls(entries)
+        logger.info(f"已加载OUI数据库: {', '.join(paths)}，共 {len(database)} 个前缀")
+        return database
+    
+    def lookup(self, mac):
+        """
+        查询MAC所属厂商
+        
+        Args:
+            mac: MAC地址
+        
+        Returns:
+            str: 厂商名称，本地管理地址或未登记的前缀返回None
+        """
+        value = mac_to_int(mac)
+        if value is None or (value >> 40) & LOCALLY_ADMINISTERED:
+            return None
+        for bits, prefixes, indexes in self._tables:
+            key = value >> (48 - bits)
+            i = bisect.bisect_left(prefixes, key)
+            if i < len(prefixes) and prefixes[i] == key:
+                return self.vendors[indexes[i]]
+        return None
+    
+    def describe(self, mac):
+        """日志中使用的MAC说明: 厂商名称、'随机MAC' 或 None"""
+        if is_locally_administered(mac):
+            return '随机MAC'
+        return self.lookup(mac)
+
+
+_oui_cache = {}
+_oui_lock = threading.Lock()
+
+
+def load_oui_database(paths):
+    """
+    读取厂商数据库，同一组文件只解析一次 (重新加载配置时复用)
+    
+    Args:
+        paths: 文件路径元组
+    
+    Returns:
+        OuiDatabase: 文件无法读取时返回None
+    """
+    paths = tuple(paths)
+    with _oui_lock:
+        if paths not in _oui_cache:
+            try:
+                _oui_cache[paths] = OuiDatabase.load(*paths)
+            except OSError as e:
+                logger.warning(f"OUI数据库不可用: {e}")
+                return None
+        return _oui_cache[paths]
+
+
+class FingerprintIndex:
+    """
+    指纹匹配索引: 记录各MAC观察到的名称，名称符合某个目标的指纹规则时把该MAC关联到目标
+    
+    目标以配置的MAC标识，规则中的主机名/mDNS名称/厂商类别各有一个字典索引，
+    扫描应答的匹配只需一次字典查询。主机名和mDNS名称任一相同即匹配，
+    同时配置了厂商类别时，已观察到的厂商类别必须一致；只配置厂商类别的规则只匹配随机MAC
+    """
+    
+    def __init__(self, rules=(), max_learned=4, max_observed=4096):
+        """
+        Args:
+            rules: [(目标MAC, FingerprintRule), ...]
+            max_learned: 每个目标最多关联的MAC个数，超过时丢弃最早关联的
+            max_observed: 最多记住多少个MAC的指纹，超过时丢弃最久未更新的
+        """
+        self.rules = dict(rules)
+        self.max_learned = max(1, max_learned)
+        self.max_observed = max_observed
+        self._by_hostname = {}
+        self._by_mdns = {}
+        self._by_vendor_class = {}
+        for target, rule in self.rules.items():
+            if rule.hostname:
+                self._by_hostname.setdefault(rule.hostname, target)
+            if rule.mdns_name:
+                self._by_mdns.setdefault(rule.mdns_name, target)
+            if rule.vendor_class and not (rule.hostname or rule.mdns_name):
+                self._by_vendor_class.setdefault(rule.vendor_class, target)
+        
+        self._observed = OrderedDict()   # mac -> Fingerprint
+        self._learned = {}               # mac -> 目标MAC
+        self._target_macs = {}           # 目标MAC -> deque([mac, ...])
+        self._lock = threading.Lock()
+    
+    def __bool__(self):
+        return bool(self.rules)
+    
+    def match(self, mac):
+        """
+        查询MAC关联的目标
+        
+        Args:
+            mac: 标准化后的MAC地址
+        
+        Returns:
+            str: 目标MAC，未关联时返回None
+        """
+        # observe 在抓包线程中运行，读取也要持有锁
+        with self._lock:
+            return self._learned.get(mac)
+    
+    def learned(self):
+        """
+        所有关联的快照，批量匹配时代替逐个调用 match
+        
+        Returns:
+            dict: {MAC: 目标MAC}
+        """
+        with self._lock:
+            return dict(self._learned)
+    
+    def macs_for(self, target):
+        """目标已关联的MAC列表 (最近关联的在前)"""
+        with self._lock:
+            macs = self._target_macs.get(target)
+            return list(reversed(macs)) if macs else []
+    
+    def fingerprint(self, mac):
+        """MAC已观察到的指纹，没有时返回None"""
+        with self._lock:
+            return self._observed.get(mac)
+    
+    def _evaluate(self, mac, fingerprint):
+        """按规则找出指纹对应的目标"""
+        candidates = (self._by_hostname.get(fingerprint.hostname), self._by_mdns.get(fingerprint.mdns_name))
+        for target in candidates:
+            if target is None or target == mac:
+                continue
+            expected = self.rules[target].vendor_class
+            if expected and fingerprint.vendor_class and expected != fingerprint.vendor_class:
+                continue
+            return target
+        target = self._by_vendor_class.get(fingerprint.vendor_class)
+        if target is not None and target != mac and is_locally_administered(mac):
+            return target
+        return None
+    
+    def _bind(self, mac, target):
+        """更新MAC与目标的关联 (调用方持有锁)，返回是否新建了关联"""
+        previous = self._learned.get(mac)
+        if previous == target:
+            return False
+        if previous is not None:
+            self._target_macs[previous].remove(mac)
+            del self._learned[mac]
+        if target is None:
+            return False
+        
+        macs = self._target_macs.setdefault(target, deque())
+        if len(macs) >= self.max_learned:
+            del self._learned[macs.popleft()]
+        macs.append(mac)
+        self._learned[mac] = target
+        return True
+    
+    def observe(self, mac, hostname=None, mdns_name=None, vendor_class=None):
+        """
+        记录一个MAC的名称 (未提供的字段保留之前观察到的值)，并更新它与目标的关联
+        
+        Args:
+            mac: 标准化后的MAC地址
+            hostname: DHCP主机名 (选项12) 或租约中的主机名
+            mdns_name: mDNS主机名
+            vendor_class: DHCP厂商类别 (选项60)
+        
+        Returns:
+            str: 关联的目标MAC，未关联时返回None
+        """
+        if not self.rules:
+            return None
+        update = Fingerprint(normalize_name(hostname), normalize_name(mdns_name), normalize_name(vendor_class))
+        with self._lock:
+            previous = self._observed.pop(mac, None)
+            if previous is not None:
+                update = Fingerprint(*(new or old for new, old in zip(update, previous)))
+            self._observed[mac] = update
+            if len(self._observed) > self.max_observed:
+                stale, _ = self._observed.popitem(last=False)
+                self._bind(stale, None)
+            target = self._evaluate(mac, update)
+            learned = self._bind(mac, target)
+        if learned:
+            kind = '随机MAC' if is_locally_administered(mac) else 'MAC'
+            logger.info(f"指纹匹配: {kind} {mac} ({', '.join(filter(None, update))}) 关联到目标 {target}")
+        return target
+    
+    def inherit(self, previous):
+        """
+        继承另一个索引已观察到的指纹，并按本索引的规则重新关联 (配置重新加载时使用)
+        
+        Args:
+            previous: 原 FingerprintIndex
+        """
+        with previous._lock:
+            observed = list(previous._observed.items())
+        for mac, fingerprint in observed:
+            self.observe(mac, *fingerprint)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+在线历史记录 - 将状态变化和探测结果追加写入SQLite (WAL)，并提供按时间范围查询的接口和命令行
+
+写入在后台线程中批量提交，检测循环不会等待fsync
+
+用法:
+    python history_store.py --db data/history.db sessions --mac aa:bb:cc:dd:ee:ff --since 7d
+    python history_store.py --db data/history.db dwell --mac aa:bb:cc:dd:ee:ff --since 30d
+    python history_store.py --db data/history.db histogram --mac aa:bb:cc:dd:ee:ff --since 30d
+"""
+import os
+import re
+import sys
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    ts REAL NOT NULL,
+    mac TEXT NOT NULL,
+    subject TEXT,
+    kind TEXT NOT NULL,
+    ip TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_transitions_mac_ts ON transitions (mac, ts);
+CREATE TABLE IF NOT EXISTS probes (
+    ts REAL NOT NULL,
+    mac TEXT NOT NULL,
+    found INTEGER NOT NULL,
+    ip TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_probes_mac_ts ON probes (mac, ts);
+"""
+
+_STOP = object()
+
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def connect(path):
+    """
+    打开数据库并确保表结构存在
+    
+    Args:
+        path: 数据库文件路径
+    
+    Returns:
+        sqlite3.Connection: 连接
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def parse_time(value, now=None):
+    """
+    解析命令行中的时间: 相对时长 (如 7d, 12h, 30m) 表示多久以前，或 YYYY-MM-DD[ HH:MM]
+    
+    Args:
+        value: 时间字符串
+        now: 当前时间戳 (默认 time.time())
+    
+    Returns:
+        float: 时间戳
+    
+    Raises:
+        ValueError: 格式不正确
+    """
+    now = time.time() if now is None else now
+    value = value.strip()
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhdw])', value)
+    if match:
+        return now - float(match.group(1)) * DURATION_UNITS[match.group(2)]
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"无法解析时间: {value!r}")
+
+
+class HistoryStore:
+    """在线历史记录存储"""
+    
+    def __init__(self, path, batch_size=500, flush_interval=2.0, record_probes=True):
+        """
+        初始化历史记录存储
+        
+        Args:
+            path: SQLite数据库文件路径
+            batch_size: 每个事务最多写入的记录数
+            flush_interval: 后台线程最长多少秒提交一次
+            record_probes: 是否记录每轮探测结果 (否则只记录状态变化)
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.record_probes = record_probes
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        connect(path).close()
+    
+    def _start(self):
+        """启动后台写入线程"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._writer, name='history-writer', daemon=True)
+                self._thread.start()
+    
+    def record_transition(self, mac, kind, ip=None, subject=None, timestamp=None):
+        """
+        记录一次状态变化（只入队，不等待写入）
+        
+        Args:
+            mac: 设备MAC地址
+            kind: 'arrival' 或 'departure'
+            ip: IP地址
+            subject: 目标名称
+            timestamp: 时间戳 (默认当前时间)
+        """
+        self._start()
+        self._queue.put(('transitions', (time.time() if timestamp is None else timestamp, mac, subject, kind, ip)))
+    
+    def record_probe(self, mac, found, ip=None, timestamp=None):
+        """
+        记录一轮探测结果（只入队，不等待写入）
+        
+        Args:
+            mac: 设备MAC地址
+            found: 是否检测到
+            ip: IP地址
+            timestamp: 时间戳 (默认当前时间)
+        """
+        if not self.record_probes:
+            return
+        self._start()
+        self._queue.put(('probes', (time.time() if timestamp is None else timestamp, mac, int(bool(found)), ip)))
+    
+    def _writer(self):
+        """后台线程: 攒够一批或到达提交间隔后在一个事务中写入"""
+        conn = connect(self.path)
+        try:
+            stop = False
+            while not stop:
+                rows = {'transitions': [], 'probes': []}
+                count = 0
+                deadline = time.monotonic() + self.flush_interval
+                while count < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        self._queue.task_done()
+                        break
+                    rows[item[0]].append(item[1])
+                    count += 1
+                
+                if count:
+                    try:
+                        with conn:
+                            if rows['transitions']:
+                                conn.executemany('INSERT INTO transitions VALUES (?, ?, ?, ?, ?)', rows['transitions'])
+                            if rows['probes']:
+                                conn.executemany('INSERT INTO probes VALUES (?, ?, ?, ?)', rows['probes'])
+                    except sqlite3.Error as e:
+                        logger.error(f"写入历史记录失败: {e}")
+                    for _ in range(count):
+                        self._queue.task_done()
+        finally:
+            conn.close()
+    
+    def flush(self):
+        """等待已入队的记录全部写入"""
+        if self._thread is not None:
+            self._queue.join()
+    
+    def close(self):
+        """写入剩余记录并停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+    
+    def sessions(self, mac, start, end):
+        """
+        查询时间范围内的在线时段
+        
+        Args:
+            mac: 设备MAC地址
+            start: 开始时间戳
+            end: 结束时间戳
+        
+        Returns:
+            list: [(到达时间, 离开时间), ...]，时段被截取到查询范围内；仍在线时离开时间为None
+        """
+        conn = connect(self.path)
+        try:
+            # 范围开始前的最后一次变化决定开始时是否在线
+            before = conn.execute('SELECT kind FROM transitions WHERE mac = ? AND ts < ? ORDER BY ts DESC LIMIT 1',
+                                  (mac, start)).fetchone()
+            rows = conn.execute('SELECT ts, kind FROM transitions WHERE mac = ? AND ts >= ? AND ts < ? ORDER BY ts',
+                                (mac, start, end)).fetchall()
+        finally:
+            conn.close()
+        
+        sessions = []
+        arrived = start if before is not None and before[0] == 'arrival' else None
+        for ts, kind in rows:
+            if kind == 'arrival' and arrived is None:
+                arrived = ts
+            elif kind == 'departure' and arrived is not None:
+                sessions.append((arrived, ts))
+                arrived = None
+        if arrived is not None:
+            sessions.append((arrived, None))
+        return sessions
+    
+    def dwell_time(self, mac, start, end, now=None):
+        """
+        计算时间范围内的总在线时长
+        
+        Args:
+            mac: 设备MAC地址
+            start: 开始时间戳
+            end: 结束时间戳
+            now: 当前时间戳，仍在线的时段计算到 min(end, now)
+        
+        Returns:
+            float: 在线秒数
+        """
+        now = time.time() if now is None else now
+        total = 0.0
+        for arrived, left in self.sessions(mac, start, end):
+            total += max(0.0, (left if left is not None else min(end, now)) - arrived)
+        return total
+    
+    def arrival_histogram(self, mac, start, end):
+        """
+        统计时间范围内每个小时(本地时间)的到达次数
+        
+        Args:
+            mac: 设备MAC地址
+            start: 开始时间戳
+            end: 结束时间戳
+        
+        Returns:
+            list: 长度为24的列表，第i项为i点钟的到达次数
+        """
+        conn = connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT CAST(strftime('%H', ts, 'unixepoch', 'localtime') AS INTEGER), COUNT(*) "
+                "FROM transitions WHERE mac = ? AND kind = 'arrival' AND ts >= ? AND ts < ? GROUP BY 1",
+                (mac, start, end)).fetchall()
+        finally:
+            conn.close()
+        histogram = [0] * 24
+        for hour, count in rows:
+            histogram[hour] = count
+        return histogram
+
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts is not None else '仍在线'
+
+
+def _format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}小时{rest // 60}分钟"
+
+
+def main(argv=None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='查询设备在线历史')
+    parser.add_argument('--db', default='data/history.db', help='历史记录数据库路径')
+    parser.add_argument('command', choices=['sessions', 'dwell', 'histogram'], help='查询类型')
+    parser.add_argument('--mac', required=True, help='设备MAC地址')
+    parser.add_argument('--since', default='7d', help='开始时间，如 7d、12h 或 2024-01-01')
+    parser.add_argument('--until', default=None, help='结束时间，默认当前时间')
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.db):
+        print(f"数据库不存在: {args.db}")
+        return 1
+    
+    now = time.time()
+    try:
+        start = parse_time(args.since, now)
+        end = parse_time(args.until, now) if args.until else now
+    except ValueError as e:
+        print(e)
+        return 1
+    
+    store = HistoryStore(args.db)
+    mac = args.mac.strip().lower().replace('-', ':')
+    
+    if args.command == 'sessions':
+        sessions = store.sessions(mac, start, end)
+        for arrived, left in sessions:
+            duration = (left if left is not None else end) - arrived
+            print(f"{_format_time(arrived)}  ->  {_format_time(left)}  ({_format_duration(duration)})")
+        print(f"共 {len(sessions)} 个在线时段")
+    elif args.command == 'dwell':
+        print(f"总在线时长: {_format_duration(store.dwell_time(mac, start, end, now))}")
+    else:
+        histogram = store.arrival_histogram(mac, start, end)
+        peak = max(histogram) or 1
+        for hour, count in enumerate(histogram):
+            print(f"{hour:02d}:00 {'█' * round(count * 40 / peak):<40} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
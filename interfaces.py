@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+网络接口模块 - 获取本机网络接口的MAC、IP和子网掩码
+"""
+import socket
+import struct
+import logging
+import ipaddress
+from collections import namedtuple
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROC_NET_ROUTE = '/proc/net/route'
+
+# ioctl 请求号 (include/uapi/linux/sockios.h)
+SIOCGIFFLAGS = 0x8913
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+SIOCGIFHWADDR = 0x8927
+
+# 接口标志 (include/uapi/linux/if.h)
+IFF_UP = 0x01
+IFF_LOOPBACK = 0x08
+
+# 可扫描的IPv4接口: network 为接口地址和子网掩码得出的网段
+InterfaceInfo = namedtuple('InterfaceInfo', ['name', 'mac', 'ip', 'network'])
+
+
+def get_default_interface(path=PROC_NET_ROUTE):
+    """
+    从路由表中获取默认路由所在的接口
+    
+    Args:
+        path: 路由表文件路径
+    
+    Returns:
+        str: 接口名称，未找到时返回None
+    """
+    try:
+        with open(path, 'r') as f:
+            for line in f.readlines()[1:]:
+                parts = line.split()
+                if len(parts) > 1 and parts[1] == '00000000':
+                    return parts[0]
+    except OSError as e:
+        logger.debug(f"读取路由表失败: {e}")
+    return None
+
+
+def _ioctl(sock, request, ifname):
+    """对接口执行 ioctl 并返回原始 ifreq 数据"""
+    import fcntl
+    ifreq = struct.pack('256s', ifname.encode()[:15])
+    return fcntl.ioctl(sock.fileno(), request, ifreq)
+
+
+def get_interface_info(ifname):
+    """
+    获取接口的MAC地址、IPv4地址和子网掩码 (仅Linux)
+    
+    Args:
+        ifname: 接口名称
+    
+    Returns:
+        tuple: (mac, ip, netmask)
+    
+    Raises:
+        OSError: 接口不存在或没有IPv4地址
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        hwaddr = _ioctl(sock, SIOCGIFHWADDR, ifname)[18:24]
+        ip = socket.inet_ntoa(_ioctl(sock, SIOCGIFADDR, ifname)[20:24])
+        netmask = socket.inet_ntoa(_ioctl(sock, SIOCGIFNETMASK, ifname)[20:24])
+    mac = ':'.join(f'{b:02x}' for b in hwaddr)
+    return mac, ip, netmask
+
+
+def get_interface_flags(ifname):
+    """
+    获取接口标志 (仅Linux)
+    
+    Args:
+        ifname: 接口名称
+    
+    Returns:
+        int: IFF_* 标志位
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        return struct.unpack_from('H', _ioctl(sock, SIOCGIFFLAGS, ifname), 16)[0]
+
+
+def list_interfaces(names=None):
+    """
+    枚举可扫描的IPv4接口 (通过 if_nameindex，不依赖默认路由或外网连通性)
+    
+    Args:
+        names: 只返回这些接口 (按给定顺序)，None表示所有已启用的非回环接口
+    
+    Returns:
+        list: InterfaceInfo 列表，没有IPv4地址或无法读取的接口被跳过
+    """
+    if names is None:
+        try:
+            candidates = [name for _, name in socket.if_nameindex()]
+        except (OSError, AttributeError) as e:
+            logger.debug(f"枚举网络接口失败: {e}")
+            return []
+    else:
+        candidates = list(names)
+    
+    interfaces = []
+    for name in candidates:
+        try:
+            flags = get_interface_flags(name)
+            if names is None and (not flags & IFF_UP or flags & IFF_LOOPBACK):
+                continue
+            mac, ip, netmask = get_interface_info(name)
+        except (OSError, ImportError) as e:
+            if names is not None:
+                logger.warning(f"接口 {name} 不可用: {e}")
+            continue
+        network = str(ipaddress.ip_interface(f"{ip}/{netmask}").network)
+        interfaces.append(InterfaceInfo(name, mac, ip, network))
+    return interfaces
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+指标模块 - 轻量的计数器/仪表/直方图注册表，以Prometheus文本格式通过本地HTTP /metrics 暴露
+"""
+import time
+import bisect
+import logging
+import threading
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+class _Metric:
+    """指标基类: 按标签值保存子指标"""
+    
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values, **kwargs):
+        """
+        获取指定标签值的子指标
+        
+        Args:
+            *values: 按 labelnames 顺序的标签值
+            **kwargs: 或以关键字给出标签值
+        
+        Returns:
+            子指标 (提供 inc/set/observe)
+        """
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        # 快速路径: 已存在的子指标直接返回
+        child = self._children.get(values)
+        if child is not None:
+            return child
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+        with self._lock:
+            return self._children.setdefault(key, self._new_child())
+    
+    def _default(self):
+        """无标签指标直接使用唯一的子指标"""
+        return self.labels()
+    
+    def render(self):
+        """
+        生成Prometheus文本格式
+        
+        Returns:
+            list: 文本行
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    """计数器/仪表的子指标"""
+    
+    __slots__ = ('value', '_lock')
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+    
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+    
+    def set(self, value):
+        self.value = value
+    
+    def render(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    
+    kind = 'counter'
+    
+    def _new_child(self):
+        return _Value()
+    
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """可任意设置的仪表"""
+    
+    kind = 'gauge'
+    
+    def _new_child(self):
+        return _Value()
+    
+    def set(self, value):
+        self._default().set(value)
+    
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _HistogramValue:
+    """直方图的子指标"""
+    
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def render(self, name, labelnames, key):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class _Timer:
+    """直方图计时上下文"""
+    
+    __slots__ = ('child', 'start')
+    
+    def __init__(self, child):
+        self.child = child
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+    
+    def observe(self, value):
+        self._default().observe(value)
+    
+    def time(self, *values, **kwargs):
+        """
+        返回计时上下文，退出时记录耗时(秒)
+        
+        Args:
+            *values, **kwargs: 标签值
+        """
+        return _Timer(self.labels(*values, **kwargs))
+
+
+class MetricsRegistry:
+    """指标注册表"""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}")
+            return metric
+    
+    def counter(self, name, documentation, labelnames=()):
+        """获取或注册计数器"""
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name, documentation, labelnames=()):
+        """获取或注册仪表"""
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """获取或注册直方图"""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self):
+        """
+        生成所有指标的Prometheus文本格式
+        
+        Returns:
+            str: 文本
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def start_metrics_server(port, host='127.0.0.1', registry=REGISTRY):
+    """
+    在后台线程中启动 /metrics HTTP服务
+    
+    Args:
+        port: 监听端口 (0表示随机端口)
+        host: 监听地址，默认只监听本机
+        registry: 指标注册表
+    
+    Returns:
+        ThreadingHTTPServer: 服务实例 (server_address 为实际监听地址，用 stop_metrics_server() 停止)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(f"指标服务已启动: http://{server.server_address[0]}:{server.server_address[1]}/metrics")
+    return server
+
+
+def stop_metrics_server(server):
+    """
+    停止 /metrics HTTP服务并关闭监听socket
+    
+    shutdown() 只结束 serve_forever，不关闭socket，之后无法再绑定同一端口
+    
+    Args:
+        server: start_metrics_server 返回的服务实例
+    """
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+邻居表读取模块 - 直接读取系统ARP/邻居表，无需fork `arp -n`
+"""
+import os
+import socket
+import struct
+import logging
+import platform
+import subprocess
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROC_NET_ARP = '/proc/net/arp'
+
+# /proc/net/arp 的 Flags 字段 (include/uapi/linux/if_arp.h)
+ATF_COM = 0x02
+ATF_PERM = 0x04
+
+# rtnetlink 常量 (include/uapi/linux/rtnetlink.h, neighbour.h)
+NETLINK_ROUTE = 0
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x01
+NLM_F_DUMP = 0x300
+NDA_DST = 1
+NDA_LLADDR = 2
+
+NLMSG_HEADER = struct.Struct('=IHHII')
+NDMSG = struct.Struct('=BBHiHBB')
+RTATTR = struct.Struct('=HH')
+
+NUD_STATES = {
+    0x01: 'incomplete',
+    0x02: 'reachable',
+    0x04: 'stale',
+    0x08: 'delay',
+    0x10: 'probe',
+    0x20: 'failed',
+    0x40: 'noarp',
+    0x80: 'permanent',
+}
+
+# 这些状态表示没有可用的MAC地址
+UNUSABLE_STATES = ('incomplete', 'failed')
+
+EMPTY_MAC = '00:00:00:00:00:00'
+
+
+def _proc_flags_to_state(flags):
+    """将 /proc/net/arp 的 Flags 转换为邻居状态名称"""
+    if flags & ATF_PERM:
+        return 'permanent'
+    if flags & ATF_COM:
+        return 'reachable'
+    return 'incomplete'
+
+
+def parse_proc_arp(text):
+    """
+    解析 /proc/net/arp 格式的文本
+    
+    Args:
+        text: 文件内容
+    
+    Returns:
+        dict: {mac: (ip, state)}
+    """
+    table = {}
+    lines = text.splitlines()
+    for line in lines[1:]:
+        parts = line.split()
+        if len(parts) < 4:
+            continue
+        mac = parts[3].lower()
+        if mac == EMPTY_MAC:
+            continue
+        try:
+            flags = int(parts[2], 16)
+        except ValueError:
+            continue
+        table[mac] = (parts[0], _proc_flags_to_state(flags))
+    return table
+
+
+def read_proc_arp(path=PROC_NET_ARP):
+    """
+    读取 /proc/net/arp
+    
+    Args:
+        path: 文件路径 (测试时可传入fixture文件)
+    
+    Returns:
+        dict: {mac: (ip, state)}
+    """
+    with open(path, 'r') as f:
+        return parse_proc_arp(f.read())
+
+
+def _parse_netlink_messages(data, table):
+    """
+    解析一批rtnetlink消息，将邻居项写入table
+    
+    Args:
+        data: recv 得到的原始数据
+        table: 结果字典 {mac: (ip, state)}
+    
+    Returns:
+        bool: 是否已收到 NLMSG_DONE
+    """
+    offset = 0
+    while offset + NLMSG_HEADER.size <= len(data):
+        msg_len, msg_type, _, _, _ = NLMSG_HEADER.unpack_from(data, offset)
+        if msg_len < NLMSG_HEADER.size:
+            return True
+        
+        if msg_type == NLMSG_DONE:
+            return True
+        if msg_type == NLMSG_ERROR:
+            error, = struct.unpack_from('=i', data, offset + NLMSG_HEADER.size)
+            raise OSError(-error, os.strerror(-error))
+        
+        if msg_type == RTM_NEWNEIGH:
+            body = offset + NLMSG_HEADER.size
+            family, _, _, _, state, _, _ = NDMSG.unpack_from(data, body)
+            
+            ip = mac = None
+            attr = body + NDMSG.size
+            end = offset + msg_len
+            while attr + RTATTR.size <= end:
+                attr_len, attr_type = RTATTR.unpack_from(data, attr)
+                if attr_len < RTATTR.size:
+                    break
+                payload = data[attr + RTATTR.size:attr + attr_len]
+                if attr_type == NDA_DST and family == socket.AF_INET:
+                    ip = socket.inet_ntoa(payload)
+                elif attr_type == NDA_LLADDR and len(payload) == 6:
+                    mac = ':'.join(f'{b:02x}' for b in payload)
+                attr += (attr_len + 3) & ~3
+            
+            if ip and mac and mac != EMPTY_MAC:
+                table[mac] = (ip, NUD_STATES.get(state, 'none'))
+        
+        offset += (msg_len + 3) & ~3
+    return False
+
+
+def read_netlink_neighbors():
+    """
+    通过 rtnetlink RTM_GETNEIGH 读取IPv4邻居表 (仅Linux)
+    
+    Returns:
+        dict: {mac: (ip, state)}
+    """
+    table = {}
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE) as sock:
+        sock.settimeout(2)
+        sock.bind((0, 0))
+        
+        payload = NDMSG.pack(socket.AF_INET, 0, 0, 0, 0, 0, 0)
+        header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), RTM_GETNEIGH,
+                                   NLM_F_REQUEST | NLM_F_DUMP, 1, 0)
+        sock.send(header + payload)
+        
+        while True:
+            data = sock.recv(65536)
+            if not data or _parse_netlink_messages(data, table):
+                break
+    return table
+
+
+def parse_arp_output(output):
+    """
+    解析 `arp -n` / `arp -a` 命令输出（非Linux系统的备选方案）
+    
+    Args:
+        output: 命令输出文本
+    
+    Returns:
+        dict: {mac: (ip, state)}
+    """
+    table = {}
+    for line in output.lower().split('\n'):
+        ip = mac = None
+        for part in line.split():
+            part = part.strip('()')
+            if ip is None and part.count('.') == 3:
+                try:
+                    socket.inet_aton(part)
+                    ip = part
+                except socket.error:
+                    continue
+            elif mac is None and len(part) == 17 and part.count(part[2]) == 5 and part[2] in ':-':
+                mac = part.replace('-', ':')
+        if ip and mac and mac != EMPTY_MAC:
+            table[mac] = (ip, 'reachable')
+    return table
+
+
+def read_arp_command():
+    """
+    执行系统 arp 命令读取ARP缓存
+    
+    Returns:
+        dict: {mac: (ip, state)}
+    """
+    if platform.system().lower() == 'windows':
+        command = ['arp', '-a']
+    else:
+        command = ['arp', '-n']
+    result = subprocess.run(command, capture_output=True, text=True, timeout=5)
+    if result.returncode != 0:
+        return {}
+    return parse_arp_output(result.stdout)
+
+
+def read_neighbor_table(backend='auto'):
+    """
+    读取系统邻居表
+    
+    Args:
+        backend: 'netlink', 'proc', 'command' 或 'auto' (依次尝试netlink、/proc、arp命令)
+    
+    Returns:
+        dict: {mac: (ip, state)}
+    """
+    readers = {
+        'netlink': read_netlink_neighbors,
+        'proc': read_proc_arp,
+        'command': read_arp_command,
+    }
+    if backend != 'auto':
+        return readers[backend]()
+    
+    for name in ('netlink', 'proc'):
+        try:
+            return readers[name]()
+        except (OSError, AttributeError) as e:
+            logger.debug(f"邻居表后端 {name} 不可用: {e}")
+    return read_arp_command()
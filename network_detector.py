@@ -3,84 +3,713 @@
 网络检测模块 - 用于检测局域网中的设备
 """
 import time
+import asyncio
 import logging
-from scapy.all import ARP, Ether, srp, ICMP, IP, sr1
+import functools
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
 import socket
+import ipaddress
 import subprocess
 import platform
 import os
+import threading
+from collections import deque
+
+from neighbor_table import read_neighbor_table, UNUSABLE_STATES
+from raw_prober import RawProber
+from sweep import ShardedSweeper, InterfaceSweeper, split_ranges
+from interfaces import get_default_interface, get_interface_info, list_interfaces
+from device_table import DeviceTable
+from fingerprint import FingerprintIndex, is_locally_administered, load_oui_database
+from metrics import REGISTRY
+from probe_backends import ProbeChain
+import router_backend  # 注册 router 探测后端
+
+# 邻居表中这些状态表示最近已确认可达，无需再ping验证
+FRESH_STATES = ('reachable', 'permanent', 'noarp')
+
+BROADCAST_MAC = 'ff:ff:ff:ff:ff:ff'
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PROBE_SECONDS = REGISTRY.histogram('boss_detect_probe_seconds', '各探测层级单次探测耗时(秒)', ('tier', 'result'))
+SWEEP_SECONDS = REGISTRY.histogram('boss_detect_sweep_seconds', '一次完整网段扫描耗时(秒)',
+                                   buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+DEVICES_SEEN = REGISTRY.histogram('boss_detect_devices_seen', '一次完整扫描发现的设备数',
+                                  buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000))
+INTERFACE_SWEEP_SECONDS = REGISTRY.histogram('boss_detect_interface_sweep_seconds', '单个接口一次完整扫描耗时(秒)',
+                                             ('interface',), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+INTERFACE_DEVICES = REGISTRY.gauge('boss_detect_interface_devices', '单个接口最近一次扫描发现的设备数', ('interface',))
+
+_scapy = None
+
+
+def load_scapy():
+    """
+    按需加载scapy，只导入需要的协议层（scapy.all 会加载全部协议层，耗时且占内存）
+    
+    Returns:
+        SimpleNamespace: 包含 ARP, Ether, IP, ICMP, srp, sr1
+    """
+    global _scapy
+    if _scapy is None:
+        from scapy.layers.l2 import ARP, Ether
+        from scapy.layers.inet import IP, ICMP
+        from scapy.sendrecv import srp, sr1
+        _scapy = SimpleNamespace(ARP=ARP, Ether=Ether, IP=IP, ICMP=ICMP, srp=srp, sr1=sr1)
+        logger.debug("已加载scapy")
+    return _scapy
+
+
+def normalize_mac(mac):
+    """
+    标准化MAC地址为小写冒号分隔格式
+    
+    Args:
+        mac: MAC地址 (支持:和-分隔符)
+    
+    Returns:
+        str: 标准化后的MAC地址
+    """
+    return mac.strip().lower().replace('-', ':')
+
+
+class TierStats:
+    """单个探测层级的命中率与耗时统计"""
+    
+    __slots__ = ('attempts', 'hits', 'total_latency', 'max_latency')
+    
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+    
+    def record(self, hit, latency):
+        """
+        记录一次探测
+        
+        Args:
+            hit: 是否发现目标
+            latency: 探测耗时(秒)
+        """
+        self.attempts += 1
+        if hit:
+            self.hits += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+    
+    @property
+    def hit_rate(self):
+        return self.hits / self.attempts if self.attempts else 0.0
+    
+    @property
+    def avg_latency(self):
+        return self.total_latency / self.attempts if self.attempts else 0.0
+    
+    def as_dict(self):
+        return {
+            'attempts': self.attempts,
+            'hits': self.hits,
+            'hit_rate': self.hit_rate,
+            'avg_latency': self.avg_latency,
+            'max_latency': self.max_latency,
+        }
+
+
+class InterfaceStats:
+    """单个接口的扫描次数与耗时统计"""
+    
+    __slots__ = ('sweeps', 'devices', 'total_duration', 'max_duration', 'last_duration')
+    
+    def __init__(self):
+        self.sweeps = 0
+        self.devices = 0
+        self.total_duration = 0.0
+        self.max_duration = 0.0
+        self.last_duration = 0.0
+    
+    def record(self, devices, duration):
+        """
+        记录一次完整扫描
+        
+        Args:
+            devices: 发现的设备数
+            duration: 扫描耗时(秒)
+        """
+        self.sweeps += 1
+        self.devices = devices
+        self.total_duration += duration
+        self.max_duration = max(self.max_duration, duration)
+        self.last_duration = duration
+    
+    @property
+    def avg_duration(self):
+        return self.total_duration / self.sweeps if self.sweeps else 0.0
+    
+    def as_dict(self):
+        return {
+            'sweeps': self.sweeps,
+            'devices': self.devices,
+            'avg_duration': self.avg_duration,
+            'max_duration': self.max_duration,
+            'last_duration': self.last_duration,
+        }
+
 
 class NetworkDetector:
     """网络设备检测器"""
     
-    def __init__(self, target_mac, target_ip=None, network_interface=None):
+    def __init__(self, target_mac, target_ip=None, network_interface=None, neighbor_backend='auto',
+                 use_raw_prober=False, scan_ranges=None, sweep_workers=4, shard_prefix=24, sweep_rate=0,
+                 sighting_ttl=0, device_expiry=300, sweep_after_misses=1, candidate_limit=4,
+                 probe_chain=None, backend_options=None, scan_interfaces=None, fingerprints=None, oui_files=None):
         """
         初始化网络检测器
         
         Args:
-            target_mac: 目标MAC地址
+            target_mac: 目标MAC地址 (多目标模式下可为None)
             target_ip: 目标IP地址 (可选)
             network_interface: 网络接口 (可选)
+            neighbor_backend: 邻居表读取方式 ('auto', 'netlink', 'proc', 'command')
+            use_raw_prober: 是否使用持久化的原始套接字探测器代替scapy/系统ping
+            scan_ranges: 默认扫描的网段列表 (可选，默认为接口所在网段)
+            sweep_workers: 分片扫描的并行线程数
+            shard_prefix: 分片的前缀长度，大于该大小的网段会被拆分
+            sweep_rate: 全局ARP发包速率上限(包/秒)，0表示不限速
+            sighting_ttl: 目标在设备清单中最近多少秒内出现过即视为在线，无需重新探测 (0表示关闭)
+            device_expiry: 设备多少秒未出现后从设备清单中移除
+            sweep_after_misses: 单播探测候选IP连续未命中多少轮后才执行全网段扫描
+            candidate_limit: 记住目标最近使用过的IP个数，作为单播探测的候选
+            probe_chain: 探测后端名称列表，按顺序执行 (默认按各后端声明的开销排序)
+            backend_options: 各探测后端的参数 {名称: {参数: 值}}
+            scan_interfaces: 同时扫描的接口列表，['all'] 表示所有已启用的IPv4接口 (可选，
+                             配置后每个接口一个扫描线程，sweep_rate 按接口分别限速)
+            fingerprints: 指纹规则 [(目标MAC, FingerprintRule), ...]，名称符合规则的其他MAC (随机MAC)
+                          也视为该目标 (可选)
+            oui_files: IEEE厂商数据库文件列表，用于在日志中标注设备厂商 (可选)
+        
+        Raises:
+            ValueError: probe_chain 中有未注册的后端
         """
-        self.target_mac = target_mac.lower().replace('-', ':')
+        self.target_mac = normalize_mac(target_mac) if target_mac else None
         self.target_ip = target_ip
         self.network_interface = network_interface
+        self.neighbor_backend = neighbor_backend
+        self._probe_executor = None
+        self.use_raw_prober = use_raw_prober
+        self._prober = None
+        self.scan_ranges = scan_ranges or []
+        self.sweep_workers = sweep_workers
+        self.shard_prefix = shard_prefix
+        self.sweep_rate = sweep_rate
+        self._sweeper = None
+        self.scan_interfaces = list(scan_interfaces or [])
+        self._interface_sweeper = None
+        self._interface_probers = {}
+        self._interface_networks = []
+        self.interface_stats = {}
+        self.sighting_ttl = sighting_ttl
+        self.fingerprints = FingerprintIndex(fingerprints or ())
+        self.oui = load_oui_database(oui_files) if oui_files else None
+        self.device_table = DeviceTable(expire_after=device_expiry, on_event=self._log_device_event)
+        self.sweep_after_misses = max(1, sweep_after_misses)
+        self._unicast_misses = 0
+        self._recent_ips = deque(maxlen=max(1, candidate_limit))
+        self.tier_stats = {}
+        self._stats_lock = threading.Lock()
+        self.probe_chain = ProbeChain.build(self, probe_chain, backend_options, on_result=self._record_tier)
         logger.info(f"初始化网络检测器 - 目标MAC: {self.target_mac}, 目标IP: {target_ip}")
+        logger.info(f"探测链: {' → '.join(self.probe_chain.names)}")
     
-    def scan_network(self, ip_range=None):
+    def _get_prober(self, interface=None):
         """
-        扫描局域网中的设备
+        获取持久化的原始套接字探测器（按需创建）
         
         Args:
-            ip_range: IP地址范围 (例如: "192.168.1.0/24")
-            
+            interface: 网络接口 (默认为 network_interface)，多接口扫描时每个接口一个探测器
+        
         Returns:
-            list: 发现的设备列表 [(ip, mac), ...]
+            RawProber: 探测器实例，未启用时返回None
+        """
+        if not self.use_raw_prober:
+            return self._prober
+        if interface is None or interface == self.network_interface:
+            if self._prober is None:
+                self._prober = RawProber(self.network_interface)
+            return self._prober
+        if interface not in self._interface_probers:
+            self._interface_probers[interface] = RawProber(interface)
+        return self._interface_probers[interface]
+    
+    def _disable_prober(self, error):
         """
-        if ip_range is None:
-            # 自动获取本地网络段
-            ip_range = self._get_local_network_range()
+        原始套接字不可用（例如权限不足）时关闭探测器，回退到scapy/系统ping
         
-        logger.info(f"开始扫描网络: {ip_range}")
+        Args:
+            error: 导致失败的异常
+        """
+        logger.warning(f"原始套接字探测器不可用: {error}，回退到scapy")
+        for prober in [self._prober, *self._interface_probers.values()]:
+            if prober is not None:
+                prober.close()
+        self._prober = None
+        self._interface_probers = {}
+        self.use_raw_prober = False
+    
+    def _scan_shard(self, ip_range, inter=0, on_reply=None, interface=None):
+        """
+        扫描单个网段分片
+        
+        Args:
+            ip_range: IP地址范围
+            inter: 两个ARP请求之间的间隔(秒)，用于限速
+            on_reply: 单条应答回调 (ip, mac)，原始套接字探测器收到应答即回调
+            interface: 发包的网络接口 (默认为 network_interface)
+        
+        Returns:
+            list: 发现的设备列表 [(ip, mac), ...]
+        """
+        prober = self._get_prober(interface)
+        if prober is not None:
+            try:
+                return prober.arp_scan(ip_range, timeout=3, inter=inter, on_reply=on_reply)
+            except OSError as e:
+                self._disable_prober(e)
         
         try:
+            scapy = load_scapy()
+            
             # 创建ARP请求包
-            arp = ARP(pdst=ip_range)
-            ether = Ether(dst="ff:ff:ff:ff:ff:ff")
+            arp = scapy.ARP(pdst=ip_range)
+            ether = scapy.Ether(dst="ff:ff:ff:ff:ff:ff")
             packet = ether/arp
             
             # 发送请求并接收响应
-            result = srp(packet, timeout=3, verbose=0, iface=self.network_interface)[0]
+            result = scapy.srp(packet, timeout=3, inter=inter, verbose=0,
+                               iface=interface or self.network_interface)[0]
             
             devices = []
             for sent, received in result:
                 devices.append((received.psrc, received.hwsrc))
-            
-            logger.info(f"扫描完成，发现 {len(devices)} 个设备")
             return devices
-            
+        
         except Exception as e:
             logger.error(f"网络扫描失败: {e}")
             return []
     
+    def scan_network_iter(self, ip_range=None, stop=None):
+        """
+        扫描局域网中的设备，大网段拆分为分片并行扫描，发现设备即返回
+        
+        每个发现的设备都会合并到 device_table 中
+        
+        Args:
+            ip_range: IP地址范围 (例如: "192.168.1.0/24")，默认使用配置的网段或接口所在网段
+            stop: threading.Event (可选)，置位后尚未开始的分片不再扫描
+        
+        Yields:
+            tuple: (ip, mac)
+        """
+        started = time.perf_counter()
+        seen = 0
+        for ip, mac in self._sweep(ip_range, stop):
+            self.device_table.observe(ip, normalize_mac(mac))
+            seen += 1
+            yield ip, mac
+        self.device_table.expire()
+        # 调用方提前停止时不会执行到这里，只统计完整扫描
+        SWEEP_SECONDS.observe(time.perf_counter() - started)
+        DEVICES_SEEN.observe(seen)
+    
+    def _sweep(self, ip_range=None, stop=None):
+        """
+        执行扫描（单个分片直接扫描，多个分片并行扫描）
+        
+        Args:
+            ip_range: IP地址范围
+            stop: threading.Event (可选)，置位后尚未开始的分片不再扫描
+        
+        Yields:
+            tuple: (ip, mac)
+        """
+        if ip_range is None and self.scan_interfaces:
+            jobs = self._interface_jobs()
+            if jobs:
+                logger.info("开始多接口扫描: " + "; ".join(f"{interface or '默认接口'}: {', '.join(ranges)}"
+                                                     for interface, ranges in jobs.items()))
+                yield from self._get_interface_sweeper().sweep(jobs, stop)
+                return
+            logger.warning("未找到可扫描的接口，改为扫描默认网段")
+        
+        ranges = [ip_range] if ip_range else self._get_scan_ranges()
+        logger.info(f"开始扫描网络: {', '.join(ranges)}")
+        
+        shards = split_ranges(ranges, self.shard_prefix)
+        if len(shards) <= 1:
+            # 单个分片直接在当前线程扫描
+            yield from self._scan_shard(shards[0] if shards else ranges[0])
+            return
+        
+        yield from self._get_sweeper().sweep(ranges, stop)
+    
+    def scan_network(self, ip_range=None):
+        """
+        扫描局域网中的设备
+        
+        Args:
+            ip_range: IP地址范围 (例如: "192.168.1.0/24")
+        
+        Returns:
+            list: 发现的设备列表 [(ip, mac), ...]
+        """
+        devices = list(self.scan_network_iter(ip_range))
+        logger.info(f"扫描完成，发现 {len(devices)} 个设备")
+        return devices
+    
+    def _log_device_event(self, event):
+        """
+        记录设备清单的变化
+        
+        Args:
+            event: DeviceEvent 实例
+        """
+        if event.kind == 'ip_changed':
+            logger.info(f"设备IP变化: MAC={event.mac}, {event.old_ip} -> {event.ip}")
+        elif event.kind == 'appeared':
+            if logger.isEnabledFor(logging.DEBUG):
+                vendor = self.describe_mac(event.mac)
+                logger.debug(f"发现新设备: MAC={event.mac}, IP={event.ip}" + (f" ({vendor})" if vendor else ""))
+        else:
+            logger.debug(f"设备已消失: MAC={event.mac}, 最后IP={event.ip}")
+    
+    def describe_mac(self, mac):
+        """
+        MAC的说明: 配置了OUI数据库时为厂商名称，本地管理地址为 '随机MAC'
+        
+        Args:
+            mac: 标准化后的MAC地址
+        
+        Returns:
+            str: 说明，无法识别时返回None
+        """
+        if self.oui is not None:
+            return self.oui.describe(mac)
+        return '随机MAC' if is_locally_administered(mac) else None
+    
+    def resolve_mac(self, mac):
+        """
+        将通过指纹关联到目标的MAC换算为目标配置的MAC
+        
+        Args:
+            mac: 标准化后的MAC地址
+        
+        Returns:
+            str: 目标MAC，未关联时原样返回
+        """
+        return self.fingerprints.match(mac) or mac
+    
+    def is_target_mac(self, mac, target_mac=None):
+        """
+        MAC是否属于目标: 与目标MAC相同，或已通过指纹关联到目标
+        
+        Args:
+            mac: MAC地址
+            target_mac: 目标MAC (默认为 self.target_mac)
+        
+        Returns:
+            bool
+        """
+        target_mac = target_mac or self.target_mac
+        mac = normalize_mac(mac)
+        return mac == target_mac or self.fingerprints.match(mac) == target_mac
+    
+    def target_macs(self, target_mac=None):
+        """
+        目标的所有MAC: 配置的MAC，以及通过指纹关联的MAC (最近关联的在前)
+        
+        Args:
+            target_mac: 目标MAC (默认为 self.target_mac)
+        
+        Returns:
+            list: MAC地址列表
+        """
+        target_mac = target_mac or self.target_mac
+        return [target_mac] + self.fingerprints.macs_for(target_mac)
+    
+    def _get_sweeper(self):
+        """获取分片扫描器（按需创建）"""
+        if self._sweeper is None:
+            self._sweeper = ShardedSweeper(
+                self._scan_shard,
+                max_workers=self.sweep_workers,
+                shard_prefix=self.shard_prefix,
+                rate_limit=self.sweep_rate
+            )
+        return self._sweeper
+    
+    def _get_interface_sweeper(self):
+        """获取多接口扫描器（按需创建）"""
+        if self._interface_sweeper is None:
+            self._interface_sweeper = InterfaceSweeper(
+                lambda shard, inter, on_reply, interface: self._scan_shard(shard, inter, on_reply, interface),
+                max_workers=self.sweep_workers,
+                shard_prefix=self.shard_prefix,
+                rate_limit=self.sweep_rate,
+                on_complete=self._record_interface
+            )
+        return self._interface_sweeper
+    
+    def _get_scan_interfaces(self):
+        """
+        枚举要扫描的接口（每次扫描前重新枚举，VLAN子接口的增减和地址变化会被自动发现）
+        
+        Returns:
+            list: InterfaceInfo 列表
+        """
+        names = None if 'all' in self.scan_interfaces else self.scan_interfaces
+        interfaces = list_interfaces(names)
+        self._interface_networks = [(ipaddress.ip_network(info.network), info.name) for info in interfaces]
+        return interfaces
+    
+    def _interface_jobs(self):
+        """
+        为每个接口分配扫描网段
+        
+        未配置 scan_ranges 时扫描各接口所在网段；配置了时每个网段分配给与之重叠的接口，
+        没有对应接口的网段从 network_interface (或默认路由接口) 发出
+        
+        Returns:
+            dict: {接口名称: [网段, ...]}
+        """
+        interfaces = self._get_scan_interfaces()
+        if not self.scan_ranges:
+            return {info.name: [info.network] for info in interfaces}
+        
+        jobs = {}
+        for value in self.scan_ranges:
+            network = ipaddress.ip_network(value, strict=False)
+            owner = next((name for interface_network, name in self._interface_networks
+                          if interface_network.overlaps(network)), self.network_interface)
+            jobs.setdefault(owner, []).append(value)
+        return jobs
+    
+    def _interface_for(self, ip):
+        """
+        查找IP所在网段对应的接口（多接口扫描时用于单播探测选择出口）
+        
+        Args:
+            ip: IP地址
+        
+        Returns:
+            str: 接口名称，未启用多接口扫描或没有对应接口时返回None
+        """
+        if not self.scan_interfaces:
+            return None
+        if not self._interface_networks:
+            self._get_scan_interfaces()
+        address = ipaddress.ip_address(ip)
+        for network, name in self._interface_networks:
+            if address in network:
+                return name
+        return None
+    
+    def _record_interface(self, interface, devices, elapsed):
+        """
+        记录单个接口的一次完整扫描
+        
+        Args:
+            interface: 接口名称 (None表示默认接口)
+            devices: 发现的设备数
+            elapsed: 扫描耗时(秒)
+        """
+        name = interface or 'default'
+        INTERFACE_SWEEP_SECONDS.labels(name).observe(elapsed)
+        INTERFACE_DEVICES.labels(name).set(devices)
+        with self._stats_lock:
+            stats = self.interface_stats.get(name)
+            if stats is None:
+                stats = self.interface_stats[name] = InterfaceStats()
+            stats.record(devices, elapsed)
+        rate = f"{self.sweep_rate:g}包/秒" if self.sweep_rate else "不限速"
+        logger.info(f"接口 {name} 扫描完成: 发现 {devices} 个设备，耗时 {elapsed:.2f}s，限速 {rate}")
+    
+    def get_interface_stats(self):
+        """
+        获取各接口的扫描统计
+        
+        Returns:
+            dict: {接口: {'sweeps', 'devices', 'avg_duration', 'max_duration', 'last_duration', 'rate_limit'}}
+        """
+        with self._stats_lock:
+            return {name: dict(stats.as_dict(), rate_limit=self.sweep_rate)
+                    for name, stats in self.interface_stats.items()}
+    
+    def _get_scan_ranges(self):
+        """
+        获取默认扫描网段
+        
+        Returns:
+            list: 配置的网段列表，未配置时为本地接口所在网段
+        """
+        if self.scan_ranges:
+            return list(self.scan_ranges)
+        return [self._get_local_network_range()]
+    
+    def match_targets(self, mac_index, ip_index=None, ip_range=None):
+        """
+        通过一次ARP扫描同时匹配多个目标
+        
+        探测链中配置了 router 后端时先查询路由器终端表，全部目标都已找到
+        (或路由器表为权威数据) 时不再扫描
+        
+        Args:
+            mac_index: MAC地址到目标的映射 {mac: target}
+            ip_index: IP地址到目标的映射 {ip: target} (可选)
+            ip_range: IP地址范围
+        
+        Returns:
+            dict: 本轮发现的目标 {target: ip}
+        """
+        found = {}
+        router = self.probe_chain.get('router')
+        if router is not None and router.ready():
+            started = time.perf_counter()
+            try:
+                table = router.table()
+            except router_backend.RouterError as e:
+                logger.warning(f"读取路由器终端表失败，改为ARP扫描: {e}")
+                table = None
+            if table is not None:
+                for mac, target in mac_index.items():
+                    if mac in table:
+                        found[target] = table[mac] or router.known_ip(mac)
+                if self.fingerprints:
+                    learned = self.fingerprints.learned()
+                    for mac, ip in table.items():
+                        target = mac_index.get(learned.get(mac))
+                        if target is not None and target not in found:
+                            found[target] = ip or router.known_ip(mac)
+                self._record_tier('router', bool(found), started)
+                if router.authoritative or len(found) == len(mac_index):
+                    logger.info(f"多目标匹配完成(路由器)，发现 {len(found)}/{len(mac_index)} 个目标")
+                    return found
+        
+        devices = self.scan_network(ip_range)
+        
+        learned = self.fingerprints.learned()
+        for ip, mac in devices:
+            mac = normalize_mac(mac)
+            target = mac_index.get(learned.get(mac, mac))
+            if target is None and ip_index:
+                target = ip_index.get(ip)
+            if target is not None and target not in found:
+                found[target] = ip
+        
+        logger.info(f"多目标匹配完成，发现 {len(found)}/{len(mac_index)} 个目标")
+        return found
+    
+    def unicast_arp(self, candidates, timeout=1):
+        """
+        向候选IP发送单播ARP请求（以期望的MAC为目的地址，不打扰网段内其他主机）
+        
+        Args:
+            candidates: {ip: mac} 候选IP及期望的MAC地址
+            timeout: 等待应答的超时秒数
+        
+        Returns:
+            list: 应答的设备列表 [(ip, mac), ...]
+        """
+        if not candidates:
+            return []
+        
+        # 多接口扫描时按IP所在网段选择出口接口
+        groups = {}
+        for ip, mac in candidates.items():
+            groups.setdefault(self._interface_for(ip), {})[ip] = mac
+        
+        devices = []
+        for interface, group in groups.items():
+            devices.extend(self._unicast_arp_on(group, timeout, interface))
+        
+        for ip, mac in devices:
+            self.device_table.observe(ip, normalize_mac(mac))
+        return devices
+    
+    def _unicast_arp_on(self, candidates, timeout, interface=None):
+        """
+        从指定接口发送单播ARP请求
+        
+        Args:
+            candidates: {ip: mac} 候选IP及期望的MAC地址
+            timeout: 等待应答的超时秒数
+            interface: 网络接口 (默认为 network_interface)
+        
+        Returns:
+            list: 应答的设备列表 [(ip, mac), ...]
+        """
+        prober = self._get_prober(interface)
+        if prober is not None:
+            try:
+                return prober.arp_probe(list(candidates), timeout=timeout, dst_macs=candidates)
+            except OSError as e:
+                self._disable_prober(e)
+        
+        try:
+            scapy = load_scapy()
+            packets = [scapy.Ether(dst=mac)/scapy.ARP(pdst=ip) for ip, mac in candidates.items()]
+            result = scapy.srp(packets, timeout=timeout, verbose=0, iface=interface or self.network_interface)[0]
+            return [(received.psrc, received.hwsrc) for sent, received in result]
+        except Exception as e:
+            logger.error(f"单播ARP探测失败: {e}")
+            return []
+    
+    def probe_mac(self, mac, ip):
+        """
+        向指定IP发送单播ARP请求，确认该IP是否仍由目标MAC持有
+        
+        Args:
+            mac: 目标MAC地址
+            ip: 目标IP地址
+        
+        Returns:
+            bool: 是否在线
+        """
+        if not ip:
+            return False
+        mac = normalize_mac(mac)
+        for found_ip, found_mac in self.unicast_arp({ip: self._candidate_mac(ip, mac)}):
+            if found_ip == ip and self.is_target_mac(found_mac, mac):
+                return True
+        return False
+    
     def _ping_host(self, ip):
         """
         使用ICMP ping检测主机是否在线
         
         Args:
             ip: 目标IP地址
-            
+        
         Returns:
             bool: 是否在线
         """
+        prober = self._get_prober()
+        if prober is not None:
+            try:
+                if prober.ping(ip, timeout=2):
+                    logger.debug(f"ICMP ping成功: {ip}")
+                    return True
+                return False
+            except OSError as e:
+                self._disable_prober(e)
+        
         try:
             # 首先尝试使用scapy发送ICMP包（更可靠）
-            packet = IP(dst=ip)/ICMP()
-            response = sr1(packet, timeout=2, verbose=0)
+            scapy = load_scapy()
+            packet = scapy.IP(dst=ip)/scapy.ICMP()
+            response = scapy.sr1(packet, timeout=2, verbose=0)
             if response:
                 logger.debug(f"ICMP ping成功: {ip}")
                 return True
@@ -120,97 +749,420 @@ class NetworkDetector:
         
         Args:
             target_mac: 目标MAC地址
-            
+        
         Returns:
             tuple: (bool, str) - (是否找到, IP地址)
         """
         try:
-            # 根据操作系统选择ARP命令
-            if platform.system().lower() == 'windows':
-                result = subprocess.run(['arp', '-a'], capture_output=True, text=True, timeout=5)
-            else:
-                result = subprocess.run(['arp', '-n'], capture_output=True, text=True, timeout=5)
-            
-            if result.returncode == 0:
-                output = result.stdout.lower()
-                # 标准化目标MAC地址，同时支持:和-两种格式
-                target_mac_colon = target_mac.replace('-', ':')
-                target_mac_dash = target_mac.replace(':', '-')
-                
-                for line in output.split('\n'):
-                    # 检查是否包含目标MAC（任一格式）
-                    if target_mac_colon in line or target_mac_dash in line:
-                        # 尝试提取IP地址
-                        parts = line.split()
-                        for part in parts:
-                            # 检查是否是IP地址格式
-                            if '.' in part and len(part.split('.')) == 4:
-                                try:
-                                    # 验证是否为有效IP
-                                    socket.inet_aton(part)
-                                    logger.info(f"在ARP缓存中发现目标设备: IP={part}, MAC={target_mac}")
-                                    return True, part
-                                except socket.error:
-                                    continue
+            table = read_neighbor_table(self.neighbor_backend)
         except Exception as e:
             logger.debug(f"检查ARP缓存失败: {e}")
+            return False, None
         
-        return False, None
+        entry = None
+        for mac in self.target_macs(normalize_mac(target_mac)):
+            entry = table.get(mac)
+            if entry is not None:
+                break
+        if entry is None:
+            return False, None
+        
+        ip, state = entry
+        if state in UNUSABLE_STATES:
+            logger.debug(f"ARP缓存中目标设备状态不可用: IP={ip}, 状态={state}")
+            return False, None
+        
+        logger.info(f"在ARP缓存中发现目标设备: IP={ip}, MAC={target_mac}, 状态={state}")
+        return True, ip
     
-    def is_target_online(self, ip_range=None):
+    def _check_recent_sighting(self):
         """
-        检测目标设备是否在线（使用多种方法）
+        检查设备清单中目标是否在 sighting_ttl 秒内出现过
         
-        Args:
-            ip_range: IP地址范围
-            
         Returns:
             tuple: (bool, str) - (是否在线, IP地址)
         """
-        # 方法1: 如果知道目标IP，先尝试ping
-        if self.target_ip:
-            logger.debug(f"尝试ping目标IP: {self.target_ip}")
-            if self._ping_host(self.target_ip):
-                logger.info(f"通过ping发现目标设备在线: {self.target_ip}")
-                # ping成功后，验证MAC地址（通过ARP缓存或新的ARP请求）
-                found, ip = self._check_arp_cache(self.target_mac)
-                if found and ip == self.target_ip:
-                    return True, self.target_ip
-                # 如果缓存中没有，发送ARP请求获取MAC
-                devices = self.scan_network(f"{self.target_ip}/32")
-                for ip, mac in devices:
-                    if mac.lower() == self.target_mac and ip == self.target_ip:
-                        logger.info(f"Ping+ARP验证成功: {ip}")
-                        return True, self.target_ip
-        
-        # 方法2: 检查ARP缓存（适用于已连接但不活跃的设备）
-        logger.debug("检查ARP缓存...")
-        found, ip = self._check_arp_cache(self.target_mac)
+        if not self.sighting_ttl or not self.target_mac:
+            return False, None
+        started = time.perf_counter()
+        found, ip = self.find_recent_sighting(self.sighting_ttl)
+        self._record_tier('sighting', found, started)
         if found:
-            # 如果在缓存中找到，尝试ping验证设备是否真的在线
-            if self._ping_host(ip):
-                logger.info(f"通过ARP缓存+ping验证设备在线: {ip}")
+            logger.info(f"设备清单中目标最近出现过: {ip}")
+        return found, ip
+    
+    def find_recent_sighting(self, ttl):
+        """
+        目标 (含指纹关联的MAC) 是否在 ttl 秒内出现在设备清单中
+        
+        Args:
+            ttl: 时间窗口(秒)
+        
+        Returns:
+            tuple: (bool, str) - (是否出现过, IP地址)
+        """
+        for mac in self.target_macs():
+            found, ip = self.device_table.is_present(mac, ttl)
+            if found:
                 return True, ip
-            else:
-                logger.debug(f"ARP缓存中找到设备但ping失败，可能已离线")
+        return False, None
+    
+    def _record_tier(self, tier, hit, started):
+        """
+        记录某一探测层级的结果
         
-        # 方法3: ARP扫描网络（主动发现）
-        logger.debug("执行ARP网络扫描...")
-        devices = self.scan_network(ip_range)
+        Args:
+            tier: 层级名称 (探测后端名称，以及ARP后端内部的 'unicast'、'sweep')
+            hit: 是否发现目标
+            started: 探测开始时的 time.perf_counter()
+        """
+        latency = time.perf_counter() - started
+        PROBE_SECONDS.labels(tier, 'hit' if hit else 'miss').observe(latency)
+        with self._stats_lock:
+            stats = self.tier_stats.get(tier)
+            if stats is None:
+                stats = self.tier_stats[tier] = TierStats()
+            stats.record(hit, latency)
+    
+    def get_tier_stats(self):
+        """
+        获取各探测层级的命中率与耗时统计
         
-        for ip, mac in devices:
-            mac = mac.lower()
-            if mac == self.target_mac:
+        Returns:
+            dict: {tier: {'attempts', 'hits', 'hit_rate', 'avg_latency', 'max_latency'}}
+        """
+        with self._stats_lock:
+            return {tier: stats.as_dict() for tier, stats in self.tier_stats.items()}
+    
+    def log_tier_stats(self):
+        """将各探测层级和各扫描接口的统计写入日志 (探测后端同时给出声明的典型耗时，便于调整探测链顺序)"""
+        declared = {backend.name: backend.latency for backend in self.probe_chain.backends}
+        for tier, stats in self.get_tier_stats().items():
+            expected = f", 声明耗时 {declared[tier] * 1000:.1f}ms" if tier in declared else ""
+            logger.info(f"探测层级 {tier}: 命中 {stats['hits']}/{stats['attempts']} "
+                        f"({stats['hit_rate']:.0%}), 平均耗时 {stats['avg_latency'] * 1000:.1f}ms, "
+                        f"最大耗时 {stats['max_latency'] * 1000:.1f}ms{expected}")
+        for name, stats in self.get_interface_stats().items():
+            rate = f"{stats['rate_limit']:g}包/秒" if stats['rate_limit'] else "不限速"
+            logger.info(f"扫描接口 {name}: 扫描 {stats['sweeps']} 次, 最近发现 {stats['devices']} 个设备, "
+                        f"平均耗时 {stats['avg_duration']:.2f}s, 最大耗时 {stats['max_duration']:.2f}s, 限速 {rate}")
+    
+    def inherit_state(self, previous):
+        """
+        从被替换的检测器继承设备清单和探测统计（配置重新加载时使用），
+        目标MAC未变时同时继承最近使用的IP
+        
+        Args:
+            previous: 原 NetworkDetector 实例
+        """
+        previous.device_table.expire_after = self.device_table.expire_after
+        previous.device_table.on_event = self._log_device_event
+        self.device_table = previous.device_table
+        with previous._stats_lock:
+            for tier, stats in previous.tier_stats.items():
+                self.tier_stats.setdefault(tier, stats)
+            for name, stats in previous.interface_stats.items():
+                self.interface_stats.setdefault(name, stats)
+        self.fingerprints.inherit(previous.fingerprints)
+        if previous.target_mac == self.target_mac:
+            for ip in reversed(previous._recent_ips):
+                self.remember_ip(ip)
+    
+    def remember_ip(self, ip):
+        """
+        记录目标最近使用的IP，作为下次单播探测的首选候选
+        
+        Args:
+            ip: 目标IP地址
+        """
+        if not ip:
+            return
+        if ip in self._recent_ips:
+            self._recent_ips.remove(ip)
+        self._recent_ips.appendleft(ip)
+    
+    def _candidate_ips(self):
+        """
+        获取单播探测的候选IP（按优先级排序并去重）
+        
+        依次为: 目标最近使用过的IP、配置的目标IP、设备清单中的IP、邻居表中的IP（含过期条目）
+        
+        Returns:
+            list: 候选IP列表
+        """
+        candidates = list(self._recent_ips)
+        if self.target_ip:
+            candidates.append(self.target_ip)
+        
+        macs = self.target_macs()
+        for mac in macs:
+            record = self.device_table.get(mac)
+            if record is not None:
+                candidates.append(record.ip)
+        
+        try:
+            table = read_neighbor_table(self.neighbor_backend)
+        except Exception as e:
+            logger.debug(f"读取邻居表失败: {e}")
+            table = {}
+        for mac in macs:
+            entry = table.get(mac)
+            if entry is not None:
+                candidates.append(entry[0])
+        
+        return list(dict.fromkeys(ip for ip in candidates if ip))
+    
+    def _candidate_mac(self, ip, target_mac=None):
+        """
+        单播ARP的目的MAC
+        
+        设备清单中该IP属于目标的某个MAC时使用该MAC；目标还有指纹关联的MAC但不知道
+        该IP用的是哪一个时改为广播，否则使用目标MAC
+        """
+        target_mac = target_mac or self.target_mac
+        record = self.device_table.get_by_ip(ip)
+        if record is not None and self.is_target_mac(record.mac, target_mac):
+            return record.mac
+        if self.fingerprints.macs_for(target_mac):
+            return BROADCAST_MAC
+        return target_mac
+    
+    def _sweep_for_target(self, ip_range=None, stop=None):
+        """
+        全网段ARP扫描，发现目标即停止等待其余分片
+        
+        Args:
+            ip_range: IP地址范围
+            stop: threading.Event (可选)，置位后放弃扫描，不再记录结果
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        started = time.perf_counter()
+        logger.debug("执行ARP网络扫描...")
+        for ip, mac in self.scan_network_iter(ip_range, stop):
+            if stop is not None and stop.is_set():
+                return False, None
+            if self.is_target_mac(mac):
                 logger.info(f"通过ARP扫描发现目标设备! IP: {ip}, MAC: {mac}")
+                self._record_tier('sweep', True, started)
                 return True, ip
             # 如果指定了IP地址，也检查IP
             if self.target_ip and ip == self.target_ip:
                 logger.info(f"通过IP地址发现目标设备! IP: {ip}, MAC: {mac}")
+                self._record_tier('sweep', True, started)
                 return True, ip
+        if stop is not None and stop.is_set():
+            return False, None
+        self._record_tier('sweep', False, started)
+        return False, None
+    
+    def _find_by_arp(self, ip_range=None, allow_sweep=True, stop=None):
+        """
+        分层ARP探测: 先向候选IP发送单播ARP，连续 sweep_after_misses 轮未命中后才扩大到全网段扫描
+        
+        Args:
+            ip_range: IP地址范围
+            allow_sweep: 是否允许扩大到全网段扫描
+            stop: threading.Event (可选)，并发探测已有结果时置位；
+                  置位后不再更新未命中计数和统计，也不再开始全网段扫描
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        if stop is not None and stop.is_set():
+            return False, None
+        candidates = self._candidate_ips()
+        if candidates:
+            started = time.perf_counter()
+            logger.debug(f"单播ARP探测候选IP: {', '.join(candidates)}")
+            devices = self.unicast_arp({ip: self._candidate_mac(ip) for ip in candidates})
+            for ip, mac in devices:
+                if self.is_target_mac(mac):
+                    logger.info(f"通过单播ARP发现目标设备: {ip}")
+                    self._record_tier('unicast', True, started)
+                    self._unicast_misses = 0
+                    return True, ip
+            if stop is not None and stop.is_set():
+                return False, None
+            self._record_tier('unicast', False, started)
+            
+            self._unicast_misses += 1
+            if self._unicast_misses < self.sweep_after_misses:
+                logger.debug(f"单播ARP未命中 ({self._unicast_misses}/{self.sweep_after_misses})，暂不扫描全网段")
+                return False, None
+        
+        if not allow_sweep or (stop is not None and stop.is_set()):
+            return False, None
+        self._unicast_misses = 0
+        return self._sweep_for_target(ip_range, stop)
+    
+    def is_target_online(self, ip_range=None):
+        """
+        检测目标设备是否在线（按探测链依次执行各探测后端，发现目标即停止）
+        
+        Args:
+            ip_range: IP地址范围
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        found, ip, backend = self.probe_chain.run(ip_range)
+        if found:
+            logger.debug(f"探测后端 {backend} 发现目标设备: {ip}")
+            self.remember_ip(ip)
+            return True, ip
         
         logger.debug("所有检测方法均未发现目标设备")
         return False, None
     
+    def _run_blocking(self, func, *args):
+        """
+        在独立线程池中运行阻塞探测
+        
+        使用独立线程池而非默认线程池，被取消的探测不会阻塞 asyncio.run 退出
+        
+        Args:
+            func: 阻塞函数
+            *args: 函数参数
+        
+        Returns:
+            asyncio.Future: 函数结果
+        """
+        if self._probe_executor is None:
+            self._probe_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='probe')
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._probe_executor, functools.partial(func, *args))
+    
+    async def _probe_ping(self):
+        """
+        并发探测之一: ping目标IP，成功后通过邻居表确认MAC
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        if not self.target_ip:
+            return False, None
+        started = time.perf_counter()
+        if not await self._run_blocking(self._ping_host, self.target_ip):
+            self._record_tier('ping', False, started)
+            return False, None
+        
+        # ping成功后内核邻居表已刷新，用它确认IP确实属于目标MAC
+        found, ip = await self._run_blocking(self._check_arp_cache, self.target_mac)
+        found = found and ip == self.target_ip
+        self._record_tier('ping', found, started)
+        if found:
+            logger.info(f"[并发探测] ping+邻居表确认目标在线: {ip}")
+            return True, ip
+        return False, None
+    
+    async def _probe_neighbor(self):
+        """
+        并发探测之二: 查询邻居表，状态不够新时再ping该IP验证
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        started = time.perf_counter()
+        try:
+            table = await self._run_blocking(read_neighbor_table, self.neighbor_backend)
+        except Exception as e:
+            logger.debug(f"读取邻居表失败: {e}")
+            return False, None
+        
+        entry = next((table[mac] for mac in self.target_macs() if mac in table), None)
+        if entry is None or entry[1] in UNUSABLE_STATES:
+            self._record_tier('arp_cache', False, started)
+            return False, None
+        
+        ip, state = entry
+        if state in FRESH_STATES or await self._run_blocking(self._ping_host, ip):
+            logger.info(f"[并发探测] 邻居表确认目标在线: {ip} ({state})")
+            self._record_tier('arp_cache', True, started)
+            return True, ip
+        self._record_tier('arp_cache', False, started)
+        return False, None
+    
+    async def _probe_arp(self, ip_range=None, stop=None):
+        """
+        并发探测之三: 分层ARP探测（先单播探测候选IP，已知目标IP时不扩大到全网段扫描），按MAC匹配
+        
+        Args:
+            ip_range: IP地址范围
+            stop: threading.Event，其他探测先得出结果或超时后置位；
+                  取消协程不会停止线程池中的阻塞探测，需要由它通知
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        found, ip = await self._run_blocking(self._find_by_arp, ip_range, not self.target_ip, stop)
+        if found:
+            logger.info(f"[并发探测] ARP确认目标在线: {ip}")
+        return found, ip
+    
+    async def is_target_online_async(self, ip_range=None, timeout=None):
+        """
+        并发运行ping、邻居表查询和ARP探测，返回第一个经MAC确认的结果
+        
+        总耗时取决于最慢的单个探测，而不是所有探测耗时之和
+        
+        Args:
+            ip_range: IP地址范围
+            timeout: 整体超时秒数 (可选)
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        found, ip = self._check_recent_sighting()
+        if found:
+            return True, ip
+        
+        stop = threading.Event()
+        pending = {
+            asyncio.create_task(self._probe_ping()),
+            asyncio.create_task(self._probe_neighbor()),
+            asyncio.create_task(self._probe_arp(ip_range, stop)),
+        }
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        try:
+            while pending:
+                remaining = max(0, deadline - time.monotonic()) if deadline else None
+                done, pending = await asyncio.wait(pending, timeout=remaining,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    logger.debug("并发探测超时")
+                    break
+                for task in done:
+                    if task.exception() is not None:
+                        logger.debug(f"探测失败: {task.exception()}")
+                        continue
+                    found, ip = task.result()
+                    if found:
+                        self.remember_ip(ip)
+                        return True, ip
+        finally:
+            stop.set()
+            for task in pending:
+                task.cancel()
+        
+        logger.debug("所有并发探测均未发现目标设备")
+        return False, None
+    
+    def is_target_online_concurrent(self, ip_range=None, timeout=None):
+        """
+        is_target_online_async 的同步封装
+        
+        Args:
+            ip_range: IP地址范围
+            timeout: 整体超时秒数 (可选)
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        return asyncio.run(self.is_target_online_async(ip_range, timeout))
+    
     def _get_local_network_range(self):
         """
         获取本地网络地址段
@@ -218,6 +1170,22 @@ class NetworkDetector:
         Returns:
             str: 网络地址段 (例如: "192.168.1.0/24")
         """
+        # 优先使用接口的地址和子网掩码，不依赖外网连通性；没有默认路由的离线网段取第一个可用接口
+        interface = self.network_interface or get_default_interface()
+        if not interface:
+            interfaces = list_interfaces()
+            if interfaces:
+                logger.info(f"自动检测到网络地址段: {interfaces[0].network} ({interfaces[0].name})")
+                return interfaces[0].network
+        if interface:
+            try:
+                _, ip, netmask = get_interface_info(interface)
+                network_range = str(ipaddress.ip_interface(f"{ip}/{netmask}").network)
+                logger.info(f"自动检测到网络地址段: {network_range} ({interface})")
+                return network_range
+            except (OSError, ValueError, ImportError) as e:
+                logger.debug(f"读取接口 {interface} 地址失败: {e}")
+        
         try:
             # 获取本机IP地址
             s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -231,7 +1199,7 @@ class NetworkDetector:
             
             logger.info(f"自动检测到网络地址段: {network_range}")
             return network_range
-            
+        
         except Exception as e:
             logger.warning(f"无法自动检测网络地址段: {e}，使用默认值")
             return "192.168.1.0/24"
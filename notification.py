@@ -3,32 +3,157 @@
 通知模块 - 支持多种消息推送服务
 """
 import logging
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from notification_queue import current_delivery
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+SESSION_OPTIONS = ('pool_size', 'connect_timeout', 'read_timeout', 'http2')
+
+
+def create_session(pool_size=4):
+    """
+    创建带连接池的 requests.Session，同一主机的连接保持长连接复用
+    
+    Args:
+        pool_size: 每个主机保留的最大连接数
+    
+    Returns:
+        requests.Session: 会话实例
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def create_http2_client(pool_size=4, connect_timeout=5, read_timeout=10):
+    """
+    创建支持HTTP/2的 httpx.Client (需要安装 httpx[http2])
+    
+    Args:
+        pool_size: 最大连接数
+        connect_timeout: 连接超时(秒)
+        read_timeout: 读取超时(秒)
+    
+    Returns:
+        httpx.Client: 客户端实例
+    
+    Raises:
+        ImportError: 未安装 httpx 或 h2
+    """
+    import httpx
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    return httpx.Client(http2=True, limits=limits, timeout=timeout)
+
 
 class NotificationService:
-    """通知服务基类"""
+    """通知服务基类，持有一个可复用的HTTP会话"""
+    
+    def __init__(self, pool_size=4, connect_timeout=5, read_timeout=10, http2=False):
+        """
+        初始化HTTP会话参数
+        
+        Args:
+            pool_size: 连接池大小 (不小于通知分发线程数)
+            connect_timeout: 连接超时(秒)
+            read_timeout: 读取超时(秒)
+            http2: 是否使用HTTP/2 (需要安装 httpx[http2]，未安装时回退到HTTP/1.1)
+        """
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http2 = http2
+        self._session = None
+        self._session_lock = threading.Lock()
+    
+    def _get_session(self):
+        """
+        获取HTTP会话（按需创建，之后一直复用）
+        
+        Returns:
+            requests.Session 或 httpx.Client
+        """
+        with self._session_lock:
+            if self._session is None:
+                if self.http2:
+                    try:
+                        self._session = create_http2_client(self.pool_size, self.connect_timeout, self.read_timeout)
+                    except ImportError as e:
+                        logger.warning(f"HTTP/2不可用 ({e})，请安装 httpx[http2]，回退到HTTP/1.1")
+                        self.http2 = False
+                if self._session is None:
+                    self._session = create_session(self.pool_size)
+            return self._session
+    
+    def _post(self, url, data=None, headers=None):
+        """
+        通过复用的会话发送POST请求
+        
+        Args:
+            url: 请求地址
+            data: 表单字典或已编码的请求体
+            headers: 请求头 (可选)
+        
+        Returns:
+            响应对象 (提供 status_code 和 json())
+        """
+        session = self._get_session()
+        if self.http2:
+            if isinstance(data, (str, bytes)):
+                return session.post(url, content=data, headers=headers)
+            return session.post(url, data=data, headers=headers)
+        return session.post(url, data=data, headers=headers,
+                            timeout=(self.connect_timeout, self.read_timeout))
     
     def send(self, title, message):
         """发送通知"""
         raise NotImplementedError
+    
+    def send_batch(self, title, message, batch):
+        """
+        发送合并后的摘要通知（默认只发送标题和内容，支持结构化数据的服务可重写）
+        
+        Args:
+            title: 摘要标题
+            message: 摘要内容
+            batch: 被合并的事件列表 [dict, ...]
+        
+        Returns:
+            bool: 是否发送成功
+        """
+        return self.send(title, message)
+    
+    def close(self):
+        """关闭HTTP会话，释放连接"""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
 
 
 class PushDeerNotification(NotificationService):
     """PushDeer推送服务"""
     
-    def __init__(self, pushkey):
+    def __init__(self, pushkey, **session_options):
         """
         初始化PushDeer服务
         
         Args:
             pushkey: PushDeer推送Key
+            **session_options: HTTP会话参数 (pool_size, connect_timeout, read_timeout, http2)
         """
+        super().__init__(**session_options)
         self.pushkey = pushkey
         self.api_url = "https://api2.pushdeer.com/message/push"
         logger.info("初始化PushDeer通知服务")
@@ -40,7 +165,7 @@ class PushDeerNotification(NotificationService):
         Args:
             title: 通知标题
             message: 通知内容
-            
+        
         Returns:
             bool: 是否发送成功
         """
@@ -52,7 +177,7 @@ class PushDeerNotification(NotificationService):
                 "type": "markdown"
             }
             
-            response = requests.post(self.api_url, data=data, timeout=10)
+            response = self._post(self.api_url, data=data)
             result = response.json()
             
             if result.get("code") == 0:
@@ -61,7 +186,7 @@ class PushDeerNotification(NotificationService):
             else:
                 logger.error(f"PushDeer通知发送失败: {result}")
                 return False
-                
+        
         except Exception as e:
             logger.error(f"发送PushDeer通知时出错: {e}")
             return False
@@ -70,13 +195,15 @@ class PushDeerNotification(NotificationService):
 class WebhookNotification(NotificationService):
     """自定义Webhook推送服务"""
     
-    def __init__(self, webhook_url):
+    def __init__(self, webhook_url, **session_options):
         """
         初始化Webhook服务
         
         Args:
             webhook_url: Webhook URL
+            **session_options: HTTP会话参数 (pool_size, connect_timeout, read_timeout, http2)
         """
+        super().__init__(**session_options)
         self.webhook_url = webhook_url
         logger.info(f"初始化Webhook通知服务: {webhook_url}")
     
@@ -87,23 +214,51 @@ class WebhookNotification(NotificationService):
         Args:
             title: 通知标题
             message: 通知内容
-            
+        
+        Returns:
+            bool: 是否发送成功
+        """
+        return self._send_payload({
+            "title": title,
+            "message": message,
+            "timestamp": int(time.time())
+        })
+    
+    def send_batch(self, title, message, batch):
+        """
+        发送合并后的摘要通知，请求体中附带 batch 数组，接收方一次请求即可处理所有事件
+        
+        Args:
+            title: 摘要标题
+            message: 摘要内容
+            batch: 被合并的事件列表 [dict, ...]
+        
+        Returns:
+            bool: 是否发送成功
+        """
+        return self._send_payload({
+            "title": title,
+            "message": message,
+            "timestamp": int(time.time()),
+            "batch": batch
+        })
+    
+    def _send_payload(self, data):
+        """
+        以JSON格式发送请求体
+        
+        Args:
+            data: 请求体字典
+        
         Returns:
             bool: 是否发送成功
         """
         try:
-            data = {
-                "title": title,
-                "message": message,
-                "timestamp": int(time.time())
-            }
-            
             headers = {"Content-Type": "application/json"}
-            response = requests.post(
+            response = self._post(
                 self.webhook_url, 
                 data=json.dumps(data), 
-                headers=headers,
-                timeout=10
+                headers=headers
             )
             
             if response.status_code == 200:
@@ -112,34 +267,172 @@ class WebhookNotification(NotificationService):
             else:
                 logger.error(f"Webhook通知发送失败: HTTP {response.status_code}")
                 return False
-                
+        
         except Exception as e:
             logger.error(f"发送Webhook通知时出错: {e}")
             return False
 
 
+class CompositeNotification(NotificationService):
+    """组合通知服务: 并行发送到多个渠道"""
+    
+    # 不经过分发队列直接调用时，记录最近多少条通知的已送达渠道，用于重试时只重发失败的渠道
+    MAX_TRACKED = 100
+    
+    def __init__(self, channels, max_workers=None):
+        """
+        初始化组合通知服务
+        
+        Args:
+            channels: {渠道名称: NotificationService}
+            max_workers: 并行发送的线程数 (默认等于渠道数)
+        """
+        super().__init__()
+        if not channels:
+            raise ValueError("组合通知服务至少需要一个渠道")
+        self.channels = dict(channels)
+        self.max_workers = max_workers or len(self.channels)
+        self.last_results = {}
+        self.channel_stats = {name: {'sent': 0, 'failed': 0, 'total_latency': 0.0} for name in self.channels}
+        self._delivered = OrderedDict()
+        self._executor = None
+        self._lock = threading.Lock()
+        logger.info(f"初始化组合通知服务: {', '.join(self.channels)}")
+    
+    def _send_channel(self, name, title, message, batch=None):
+        """
+        发送到单个渠道并计时
+        
+        Returns:
+            tuple: (是否成功, 耗时秒数)
+        """
+        start = time.perf_counter()
+        try:
+            if batch is None:
+                success = bool(self.channels[name].send(title, message))
+            else:
+                success = bool(self.channels[name].send_batch(title, message, batch))
+        except Exception as e:
+            logger.error(f"[{name}] 通知发送出错: {e}")
+            success = False
+        return success, time.perf_counter() - start
+    
+    def send(self, title, message):
+        """
+        并行发送到所有渠道，总耗时取决于最慢的渠道而不是各渠道耗时之和
+        
+        同一条通知重试时只发送到之前失败的渠道: 经分发队列发送时按队列中的通知识别，
+        直接调用时按标题和内容识别
+        
+        Args:
+            title: 通知标题
+            message: 通知内容
+        
+        Returns:
+            bool: 是否所有渠道都发送成功
+        """
+        return self._fan_out(title, message)
+    
+    def send_batch(self, title, message, batch):
+        """
+        并行发送合并后的摘要通知到所有渠道
+        
+        Args:
+            title: 摘要标题
+            message: 摘要内容
+            batch: 被合并的事件列表 [dict, ...]
+        
+        Returns:
+            bool: 是否所有渠道都发送成功
+        """
+        return self._fan_out(title, message, batch)
+    
+    def _fan_out(self, title, message, batch=None):
+        """
+        并行发送，记录每个渠道的结果
+        
+        Returns:
+            bool: 是否所有渠道都发送成功
+        """
+        # 分发队列为每条通知单独记录已送达的渠道，通知结束后随之丢弃
+        delivered = current_delivery()
+        key = None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='fanout')
+            if delivered is None and batch is None:
+                key = (title, message)
+                delivered = self._delivered.setdefault(key, set())
+                self._delivered.move_to_end(key)
+                while len(self._delivered) > self.MAX_TRACKED:
+                    self._delivered.popitem(last=False)
+            elif delivered is None:
+                delivered = set()
+        
+        pending = [name for name in self.channels if name not in delivered]
+        futures = {name: self._executor.submit(self._send_channel, name, title, message, batch)
+                   for name in pending}
+        
+        results = {}
+        for name, future in futures.items():
+            success, latency = future.result()
+            results[name] = {'success': success, 'latency': latency}
+            logger.info(f"[{name}] 通知{'发送成功' if success else '发送失败'}，耗时 {latency * 1000:.0f}ms")
+        
+        with self._lock:
+            for name, result in results.items():
+                stats = self.channel_stats[name]
+                stats['sent' if result['success'] else 'failed'] += 1
+                stats['total_latency'] += result['latency']
+                if result['success']:
+                    delivered.add(name)
+            self.last_results = results
+            if len(delivered) == len(self.channels):
+                if key is not None:
+                    self._delivered.pop(key, None)
+                return True
+        return False
+    
+    def close(self):
+        """关闭所有渠道和发送线程"""
+        for service in self.channels.values():
+            service.close()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
 def create_notification_service(service_type, **kwargs):
     """
     创建通知服务实例
     
     Args:
-        service_type: 服务类型 ("pushdeer" 或 "webhook")
-        **kwargs: 服务相关参数
-        
+        service_type: 服务类型 ("pushdeer"、"webhook" 或 "composite")
+        **kwargs: 服务相关参数，以及HTTP会话参数 (pool_size, connect_timeout, read_timeout, http2)
+    
     Returns:
         NotificationService: 通知服务实例
     """
+    session_options = {key: kwargs[key] for key in SESSION_OPTIONS if key in kwargs}
+    
     if service_type.lower() == "pushdeer":
         pushkey = kwargs.get("pushdeer_key")
         if not pushkey:
             raise ValueError("PushDeer服务需要提供pushdeer_key")
-        return PushDeerNotification(pushkey)
+        return PushDeerNotification(pushkey, **session_options)
     
     elif service_type.lower() == "webhook":
         webhook_url = kwargs.get("webhook_url")
         if not webhook_url:
             raise ValueError("Webhook服务需要提供webhook_url")
-        return WebhookNotification(webhook_url)
+        return WebhookNotification(webhook_url, **session_options)
+    
+    elif service_type.lower() == "composite":
+        channels = kwargs.get("channels")
+        if not channels:
+            raise ValueError("组合通知服务需要提供channels")
+        return CompositeNotification(channels, kwargs.get("max_workers"))
     
     else:
         raise ValueError(f"不支持的通知服务类型: {service_type}")
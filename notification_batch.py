@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+通知合并模块 - 将时间窗口内的状态变化合并为每个渠道一条摘要通知
+"""
+import logging
+import threading
+from collections import namedtuple, OrderedDict
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# kind: 'arrival' 或 'departure'
+NotificationEvent = namedtuple('NotificationEvent', ['subject', 'kind', 'title', 'message', 'ip', 'mac', 'timestamp'])
+
+KIND_NAMES = {'arrival': '到达', 'departure': '离开'}
+
+
+def event_to_dict(event):
+    """
+    将事件转换为webhook batch数组中的一项
+    
+    Args:
+        event: NotificationEvent 实例
+    
+    Returns:
+        dict: 事件字典
+    """
+    return {
+        'subject': event.subject,
+        'kind': event.kind,
+        'title': event.title,
+        'ip': event.ip,
+        'mac': event.mac,
+        'timestamp': int(event.timestamp),
+    }
+
+
+def build_digest(events):
+    """
+    将一组事件合并为一条摘要，每个目标以最后一个事件作为最终状态
+    
+    Args:
+        events: 按时间排序的 NotificationEvent 列表
+    
+    Returns:
+        tuple: (标题, 内容, batch列表)
+    """
+    history = OrderedDict()
+    for event in events:
+        history.setdefault(event.subject, []).append(event)
+    batch = [event_to_dict(event) for event in events]
+    
+    if len(events) == 1:
+        return events[0].title, events[0].message, batch
+    
+    finals = [subject_events[-1] for subject_events in history.values()]
+    if len(finals) == 1:
+        title = finals[0].title
+    else:
+        title = f"📋 {len(finals)}个目标状态变化"
+    
+    lines = []
+    for subject, subject_events in history.items():
+        changes = ' → '.join(KIND_NAMES.get(event.kind, event.kind) for event in subject_events)
+        final = KIND_NAMES.get(subject_events[-1].kind, subject_events[-1].kind)
+        lines.append(f"- {subject}: {changes}（最终: {final}）")
+    summary = "**状态变化汇总:**\n" + "\n".join(lines)
+    message = "\n\n".join([summary] + [event.message for event in finals])
+    return title, message, batch
+
+
+class NotificationCoalescer:
+    """按渠道合并通知: 每个渠道的第一条通知开启一个时间窗口，窗口结束时发送一条摘要"""
+    
+    def __init__(self, dispatcher, window=10):
+        """
+        初始化通知合并器
+        
+        Args:
+            dispatcher: NotificationDispatcher 实例
+            window: 合并窗口(秒)
+        """
+        self.dispatcher = dispatcher
+        self.window = window
+        self._batches = {}
+        self._lock = threading.Lock()
+    
+    def add(self, service, event, on_success=None):
+        """
+        添加一个事件，窗口结束后与同一渠道的其他事件一起发送
+        
+        Args:
+            service: NotificationService 实例 (即渠道)
+            event: NotificationEvent 实例
+            on_success: 摘要发送成功后调用的回调 (可选)
+        """
+        key = id(service)
+        with self._lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                timer = threading.Timer(self.window, self._flush_key, [key])
+                timer.daemon = True
+                batch = self._batches[key] = {'service': service, 'events': [], 'callbacks': [], 'timer': timer}
+                timer.start()
+            batch['events'].append(event)
+            if on_success is not None:
+                batch['callbacks'].append(on_success)
+        logger.debug(f"通知已加入合并窗口: {event.subject} {event.kind}")
+    
+    def _flush_key(self, key):
+        """
+        发送某个渠道窗口内的所有事件
+        
+        Args:
+            key: 渠道键
+        """
+        with self._lock:
+            batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch['timer'].cancel()
+        
+        events = batch['events']
+        callbacks = batch['callbacks']
+        title, message, items = build_digest(events)
+        subjects = ', '.join(OrderedDict.fromkeys(event.subject for event in events))
+        if len(events) > 1:
+            logger.info(f"合并 {len(events)} 条通知为一条摘要: {subjects}")
+        
+        def on_success():
+            for callback in callbacks:
+                callback()
+        
+        self.dispatcher.submit(batch['service'], title, message, label=subjects,
+                               on_success=on_success, batch=items)
+    
+    def flush_all(self):
+        """立即发送所有窗口中的事件（退出前调用）"""
+        with self._lock:
+            keys = list(self._batches)
+        for key in keys:
+            self._flush_key(key)
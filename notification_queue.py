@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+通知分发队列 - 在后台线程池中发送通知，失败时指数退避重试，最终失败写入死信文件
+"""
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+
+from metrics import REGISTRY
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SEND_SECONDS = REGISTRY.histogram('boss_detect_notification_send_seconds', '单次通知发送耗时(秒)', ('channel', 'result'))
+SEND_FAILURES = REGISTRY.counter('boss_detect_notification_failures_total', '通知发送失败次数(含重试)', ('channel',))
+DEAD_LETTERS = REGISTRY.counter('boss_detect_notification_dead_letters_total', '写入死信文件的通知数')
+
+NotificationJob = namedtuple('NotificationJob', ['service', 'title', 'message', 'label', 'on_success', 'created',
+                                                 'batch'])
+
+_STOP = object()
+
+# 发送线程当前处理的通知的已送达渠道
+_delivery = threading.local()
+
+
+def channel_name(service):
+    """
+    由通知服务类名得到指标标签 (PushDeerNotification -> pushdeer)
+    
+    Args:
+        service: NotificationService 实例
+    
+    Returns:
+        str: 渠道名称
+    """
+    name = type(service).__name__
+    if name.endswith('Notification') and name != 'Notification':
+        name = name[:-len('Notification')]
+    return name.lower()
+
+
+def current_delivery():
+    """
+    发送线程当前处理的通知的已送达记录
+    
+    分发队列发送一条通知 (含所有重试) 期间有效，组合通知服务用它记录已成功的渠道，
+    重试时只发送之前失败的渠道；通知发送成功或写入死信后随之丢弃
+    
+    Returns:
+        set: 已送达的渠道名称，不在分发队列的发送线程中时返回None
+    """
+    return getattr(_delivery, 'channels', None)
+
+
+def read_dead_letters(path):
+    """
+    读取死信文件
+    
+    Args:
+        path: 死信文件路径 (每行一个JSON对象)
+    
+    Returns:
+        list: 死信记录列表，文件不存在时为空
+    """
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+class NotificationDispatcher:
+    """有界通知队列 + 后台发送线程池"""
+    
+    def __init__(self, workers=2, queue_size=100, max_retries=3, retry_backoff=2.0,
+                 retry_max_delay=60.0, dead_letter_file='data/notifications.dead.jsonl'):
+        """
+        初始化通知分发器
+        
+        Args:
+            workers: 后台发送线程数
+            queue_size: 队列容量，队列满时新通知直接写入死信文件
+            max_retries: 首次发送失败后的最大重试次数
+            retry_backoff: 第一次重试前的等待秒数，之后每次翻倍
+            retry_max_delay: 单次重试等待的上限(秒)
+            dead_letter_file: 死信文件路径 (为空则只记录日志)
+        """
+        self.workers = max(1, workers)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        self.retry_max_delay = retry_max_delay
+        self.dead_letter_file = dead_letter_file
+        self.sent = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stopping = threading.Event()
+        self._dead_letter_lock = threading.Lock()
+        self._threads = []
+    
+    def start(self):
+        """启动后台发送线程（submit 时会自动调用）"""
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'notify-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"通知分发队列已启动: {self.workers} 个线程, 容量 {self._queue.maxsize}")
+    
+    def submit(self, service, title, message, label='', on_success=None, batch=None):
+        """
+        将通知放入队列，立即返回
+        
+        Args:
+            service: NotificationService 实例
+            title: 通知标题
+            message: 通知内容
+            label: 日志和死信中使用的名称 (例如目标名称)
+            on_success: 发送成功后在发送线程中调用的回调 (可选)
+            batch: 合并通知包含的事件列表 (可选，通过 service.send_batch 发送)
+        
+        Returns:
+            bool: 是否成功入队
+        """
+        job = NotificationJob(service, title, message, label, on_success, time.time(), batch)
+        if self._stopping.is_set():
+            self._dead_letter(job, 0, "通知分发器已停止")
+            return False
+        
+        self.start()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            logger.error(f"通知队列已满，通知写入死信文件: {title}")
+            self._dead_letter(job, 0, "通知队列已满")
+            return False
+        return True
+    
+    def retry_delay(self, attempt):
+        """
+        计算第 attempt 次重试前的等待时间
+        
+        Args:
+            attempt: 重试序号 (从1开始)
+        
+        Returns:
+            float: 等待秒数
+        """
+        return min(self.retry_max_delay, self.retry_backoff * (2 ** (attempt - 1)))
+    
+    def _worker(self):
+        """发送线程: 依次取出通知发送"""
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _STOP:
+                    return
+                _delivery.channels = set()
+                self._deliver(job)
+            except Exception as e:
+                logger.error(f"通知发送线程出错: {e}", exc_info=True)
+            finally:
+                _delivery.channels = None
+                self._queue.task_done()
+    
+    def _deliver(self, job):
+        """
+        发送单条通知，失败时按指数退避重试
+        
+        Args:
+            job: NotificationJob 实例
+        """
+        prefix = f"[{job.label}] " if job.label else ""
+        channel = channel_name(job.service)
+        attempts = 0
+        error = None
+        while True:
+            attempts += 1
+            started = time.perf_counter()
+            try:
+                if job.batch is None:
+                    success = job.service.send(job.title, job.message)
+                else:
+                    success = job.service.send_batch(job.title, job.message, job.batch)
+                error = None if success else "发送失败"
+            except Exception as e:
+                success = False
+                error = str(e)
+            SEND_SECONDS.labels(channel, 'success' if success else 'failure').observe(time.perf_counter() - started)
+            
+            if success:
+                self.sent += 1
+                logger.info(f"{prefix}通知发送成功 (第{attempts}次尝试)")
+                if job.on_success is not None:
+                    job.on_success()
+                return
+            
+            SEND_FAILURES.labels(channel).inc()
+            if attempts > self.max_retries:
+                break
+            delay = self.retry_delay(attempts)
+            logger.warning(f"{prefix}通知发送失败，{delay:g}秒后重试 ({attempts}/{self.max_retries})")
+            # 停止时不再等待，直接写入死信
+            if self._stopping.wait(delay):
+                break
+        
+        self.failed += 1
+        logger.error(f"{prefix}通知发送失败，已尝试{attempts}次: {job.title}")
+        self._dead_letter(job, attempts, error)
+    
+    def _dead_letter(self, job, attempts, error):
+        """
+        将无法发送的通知追加到死信文件
+        
+        Args:
+            job: NotificationJob 实例
+            attempts: 已尝试次数
+            error: 最后一次的错误信息
+        """
+        DEAD_LETTERS.inc()
+        if not self.dead_letter_file:
+            return
+        record = {
+            'time': int(time.time()),
+            'created': int(job.created),
+            'service': type(job.service).__name__,
+            'label': job.label,
+            'title': job.title,
+            'message': job.message,
+            'batch': job.batch,
+            'attempts': attempts,
+            'error': error,
+        }
+        try:
+            with self._dead_letter_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_file)), exist_ok=True)
+                with open(self.dead_letter_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"写入死信文件失败: {e}")
+    
+    def join(self):
+        """等待队列中的通知全部处理完毕"""
+        self._queue.join()
+    
+    def stop(self, timeout=10):
+        """
+        停止分发器：已入队的通知会继续发送，正在退避等待的通知直接写入死信
+        
+        Args:
+            timeout: 等待每个线程退出的最长时间(秒)
+        """
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+被动在线检测模块 - 监听ARP/DHCP/mDNS报文判断设备在线状态
+"""
+import time
+import queue
+import logging
+import threading
+from types import SimpleNamespace
+from collections import namedtuple
+
+from network_detector import normalize_mac
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 在线状态变化事件: kind 为 'arrive' 或 'depart'
+PresenceEvent = namedtuple('PresenceEvent', ['kind', 'mac', 'ip', 'timestamp'])
+
+DHCP_PORTS = (67, 68)
+MDNS_PORT = 5353
+
+# mDNS 应答中带主机名的记录类型: A、AAAA
+MDNS_HOST_TYPES = (1, 28)
+
+_scapy = None
+
+
+def load_scapy():
+    """
+    按需加载被动监听所需的scapy协议层
+    
+    Returns:
+        SimpleNamespace: 包含 ARP, Ether, IP, BOOTP, DHCP, DNS, AsyncSniffer, PcapReader
+    """
+    global _scapy
+    if _scapy is None:
+        from scapy.layers.l2 import ARP, Ether
+        from scapy.layers.inet import IP
+        from scapy.layers.dhcp import BOOTP, DHCP
+        from scapy.layers.dns import DNS
+        from scapy.sendrecv import AsyncSniffer
+        from scapy.utils import PcapReader
+        _scapy = SimpleNamespace(ARP=ARP, Ether=Ether, IP=IP, BOOTP=BOOTP, DHCP=DHCP, DNS=DNS,
+                                 AsyncSniffer=AsyncSniffer, PcapReader=PcapReader)
+    return _scapy
+
+
+def build_bpf_filter(macs):
+    """
+    构建只捕获已知MAC发出的ARP/DHCP/mDNS报文的BPF过滤器
+    
+    Args:
+        macs: 目标MAC地址列表 (为空时捕获所有来源的报文)
+    
+    Returns:
+        str: BPF过滤表达式
+    """
+    ports = " or ".join(f"port {port}" for port in DHCP_PORTS + (MDNS_PORT,))
+    protocols = f"arp or (udp and ({ports}))"
+    sources = " or ".join(f"ether src {normalize_mac(mac)}" for mac in sorted(macs))
+    if not sources:
+        return protocols
+    return f"({protocols}) and ({sources})"
+
+
+class PassivePresenceEngine:
+    """被动在线检测引擎"""
+    
+    def __init__(self, macs, confirm_departure=None, departure_timeout=300, network_interface=None,
+                 fingerprints=None, device_table=None):
+        """
+        初始化被动检测引擎
+        
+        Args:
+            macs: 需要跟踪的MAC地址列表
+            confirm_departure: 离线确认回调 (mac, last_ip) -> bool，返回True表示设备仍在线
+            departure_timeout: 设备静默多少秒后触发离线确认
+            network_interface: 监听的网络接口 (可选)
+            fingerprints: FingerprintIndex (可选)，配置后监听所有来源的报文，
+                          从DHCP/mDNS报文中学习随机MAC，关联到目标的MAC按目标MAC处理
+            device_table: DeviceTable (可选)，收到跟踪设备带IP的报文时记录到设备清单，
+                          探测链的 sighting 后端据此判定目标最近出现过
+        """
+        self.macs = {normalize_mac(mac) for mac in macs}
+        self.confirm_departure = confirm_departure
+        self.departure_timeout = departure_timeout
+        self.network_interface = network_interface
+        self.fingerprints = fingerprints
+        self.device_table = device_table
+        
+        self.last_seen = {}   # mac -> 最后一次收到报文的时间
+        self.last_ip = {}     # mac -> 最后一次看到的IP
+        self.present = set()  # 当前在线的MAC
+        self.events = queue.Queue()
+        
+        self._lock = threading.Lock()
+        self._sniffer = None
+        logger.info(f"初始化被动检测引擎 - 跟踪 {len(self.macs)} 个MAC，离线超时: {departure_timeout}秒")
+    
+    def start(self):
+        """启动后台抓包"""
+        # 随机MAC事先未知，不能按来源MAC过滤
+        bpf_filter = build_bpf_filter(() if self.fingerprints else self.macs)
+        logger.info(f"启动被动监听: {bpf_filter}")
+        self._sniffer = load_scapy().AsyncSniffer(
+            iface=self.network_interface,
+            filter=bpf_filter,
+            prn=self.handle_packet,
+            store=False
+        )
+        self._sniffer.start()
+    
+    def stop(self):
+        """停止后台抓包"""
+        if self._sniffer is not None:
+            try:
+                self._sniffer.stop()
+            except Exception as e:
+                logger.debug(f"停止抓包失败: {e}")
+            self._sniffer = None
+    
+    def replay(self, pcap_file):
+        """
+        回放pcap文件（用于测试），报文时间戳作为检测时间
+        
+        Args:
+            pcap_file: pcap文件路径
+        
+        Returns:
+            int: 处理的报文数量
+        """
+        count = 0
+        with load_scapy().PcapReader(pcap_file) as reader:
+            for packet in reader:
+                self.handle_packet(packet, timestamp=float(packet.time))
+                count += 1
+        logger.info(f"回放完成: {pcap_file}，共 {count} 个报文")
+        return count
+    
+    def _extract_source(self, packet):
+        """
+        从报文中提取源MAC和IP
+        
+        Args:
+            packet: scapy报文
+        
+        Returns:
+            tuple: (mac, ip)，无法识别时返回 (None, None)
+        """
+        scapy = load_scapy()
+        if scapy.ARP in packet:
+            arp = packet[scapy.ARP]
+            ip = arp.psrc if arp.psrc and arp.psrc != '0.0.0.0' else None
+            return normalize_mac(arp.hwsrc), ip
+        
+        if scapy.Ether not in packet:
+            return None, None
+        mac = normalize_mac(packet[scapy.Ether].src)
+        
+        ip = None
+        if scapy.DHCP in packet:
+            for option in packet[scapy.DHCP].options:
+                if isinstance(option, tuple) and option[0] == 'requested_addr':
+                    ip = option[1]
+                    break
+            if ip is None and scapy.BOOTP in packet and packet[scapy.BOOTP].ciaddr != '0.0.0.0':
+                ip = packet[scapy.BOOTP].ciaddr
+        elif scapy.IP in packet and packet[scapy.IP].src != '0.0.0.0':
+            ip = packet[scapy.IP].src
+        
+        return mac, ip
+    
+    def _extract_fingerprint(self, packet):
+        """
+        从DHCP请求中提取主机名 (选项12) 和厂商类别 (选项60)，从mDNS应答中提取主机名
+        
+        Args:
+            packet: scapy报文
+        
+        Returns:
+            tuple: (主机名, mDNS名称, 厂商类别)，没有的项为None
+        """
+        scapy = load_scapy()
+        hostname = mdns_name = vendor_class = None
+        if scapy.DHCP in packet:
+            for option in packet[scapy.DHCP].options:
+                if not isinstance(option, tuple):
+                    continue
+                if option[0] == 'hostname':
+                    hostname = option[1]
+                elif option[0] == 'vendor_class_id':
+                    vendor_class = option[1]
+        elif scapy.DNS in packet and packet[scapy.DNS].qr:
+            for record in packet[scapy.DNS].an or ():
+                if getattr(record, 'type', None) in MDNS_HOST_TYPES:
+                    mdns_name = record.rrname
+                    break
+        return hostname, mdns_name, vendor_class
+    
+    def handle_packet(self, packet, timestamp=None):
+        """
+        处理一个捕获的报文
+        
+        Args:
+            packet: scapy报文
+            timestamp: 报文时间 (默认当前时间)
+        """
+        source, ip = self._extract_source(packet)
+        if source is None:
+            return
+        mac = source
+        if self.fingerprints is not None:
+            names = self._extract_fingerprint(packet)
+            if any(names):
+                self.fingerprints.observe(source, *names)
+            mac = self.fingerprints.match(source) or source
+        if mac not in self.macs:
+            return
+        
+        now = timestamp if timestamp is not None else time.time()
+        # 设备清单按实际发出报文的MAC记录，随机MAC通过指纹关联到目标
+        if ip and self.device_table is not None:
+            self.device_table.observe(ip, source, now)
+        with self._lock:
+            self.last_seen[mac] = now
+            if ip:
+                self.last_ip[mac] = ip
+            if mac in self.present:
+                return
+            self.present.add(mac)
+        
+        logger.info(f"被动监听发现设备上线: MAC={mac}, IP={ip}")
+        self.events.put(PresenceEvent('arrive', mac, self.last_ip.get(mac), now))
+    
+    def check_departures(self, now=None):
+        """
+        检查静默超时的设备，通过主动探测确认是否离线
+        
+        Args:
+            now: 当前时间 (默认当前时间)
+        
+        Returns:
+            list: 本次确认离线的MAC列表
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            silent = [mac for mac in self.present
+                      if now - self.last_seen[mac] > self.departure_timeout]
+        
+        departed = []
+        for mac in silent:
+            ip = self.last_ip.get(mac)
+            if self.confirm_departure is not None and self.confirm_departure(mac, ip):
+                logger.debug(f"设备静默但主动探测仍在线: {mac}")
+                with self._lock:
+                    self.last_seen[mac] = now
+                continue
+            
+            with self._lock:
+                self.present.discard(mac)
+            logger.info(f"设备已离线: MAC={mac}, 最后IP={ip}")
+            self.events.put(PresenceEvent('depart', mac, ip, now))
+            departed.append(mac)
+        
+        return departed
+    
+    def wait_event(self, timeout=None):
+        """
+        等待下一个在线状态变化事件
+        
+        Args:
+            timeout: 最长等待秒数
+        
+        Returns:
+            PresenceEvent: 事件，超时返回None
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
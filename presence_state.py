@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+在线状态机 - 带迟滞的到达/离开判定
+
+状态: absent(离线) -> pending(待确认到达) -> present(在线) -> leaving(待确认离开) -> absent
+到达和离开使用各自的确认次数，离开还需要超过宽限时间，避免手机省电模式下偶尔漏检造成误报
+
+所有状态转换都是纯函数，状态为不可变的namedtuple，可以低成本地批量处理大量目标
+"""
+from collections import namedtuple
+
+ABSENT = 'absent'
+PENDING = 'pending'
+PRESENT = 'present'
+LEAVING = 'leaving'
+
+# hits: 待确认到达时连续检测到的次数; misses: 待确认离开时连续漏检的次数; last_seen: 最后一次检测到的时间
+PresenceState = namedtuple('PresenceState', ['status', 'hits', 'misses', 'last_seen'])
+
+# arrive_after: 连续检测到多少次确认到达; leave_after: 连续漏检多少次确认离开;
+# grace_period: 最后一次检测到之后至少经过多少秒才确认离开
+PresencePolicy = namedtuple('PresencePolicy', ['arrive_after', 'leave_after', 'grace_period'])
+
+INITIAL_STATE = PresenceState(ABSENT, 0, 0, None)
+
+
+def is_online(state):
+    """
+    判断状态是否视为在线 (待确认离开期间仍视为在线)
+    
+    Args:
+        state: PresenceState 实例
+    
+    Returns:
+        bool: 是否在线
+    """
+    return state.status in (PRESENT, LEAVING)
+
+
+def transition(state, seen, now, policy):
+    """
+    根据一次检测结果计算下一个状态
+    
+    Args:
+        state: 当前 PresenceState
+        seen: 本轮是否检测到目标
+        now: 当前时间戳(秒)
+        policy: PresencePolicy
+    
+    Returns:
+        tuple: (新的 PresenceState, 事件) - 事件为 'arrival'、'departure' 或 None
+    """
+    status = state.status
+    
+    if seen:
+        if status in (PRESENT, LEAVING):
+            return PresenceState(PRESENT, 0, 0, now), None
+        hits = state.hits + 1
+        if hits >= policy.arrive_after:
+            return PresenceState(PRESENT, 0, 0, now), 'arrival'
+        return PresenceState(PENDING, hits, 0, now), None
+    
+    if status in (ABSENT, PENDING):
+        return PresenceState(ABSENT, 0, 0, state.last_seen), None
+    
+    misses = state.misses + 1
+    last_seen = state.last_seen if state.last_seen is not None else now
+    if misses >= policy.leave_after and now - last_seen >= policy.grace_period:
+        return PresenceState(ABSENT, 0, 0, last_seen), 'departure'
+    return PresenceState(LEAVING, 0, misses, last_seen), None
+
+
+def advance(states, seen, now, policy):
+    """
+    批量推进多个目标的状态
+    
+    Args:
+        states: {key: PresenceState}，不存在的key视为 INITIAL_STATE
+        seen: 本轮检测到的key集合
+        now: 当前时间戳(秒)
+        policy: PresencePolicy
+    
+    Returns:
+        tuple: (新的状态字典, 事件列表 [(key, 事件), ...])
+    """
+    new_states = {}
+    events = []
+    for key in states.keys() | set(seen):
+        state, event = transition(states.get(key, INITIAL_STATE), key in seen, now, policy)
+        new_states[key] = state
+        if event is not None:
+            events.append((key, event))
+    return new_states, events
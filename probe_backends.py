@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""
+探测后端模块 - 可插拔的在线检测方法，按配置组成探测链，从便宜到昂贵依次执行，发现目标即停止
+"""
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 已注册的后端 {名称: 类}
+BACKENDS = {}
+
+
+def register_backend(cls):
+    """
+    注册探测后端 (类装饰器)
+    
+    Args:
+        cls: ProbeBackend 子类，必须定义 name
+    
+    Returns:
+        cls 本身
+    """
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} 未定义 name")
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def default_chain():
+    """
+    默认探测链: 所有默认启用的后端按声明的开销从低到高排序
+    
+    Returns:
+        list: 后端名称列表
+    """
+    backends = [cls for cls in BACKENDS.values() if cls.default]
+    return [cls.name for cls in sorted(backends, key=lambda cls: (cls.cost, cls.latency))]
+
+
+class ProbeBackend:
+    """
+    探测后端基类
+    
+    子类声明 name、cost (相对开销，大致为每轮发出的报文数)、latency (典型耗时，秒)，并实现 probe()
+    """
+    
+    name = None
+    cost = 0
+    latency = 0.0
+    # 未配置 probe_chain 时是否加入默认探测链
+    default = True
+    # 为True时未命中即可确定目标离线，不再执行后续后端 (后端出错时仍继续)
+    authoritative = False
+    
+    def __init__(self, detector):
+        """
+        Args:
+            detector: 所属的 NetworkDetector (提供目标MAC/IP、设备清单和底层探测方法)
+        """
+        self.detector = detector
+    
+    def ready(self):
+        """
+        本轮是否需要执行 (例如未配置目标IP时跳过ping)，跳过的后端不计入统计
+        
+        Returns:
+            bool
+        """
+        return True
+    
+    def probe(self, ip_range=None):
+        """
+        执行探测
+        
+        Args:
+            ip_range: IP地址范围
+        
+        Returns:
+            tuple: (bool, str) - (是否在线, IP地址)
+        """
+        raise NotImplementedError
+    
+    def close(self):
+        """释放后端持有的资源"""
+    
+    def __repr__(self):
+        return f"{type(self).__name__}(cost={self.cost}, latency={self.latency:g}s)"
+
+
+@register_backend
+class SightingBackend(ProbeBackend):
+    """被动发现: 设备清单中目标在 sighting_ttl 秒内出现过 (来自扫描或被动监听)"""
+    
+    name = 'sighting'
+    cost = 0
+    latency = 0.0001
+    
+    def __init__(self, detector, sniff=False):
+        """
+        Args:
+            detector: 所属的 NetworkDetector
+            sniff: 是否在后台监听目标发出的ARP/DHCP/mDNS报文并记录到设备清单 (主动模式使用，
+                   被动模式下由被动检测引擎记录)
+        """
+        super().__init__(detector)
+        self.sniff = sniff
+        self._engine = None
+    
+    def ready(self):
+        return bool(self.detector.sighting_ttl and self.detector.target_mac)
+    
+    def _start_sniffer(self):
+        """首次探测时启动后台抓包，无法抓包 (未安装scapy、没有权限) 时只使用扫描结果"""
+        from presence_sniffer import PassivePresenceEngine
+        
+        detector = self.detector
+        engine = PassivePresenceEngine([detector.target_mac], network_interface=detector.network_interface,
+                                       fingerprints=detector.fingerprints or None,
+                                       device_table=detector.device_table)
+        try:
+            engine.start()
+        except Exception as e:
+            logger.warning(f"sighting 后端无法启动被动监听，只使用扫描结果: {e}")
+            self.sniff = False
+            return
+        self._engine = engine
+    
+    def probe(self, ip_range=None):
+        if self.sniff and self._engine is None:
+            self._start_sniffer()
+        found, ip = self.detector.find_recent_sighting(self.detector.sighting_ttl)
+        if found:
+            logger.info(f"设备清单中目标最近出现过: {ip}")
+        return found, ip
+    
+    def close(self):
+        if self._engine is not None:
+            self._engine.stop()
+            self._engine = None
+
+
+@register_backend
+class PingBackend(ProbeBackend):
+    """ICMP: ping已知的目标IP，再通过邻居表或单播ARP确认MAC"""
+    
+    name = 'ping'
+    cost = 1
+    latency = 0.05
+    
+    def ready(self):
+        return bool(self.detector.target_ip)
+    
+    def probe(self, ip_range=None):
+        detector = self.detector
+        logger.debug(f"尝试ping目标IP: {detector.target_ip}")
+        if not detector._ping_host(detector.target_ip):
+            return False, None
+        
+        logger.info(f"通过ping发现目标设备在线: {detector.target_ip}")
+        # ping成功后，验证MAC地址（通过ARP缓存或新的ARP请求）
+        found, ip = detector._check_arp_cache(detector.target_mac)
+        if found and ip == detector.target_ip:
+            return True, ip
+        if detector.probe_mac(detector.target_mac, detector.target_ip):
+            logger.info(f"Ping+ARP验证成功: {detector.target_ip}")
+            return True, detector.target_ip
+        return False, None
+
+
+@register_backend
+class NeighborBackend(ProbeBackend):
+    """邻居表: 查询系统ARP缓存（适用于已连接但不活跃的设备），找到后ping验证"""
+    
+    name = 'arp_cache'
+    cost = 2
+    latency = 0.05
+    
+    def probe(self, ip_range=None):
+        detector = self.detector
+        logger.debug("检查ARP缓存...")
+        found, ip = detector._check_arp_cache(detector.target_mac)
+        if not found:
+            return False, None
+        if detector._ping_host(ip):
+            logger.info(f"通过ARP缓存+ping验证设备在线: {ip}")
+            return True, ip
+        logger.debug("ARP缓存中找到设备但ping失败，可能已离线")
+        return False, None
+
+
+@register_backend
+class ArpBackend(ProbeBackend):
+    """ARP: 先单播探测候选IP，连续未命中 sweep_after_misses 轮后扫描全网段"""
+    
+    name = 'arp'
+    cost = 256
+    latency = 3.0
+    
+    def probe(self, ip_range=None):
+        return self.detector._find_by_arp(ip_range)
+
+
+class ProbeChain:
+    """按顺序执行的探测链"""
+    
+    def __init__(self, backends, on_result=None):
+        """
+        Args:
+            backends: ProbeBackend 实例列表，按执行顺序排列
+            on_result: 每个后端执行后的回调 (name, found, started)，用于记录各后端耗时
+        """
+        self.backends = list(backends)
+        self.on_result = on_result
+    
+    @classmethod
+    def build(cls, detector, names=None, options=None, on_result=None):
+        """
+        按名称创建探测链
+        
+        Args:
+            detector: NetworkDetector
+            names: 后端名称列表，默认为 default_chain()
+            options: 各后端的构造参数 {名称: {参数: 值}}
+            on_result: 见 __init__
+        
+        Returns:
+            ProbeChain
+        """
+        names = list(names) if names else default_chain()
+        unknown = [name for name in names if name not in BACKENDS]
+        if unknown:
+            raise ValueError(f"未知的探测后端: {', '.join(unknown)} (可用: {', '.join(BACKENDS)})")
+        options = options or {}
+        backends = [BACKENDS[name](detector, **options.get(name, {})) for name in dict.fromkeys(names)]
+        return cls(backends, on_result)
+    
+    @property
+    def names(self):
+        return [backend.name for backend in self.backends]
+    
+    def get(self, name):
+        """
+        按名称获取探测链中的后端
+        
+        Returns:
+            ProbeBackend: 不在探测链中时为None
+        """
+        for backend in self.backends:
+            if backend.name == name:
+                return backend
+        return None
+    
+    def run(self, ip_range=None):
+        """
+        依次执行各后端，发现目标即停止
+        
+        Args:
+            ip_range: IP地址范围
+        
+        Returns:
+            tuple: (bool, str, str) - (是否在线, IP地址, 命中的后端名称)
+        """
+        for backend in self.backends:
+            if not backend.ready():
+                continue
+            started = time.perf_counter()
+            failed = False
+            try:
+                found, ip = backend.probe(ip_range)
+            except Exception as e:
+                logger.warning(f"探测后端 {backend.name} 失败: {e}")
+                found, ip, failed = False, None, True
+            if self.on_result is not None:
+                self.on_result(backend.name, found, started)
+            if found:
+                return True, ip, backend.name
+            if backend.authoritative and not failed:
+                logger.debug(f"探测后端 {backend.name} 确认目标不在线")
+                break
+        return False, None, None
+    
+    def close(self):
+        """关闭所有后端"""
+        for backend in self.backends:
+            backend.close()
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+原始套接字探测模块 - 复用长连接套接字和预构建报文模板进行ICMP/ARP探测
+"""
+import os
+import time
+import socket
+import struct
+import select
+import logging
+import ipaddress
+import threading
+
+from interfaces import get_default_interface, get_interface_info
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ETH_P_ARP = 0x0806
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ARP_REQUEST = 1
+ARP_REPLY = 2
+
+BROADCAST_MAC = b'\xff' * 6
+ICMP_PAYLOAD = b'boss-detect'.ljust(32, b'\0')
+
+# 以太网ARP帧中各字段的偏移
+ARP_DST_MAC = slice(0, 6)
+ARP_TARGET_IP = slice(38, 42)
+
+
+def checksum(data):
+    """
+    计算Internet校验和 (RFC 1071)
+    
+    Args:
+        data: 报文数据
+    
+    Returns:
+        int: 16位校验和
+    """
+    if len(data) % 2:
+        data = bytes(data) + b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def build_icmp_template(ident, payload=ICMP_PAYLOAD):
+    """
+    构建ICMP回显请求模板，发送时只需填入序号和校验和
+    
+    Args:
+        ident: ICMP标识符
+        payload: 负载数据
+    
+    Returns:
+        bytearray: 报文模板
+    """
+    return bytearray(struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, 0) + payload)
+
+
+def patch_icmp(template, seq):
+    """
+    在模板中填入序号并重新计算校验和
+    
+    Args:
+        template: build_icmp_template 返回的模板
+        seq: ICMP序号
+    
+    Returns:
+        bytearray: 填好的报文 (即模板本身)
+    """
+    struct.pack_into('!H', template, 2, 0)
+    struct.pack_into('!H', template, 6, seq)
+    struct.pack_into('!H', template, 2, checksum(template))
+    return template
+
+
+def parse_icmp_reply(data, has_ip_header):
+    """
+    解析ICMP回显应答
+    
+    Args:
+        data: 收到的数据
+        has_ip_header: 数据是否包含IP头 (SOCK_RAW 为True，SOCK_DGRAM 为False)
+    
+    Returns:
+        tuple: (ident, seq)，不是回显应答时返回None
+    """
+    offset = (data[0] & 0x0f) * 4 if has_ip_header else 0
+    if len(data) < offset + 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack_from('!BBHHH', data, offset)
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+
+def build_arp_template(src_mac, src_ip):
+    """
+    构建以太网ARP请求模板，发送时只需填入目标IP (单播时再填入目标MAC)
+    
+    Args:
+        src_mac: 本机MAC地址
+        src_ip: 本机IP地址
+    
+    Returns:
+        bytearray: 42字节的以太网帧模板
+    """
+    src_mac = bytes.fromhex(src_mac.replace(':', ''))
+    ether = BROADCAST_MAC + src_mac + struct.pack('!H', ETH_P_ARP)
+    arp = struct.pack('!HHBBH6s4s6s4s', 1, 0x0800, 6, 4, ARP_REQUEST,
+                      src_mac, socket.inet_aton(src_ip), b'\0' * 6, b'\0' * 4)
+    return bytearray(ether + arp)
+
+
+def patch_arp(template, target_ip, dst_mac=None):
+    """
+    在ARP模板中填入目标IP和目的MAC
+    
+    Args:
+        template: build_arp_template 返回的模板
+        target_ip: 目标IP地址
+        dst_mac: 单播目的MAC (默认广播)
+    
+    Returns:
+        bytearray: 填好的帧 (即模板本身)
+    """
+    template[ARP_TARGET_IP] = socket.inet_aton(target_ip)
+    template[ARP_DST_MAC] = bytes.fromhex(dst_mac.replace(':', '')) if dst_mac else BROADCAST_MAC
+    return template
+
+
+def parse_arp_reply(frame):
+    """
+    解析以太网ARP应答帧
+    
+    Args:
+        frame: 收到的以太网帧
+    
+    Returns:
+        tuple: (ip, mac)，不是ARP应答时返回None
+    """
+    if len(frame) < 42 or frame[12:14] != b'\x08\x06':
+        return None
+    opcode, sender_mac, sender_ip = struct.unpack_from('!H6s4s', frame, 20)
+    if opcode != ARP_REPLY:
+        return None
+    return socket.inet_ntoa(sender_ip), ':'.join(f'{b:02x}' for b in sender_mac)
+
+
+class _ArpWaiter:
+    """一次 arp_probe 调用的等待状态，由接收线程按发送方IP分发应答"""
+    
+    def __init__(self, ips, on_reply=None):
+        """
+        初始化等待状态
+        
+        Args:
+            ips: 等待应答的IP集合
+            on_reply: 收到应答时立即调用的回调 (ip, mac) (可选)
+        """
+        self.ips = frozenset(ips)
+        self.wanted = set(ips)
+        self.devices = []
+        self.on_reply = on_reply
+        self.done = threading.Event()
+        self._lock = threading.Lock()
+        self._closed = False
+    
+    def deliver(self, ip, mac):
+        """
+        接收线程收到应答后调用
+        
+        Args:
+            ip: 发送方IP
+            mac: 发送方MAC
+        """
+        with self._lock:
+            if self._closed or ip not in self.wanted:
+                return
+            self.wanted.discard(ip)
+            self.devices.append((ip, mac))
+            finished = not self.wanted
+        if self.on_reply is not None:
+            self.on_reply(ip, mac)
+        if finished:
+            self.done.set()
+    
+    def close(self):
+        """
+        停止接收应答
+        
+        Returns:
+            list: 已收到的应答 [(ip, mac), ...]
+        """
+        with self._lock:
+            self._closed = True
+            return list(self.devices)
+
+
+class RawProber:
+    """持久化的ICMP/ARP探测器"""
+    
+    def __init__(self, network_interface=None):
+        """
+        初始化探测器
+        
+        Args:
+            network_interface: 网络接口 (可选，默认使用默认路由接口)
+        """
+        self.network_interface = network_interface or get_default_interface()
+        self.ident = os.getpid() & 0xffff
+        self._seq = 0
+        
+        self._icmp_sock = None
+        self._icmp_raw = False
+        self._icmp_template = build_icmp_template(self.ident)
+        self._icmp_lock = threading.Lock()
+        
+        self._arp_sock = None
+        self._arp_template = None
+        # 只保护发包和模板，应答由接收线程分发，多个分片可以同时等待
+        self._arp_lock = threading.Lock()
+        self._arp_waiters = {}
+        self._waiters_lock = threading.Lock()
+        logger.info(f"初始化原始套接字探测器 - 接口: {self.network_interface}")
+    
+    def _open_icmp(self):
+        """打开ICMP套接字，优先使用无需root的SOCK_DGRAM"""
+        if self._icmp_sock is not None:
+            return self._icmp_sock
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            self._icmp_raw = False
+        except PermissionError:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            self._icmp_raw = True
+        sock.setblocking(False)
+        self._icmp_sock = sock
+        return sock
+    
+    def _open_arp(self):
+        """打开绑定到接口的AF_PACKET套接字并构建ARP模板"""
+        if self._arp_sock is not None:
+            return self._arp_sock
+        if not self.network_interface:
+            raise OSError("无法确定网络接口")
+        src_mac, src_ip, _ = get_interface_info(self.network_interface)
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        sock.bind((self.network_interface, ETH_P_ARP))
+        sock.setblocking(False)
+        self._arp_template = build_arp_template(src_mac, src_ip)
+        self._arp_sock = sock
+        threading.Thread(target=self._receive_arp, args=(sock,), name='arp-receiver', daemon=True).start()
+        return sock
+    
+    def _receive_arp(self, sock):
+        """
+        接收线程: 读取ARP应答并按发送方IP分发给等待中的探测，套接字关闭后退出
+        
+        Args:
+            sock: AF_PACKET套接字
+        """
+        while self._arp_sock is sock:
+            try:
+                readable, _, _ = select.select([sock], [], [], 0.5)
+                if not readable:
+                    continue
+                frame = sock.recv(2048)
+            except BlockingIOError:
+                continue
+            except (OSError, ValueError):
+                break
+            reply = parse_arp_reply(frame)
+            if reply is None:
+                continue
+            with self._waiters_lock:
+                waiters = list(self._arp_waiters.get(reply[0], ()))
+            for waiter in waiters:
+                waiter.deliver(*reply)
+    
+    def _add_waiter(self, waiter):
+        """登记等待应答的探测"""
+        with self._waiters_lock:
+            for ip in waiter.ips:
+                self._arp_waiters.setdefault(ip, []).append(waiter)
+    
+    def _remove_waiter(self, waiter):
+        """注销等待应答的探测"""
+        with self._waiters_lock:
+            for ip in waiter.ips:
+                waiters = self._arp_waiters.get(ip)
+                if waiters is None:
+                    continue
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._arp_waiters[ip]
+    
+    def _next_seq(self):
+        """获取下一个ICMP序号"""
+        self._seq = (self._seq + 1) & 0xffff
+        return self._seq
+    
+    def ping(self, ip, timeout=2):
+        """
+        发送一个ICMP回显请求并等待匹配的应答
+        
+        Args:
+            ip: 目标IP地址
+            timeout: 超时秒数
+        
+        Returns:
+            bool: 是否收到应答
+        """
+        with self._icmp_lock:
+            sock = self._open_icmp()
+            seq = self._next_seq()
+            sock.sendto(patch_icmp(self._icmp_template, seq), (ip, 0))
+            
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                readable, _, _ = select.select([sock], [], [], remaining)
+                if not readable:
+                    return False
+                data, addr = sock.recvfrom(1024)
+                reply = parse_icmp_reply(data, self._icmp_raw)
+                if reply is None or addr[0] != ip:
+                    continue
+                ident, reply_seq = reply
+                # SOCK_DGRAM 下内核会改写标识符，只能按序号匹配
+                if reply_seq == seq and (not self._icmp_raw or ident == self.ident):
+                    return True
+    
+    def arp_probe(self, ips, timeout=2, dst_macs=None, inter=0, on_reply=None):
+        """
+        向一组IP发送ARP请求，收集应答
+        
+        只在发包时持有锁，应答由接收线程按IP分发，多个线程可以同时探测不同分片
+        
+        Args:
+            ips: 目标IP列表
+            timeout: 等待应答的超时秒数
+            dst_macs: {ip: mac} 单播目的MAC (可选，未指定的IP使用广播)
+            inter: 两个请求之间的间隔(秒)，用于限速
+            on_reply: 收到应答时立即调用的回调 (ip, mac) (可选，在接收线程中调用)
+        
+        Returns:
+            list: [(ip, mac), ...]
+        """
+        wanted = set(ips)
+        if not wanted:
+            return []
+        dst_macs = dst_macs or {}
+        
+        with self._arp_lock:
+            sock = self._open_arp()
+        
+        # 先登记再发包，避免漏掉很快到达的应答
+        waiter = _ArpWaiter(wanted, on_reply)
+        self._add_waiter(waiter)
+        try:
+            for ip in wanted:
+                with self._arp_lock:
+                    sock.send(patch_arp(self._arp_template, ip, dst_macs.get(ip)))
+                if inter:
+                    time.sleep(inter)
+            waiter.done.wait(timeout)
+        finally:
+            self._remove_waiter(waiter)
+        return waiter.close()
+    
+    def arp_scan(self, ip_range, timeout=3, inter=0, on_reply=None):
+        """
+        ARP扫描一个网段
+        
+        Args:
+            ip_range: IP地址范围 (例如: "192.168.1.0/24")
+            timeout: 等待应答的超时秒数
+            inter: 两个请求之间的间隔(秒)，用于限速
+            on_reply: 收到应答时立即调用的回调 (ip, mac) (可选)
+        
+        Returns:
+            list: [(ip, mac), ...]
+        """
+        network = ipaddress.ip_network(ip_range, strict=False)
+        hosts = [str(ip) for ip in (network.hosts() if network.num_addresses > 1 else [network.network_address])]
+        return self.arp_probe(hosts, timeout, inter=inter, on_reply=on_reply)
+    
+    def close(self):
+        """关闭套接字"""
+        for sock in (self._icmp_sock, self._arp_sock):
+            if sock is not None:
+                sock.close()
+        self._icmp_sock = None
+        self._arp_sock = None
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+路由器探测后端 - 从路由器/AP批量读取已关联终端和DHCP租约，一次请求代替逐个主机探测
+
+支持的数据源:
+    - OpenWrt ubus JSON-RPC (hostapd get_clients、luci-rpc getDHCPLeases)
+    - SNMP v2c (BRIDGE-MIB 转发表、ipNetToMediaTable)
+    - dnsmasq 租约文件
+"""
+import os
+import time
+import socket
+import logging
+import itertools
+
+from probe_backends import ProbeBackend, register_backend
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+UBUS_NULL_SESSION = '0' * 32
+UBUS_STATUS_OK = 0
+UBUS_STATUS_PERMISSION_DENIED = 6
+
+# BRIDGE-MIB dot1dTpFdbAddress、IP-MIB ipNetToMediaPhysAddress
+OID_FDB_ADDRESS = (1, 3, 6, 1, 2, 1, 17, 4, 3, 1, 1)
+OID_NET_TO_MEDIA = (1, 3, 6, 1, 2, 1, 4, 22, 1, 2)
+
+# BER 标签
+BER_INTEGER = 0x02
+BER_OCTET_STRING = 0x04
+BER_NULL = 0x05
+BER_OID = 0x06
+BER_SEQUENCE = 0x30
+PDU_RESPONSE = 0xA2
+PDU_GETBULK = 0xA5
+END_OF_MIB_VIEW = 0x82
+SNMP_V2C = 1
+
+
+class RouterError(Exception):
+    """路由器数据源请求失败"""
+
+
+def format_mac(data):
+    """6字节MAC转换为 aa:bb:cc:dd:ee:ff"""
+    return ':'.join(f'{b:02x}' for b in data)
+
+
+# ---------- BER 编解码 (仅实现 SNMP v2c GETBULK 需要的部分) ----------
+
+def _ber_length(length):
+    if length < 0x80:
+        return bytes([length])
+    data = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([0x80 | len(data)]) + data
+
+
+def ber_tlv(tag, payload):
+    """编码一个BER TLV"""
+    return bytes([tag]) + _ber_length(len(payload)) + payload
+
+
+def ber_integer(value):
+    """编码INTEGER"""
+    return ber_tlv(BER_INTEGER, value.to_bytes(max(1, (value.bit_length() + 8) // 8), 'big', signed=True))
+
+
+def ber_oid(oid):
+    """编码OBJECT IDENTIFIER"""
+    payload = bytearray([40 * oid[0] + oid[1]])
+    for sub in oid[2:]:
+        chunk = [sub & 0x7F]
+        sub >>= 7
+        while sub:
+            chunk.append(0x80 | (sub & 0x7F))
+            sub >>= 7
+        payload.extend(reversed(chunk))
+    return ber_tlv(BER_OID, bytes(payload))
+
+
+def ber_decode(data, offset=0):
+    """
+    解码一个BER TLV
+    
+    Returns:
+        tuple: (标签, 内容, 下一个TLV的偏移)
+    """
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        size = length & 0x7F
+        length = int.from_bytes(data[offset:offset + size], 'big')
+        offset += size
+    end = offset + length
+    if end > len(data):
+        raise RouterError("BER长度超出报文")
+    return tag, data[offset:end], end
+
+
+def ber_items(data):
+    """逐个解码连续的TLV，返回 [(标签, 内容), ...]"""
+    items = []
+    offset = 0
+    while offset < len(data):
+        tag, value, offset = ber_decode(data, offset)
+        items.append((tag, value))
+    return items
+
+
+def decode_oid(data):
+    """解码OBJECT IDENTIFIER内容"""
+    oid = [data[0] // 40, data[0] % 40]
+    value = 0
+    for byte in data[1:]:
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            oid.append(value)
+            value = 0
+    return tuple(oid)
+
+
+def encode_message(community, pdu_tag, request_id, field1, field2, varbinds):
+    """
+    编码 SNMP v2c 报文
+    
+    Args:
+        community: 团体名
+        pdu_tag: PDU类型 (PDU_GETBULK、PDU_RESPONSE)
+        request_id: 请求ID
+        field1, field2: GETBULK为 non-repeaters/max-repetitions，应答为 error-status/error-index
+        varbinds: [(oid, (标签, 内容)), ...]
+    
+    Returns:
+        bytes
+    """
+    bindings = b''.join(ber_tlv(BER_SEQUENCE, ber_oid(oid) + ber_tlv(tag, value)) for oid, (tag, value) in varbinds)
+    pdu = ber_tlv(pdu_tag, ber_integer(request_id) + ber_integer(field1) + ber_integer(field2)
+                  + ber_tlv(BER_SEQUENCE, bindings))
+    return ber_tlv(BER_SEQUENCE, ber_integer(SNMP_V2C) + ber_tlv(BER_OCTET_STRING, community.encode()) + pdu)
+
+
+def decode_message(data):
+    """
+    解码 SNMP v2c 报文
+    
+    Returns:
+        tuple: (团体名, PDU类型, 请求ID, field1, field2, [(oid, (标签, 内容)), ...])
+    """
+    tag, message, _ = ber_decode(data)
+    if tag != BER_SEQUENCE:
+        raise RouterError("不是SNMP报文")
+    (_, _), (_, community), (pdu_tag, pdu) = ber_items(message)
+    (_, request_id), (_, field1), (_, field2), (_, bindings) = ber_items(pdu)
+    varbinds = []
+    for _, binding in ber_items(bindings):
+        (_, oid), value = ber_items(binding)
+        varbinds.append((decode_oid(oid), value))
+    return (community.decode(errors='replace'), pdu_tag, int.from_bytes(request_id, 'big', signed=True),
+            int.from_bytes(field1, 'big', signed=True), int.from_bytes(field2, 'big', signed=True), varbinds)
+
+
+# ---------- 数据源 ----------
+
+class RouterSource:
+    """路由器数据源基类"""
+    
+    name = None
+    
+    def fetch(self):
+        """
+        读取当前在线的终端
+        
+        Returns:
+            dict: {mac: ip}，不知道IP时为None
+        
+        Raises:
+            RouterError, OSError: 请求失败
+        """
+        raise NotImplementedError
+    
+    def hostnames(self):
+        """
+        最近一次 fetch 读取到的DHCP主机名，用于指纹匹配
+        
+        Returns:
+            dict: {mac: 主机名}
+        """
+        return {}
+    
+    def close(self):
+        """释放连接"""
+
+
+class UbusSource(RouterSource):
+    """OpenWrt ubus JSON-RPC: 一次批量请求读取所有无线接口的关联终端和DHCP租约"""
+    
+    name = 'ubus'
+    
+    def __init__(self, url, username='root', password='', interfaces=(), leases=True, timeout=5):
+        """
+        Args:
+            url: ubus地址 (例如 http://192.168.1.1/ubus)
+            username, password: rpcd 登录账号
+            interfaces: hostapd对象列表 (例如 ['hostapd.wlan0'])，为空时以DHCP租约作为在线依据
+            leases: 是否读取DHCP租约以补全IP
+            timeout: 请求超时(秒)
+        """
+        self.url = url
+        self.username = username
+        self.password = password
+        self.interfaces = list(interfaces)
+        self.leases = leases or not self.interfaces
+        self.timeout = timeout
+        self._session = None
+        self._sid = None
+        self._ids = itertools.count(1)
+        self._hostnames = {}
+    
+    def _post(self, payload):
+        if self._session is None:
+            # 延迟导入: requests 只在启用路由器后端时加载
+            from notification import create_session
+            self._session = create_session(pool_size=1)
+        try:
+            response = self._session.post(self.url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            raise RouterError(f"ubus请求失败: {e}") from e
+    
+    def _call(self, obj, method, args=None, sid=None):
+        return {'jsonrpc': '2.0', 'id': next(self._ids), 'method': 'call',
+                'params': [sid or self._sid, obj, method, args or {}]}
+    
+    def _login(self):
+        reply = self._post(self._call('session', 'login', {'username': self.username, 'password': self.password},
+                                      sid=UBUS_NULL_SESSION))
+        result = reply.get('result') or [None]
+        if result[0] != UBUS_STATUS_OK:
+            raise RouterError(f"ubus登录失败: {reply.get('error') or result}")
+        self._sid = result[1]['ubus_rpc_session']
+    
+    def _batch(self):
+        calls = [self._call(interface, 'get_clients') for interface in self.interfaces]
+        if self.leases:
+            calls.append(self._call('luci-rpc', 'getDHCPLeases'))
+        replies = self._post(calls)
+        if isinstance(replies, dict):
+            replies = [replies]
+        by_id = {reply.get('id'): reply for reply in replies}
+        return [by_id.get(call['id'], {}) for call in calls]
+    
+    @staticmethod
+    def _status(reply):
+        result = reply.get('result')
+        if not result:
+            return None
+        return result[0]
+    
+    def fetch(self):
+        if self._sid is None:
+            self._login()
+        replies = self._batch()
+        if any(self._status(reply) == UBUS_STATUS_PERMISSION_DENIED for reply in replies):
+            # 会话过期，重新登录一次
+            self._login()
+            replies = self._batch()
+        
+        table = {}
+        lease_ips = {}
+        hostnames = {}
+        for reply in replies:
+            if self._status(reply) != UBUS_STATUS_OK or len(reply['result']) < 2:
+                logger.debug(f"ubus调用失败: {reply}")
+                continue
+            data = reply['result'][1]
+            for mac in data.get('clients', {}):
+                table[mac.lower()] = None
+            for lease in data.get('dhcp_leases', []):
+                if lease.get('macaddr'):
+                    lease_ips[lease['macaddr'].lower()] = lease.get('ipaddr')
+                    if lease.get('hostname'):
+                        hostnames[lease['macaddr'].lower()] = lease['hostname']
+        self._hostnames = hostnames
+        
+        if not self.interfaces:
+            return lease_ips
+        for mac in table:
+            table[mac] = lease_ips.get(mac)
+        return table
+    
+    def hostnames(self):
+        return self._hostnames
+    
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+
+class SnmpSource(RouterSource):
+    """SNMP v2c: GETBULK遍历交换转发表 (BRIDGE-MIB)，并用 ipNetToMediaTable 补全IP"""
+    
+    name = 'snmp'
+    
+    def __init__(self, host, community='public', port=161, timeout=2, retries=1, max_repetitions=50):
+        """
+        Args:
+            host: 路由器地址
+            community: 只读团体名
+            port: SNMP端口
+            timeout: 单次请求超时(秒)
+            retries: 超时重试次数
+            max_repetitions: 每个GETBULK请求返回的最大条目数
+        """
+        self.host = host
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_repetitions = max_repetitions
+        self._sock = None
+        self._ids = itertools.count(1)
+    
+    def _request(self, oid):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.settimeout(self.timeout)
+            self._sock.connect((self.host, self.port))
+        request_id = next(self._ids) & 0x7FFFFFFF
+        packet = encode_message(self.community, PDU_GETBULK, request_id, 0, self.max_repetitions,
+                                [(oid, (BER_NULL, b''))])
+        for _ in range(self.retries + 1):
+            self._sock.send(packet)
+            try:
+                while True:
+                    _, pdu_tag, reply_id, error, _, varbinds = decode_message(self._sock.recv(65535))
+                    # 丢弃上一次超时请求迟到的应答
+                    if pdu_tag == PDU_RESPONSE and reply_id == request_id:
+                        break
+            except socket.timeout:
+                continue
+            if error:
+                raise RouterError(f"SNMP错误状态: {error}")
+            return varbinds
+        raise RouterError(f"SNMP请求超时: {self.host}:{self.port}")
+    
+    def walk(self, base):
+        """
+        遍历一个子树
+        
+        Args:
+            base: 子树OID
+        
+        Returns:
+            list: [(oid, 内容), ...]
+        """
+        rows = []
+        oid = base
+        while True:
+            varbinds = self._request(oid)
+            if not varbinds:
+                return rows
+            for oid, (tag, value) in varbinds:
+                if tag == END_OF_MIB_VIEW or oid[:len(base)] != base:
+                    return rows
+                rows.append((oid, value))
+    
+    def fetch(self):
+        ips = {}
+        for oid, value in self.walk(OID_NET_TO_MEDIA):
+            if len(value) == 6:
+                ips[format_mac(value)] = '.'.join(str(part) for part in oid[-4:])
+        macs = [format_mac(value) for _, value in self.walk(OID_FDB_ADDRESS) if len(value) == 6]
+        # 不支持BRIDGE-MIB的设备只能以ARP表作为在线依据
+        if not macs:
+            return ips
+        return {mac: ips.get(mac) for mac in macs}
+    
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class DnsmasqLeaseSource(RouterSource):
+    """dnsmasq 租约文件: 未过期的租约视为在线，文件未变化时不重新解析"""
+    
+    name = 'dnsmasq'
+    
+    def __init__(self, path, clock=time.time):
+        """
+        Args:
+            path: 租约文件路径 (例如 /tmp/dhcp.leases)
+            clock: 返回当前时间戳的函数
+        """
+        self.path = path
+        self.clock = clock
+        self._signature = None
+        self._leases = []
+    
+    @staticmethod
+    def parse(text):
+        """
+        解析租约文件
+        
+        每行格式: <到期时间戳> <MAC> <IP> <主机名> <客户端ID>，到期时间为0表示永久，主机名未知时为 *
+        
+        Returns:
+            list: [(到期时间, mac, ip, 主机名或None), ...]
+        """
+        leases = []
+        for line in text.splitlines():
+            parts = line.split()
+            if len(parts) < 3 or not parts[0].isdigit() or parts[1].count(':') != 5:
+                continue
+            hostname = parts[3] if len(parts) > 3 and parts[3] != '*' else None
+            leases.append((int(parts[0]), parts[1].lower(), parts[2], hostname))
+        return leases
+    
+    def fetch(self):
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                self._leases = self.parse(f.read())
+            self._signature = signature
+        now = self.clock()
+        return {mac: ip for expiry, mac, ip, _ in self._leases if expiry == 0 or expiry > now}
+    
+    def hostnames(self):
+        return {mac: hostname for _, mac, _, hostname in self._leases if hostname}
+
+
+# ---------- 探测后端 ----------
+
+@register_backend
+class RouterBackend(ProbeBackend):
+    """路由器: 批量读取路由器的在线终端表，按TTL缓存，多个目标共享一次请求"""
+    
+    name = 'router'
+    cost = 1
+    latency = 0.02
+    # 需要配置 [router]，不加入默认探测链
+    default = False
+    
+    def __init__(self, detector, sources=(), ttl=10, authoritative=False, clock=time.monotonic):
+        """
+        Args:
+            detector: 所属的 NetworkDetector
+            sources: RouterSource 列表
+            ttl: 每个数据源结果的缓存时间(秒)
+            authoritative: 为True时未出现在路由器表中即判定离线，不再执行后续后端
+            clock: 单调时钟
+        """
+        super().__init__(detector)
+        self.sources = list(sources)
+        self.ttl = ttl
+        self.authoritative = authoritative
+        self.clock = clock
+        self._cache = {}
+    
+    def ready(self):
+        return bool(self.sources)
+    
+    def table(self):
+        """
+        合并所有数据源的在线终端表，只刷新缓存已过期的数据源
+        
+        Returns:
+            dict: {mac: ip}
+        
+        Raises:
+            RouterError: 所有数据源都不可用
+        """
+        now = self.clock()
+        merged = {}
+        available = 0
+        for source in self.sources:
+            cached = self._cache.get(source)
+            if cached is None or now - cached[0] >= self.ttl:
+                try:
+                    cached = self._cache[source] = (now, source.fetch())
+                except (RouterError, OSError) as e:
+                    logger.warning(f"路由器数据源 {source.name} 不可用: {e}")
+                    self._cache.pop(source, None)
+                    continue
+                self._observe(source, cached[1])
+            available += 1
+            for mac, ip in cached[1].items():
+                if ip or mac not in merged:
+                    merged[mac] = ip
+        if not available:
+            raise RouterError("所有路由器数据源均不可用")
+        return merged
+    
+    def _observe(self, source, table):
+        """将带IP的条目合并到设备清单，配置了指纹规则时记录租约中的主机名"""
+        for mac, ip in table.items():
+            if ip:
+                self.detector.device_table.observe(ip, mac)
+        fingerprints = self.detector.fingerprints
+        if fingerprints:
+            for mac, hostname in source.hostnames().items():
+                fingerprints.observe(mac, hostname=hostname)
+    
+    def probe(self, ip_range=None):
+        table = self.table()
+        mac = next((mac for mac in self.detector.target_macs() if mac in table), None)
+        if mac is None:
+            return False, None
+        ip = table[mac] or self.known_ip(mac)
+        logger.info(f"路由器终端表中发现目标设备: {ip}")
+        return True, ip
+    
+    def known_ip(self, mac):
+        """路由器只提供MAC时 (例如无线关联表)，使用设备清单或最近记录的IP"""
+        record = self.detector.device_table.get(mac)
+        if record is not None:
+            return record.ip
+        if self.detector._recent_ips:
+            return self.detector._recent_ips[0]
+        return self.detector.target_ip
+    
+    def close(self):
+        for source in self.sources:
+            source.close()
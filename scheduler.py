@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+扫描调度模块 - 根据检测状态自适应调整扫描间隔
+"""
+import time
+import logging
+from datetime import datetime
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+
+def _parse_days(spec):
+    """
+    解析星期范围
+    
+    Args:
+        spec: 例如 "mon-fri" 或 "mon,wed,fri"
+    
+    Returns:
+        set: 星期序号集合 (0=周一)
+    """
+    days = set()
+    for part in spec.lower().split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = (WEEKDAYS.index(day.strip()) for day in part.split('-'))
+            day = start
+            while True:
+                days.add(day)
+                if day == end:
+                    break
+                day = (day + 1) % 7
+        else:
+            days.add(WEEKDAYS.index(part))
+    return days
+
+
+def _parse_minutes(value):
+    """将 HH:MM 转换为当天的分钟数"""
+    hours, minutes = value.strip().split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_work_hours(spec):
+    """
+    解析工作时间配置
+    
+    Args:
+        spec: 例如 "mon-fri 08:30-19:00; sat 10:00-12:00"，多段用分号分隔
+    
+    Returns:
+        list: [(星期集合, 开始分钟, 结束分钟), ...]，未配置时为空列表
+    
+    Raises:
+        ValueError: 格式错误
+    """
+    periods = []
+    for entry in spec.split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        try:
+            days, hours = entry.split()
+            start, end = hours.split('-')
+            periods.append((_parse_days(days), _parse_minutes(start), _parse_minutes(end)))
+        except ValueError:
+            raise ValueError(f"无效的工作时间配置: {entry}")
+    return periods
+
+
+class ScanScheduler:
+    """自适应扫描调度器"""
+    
+    def __init__(self, base_interval=30, min_interval=None, max_interval=None, backoff_factor=1.0,
+                 fast_window=0, work_hours='', clock=time.time):
+        """
+        初始化调度器
+        
+        Args:
+            base_interval: 稳定状态下的初始扫描间隔(秒)
+            min_interval: 等待确认或状态刚变化时的快速扫描间隔(秒)，默认等于 base_interval
+            max_interval: 退避的最大间隔，也用于工作时间之外(秒)，默认等于 base_interval
+            backoff_factor: 稳定期间每轮间隔的增长倍数 (1.0 表示不退避)
+            fast_window: 状态变化后保持快速扫描的时长(秒)
+            work_hours: 工作时间配置，留空表示全天
+            clock: 返回当前时间戳的函数 (测试时可注入)
+        """
+        self.base_interval = base_interval
+        self.min_interval = min_interval if min_interval is not None else base_interval
+        self.max_interval = max_interval if max_interval is not None else base_interval
+        self.backoff_factor = backoff_factor
+        self.fast_window = fast_window
+        self.work_hours = parse_work_hours(work_hours)
+        self.clock = clock
+        
+        self.pending = False
+        self.last_change = None
+        self.current_interval = base_interval
+    
+    def observe(self, changed=False, pending=False):
+        """
+        记录一轮检测的结果
+        
+        Args:
+            changed: 本轮是否有目标状态变化（到达/离开）
+            pending: 是否有目标等待确认
+        """
+        self.pending = pending
+        if changed:
+            self.last_change = self.clock()
+        if changed or pending:
+            self.current_interval = self.base_interval
+    
+    def in_work_hours(self):
+        """
+        判断当前是否处于工作时间
+        
+        Returns:
+            bool: 未配置工作时间时始终为True
+        """
+        if not self.work_hours:
+            return True
+        now = datetime.fromtimestamp(self.clock())
+        minutes = now.hour * 60 + now.minute
+        for days, start, end in self.work_hours:
+            if now.weekday() in days and start <= minutes < end:
+                return True
+        return False
+    
+    def next_interval(self):
+        """
+        计算下一次扫描前的等待时间
+        
+        Returns:
+            float: 等待秒数
+        """
+        if self.pending:
+            return self.min_interval
+        
+        if self.last_change is not None and self.clock() - self.last_change < self.fast_window:
+            return self.min_interval
+        
+        if not self.in_work_hours():
+            return self.max_interval
+        
+        interval = self.current_interval
+        self.current_interval = min(self.max_interval, self.current_interval * self.backoff_factor)
+        return min(self.max_interval, max(self.min_interval, interval))
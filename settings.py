@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+配置模块 - 将 config.ini 一次性解析为不可变的类型化配置，并监视文件变化
+
+所有配置节都是namedtuple，检测循环中直接读取字段，不再每次调用 ConfigParser.get*；
+配置文件修改后由 SettingsWatcher 重新解析，比较新旧配置即可知道哪些组件需要重建
+"""
+import os
+import types
+import logging
+import threading
+import configparser
+from collections import namedtuple
+
+from fingerprint import parse_rule
+from network_detector import normalize_mac
+from sweep import parse_ranges
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_TITLE = '🚨 老板来了！'
+DEFAULT_MESSAGE = '检测到老板的手机已连接到局域网，请注意！'
+DEFAULT_LEAVE_TITLE = '✅ 老板离开了！'
+DEFAULT_LEAVE_MESSAGE = '老板的手机已从局域网断开，可以放松了~'
+
+# [network]: boss_mac 已规范化为小写冒号格式，scan_ranges 为网段字符串元组，scan_interfaces 为接口名称元组
+NetworkSettings = namedtuple('NetworkSettings', [
+    'boss_mac', 'boss_ip', 'network_interface', 'scan_interval', 'scan_ranges', 'scan_interfaces',
+    'detection_mode', 'concurrent_probes'])
+
+# [advanced] 中的判定和通知参数; reload_interval 为配置文件检查间隔(秒)，0表示不监视
+AdvancedSettings = namedtuple('AdvancedSettings', [
+    'confirmation_count', 'departure_count', 'departure_grace', 'notification_cooldown',
+    'departure_timeout', 'reload_interval'])
+
+# [advanced] 中的网络检测器参数，字段名与 NetworkDetector 的参数一致；
+# fingerprints 来自 [fingerprints]，为 ((目标MAC, FingerprintRule), ...)
+DetectorSettings = namedtuple('DetectorSettings', [
+    'neighbor_backend', 'use_raw_prober', 'sweep_workers', 'shard_prefix', 'sweep_rate',
+    'sighting_ttl', 'device_expiry', 'sweep_after_misses', 'candidate_limit', 'probe_chain',
+    'fingerprints', 'oui_files'])
+
+RouterSettings = namedtuple('RouterSettings', [
+    'ubus_url', 'ubus_username', 'ubus_password', 'ubus_interfaces', 'ubus_leases',
+    'snmp_host', 'snmp_community', 'snmp_port', 'dnsmasq_leases', 'cache_ttl', 'authoritative'])
+
+# 单个通知配置节，未配置的标题、内容和HTTP会话参数已按 [notification] 补全
+NotificationSettings = namedtuple('NotificationSettings', [
+    'service_type', 'pushdeer_key', 'webhook_url', 'title', 'message', 'leave_title',
+    'leave_message', 'channels', 'pool_size', 'connect_timeout', 'read_timeout', 'http2'])
+
+DispatchSettings = namedtuple('DispatchSettings', [
+    'workers', 'queue_size', 'max_retries', 'retry_backoff', 'retry_max_delay',
+    'dead_letter_file', 'batch_window'])
+
+ScheduleSettings = namedtuple('ScheduleSettings', [
+    'adaptive', 'min_interval', 'max_interval', 'backoff_factor', 'fast_window', 'work_hours'])
+
+StateSettings = namedtuple('StateSettings', ['state_file', 'max_age'])
+
+HistorySettings = namedtuple('HistorySettings', ['db_file', 'record_probes'])
+
+MetricsSettings = namedtuple('MetricsSettings', ['port', 'bind'])
+
+# [targets] 中的一行，mac 已规范化
+TargetSettings = namedtuple('TargetSettings', ['name', 'mac', 'ip', 'notification_section'])
+
+# notifications: 只读映射 {配置节名称: NotificationSettings}; targets: TargetSettings 元组
+Settings = namedtuple('Settings', [
+    'network', 'advanced', 'detector', 'router', 'notifications', 'dispatch', 'schedule',
+    'state', 'history', 'metrics', 'targets'])
+
+
+# 多站点控制器: processes 为工作进程数上限; restart_backoff/restart_max_delay 为崩溃重启的退避;
+# 运行超过 stable_after 秒后退避重置; 站点超过最长扫描间隔再加 stall_timeout 秒没有完成检测时
+# 所在的工作进程被重启 (0表示不检查);
+# sites 为 (站点名称, 站点配置文件) 元组
+ControllerSettings = namedtuple('ControllerSettings', [
+    'processes', 'restart_backoff', 'restart_max_delay', 'stable_after', 'stall_timeout',
+    'report_interval', 'log_dir', 'dispatch', 'metrics', 'sites'])
+
+
+class SettingsError(ValueError):
+    """配置文件缺失或配置项无效"""
+
+
+class _Reader:
+    """ConfigParser 的薄封装，类型转换失败时抛出带配置项名称的 SettingsError"""
+    
+    def __init__(self, config):
+        self.config = config
+    
+    def _read(self, getter, section, key, fallback):
+        try:
+            return getter(section, key, fallback=fallback)
+        except ValueError as e:
+            raise SettingsError(f"配置项 [{section}] {key} 无效: {e}") from None
+    
+    def get(self, section, key, fallback=''):
+        return self._read(self.config.get, section, key, fallback).strip()
+    
+    def getint(self, section, key, fallback):
+        return self._read(self.config.getint, section, key, fallback)
+    
+    def getfloat(self, section, key, fallback):
+        return self._read(self.config.getfloat, section, key, fallback)
+    
+    def getboolean(self, section, key, fallback):
+        return self._read(self.config.getboolean, section, key, fallback)
+    
+    def getlist(self, section, key):
+        return tuple(name.strip() for name in self.get(section, key).split(',') if name.strip())
+
+
+def _parse_targets(reader):
+    """
+    解析 [targets] 节，每行一个目标，格式: 名称 = MAC[, IP[, 通知配置节]]
+    
+    Returns:
+        tuple: TargetSettings 元组，未配置时为空元组
+    """
+    config = reader.config
+    if not config.has_section('targets'):
+        return ()
+    
+    targets = []
+    for name, value in config.items('targets'):
+        parts = [part.strip() for part in value.split(',')]
+        mac = parts[0]
+        ip = parts[1] if len(parts) > 1 and parts[1] else None
+        section = parts[2] if len(parts) > 2 and parts[2] else 'notification'
+        
+        if not mac:
+            raise SettingsError(f"目标 {name} 未配置MAC地址")
+        if not config.has_section(section):
+            raise SettingsError(f"目标 {name} 的通知配置节不存在: [{section}]")
+        targets.append(TargetSettings(name, normalize_mac(mac), ip, section))
+    return tuple(targets)
+
+
+def _parse_fingerprints(reader, targets, boss_mac):
+    """
+    解析 [fingerprints] 节，每行一个目标，格式: 目标名称 = hostname=主机名, mdns=mDNS名称, vendor_class=厂商类别
+    
+    多目标模式下名称为 [targets] 中的目标名称，单目标模式下为 boss
+    
+    Returns:
+        tuple: ((目标MAC, FingerprintRule), ...)，未配置时为空元组
+    """
+    config = reader.config
+    if not config.has_section('fingerprints'):
+        return ()
+    
+    macs = {target.name: target.mac for target in targets} if targets else {'boss': boss_mac}
+    rules = []
+    for name, value in config.items('fingerprints'):
+        if name not in macs:
+            raise SettingsError(f"[fingerprints] 中的目标不存在: {name}")
+        try:
+            rules.append((macs[name], parse_rule(value)))
+        except ValueError as e:
+            raise SettingsError(f"目标 {name} 的指纹规则错误: {e}") from None
+    return tuple(rules)
+
+
+def _parse_notification(reader, section, workers):
+    """
+    解析单个通知配置节，未配置的项沿用 [notification] 的设置
+    
+    Args:
+        reader: _Reader 实例
+        section: 通知配置节名称
+        workers: [dispatch] workers，作为连接池大小的默认值
+    
+    Returns:
+        NotificationSettings: 通知配置
+    """
+    def inherited(getter, key, fallback):
+        return getter(section, key, fallback=getter('notification', key, fallback=fallback))
+    
+    channels = reader.getlist(section, 'channels')
+    service_type = reader.get(section, 'service_type')
+    pushdeer_key = reader.get(section, 'pushdeer_key')
+    webhook_url = reader.get(section, 'webhook_url')
+    
+    # 配置了 channels 且不包含自身时，本节只是组合渠道，无需 service_type
+    if not channels or section in channels:
+        if not service_type:
+            raise SettingsError(f"通知配置节 [{section}] 未配置 service_type")
+        if service_type == 'pushdeer' and not pushdeer_key:
+            raise SettingsError("未配置PushDeer Key")
+        if service_type == 'webhook' and not webhook_url:
+            raise SettingsError("未配置Webhook URL")
+    
+    return NotificationSettings(
+        service_type=service_type,
+        pushdeer_key=pushdeer_key,
+        webhook_url=webhook_url,
+        title=inherited(reader.get, 'notification_title', DEFAULT_TITLE),
+        message=inherited(reader.get, 'notification_message', DEFAULT_MESSAGE),
+        leave_title=inherited(reader.get, 'leave_notification_title', DEFAULT_LEAVE_TITLE),
+        leave_message=inherited(reader.get, 'leave_notification_message', DEFAULT_LEAVE_MESSAGE),
+        channels=channels,
+        pool_size=inherited(reader.getint, 'pool_size', workers),
+        connect_timeout=inherited(reader.getfloat, 'connect_timeout', 5),
+        read_timeout=inherited(reader.getfloat, 'read_timeout', 10),
+        http2=inherited(reader.getboolean, 'http2', False)
+    )
+
+
+def _parse_notifications(reader, targets, workers):
+    """
+    解析 [notification]、目标引用的通知配置节以及它们的 channels 引用的配置节
+    
+    Returns:
+        MappingProxyType: {配置节名称: NotificationSettings}
+    """
+    pending = ['notification'] + [target.notification_section for target in targets]
+    notifications = {}
+    while pending:
+        section = pending.pop(0)
+        if section in notifications:
+            continue
+        if not reader.config.has_section(section):
+            raise SettingsError(f"通知配置节不存在: [{section}]")
+        notifications[section] = _parse_notification(reader, section, workers)
+        pending.extend(notifications[section].channels)
+    return types.MappingProxyType(notifications)
+
+
+def _parse_dispatch(reader):
+    """解析 [dispatch] 节"""
+    return DispatchSettings(
+        workers=reader.getint('dispatch', 'workers', 2),
+        queue_size=reader.getint('dispatch', 'queue_size', 100),
+        max_retries=reader.getint('dispatch', 'max_retries', 3),
+        retry_backoff=reader.getfloat('dispatch', 'retry_backoff', 2),
+        retry_max_delay=reader.getfloat('dispatch', 'retry_max_delay', 60),
+        dead_letter_file=reader.get('dispatch', 'dead_letter_file', 'data/notifications.dead.jsonl'),
+        batch_window=reader.getfloat('dispatch', 'batch_window', 0)
+    )
+
+
+def _parse_metrics(reader):
+    """解析 [metrics] 节"""
+    return MetricsSettings(reader.getint('metrics', 'port', 0), reader.get('metrics', 'bind', '127.0.0.1'))
+
+
+def parse_settings(config):
+    """
+    将 ConfigParser 解析为 Settings
+    
+    Args:
+        config: configparser.ConfigParser 实例
+    
+    Returns:
+        Settings: 不可变的配置对象
+    
+    Raises:
+        SettingsError: 缺少必需的配置或配置项无效
+    """
+    reader = _Reader(config)
+    targets = _parse_targets(reader)
+    
+    boss_mac = reader.get('network', 'boss_mac')
+    if not targets and not boss_mac:
+        raise SettingsError("未配置老板的MAC地址")
+    try:
+        scan_ranges = tuple(parse_ranges(reader.get('network', 'scan_ranges')))
+    except ValueError as e:
+        raise SettingsError(f"扫描网段配置错误: {e}") from None
+    
+    network = NetworkSettings(
+        boss_mac=normalize_mac(boss_mac) if boss_mac else None,
+        boss_ip=reader.get('network', 'boss_ip') or None,
+        network_interface=reader.get('network', 'network_interface') or None,
+        scan_interval=reader.getint('network', 'scan_interval', 30),
+        scan_ranges=scan_ranges,
+        scan_interfaces=reader.getlist('network', 'scan_interfaces'),
+        detection_mode=reader.get('network', 'detection_mode', 'active'),
+        concurrent_probes=reader.getboolean('network', 'concurrent_probes', False)
+    )
+    advanced = AdvancedSettings(
+        confirmation_count=reader.getint('advanced', 'confirmation_count', 2),
+        departure_count=reader.getint('advanced', 'departure_count', 1),
+        departure_grace=reader.getfloat('advanced', 'departure_grace', 0),
+        notification_cooldown=reader.getint('advanced', 'notification_cooldown', 300),
+        departure_timeout=reader.getint('advanced', 'departure_timeout', 300),
+        reload_interval=reader.getfloat('advanced', 'reload_interval', 5)
+    )
+    detector = DetectorSettings(
+        neighbor_backend=reader.get('advanced', 'neighbor_backend', 'auto'),
+        use_raw_prober=reader.getboolean('advanced', 'raw_prober', False),
+        sweep_workers=reader.getint('advanced', 'sweep_workers', 4),
+        shard_prefix=reader.getint('advanced', 'shard_prefix', 24),
+        sweep_rate=reader.getfloat('advanced', 'sweep_rate', 0),
+        sighting_ttl=reader.getfloat('advanced', 'sighting_ttl', 0),
+        device_expiry=reader.getfloat('advanced', 'device_expiry', 300),
+        sweep_after_misses=reader.getint('advanced', 'sweep_after_misses', 1),
+        candidate_limit=reader.getint('advanced', 'candidate_limit', 4),
+        probe_chain=reader.getlist('advanced', 'probe_chain'),
+        fingerprints=_parse_fingerprints(reader, targets, network.boss_mac),
+        oui_files=reader.getlist('advanced', 'oui_file')
+    )
+    router = RouterSettings(
+        ubus_url=reader.get('router', 'ubus_url'),
+        ubus_username=reader.get('router', 'ubus_username', 'root'),
+        ubus_password=reader.get('router', 'ubus_password'),
+        ubus_interfaces=reader.getlist('router', 'ubus_interfaces'),
+        ubus_leases=reader.getboolean('router', 'ubus_leases', True),
+        snmp_host=reader.get('router', 'snmp_host'),
+        snmp_community=reader.get('router', 'snmp_community', 'public'),
+        snmp_port=reader.getint('router', 'snmp_port', 161),
+        dnsmasq_leases=reader.get('router', 'dnsmasq_leases'),
+        cache_ttl=reader.getfloat('router', 'cache_ttl', 10),
+        authoritative=reader.getboolean('router', 'authoritative', False)
+    )
+    dispatch = _parse_dispatch(reader)
+    schedule = ScheduleSettings(
+        adaptive=reader.getboolean('schedule', 'adaptive', False),
+        min_interval=reader.getfloat('schedule', 'min_interval', 5),
+        max_interval=reader.getfloat('schedule', 'max_interval', 300),
+        backoff_factor=reader.getfloat('schedule', 'backoff_factor', 1.5),
+        fast_window=reader.getfloat('schedule', 'fast_window', 120),
+        work_hours=reader.get('schedule', 'work_hours')
+    )
+    
+    return Settings(
+        network=network,
+        advanced=advanced,
+        detector=detector,
+        router=router,
+        notifications=_parse_notifications(reader, targets, dispatch.workers),
+        dispatch=dispatch,
+        schedule=schedule,
+        state=StateSettings(reader.get('state', 'state_file'), reader.getfloat('state', 'max_age', 900)),
+        history=HistorySettings(reader.get('history', 'db_file'),
+                                reader.getboolean('history', 'record_probes', True)),
+        metrics=_parse_metrics(reader),
+        targets=targets
+    )
+
+
+def _read_config(config_file):
+    """读取配置文件，文件不存在或格式错误时抛出 SettingsError"""
+    if not os.path.exists(config_file):
+        raise SettingsError(f"配置文件不存在: {config_file}")
+    
+    config = configparser.ConfigParser()
+    try:
+        config.read(config_file, encoding='utf-8')
+    except (configparser.Error, UnicodeDecodeError) as e:
+        raise SettingsError(f"配置文件格式错误: {e}") from None
+    return config
+
+
+def load_settings(config_file):
+    """
+    读取并解析配置文件
+    
+    Args:
+        config_file: 配置文件路径
+    
+    Returns:
+        Settings: 不可变的配置对象
+    
+    Raises:
+        SettingsError: 文件不存在、格式错误或配置项无效
+    """
+    return parse_settings(_read_config(config_file))
+
+
+def load_controller_settings(config_file):
+    """
+    读取多站点控制器的配置文件
+    
+    [sites] 节中每行一个站点: 名称 = 站点配置文件 (格式与 config.ini 相同，相对路径相对于控制器配置文件，log_dir 同样)；
+    [dispatch] 和 [metrics] 与 config.ini 中的含义相同，由所有站点共享
+    
+    Args:
+        config_file: 控制器配置文件路径
+    
+    Returns:
+        ControllerSettings: 不可变的配置对象
+    
+    Raises:
+        SettingsError: 文件不存在、格式错误、没有站点或配置项无效
+    """
+    config = _read_config(config_file)
+    reader = _Reader(config)
+    
+    base = os.path.dirname(os.path.abspath(config_file))
+    sites = tuple((name, os.path.join(base, path.strip())) for name, path in
+                  (config.items('sites') if config.has_section('sites') else []) if path.strip())
+    if not sites:
+        raise SettingsError("[sites] 中没有配置任何站点")
+    log_dir = reader.get('controller', 'log_dir', 'logs')
+    
+    return ControllerSettings(
+        processes=reader.getint('controller', 'processes', os.cpu_count() or 1),
+        restart_backoff=reader.getfloat('controller', 'restart_backoff', 1),
+        restart_max_delay=reader.getfloat('controller', 'restart_max_delay', 60),
+        stable_after=reader.getfloat('controller', 'stable_after', 60),
+        stall_timeout=reader.getfloat('controller', 'stall_timeout', 0),
+        report_interval=reader.getfloat('controller', 'report_interval', 300),
+        log_dir=os.path.join(base, log_dir) if log_dir else '',
+        dispatch=_parse_dispatch(reader),
+        metrics=_parse_metrics(reader),
+        sites=sites
+    )
+
+
+def changed_fields(old, new):
+    """
+    比较两个同类型的namedtuple
+    
+    Args:
+        old: 旧配置 (Settings 或某个配置节)
+        new: 新配置
+    
+    Returns:
+        list: 值不同的字段名
+    """
+    return [field for field in old._fields if getattr(old, field) != getattr(new, field)]
+
+
+class SettingsWatcher:
+    """
+    在后台线程中按 mtime/大小 轮询配置文件，变化后重新解析
+    
+    解析失败时只记录日志，继续使用原配置；编辑器分多次写入时，写完后文件再次变化会重新解析
+    """
+    
+    def __init__(self, config_file, on_change, interval=5):
+        """
+        初始化配置监视器
+        
+        Args:
+            config_file: 配置文件路径
+            on_change: 解析成功后的回调 (settings)，在监视线程中调用
+            interval: 检查间隔(秒)
+        """
+        self.config_file = config_file
+        self.on_change = on_change
+        self.interval = interval
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _stat(self):
+        """返回文件的 (mtime_ns, size)，文件不存在时返回 None"""
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def check(self):
+        """
+        检查一次配置文件，变化且解析成功时调用 on_change
+        
+        Returns:
+            Settings: 新配置，文件未变化或解析失败时返回 None
+        """
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return None
+        self._signature = signature
+        
+        try:
+            settings = load_settings(self.config_file)
+        except SettingsError as e:
+            logger.error(f"配置文件已修改但无法加载，继续使用原配置: {e}")
+            return None
+        
+        logger.info(f"检测到配置文件变化: {self.config_file}")
+        self.on_change(settings)
+        return settings
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"配置重新加载失败: {e}", exc_info=True)
+    
+    def start(self):
+        """启动后台监视线程"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='settings-watcher', daemon=True)
+        self._thread.start()
+        logger.info(f"监视配置文件变化: {self.config_file}，检查间隔 {self.interval}秒")
+    
+    def stop(self):
+        """停止后台监视线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
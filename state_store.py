@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+状态持久化模块 - 将检测器状态以原子方式写入JSON快照，重启后恢复
+"""
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+
+from presence_state import PresenceState, INITIAL_STATE
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+
+
+def presence_to_dict(state):
+    """
+    将状态机状态转换为可序列化的字典
+    
+    Args:
+        state: PresenceState 实例
+    
+    Returns:
+        dict: 状态字典
+    """
+    return state._asdict()
+
+
+def presence_from_dict(data):
+    """
+    从字典恢复状态机状态，数据不完整时返回初始状态
+    
+    Args:
+        data: presence_to_dict 生成的字典
+    
+    Returns:
+        PresenceState: 状态
+    """
+    try:
+        return PresenceState(**{field: data[field] for field in PresenceState._fields})
+    except (KeyError, TypeError):
+        return INITIAL_STATE
+
+
+class StateStore:
+    """检测器状态的JSON快照存储"""
+    
+    def __init__(self, path, max_age=900, clock=time.time):
+        """
+        初始化状态存储
+        
+        Args:
+            path: 快照文件路径 (建议放在挂载的数据卷中)
+            max_age: 快照超过多少秒视为过期，不再恢复
+            clock: 时间函数 (测试时可替换)
+        """
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        self.saved_at = None
+        self._lock = threading.Lock()
+    
+    def save(self, snapshot):
+        """
+        原子写入快照：先写同目录下的临时文件并fsync，再重命名覆盖
+        
+        Args:
+            snapshot: 可JSON序列化的状态字典
+        
+        Returns:
+            bool: 是否写入成功
+        """
+        data = dict(snapshot, version=SNAPSHOT_VERSION, saved_at=self.clock())
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix='.state-', suffix='.tmp', dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(data, f, ensure_ascii=False)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+            except OSError as e:
+                logger.error(f"保存状态快照失败: {e}")
+                return False
+            self.saved_at = data['saved_at']
+        logger.debug(f"已保存状态快照: {self.path}")
+        return True
+    
+    def due(self):
+        """
+        状态稳定时是否需要刷新快照：距上次保存已超过 max_age 的一半
+        
+        只在状态变化时保存的话，稳定在线超过 max_age 后重启会把快照当作过期丢弃
+        
+        Returns:
+            bool: 是否需要重新保存
+        """
+        return self.saved_at is None or self.clock() - self.saved_at >= self.max_age / 2
+    
+    def load(self):
+        """
+        读取快照，文件不存在、损坏、版本不符或已过期时返回None
+        
+        Returns:
+            dict: 状态字典
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"状态快照无法读取，忽略: {e}")
+            return None
+        
+        if not isinstance(data, dict) or data.get('version') != SNAPSHOT_VERSION:
+            logger.warning("状态快照版本不符，忽略")
+            return None
+        
+        age = self.clock() - data.get('saved_at', 0)
+        if age > self.max_age or age < 0:
+            logger.info(f"状态快照已过期 ({age:.0f}秒前保存)，重新开始检测")
+            return None
+        
+        logger.info(f"已读取状态快照 ({age:.0f}秒前保存)")
+        return data
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+分片扫描模块 - 将大网段拆分为多个分片并行扫描，结果边收边返回
+"""
+import time
+import queue
+import logging
+import threading
+import ipaddress
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def parse_ranges(value):
+    """
+    解析逗号分隔的网段列表
+    
+    Args:
+        value: 例如 "10.0.0.0/20, 10.1.0.0/24"
+    
+    Returns:
+        list: 网段字符串列表
+    
+    Raises:
+        ValueError: 网段格式错误
+    """
+    ranges = []
+    for part in value.split(','):
+        part = part.strip()
+        if part:
+            ranges.append(str(ipaddress.ip_network(part, strict=False)))
+    return ranges
+
+
+def split_ranges(ranges, shard_prefix=24):
+    """
+    将网段拆分为不大于 shard_prefix 的分片，并去掉重复的分片
+    
+    Args:
+        ranges: 网段列表
+        shard_prefix: 分片的前缀长度
+    
+    Returns:
+        list: 分片网段字符串列表
+    """
+    shards = []
+    seen = set()
+    for value in ranges:
+        network = ipaddress.ip_network(value, strict=False)
+        if network.prefixlen >= shard_prefix:
+            subnets = [network]
+        else:
+            subnets = network.subnets(new_prefix=shard_prefix)
+        for subnet in subnets:
+            if subnet not in seen:
+                seen.add(subnet)
+                shards.append(str(subnet))
+    return shards
+
+
+class ShardedSweeper:
+    """并行分片扫描器"""
+    
+    def __init__(self, scan_shard, max_workers=4, shard_prefix=24, rate_limit=0):
+        """
+        初始化分片扫描器
+        
+        Args:
+            scan_shard: 扫描单个分片的函数 (shard, inter, on_reply) -> [(ip, mac), ...]
+                        on_reply 为可选的单条应答回调，支持时应答会立即返回
+            max_workers: 并行扫描的线程数
+            shard_prefix: 分片的前缀长度
+            rate_limit: 全局发包速率上限(包/秒)，0表示不限速
+        """
+        self.scan_shard = scan_shard
+        self.max_workers = max_workers
+        self.shard_prefix = shard_prefix
+        self.rate_limit = rate_limit
+    
+    def _inter(self, workers):
+        """计算每个分片内两个请求之间的间隔(秒)，使全局速率不超过上限"""
+        if not self.rate_limit:
+            return 0
+        return workers / self.rate_limit
+    
+    def sweep(self, ranges, stop=None):
+        """
+        扫描网段，应答到达即返回
+        
+        Args:
+            ranges: 网段列表
+            stop: threading.Event (可选)，置位后尚未开始的分片不再扫描
+        
+        Yields:
+            tuple: (ip, mac)，同一IP只返回一次
+        """
+        shards = split_ranges(ranges, self.shard_prefix)
+        if not shards:
+            return
+        workers = min(self.max_workers, len(shards))
+        inter = self._inter(workers)
+        logger.info(f"分片扫描: {len(shards)} 个分片, {workers} 个线程, 间隔 {inter * 1000:.1f}ms")
+        
+        results = queue.Queue()
+        
+        def run(shard):
+            streamed = set()
+            
+            def on_reply(ip, mac):
+                streamed.add(ip)
+                results.put((ip, mac))
+            
+            try:
+                if stop is not None and stop.is_set():
+                    return
+                for ip, mac in self.scan_shard(shard, inter, on_reply):
+                    if ip not in streamed:
+                        results.put((ip, mac))
+            except Exception as e:
+                logger.error(f"分片扫描失败 {shard}: {e}")
+            finally:
+                results.put(_DONE)
+        
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='sweep')
+        try:
+            for shard in shards:
+                executor.submit(run, shard)
+            
+            seen = set()
+            remaining = len(shards)
+            while remaining:
+                item = results.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                if item[0] not in seen:
+                    seen.add(item[0])
+                    yield item
+        finally:
+            # 调用方提前结束迭代时不等待剩余分片
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class InterfaceSweeper:
+    """
+    多接口并行扫描器: 每个接口一个扫描线程，接口内再按分片并行扫描
+    
+    各接口是独立的广播域，发包速率按接口分别限制，一个接口缓慢不会拖慢其他接口
+    """
+    
+    def __init__(self, scan_shard, max_workers=4, shard_prefix=24, rate_limit=0, on_complete=None):
+        """
+        初始化多接口扫描器
+        
+        Args:
+            scan_shard: 扫描单个分片的函数 (shard, inter, on_reply, interface) -> [(ip, mac), ...]
+            max_workers: 每个接口内并行扫描分片的线程数
+            shard_prefix: 分片的前缀长度
+            rate_limit: 每个接口的发包速率上限(包/秒)，0表示不限速
+            on_complete: 接口扫描完成后的回调 (interface, devices, elapsed)，提前停止的接口不回调
+        """
+        self.scan_shard = scan_shard
+        self.max_workers = max_workers
+        self.shard_prefix = shard_prefix
+        self.rate_limit = rate_limit
+        self.on_complete = on_complete
+        self._sweepers = {}
+    
+    def _get_sweeper(self, interface):
+        """获取接口对应的分片扫描器（按需创建）"""
+        if interface not in self._sweepers:
+            def scan_shard(shard, inter=0, on_reply=None):
+                return self.scan_shard(shard, inter, on_reply, interface)
+            
+            self._sweepers[interface] = ShardedSweeper(
+                scan_shard,
+                max_workers=self.max_workers,
+                shard_prefix=self.shard_prefix,
+                rate_limit=self.rate_limit
+            )
+        return self._sweepers[interface]
+    
+    def sweep(self, jobs, stop=None):
+        """
+        并行扫描各接口的网段，应答到达即返回
+        
+        Args:
+            jobs: {接口名称: [网段, ...]}
+            stop: threading.Event (可选)，置位后各接口尚未开始的分片不再扫描
+        
+        Yields:
+            tuple: (ip, mac)，同一IP和MAC只返回一次 (不同VLAN中相同的IP不会被合并)
+        """
+        results = queue.Queue()
+        closed = threading.Event()
+        
+        def run(interface, ranges):
+            started = time.perf_counter()
+            devices = 0
+            try:
+                with contextlib.closing(self._get_sweeper(interface).sweep(ranges, stop)) as replies:
+                    for item in replies:
+                        if closed.is_set():
+                            return
+                        devices += 1
+                        results.put(item)
+                if self.on_complete is not None:
+                    self.on_complete(interface, devices, time.perf_counter() - started)
+            except Exception as e:
+                logger.error(f"接口 {interface} 扫描失败: {e}")
+            finally:
+                results.put(_DONE)
+        
+        for interface, ranges in jobs.items():
+            threading.Thread(target=run, args=(interface, ranges), name=f'sweep-{interface}', daemon=True).start()
+        
+        try:
+            seen = set()
+            remaining = len(jobs)
+            while remaining:
+                item = results.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                key = (item[0], item[1].lower())
+                if key not in seen:
+                    seen.add(key)
+                    yield item
+        finally:
+            # 调用方提前结束迭代时通知各接口线程停止
+            closed.set()
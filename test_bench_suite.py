@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+测试性能基准套件
+Test benchmark suite and regression check
+"""
+import sys
+import os
+import json
+import shutil
+import logging
+import tempfile
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def result(seconds, calibration=None):
+    """构造 run_benchmarks 格式的单条结果"""
+    return {'min': seconds, 'median': seconds, 'rounds': 1, 'items': 1, 'calibration': calibration}
+
+
+def test_compare():
+    """测试与基线比较"""
+    print("测试回归判断...")
+    try:
+        from bench_suite import compare
+        
+        baseline = {
+            'presence_advance_10k': result(0.010),
+            'neighbor_proc_parse_10k': result(0.010),
+            'notification_throughput': result(0.100),
+        }
+        report = {name: (current, base, regressed) for name, current, base, regressed in compare({
+            'presence_advance_10k': result(0.012),
+            'neighbor_proc_parse_10k': result(0.013),
+            'notification_throughput': result(0.150),
+            'sweep_replies_16': result(0.5),
+        }, baseline, threshold=0.25)}
+        
+        assert report['presence_advance_10k'][2] is False, "慢20%在阈值内"
+        assert report['neighbor_proc_parse_10k'][2] is True, "慢30%应判为退化"
+        assert report['notification_throughput'][2] is False, "放宽容差的基准慢50%不算退化"
+        assert report['sweep_replies_16'] == (0.5, None, False), "没有基线的基准不判断"
+        print("  ✓ 按阈值和单项容差判断退化")
+        
+        baseline = {'presence_advance_10k': result(0.010, calibration=0.050)}
+        (name, current, base, regressed), = compare(
+            {'presence_advance_10k': result(0.018, calibration=0.100)}, baseline, threshold=0.25)
+        assert abs(current - 0.009) < 1e-9 and not regressed, "机器整体变慢一倍时应按校准耗时换算"
+        (name, current, base, regressed), = compare(
+            {'presence_advance_10k': result(0.018, calibration=0.050)}, baseline, threshold=0.25)
+        assert regressed, "校准耗时不变时慢80%应判为退化"
+        print("  ✓ 按校准耗时换算机器速度差异")
+        
+        print("✅ 回归判断测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 回归判断测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_noise_handling():
+    """测试多遍合并基线和重测确认退化"""
+    print("\n测试噪声处理...")
+    try:
+        from bench_suite import merge_passes, recheck
+        
+        passes = [{'presence_advance_10k': result(seconds, calibration)}
+                  for seconds, calibration in ((0.010, 0.050), (0.030, 0.050), (0.024, 0.100))]
+        merged = merge_passes(passes)['presence_advance_10k']
+        assert merged['calibration'] == 0.050 and merged['passes'] == 3
+        assert abs(merged['min'] - 0.012) < 1e-9, f"应取换算后的中位数: {merged['min']}"
+        print("  ✓ 基线取多遍换算后的中位数，偶发的快慢不影响基线")
+        
+        baseline = {'presence_advance_10k': result(0.010, calibration=0.050)}
+        slow = {'presence_advance_10k': result(0.020, calibration=0.050)}
+        with patch('bench_suite.run_benchmarks', return_value={'presence_advance_10k': result(0.011, 0.050)}) as rerun:
+            results = recheck(slow, baseline, retries=2)
+        assert results['presence_advance_10k']['min'] == 0.011 and rerun.call_count == 1, "重测恢复正常后不再重测"
+        with patch('bench_suite.run_benchmarks', return_value=slow) as rerun:
+            results = recheck(slow, baseline, retries=2)
+        assert results['presence_advance_10k']['min'] == 0.020 and rerun.call_count == 2, "每次重测都慢才保留退化"
+        print("  ✓ 超过阈值的基准重测确认")
+        
+        print("✅ 噪声处理测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 噪声处理测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_baseline_file():
+    """测试基线文件读写"""
+    print("\n测试基线文件...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from bench_suite import load_baseline, save_baseline
+        
+        path = os.path.join(temp_dir, 'baseline.json')
+        assert load_baseline(path) == {}, "文件不存在时基线为空"
+        
+        save_baseline({'a': result(1.0), 'b': result(2.0)}, path)
+        save_baseline({'b': result(3.0)}, path)
+        baseline = load_baseline(path)
+        assert baseline['a']['min'] == 1.0, "未重新运行的基准应保留"
+        assert baseline['b']['min'] == 3.0, "重新运行的基准应覆盖"
+        print("  ✓ 保存时合并已有基线")
+        
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data['version'] = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        assert load_baseline(path) == {}, "版本不符时忽略基线"
+        print("  ✓ 忽略版本不符的基线")
+        
+        print("✅ 基线文件测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 基线文件测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_benchmarks_run():
+    """测试所有基准都能运行，且合成数据规模正确"""
+    print("\n测试基准可运行...")
+    try:
+        from bench_suite import BENCHMARKS, BASELINE_FILE, load_baseline, run_benchmarks
+        
+        logging.disable(logging.INFO)
+        try:
+            with BENCHMARKS['sweep_replies_16'][0]() as run:
+                assert run() == 65534, "/16 应返回全部65534个主机的应答"
+            print("  ✓ /16 合成应答流完整")
+            
+            results = run_benchmarks(rounds=1, warmup=0)
+        finally:
+            logging.disable(logging.NOTSET)
+        assert set(results) == set(BENCHMARKS), "每个基准都应有结果"
+        for name, item in results.items():
+            assert item['min'] > 0 and item['calibration'] > 0, f"{name} 结果不完整"
+        print(f"  ✓ {len(results)} 个基准均运行成功")
+        
+        assert set(load_baseline(BASELINE_FILE)) == set(BENCHMARKS), "仓库中的基线应覆盖所有基准"
+        print("  ✓ 基线覆盖所有基准")
+        
+        print("✅ 基准可运行测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 基准可运行测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 性能基准套件测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("回归判断", test_compare()))
+    results.append(("噪声处理", test_noise_handling()))
+    results.append(("基线文件", test_baseline_file()))
+    results.append(("基准可运行", test_benchmarks_run()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有性能基准套件测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+测试并发探测功能
+Test concurrent probe pipeline
+"""
+import sys
+import os
+import time
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MAC = "aa:bb:cc:dd:ee:ff"
+
+
+def _slow(result, delay):
+    """返回一个延迟后给出固定结果的函数"""
+    def func(*args, **kwargs):
+        time.sleep(delay)
+        return result
+    return func
+
+
+def test_first_confirmed_positive_wins():
+    """测试第一个经MAC确认的结果立即返回"""
+    print("测试第一个确认结果立即返回...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC)
+        table = {TARGET_MAC: ("192.168.1.100", "reachable")}
+        with patch('network_detector.read_neighbor_table', side_effect=_slow(table, 0.1)), \
+             patch.object(detector, 'unicast_arp', side_effect=_slow([], 2.0)), \
+             patch.object(detector, 'scan_network', side_effect=_slow([], 2.0)):
+            start = time.monotonic()
+            result = detector.is_target_online_concurrent()
+            elapsed = time.monotonic() - start
+        
+        assert result == (True, "192.168.1.100"), f"结果不正确: {result}"
+        assert elapsed < 1.0, f"应在邻居表命中后立即返回，实际耗时 {elapsed:.2f}s"
+        print(f"  ✓ 耗时 {elapsed:.2f}s，未等待2秒的ARP扫描")
+        
+        print("✅ 第一个确认结果立即返回测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 第一个确认结果立即返回测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_latency_bounded_by_slowest_probe():
+    """测试全部失败时耗时取决于最慢的单个探测"""
+    print("\n测试最坏耗时...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC, "192.168.1.100")
+        with patch('network_detector.read_neighbor_table', side_effect=_slow({}, 0.5)), \
+             patch.object(detector, '_ping_host', side_effect=_slow(False, 0.5)), \
+             patch.object(detector, 'unicast_arp', side_effect=_slow([], 0.5)):
+            start = time.monotonic()
+            result = detector.is_target_online_concurrent()
+            elapsed = time.monotonic() - start
+        
+        assert result == (False, None), f"结果不正确: {result}"
+        assert elapsed < 1.2, f"耗时应接近单个探测(0.5s)，实际 {elapsed:.2f}s"
+        print(f"  ✓ 三个0.5秒的探测总耗时 {elapsed:.2f}s")
+        
+        print("✅ 最坏耗时测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 最坏耗时测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_requires_mac_confirmation():
+    """测试只有IP匹配、MAC不匹配时不算在线"""
+    print("\n测试MAC确认...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC, "192.168.1.100")
+        other = {"11:22:33:44:55:66": ("192.168.1.100", "reachable")}
+        with patch('network_detector.read_neighbor_table', return_value=other), \
+             patch.object(detector, '_ping_host', return_value=True), \
+             patch.object(detector, 'unicast_arp', return_value=[("192.168.1.100", "11:22:33:44:55:66")]):
+            result = detector.is_target_online_concurrent()
+        
+        assert result == (False, None), f"MAC不匹配不应判定在线: {result}"
+        print("  ✓ IP被其他设备占用时判定为不在线")
+        
+        print("✅ MAC确认测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ MAC确认测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_settled_result_stops_arp_probe():
+    """测试已有结果后，后台线程中的ARP探测不再扩大到全网段扫描，也不更新未命中计数"""
+    print("\n测试结果确定后停止ARP探测...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC)
+        detector.remember_ip("192.168.1.50")
+        table = {TARGET_MAC: ("192.168.1.100", "reachable")}
+        with patch('network_detector.read_neighbor_table', side_effect=_slow(table, 0.1)), \
+             patch.object(detector, 'unicast_arp', side_effect=_slow([], 0.5)), \
+             patch.object(detector, 'scan_network_iter', return_value=iter([])) as mock_sweep:
+            result = detector.is_target_online_concurrent()
+            # 等待后台线程中的单播ARP结束
+            time.sleep(0.8)
+        
+        assert result == (True, "192.168.1.100"), f"结果不正确: {result}"
+        assert mock_sweep.call_count == 0, "结果确定后不应再开始全网段扫描"
+        assert detector._unicast_misses == 0, f"结果确定后不应更新未命中计数: {detector._unicast_misses}"
+        print("  ✓ 邻居表命中后，未完成的单播ARP没有触发全网段扫描")
+        
+        print("✅ 结果确定后停止ARP探测测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 结果确定后停止ARP探测测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 并发探测功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("第一个确认结果返回", test_first_confirmed_positive_wins()))
+    results.append(("最坏耗时", test_latency_bounded_by_slowest_probe()))
+    results.append(("MAC确认", test_requires_mac_confirmation()))
+    results.append(("结果确定后停止ARP探测", test_settled_result_stops_arp_probe()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有并发探测功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+测试多站点控制器功能
+Test multi-site controller with worker processes
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SITE_TEMPLATE = """[network]
+boss_mac = {mac}
+scan_interval = 1
+
+[notification]
+service_type = webhook
+webhook_url = {url}
+notification_title = 老板来了
+notification_message = 老板在线
+
+[advanced]
+confirmation_count = 1
+reload_interval = 0
+probe_chain = router
+
+[router]
+dnsmasq_leases = {leases}
+authoritative = true
+"""
+
+CONTROLLER_TEMPLATE = """[controller]
+processes = 2
+restart_backoff = 0.2
+stable_after = 60
+report_interval = 3600
+
+[dispatch]
+dead_letter_file =
+
+[sites]
+{sites}
+"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """本地Webhook桩: 记录收到的通知"""
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self.server.lock:
+            self.server.received.append(json.loads(body))
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def _settings(interface=None, scan_interfaces=(), mode='active'):
+    network = Mock(network_interface=interface, scan_interfaces=scan_interfaces, detection_mode=mode)
+    return Mock(network=network)
+
+
+def _poll_until(controller, condition, timeout=30):
+    """处理控制器队列直到条件满足"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        controller.poll(timeout=0.2)
+        controller.supervise()
+        if condition():
+            return True
+    return False
+
+
+def test_shard_sites():
+    """测试按接口分配站点"""
+    print("测试站点分配...")
+    try:
+        from controller import shard_sites
+        
+        sites = {
+            'a1': _settings('eth0'), 'a2': _settings('eth0'), 'a3': _settings('eth0'),
+            'b1': _settings('eth1'), 'b2': _settings('eth1'),
+            'c1': _settings(None, ('vlan10', 'vlan20')),
+            'd1': _settings(),
+        }
+        shards = shard_sites(sites, 3)
+        assert len(shards) == 3, f"进程数不正确: {shards}"
+        assert sorted(sum(shards, [])) == sorted(sites), "每个站点应恰好分配一次"
+        for group in (('a1', 'a2', 'a3'), ('b1', 'b2')):
+            assert sum(1 for shard in shards if set(group) & set(shard)) == 1, f"同一接口的站点应在同一进程: {shards}"
+        assert sorted(len(shard) for shard in shards) == [2, 2, 3], f"负载不均衡: {shards}"
+        print("  ✓ 同一接口的站点分配到同一进程，进程间负载均衡")
+        
+        assert len(shard_sites(sites, 16)) == 4, "进程数不应超过接口数"
+        assert shard_sites({'x': _settings('eth0')}, 0) == [['x']]
+        print("  ✓ 进程数不超过接口分组数")
+        
+        print("✅ 站点分配测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 站点分配测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_aggregator_cadence():
+    """测试检测节奏统计"""
+    print("\n测试检测节奏统计...")
+    try:
+        from controller import ResultAggregator
+        
+        aggregator = ResultAggregator({'office': 10, 'lab': 30})
+        for started, duration in ((100.0, 0.5), (110.0, 1.5), (125.0, 1.0)):
+            aggregator.record_cycle('office', started, duration, [('boss', '192.168.1.100')], 1)
+        
+        stats = aggregator.snapshot()
+        office = stats['office']
+        assert office['cycles'] == 3
+        assert office['avg_interval'] == 12.5 and office['max_interval'] == 15.0, f"间隔统计不正确: {office}"
+        assert office['avg_duration'] == 1.0 and office['max_duration'] == 1.5, f"耗时统计不正确: {office}"
+        assert office['online'] == [('boss', '192.168.1.100')] and office['expected_interval'] == 10
+        assert aggregator.last_finished('office') == 126.0
+        assert stats['lab']['cycles'] == 0 and aggregator.last_finished('lab') is None
+        print("  ✓ 按站点统计实际检测间隔与耗时")
+        
+        aggregator.log_summary()
+        print("✅ 检测节奏统计测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 检测节奏统计测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_stall_uses_site_interval():
+    """测试停滞检查按站点的扫描间隔计算，间隔很长的空闲站点不会被重启"""
+    print("\n测试停滞检查...")
+    temp_dir = tempfile.mkdtemp()
+    controller = None
+    try:
+        from controller import Controller
+        
+        leases = os.path.join(temp_dir, 'site.leases')
+        open(leases, 'w').close()
+        site = SITE_TEMPLATE.format(mac='aa:bb:cc:dd:ee:01', url='http://127.0.0.1:9/hook', leases=leases)
+        with open(os.path.join(temp_dir, 'idle.ini'), 'w', encoding='utf-8') as f:
+            f.write(site + "\n[schedule]\nadaptive = true\nmax_interval = 600\n")
+        with open(os.path.join(temp_dir, 'busy.ini'), 'w', encoding='utf-8') as f:
+            f.write(site)
+        config_file = os.path.join(temp_dir, 'controller.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONTROLLER_TEMPLATE.format(sites='idle = idle.ini\nbusy = busy.ini')
+                    .replace('[controller]', '[controller]\nstall_timeout = 300'))
+        
+        controller = Controller(config_file)
+        worker = controller.workers[0]
+        worker.process = Mock()
+        worker.process.is_alive.return_value = True
+        worker.started_at = 0.0
+        controller.aggregator.record_cycle('idle', 100.0, 1.0, [], 1)
+        controller.aggregator.record_cycle('busy', 890.0, 1.0, [], 1)
+        
+        # idle 等待 max_interval 600 秒后再扫描 200 秒，仍在 600 + 300 秒之内
+        controller.supervise(now=901.0)
+        worker.process.terminate.assert_not_called()
+        print("  ✓ 扫描间隔 600 秒的空闲站点超过 stall_timeout 未完成检测时不被重启")
+        
+        assert controller._stalled(worker, 1002.0) == ['idle'], "超过扫描间隔加 stall_timeout 后应视为停滞"
+        assert controller._stalled(worker, 1200.0) == ['idle', 'busy']
+        print("  ✓ 超过站点自己的扫描间隔加 stall_timeout 后视为停滞")
+        
+        print("✅ 停滞检查测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 停滞检查测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if controller is not None:
+            controller.dispatcher.stop()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_metrics_port_released():
+    """测试控制器停止后释放指标端口，同一进程中重新启动的控制器可以再次绑定"""
+    print("\n测试指标端口释放...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from controller import Controller
+        
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        leases = os.path.join(temp_dir, 'site.leases')
+        open(leases, 'w').close()
+        with open(os.path.join(temp_dir, 'office.ini'), 'w', encoding='utf-8') as f:
+            f.write(SITE_TEMPLATE.format(mac='aa:bb:cc:dd:ee:01', url='http://127.0.0.1:9/hook', leases=leases))
+        config_file = os.path.join(temp_dir, 'controller.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONTROLLER_TEMPLATE.format(sites='office = office.ini') + f"\n[metrics]\nport = {port}\n")
+        
+        # 保留已停止的控制器，避免垃圾回收顺带关闭未关闭的socket
+        controllers = []
+        for attempt in range(2):
+            controller = Controller(config_file)
+            controllers.append(controller)
+            # 只检查指标服务，不启动工作进程
+            controller.workers = []
+            controller.start()
+            try:
+                assert controller.metrics_server is not None, f"第{attempt + 1}次启动时无法绑定指标端口"
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+                    assert response.status == 200
+            finally:
+                controller.stop()
+        print("  ✓ 停止后指标端口已释放，重新启动的控制器可再次绑定")
+        
+        print("✅ 指标端口释放测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 指标端口释放测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_controller_end_to_end():
+    """测试控制器运行多个站点、汇总通知并重启崩溃的工作进程"""
+    print("\n测试控制器端到端...")
+    temp_dir = tempfile.mkdtemp()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.received = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/hook"
+    controller = None
+    try:
+        from controller import Controller
+        
+        sites = {'office': ('aa:bb:cc:dd:ee:01', 'eth0'), 'lab': ('aa:bb:cc:dd:ee:02', 'eth1')}
+        for name, (mac, interface) in sites.items():
+            leases = os.path.join(temp_dir, f'{name}.leases')
+            with open(leases, 'w') as f:
+                f.write(f"0 {mac} 192.168.1.{len(name)} boss *\n")
+            with open(os.path.join(temp_dir, f'{name}.ini'), 'w', encoding='utf-8') as f:
+                f.write(SITE_TEMPLATE.format(mac=mac, url=url, leases=leases)
+                        .replace('[network]', f'[network]\nnetwork_interface = {interface}'))
+        config_file = os.path.join(temp_dir, 'controller.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONTROLLER_TEMPLATE.format(sites='\n'.join(f'{name} = {name}.ini' for name in sites)))
+        
+        controller = Controller(config_file)
+        assert len(controller.workers) == 2, "两个接口应分配到两个工作进程"
+        controller.start()
+        
+        def titles():
+            with server.lock:
+                return sorted(item['title'] for item in server.received)
+        
+        assert _poll_until(controller, lambda: titles() == ['[lab] 老板来了', '[office] 老板来了']), \
+            f"未收到两个站点的通知: {titles()}"
+        print("  ✓ 两个站点的通知经控制进程共享队列发送，标题带站点名")
+        
+        assert _poll_until(controller, lambda: all(stats['cycles'] >= 3 for stats in controller.aggregator.snapshot().values()))
+        stats = controller.aggregator.snapshot()
+        for name, site in stats.items():
+            assert len(site['online']) == 1, f"站点 {name} 在线状态不正确: {site}"
+            assert 0.5 < site['avg_interval'] < 5, f"站点 {name} 检测间隔不正确: {site}"
+        print(f"  ✓ 检测节奏: " + ', '.join(f"{name} {site['avg_interval']:.2f}s" for name, site in stats.items()))
+        
+        worker = next(worker for worker in controller.workers if 'office' in worker.names)
+        old_pid = worker.process.pid
+        cycles = stats['office']['cycles']
+        os.kill(old_pid, signal.SIGKILL)
+        assert _poll_until(controller, lambda: worker.restarts == 1 and worker.process is not None
+                           and worker.process.pid != old_pid
+                           and controller.aggregator.snapshot()['office']['cycles'] > cycles + 1), "崩溃的工作进程未重启"
+        assert len(titles()) >= 2
+        print("  ✓ 工作进程被杀死后自动重启，站点继续检测")
+        
+        controller.stop()
+        assert all(not worker.process.is_alive() for worker in controller.workers), "停止后工作进程应退出"
+        controller = None
+        print("  ✓ 停止后所有工作进程退出")
+        
+        for name, other in (('office', 'lab'), ('lab', 'office')):
+            with open(os.path.join(temp_dir, 'logs', f'{name}.log'), encoding='utf-8') as f:
+                # 只看每条日志的首行 (消息本身可能换行)
+                lines = [line for line in f.read().splitlines() if line[:4].isdigit()]
+            assert lines and all(f'[{name}]' in line for line in lines), f"站点 {name} 的日志应带站点名称"
+            assert not any(f'[{other}]' in line for line in lines), f"站点 {name} 的日志混入了 {other}"
+        print("  ✓ 每个站点的日志带站点名称，写入各自的日志文件")
+        
+        print("✅ 控制器端到端测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 控制器端到端测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if controller is not None:
+            controller.stop()
+        server.shutdown()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 多站点控制器功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("站点分配", test_shard_sites()))
+    results.append(("检测节奏统计", test_aggregator_cadence()))
+    results.append(("停滞检查", test_stall_uses_site_interval()))
+    results.append(("指标端口释放", test_metrics_port_released()))
+    results.append(("控制器端到端", test_controller_end_to_end()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有多站点控制器功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
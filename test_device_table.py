@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+测试设备清单功能
+Test incremental device inventory
+"""
+import sys
+import os
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BOSS_MAC = "aa:bb:cc:dd:ee:ff"
+OTHER_MAC = "11:22:33:44:55:66"
+
+
+def test_merge_events():
+    """测试合并扫描结果产生的事件"""
+    print("测试合并扫描结果...")
+    try:
+        from device_table import DeviceTable
+        
+        events = []
+        table = DeviceTable(expire_after=100, on_event=events.append)
+        
+        result = table.merge([("192.168.1.100", BOSS_MAC), ("192.168.1.20", OTHER_MAC)], now=1000)
+        assert [e.kind for e in result] == ["appeared", "appeared"]
+        assert events == result, "回调应收到相同的事件"
+        print("  ✓ 新设备产生 appeared 事件")
+        
+        # 再次扫描到相同设备：只更新时间和次数
+        assert table.merge([("192.168.1.100", BOSS_MAC)], now=1050) == []
+        record = table.get(BOSS_MAC)
+        assert (record.first_seen, record.last_seen, record.seen_count) == (1000, 1050, 2)
+        print("  ✓ 重复出现只更新 last_seen / seen_count")
+        
+        # DHCP租约变化
+        result = table.merge([("192.168.1.101", BOSS_MAC)], now=1080)
+        assert len(result) == 1 and result[0].kind == "ip_changed"
+        assert (result[0].old_ip, result[0].ip) == ("192.168.1.100", "192.168.1.101")
+        assert table.get_by_ip("192.168.1.101") is record
+        assert table.get_by_ip("192.168.1.100") is None, "旧IP索引应被移除"
+        print("  ✓ IP变化产生 ip_changed 事件并更新IP索引")
+        
+        # 其他设备超过100秒未出现
+        result = table.merge([("192.168.1.101", BOSS_MAC)], now=1101)
+        assert [(e.kind, e.mac) for e in result] == [("disappeared", OTHER_MAC)]
+        assert table.get(OTHER_MAC) is None and table.get_by_ip("192.168.1.20") is None
+        assert len(table) == 1
+        print("  ✓ 超时未出现的设备产生 disappeared 事件")
+        
+        print("✅ 合并扫描结果测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 合并扫描结果测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_records_use_slots():
+    """测试设备记录使用 __slots__"""
+    print("\n测试紧凑记录...")
+    try:
+        from device_table import DeviceRecord
+        
+        record = DeviceRecord(BOSS_MAC, "192.168.1.100", 1000)
+        assert not hasattr(record, '__dict__'), "DeviceRecord 不应有 __dict__"
+        print("  ✓ DeviceRecord 没有 __dict__")
+        
+        print("✅ 紧凑记录测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 紧凑记录测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_detector_recent_sighting():
+    """测试检测器用最近的扫描结果判断在线，无需重新扫描"""
+    print("\n测试最近出现即在线...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(None, sighting_ttl=60)
+        with patch.object(detector, '_scan_shard', return_value=[("192.168.1.100", "AA:BB:CC:DD:EE:FF")]):
+            detector.scan_network("192.168.1.0/24")
+        record = detector.device_table.get(BOSS_MAC)
+        assert record is not None and record.ip == "192.168.1.100", "扫描结果应合并到设备清单"
+        print("  ✓ 扫描结果已合并到设备清单")
+        
+        detector.target_mac = BOSS_MAC
+        with patch.object(detector, '_scan_shard') as mock_scan, \
+             patch.object(detector, '_check_arp_cache') as mock_cache:
+            assert detector.is_target_online() == (True, "192.168.1.100")
+            assert mock_scan.call_count == 0 and mock_cache.call_count == 0, "不应重新探测"
+        print("  ✓ 最近出现过的目标直接判定在线")
+        
+        record.last_seen -= 120
+        with patch.object(detector, '_scan_shard', return_value=[]), \
+             patch.object(detector, '_check_arp_cache', return_value=(False, None)):
+            assert detector.is_target_online("192.168.1.0/24") == (False, None), "过期的记录不应判定在线"
+        print("  ✓ 超过 sighting_ttl 的记录需重新探测")
+        
+        print("✅ 最近出现即在线测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 最近出现即在线测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 设备清单功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("合并扫描结果", test_merge_events()))
+    results.append(("紧凑记录", test_records_use_slots()))
+    results.append(("最近出现即在线", test_detector_recent_sighting()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有设备清单功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+测试多渠道并行通知
+Test composite fan-out notifier
+"""
+import sys
+import os
+import time
+import tempfile
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_CONTENT = """[network]
+boss_mac = aa:bb:cc:dd:ee:ff
+scan_interval = 30
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+notification_title = 🚨 老板来了！
+notification_message = 老板在线
+channels = notification, notification_bot, notification_audit
+
+[notification_bot]
+service_type = webhook
+webhook_url = http://127.0.0.1:9/bot
+
+[notification_audit]
+service_type = webhook
+webhook_url = http://127.0.0.1:9/audit
+read_timeout = 3
+"""
+
+
+def _slow_service(delay, results):
+    """创建一个耗时 delay 秒、依次返回 results 的模拟渠道"""
+    results = list(results)
+    
+    def send(title, message):
+        time.sleep(delay)
+        return results.pop(0) if results else True
+    
+    service = Mock()
+    service.send = Mock(side_effect=send)
+    return service
+
+
+def test_parallel_send():
+    """测试总耗时取决于最慢的渠道"""
+    print("测试并行发送...")
+    try:
+        from notification import CompositeNotification
+        
+        channels = {name: _slow_service(0.3, [True]) for name in ("pushdeer", "bot", "audit")}
+        composite = CompositeNotification(channels)
+        start = time.monotonic()
+        assert composite.send("老板来了", "msg") is True
+        elapsed = time.monotonic() - start
+        
+        assert elapsed < 0.6, f"3个0.3秒的渠道应并行发送，实际耗时 {elapsed:.2f}s"
+        assert set(composite.last_results) == {"pushdeer", "bot", "audit"}
+        for name, result in composite.last_results.items():
+            assert result['success'] and result['latency'] >= 0.3, f"{name} 结果不正确: {result}"
+        composite.close()
+        print(f"  ✓ 3个渠道总耗时 {elapsed:.2f}s")
+        
+        print("✅ 并行发送测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 并行发送测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_retry_only_failed_channels():
+    """测试部分渠道失败时，重试只发送失败的渠道"""
+    print("\n测试部分失败重试...")
+    try:
+        from notification import CompositeNotification
+        
+        channels = {
+            "pushdeer": _slow_service(0, [True]),
+            "bot": _slow_service(0, [False, True]),
+        }
+        composite = CompositeNotification(channels)
+        assert composite.send("老板来了", "msg") is False, "有渠道失败时应返回False"
+        assert composite.last_results["bot"]['success'] is False
+        
+        assert composite.send("老板来了", "msg") is True
+        assert channels["pushdeer"].send.call_count == 1, "已成功的渠道不应重发"
+        assert channels["bot"].send.call_count == 2
+        assert composite.channel_stats["bot"]['sent'] == 1 and composite.channel_stats["bot"]['failed'] == 1
+        
+        # 新通知重新发送到所有渠道
+        assert composite.send("老板走了", "msg") is True
+        assert channels["pushdeer"].send.call_count == 2
+        composite.close()
+        print("  ✓ 只重发失败的渠道")
+        
+        print("✅ 部分失败重试测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 部分失败重试测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_dispatcher_tracks_each_job():
+    """测试经分发队列发送时，已送达的渠道按队列中的每条通知分别记录"""
+    print("\n测试按通知记录已送达渠道...")
+    try:
+        from notification import CompositeNotification
+        from notification_queue import NotificationDispatcher
+        
+        channels = {
+            "pushdeer": _slow_service(0, [True] * 4),
+            "bot": _slow_service(0, [False, True, False, True]),
+        }
+        channels["bot"].send_batch = Mock(side_effect=lambda title, message, batch: True)
+        channels["pushdeer"].send_batch = Mock(side_effect=lambda title, message, batch: True)
+        composite = CompositeNotification(channels)
+        
+        # 第一条: bot首次失败，重试时只重发bot
+        dispatcher = NotificationDispatcher(workers=1, max_retries=1, retry_backoff=0, dead_letter_file='')
+        dispatcher.submit(composite, "老板来了", "msg")
+        dispatcher.join()
+        assert channels["pushdeer"].send.call_count == 1 and channels["bot"].send.call_count == 2
+        print("  ✓ 同一条通知重试时只重发失败的渠道")
+        
+        # 第二条: 不重试，bot失败后写入死信
+        dispatcher.max_retries = 0
+        dispatcher.submit(composite, "老板来了", "msg")
+        dispatcher.join()
+        assert dispatcher.failed == 1, "第二条通知应写入死信"
+        
+        # 第三条与第二条内容相同，但是新的通知，应重新发送到所有渠道
+        dispatcher.submit(composite, "老板来了", "msg")
+        dispatcher.join()
+        assert channels["pushdeer"].send.call_count == 3, "写入死信后已送达记录应被丢弃"
+        assert channels["bot"].send.call_count == 4
+        
+        # 内容相同但事件不同的合并通知也是不同的通知
+        for batch in ([{'target': 'boss'}], [{'target': 'manager'}]):
+            dispatcher.submit(composite, "摘要", "msg", batch=batch)
+        dispatcher.join()
+        dispatcher.stop()
+        assert channels["pushdeer"].send_batch.call_count == 2 and channels["bot"].send_batch.call_count == 2
+        assert not composite._delivered, "经分发队列发送的通知不应留下记录"
+        composite.close()
+        print("  ✓ 写入死信或内容相同的新通知会重新发送到所有渠道")
+        
+        print("✅ 按通知记录已送达渠道测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 按通知记录已送达渠道测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_channels_from_config():
+    """测试从配置文件创建组合通知服务"""
+    print("\n测试渠道配置...")
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False, encoding='utf-8') as f:
+        config_file = f.name
+        f.write(CONFIG_CONTENT)
+    
+    try:
+        from boss_detect import BossDetector
+        from notification import CompositeNotification, PushDeerNotification, WebhookNotification
+        
+        with patch('boss_detect.NetworkDetector'):
+            detector = BossDetector(config_file)
+        
+        service = detector.notification_service
+        assert isinstance(service, CompositeNotification), f"应创建组合服务: {service}"
+        assert list(service.channels) == ["notification", "notification_bot", "notification_audit"]
+        assert isinstance(service.channels["notification"], PushDeerNotification)
+        assert isinstance(service.channels["notification_bot"], WebhookNotification)
+        assert service.channels["notification_audit"].read_timeout == 3
+        service.close()
+        print("  ✓ 从 channels 配置创建3个渠道")
+        
+        print("✅ 渠道配置测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 渠道配置测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(config_file):
+            os.remove(config_file)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 多渠道并行通知测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("并行发送", test_parallel_send()))
+    results.append(("部分失败重试", test_retry_only_failed_channels()))
+    results.append(("按通知记录已送达渠道", test_dispatcher_tracks_each_job()))
+    results.append(("渠道配置", test_channels_from_config()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有多渠道并行通知测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+测试设备指纹与随机MAC匹配功能
+Test OUI lookup and fingerprint matching for randomized MACs
+"""
+import sys
+import os
+import shutil
+import tempfile
+import configparser
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MAC = "aa:bb:cc:dd:ee:ff"
+RANDOM_MAC = "a6:11:22:33:44:55"
+OTHER_RANDOM_MAC = "5e:66:77:88:99:00"
+
+OUI_TEXT = """OUI/MA-L                                                    Organization
+company_id                                                  Organization
+                                                            Address
+
+00-1B-63   (hex)\t\tApple, Inc.
+001B63     (base 16)\t\tApple, Inc.
+\t\t\t\t1 Infinite Loop
+\t\t\t\tCupertino  CA  95014
+\t\t\t\tUS
+
+70-B3-D5   (hex)\t\tIEEE Registration Authority
+70B3D5     (base 16)\t\tIEEE Registration Authority
+
+3C-5A-B4   (hex)\t\tGoogle, Inc.
+"""
+
+OUI_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-M,70B3D51,"Example Sensors, Ltd",Somewhere
+MA-S,70B3D5123,Tiny Devices,Elsewhere
+"""
+
+
+def test_oui_database():
+    """测试OUI数据库解析与二分查找"""
+    print("测试OUI数据库...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from fingerprint import OuiDatabase, load_oui_database
+        
+        database = OuiDatabase(OuiDatabase.parse(OUI_TEXT) + OuiDatabase.parse(OUI_CSV))
+        assert len(database) == 5, f"前缀数不正确: {len(database)}"
+        assert database.lookup("00:1b:63:12:34:56") == "Apple, Inc."
+        assert database.lookup("3C-5A-B4-00-00-01") == "Google, Inc."
+        assert database.lookup("00:00:00:00:00:01") is None, "未登记的前缀应返回None"
+        print("  ✓ 解析 oui.txt 并按前缀查询厂商")
+        
+        assert database.lookup("70:b3:d5:12:3f:ff") == "Tiny Devices", "应优先匹配最长前缀 (MA-S)"
+        assert database.lookup("70:b3:d5:1f:00:00") == "Example Sensors, Ltd", "MA-M"
+        assert database.lookup("70:b3:d5:ff:00:00") == "IEEE Registration Authority", "MA-L"
+        print("  ✓ MA-S/MA-M/MA-L 最长前缀优先")
+        
+        assert database.lookup(RANDOM_MAC) is None, "本地管理地址不对应厂商"
+        assert database.describe(RANDOM_MAC) == "随机MAC"
+        assert database.describe("00:1b:63:00:00:01") == "Apple, Inc."
+        print("  ✓ 随机MAC不查询厂商")
+        
+        oui_file = os.path.join(temp_dir, 'oui.txt')
+        with open(oui_file, 'w', encoding='utf-8') as f:
+            f.write(OUI_TEXT)
+        loaded = load_oui_database((oui_file,))
+        assert loaded is not None and loaded.lookup("00:1b:63:00:00:01") == "Apple, Inc."
+        assert load_oui_database((oui_file,)) is loaded, "同一文件只应解析一次"
+        assert load_oui_database((os.path.join(temp_dir, 'missing.txt'),)) is None, "文件不存在时返回None"
+        print("  ✓ 读取文件并缓存")
+        
+        print("✅ OUI数据库测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ OUI数据库测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_fingerprint_index():
+    """测试指纹规则与关联"""
+    print("\n测试指纹索引...")
+    try:
+        from fingerprint import (FingerprintIndex, FingerprintRule, parse_rule, normalize_name,
+                                 is_locally_administered)
+        
+        assert is_locally_administered(RANDOM_MAC) and not is_locally_administered("00:1b:63:00:00:01")
+        assert normalize_name(b"Bosss-iPhone.local.") == "bosss-iphone"
+        assert parse_rule("hostname=Bosss-iPhone, mdns=Bosss-iPhone.local") == \
+            FingerprintRule("bosss-iphone", "bosss-iphone", None)
+        for bad in ("", "hostname", "serial=123", "hostname="):
+            try:
+                parse_rule(bad)
+                raise AssertionError(f"应拒绝无效规则: {bad!r}")
+            except ValueError:
+                pass
+        print("  ✓ 规则解析与名称规范化")
+        
+        index = FingerprintIndex([
+            (TARGET_MAC, parse_rule("hostname=Bosss-iPhone, vendor_class=android-dhcp-13")),
+            ("11:22:33:44:55:66", parse_rule("mdns=managers-pixel")),
+            ("22:33:44:55:66:77", parse_rule("vendor_class=special-firmware")),
+        ], max_learned=2)
+        assert index.observe(RANDOM_MAC, hostname="BOSSS-IPHONE") == TARGET_MAC
+        assert index.match(RANDOM_MAC) == TARGET_MAC and index.macs_for(TARGET_MAC) == [RANDOM_MAC]
+        assert index.match(OTHER_RANDOM_MAC) is None
+        print("  ✓ DHCP主机名关联随机MAC")
+        
+        assert index.observe(OTHER_RANDOM_MAC, hostname="bosss-iphone", vendor_class="MSFT 5.0") is None, \
+            "厂商类别不一致时不应关联"
+        assert index.observe(OTHER_RANDOM_MAC, mdns_name="Managers-Pixel.local.") == "11:22:33:44:55:66", \
+            "mDNS名称匹配另一个目标"
+        assert index.fingerprint(OTHER_RANDOM_MAC).hostname == "bosss-iphone", "之前观察到的字段应保留"
+        print("  ✓ 厂商类别约束与mDNS名称")
+        
+        assert index.observe("00:1b:63:00:00:01", vendor_class="special-firmware") is None, \
+            "只有厂商类别的规则不应关联全局MAC"
+        assert index.observe("02:00:00:00:00:01", vendor_class="special-firmware") == "22:33:44:55:66:77"
+        print("  ✓ 只有厂商类别的规则只关联随机MAC")
+        
+        index.observe("02:00:00:00:00:02", hostname="bosss-iphone")
+        index.observe("02:00:00:00:00:03", hostname="bosss-iphone")
+        assert index.macs_for(TARGET_MAC) == ["02:00:00:00:00:03", "02:00:00:00:00:02"], index.macs_for(TARGET_MAC)
+        assert index.match(RANDOM_MAC) is None, "超过上限时应丢弃最早关联的MAC"
+        index.observe("02:00:00:00:00:03", hostname="someone-else")
+        assert index.match("02:00:00:00:00:03") is None, "主机名变化后应解除关联"
+        print("  ✓ 关联数量上限与名称变化")
+        
+        reloaded = FingerprintIndex([(TARGET_MAC, parse_rule("mdns=managers-pixel"))])
+        reloaded.inherit(index)
+        assert reloaded.match(OTHER_RANDOM_MAC) == TARGET_MAC, "继承的指纹应按新规则重新关联"
+        assert reloaded.match("02:00:00:00:00:02") is None
+        assert not FingerprintIndex() and FingerprintIndex().observe(RANDOM_MAC, hostname="x") is None
+        print("  ✓ 重新加载配置时继承指纹")
+        
+        print("✅ 指纹索引测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 指纹索引测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_detector_random_mac():
+    """测试检测器通过指纹识别随机MAC"""
+    print("\n测试检测器随机MAC匹配...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        from fingerprint import parse_rule
+        from network_detector import NetworkDetector
+        from router_backend import DnsmasqLeaseSource
+        
+        rules = [(TARGET_MAC, parse_rule("hostname=Bosss-iPhone"))]
+        detector = NetworkDetector(TARGET_MAC, fingerprints=rules)
+        devices = [("192.168.1.10", "00:1b:63:00:00:01"), ("192.168.1.50", RANDOM_MAC.upper())]
+        with patch.object(detector, '_sweep', return_value=iter(devices)):
+            assert detector._sweep_for_target("192.168.1.0/24") == (False, None), "未学习指纹前不应匹配随机MAC"
+        
+        detector.fingerprints.observe(RANDOM_MAC, hostname="Bosss-iPhone")
+        with patch.object(detector, '_sweep', return_value=iter(devices)):
+            assert detector._sweep_for_target("192.168.1.0/24") == (True, "192.168.1.50")
+        print("  ✓ 全网段扫描匹配关联的随机MAC")
+        
+        assert detector.is_target_mac(TARGET_MAC.upper()) and detector.is_target_mac(RANDOM_MAC)
+        assert detector.target_macs() == [TARGET_MAC, RANDOM_MAC]
+        assert detector.find_recent_sighting(60) == (True, "192.168.1.50"), "设备清单中应能找到关联的MAC"
+        assert detector._candidate_mac("192.168.1.50") == RANDOM_MAC, "单播ARP应发往随机MAC"
+        assert detector._candidate_mac("192.168.1.99") == "ff:ff:ff:ff:ff:ff", "不知道IP对应哪个MAC时应广播"
+        with patch.object(detector, 'unicast_arp', return_value=[("192.168.1.50", RANDOM_MAC)]) as mock_arp:
+            assert detector.probe_mac(TARGET_MAC, "192.168.1.50")
+            assert mock_arp.call_args[0][0] == {"192.168.1.50": RANDOM_MAC}
+        print("  ✓ 设备清单、单播ARP和离线确认使用关联的MAC")
+        
+        leases = os.path.join(temp_dir, 'dhcp.leases')
+        with open(leases, 'w') as f:
+            f.write(f"0 {OTHER_RANDOM_MAC} 192.168.1.60 Bosss-iPhone *\n"
+                    "0 00:1b:63:00:00:01 192.168.1.10 desktop *\n")
+        router = NetworkDetector(TARGET_MAC, probe_chain=['router'], fingerprints=rules,
+                                 backend_options={'router': {'sources': [DnsmasqLeaseSource(leases)],
+                                                             'authoritative': True}})
+        assert router.is_target_online() == (True, "192.168.1.60"), "路由器租约中的主机名应关联随机MAC"
+        
+        multi = NetworkDetector(None, fingerprints=rules)
+        multi.fingerprints.observe(RANDOM_MAC, hostname="bosss-iphone")
+        mac_index = {TARGET_MAC: 'boss', "11:22:33:44:55:66": 'manager'}
+        with patch.object(multi, 'scan_network', return_value=devices):
+            assert multi.match_targets(mac_index) == {'boss': "192.168.1.50"}
+        print("  ✓ 路由器租约和多目标匹配")
+        
+        reloaded = NetworkDetector(TARGET_MAC, fingerprints=rules)
+        reloaded.inherit_state(detector)
+        assert reloaded.is_target_mac(RANDOM_MAC), "重新加载配置后应保留学习到的关联"
+        print("  ✓ 重新加载配置后保留关联")
+        
+        print("✅ 检测器随机MAC匹配测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 检测器随机MAC匹配测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_passive_random_mac():
+    """测试被动监听从DHCP/mDNS学习随机MAC"""
+    print("\n测试被动监听指纹学习...")
+    try:
+        from scapy.layers.l2 import ARP, Ether
+        from scapy.layers.inet import IP, UDP
+        from scapy.layers.dhcp import BOOTP, DHCP
+        from scapy.layers.dns import DNS, DNSRR
+        from fingerprint import FingerprintIndex, parse_rule
+        from presence_sniffer import PassivePresenceEngine, build_bpf_filter
+        
+        index = FingerprintIndex([(TARGET_MAC, parse_rule("hostname=Bosss-iPhone, mdns=Bosss-iPhone"))])
+        engine = PassivePresenceEngine([TARGET_MAC], fingerprints=index)
+        assert "ether src" not in build_bpf_filter(()), "配置指纹时不应按来源MAC过滤"
+        
+        arp = Ether(src=RANDOM_MAC)/ARP(hwsrc=RANDOM_MAC, psrc="192.168.1.50")
+        engine.handle_packet(Ether(bytes(arp)), timestamp=100)
+        assert engine.wait_event(timeout=0) is None, "未学习指纹前不应视为目标"
+        
+        request = (Ether(src=RANDOM_MAC)/IP(src="0.0.0.0", dst="255.255.255.255")/UDP(sport=68, dport=67)
+                   /BOOTP(chaddr=bytes.fromhex(RANDOM_MAC.replace(':', '')))
+                   /DHCP(options=[('message-type', 'request'), ('requested_addr', '192.168.1.50'),
+                                  ('hostname', b'Bosss-iPhone'), 'end']))
+        engine.handle_packet(Ether(bytes(request)), timestamp=110)
+        event = engine.wait_event(timeout=0)
+        assert event is not None and event.kind == 'arrive', "DHCP主机名匹配后应上线"
+        assert event.mac == TARGET_MAC and event.ip == "192.168.1.50", f"事件应使用目标MAC: {event}"
+        
+        engine.handle_packet(Ether(bytes(arp)), timestamp=200)
+        assert engine.last_seen[TARGET_MAC] == 200, "关联后随机MAC的ARP也应刷新在线时间"
+        print("  ✓ DHCP选项12关联随机MAC，之后的ARP按目标处理")
+        
+        response = (Ether(src=OTHER_RANDOM_MAC)/IP(src="192.168.1.61", dst="224.0.0.251")/UDP(sport=5353, dport=5353)
+                    /DNS(qr=1, aa=1, an=[DNSRR(rrname='Bosss-iPhone.local.', type='A', rdata='192.168.1.61')]))
+        engine.handle_packet(Ether(bytes(response)), timestamp=210)
+        assert index.match(OTHER_RANDOM_MAC) == TARGET_MAC, "mDNS主机名应关联随机MAC"
+        assert engine.last_ip[TARGET_MAC] == "192.168.1.61"
+        print("  ✓ mDNS应答关联随机MAC")
+        
+        print("✅ 被动监听指纹学习测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 被动监听指纹学习测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_concurrent_reads():
+    """测试抓包线程更新关联时，其他线程读取关联不会出错"""
+    print("\n测试并发读取...")
+    try:
+        import threading
+        from fingerprint import FingerprintIndex, parse_rule
+        
+        index = FingerprintIndex([(TARGET_MAC, parse_rule("hostname=Bosss-iPhone"))], max_learned=4)
+        stop = threading.Event()
+        
+        def sniff():
+            i = 0
+            while not stop.is_set():
+                index.observe(f"02:00:00:00:{(i >> 8) & 0xff:02x}:{i & 0xff:02x}", hostname="bosss-iphone")
+                i += 1
+        
+        thread = threading.Thread(target=sniff, daemon=True)
+        thread.start()
+        try:
+            for _ in range(20000):
+                macs = index.macs_for(TARGET_MAC)
+                assert len(macs) <= 4
+                learned = index.learned()
+                assert all(target == TARGET_MAC for target in learned.values())
+                for mac in macs:
+                    index.match(mac)
+                    index.fingerprint(mac)
+        finally:
+            stop.set()
+            thread.join()
+        print("  ✓ 读取关联与抓包线程的更新互不干扰")
+        
+        print("✅ 并发读取测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 并发读取测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_no_name_source_warning():
+    """测试主动模式下探测链没有 router 后端时警告指纹规则不会生效"""
+    print("\n测试名称来源警告...")
+    temp_dir = tempfile.mkdtemp()
+    try:
+        import boss_detect
+        from boss_detect import BossDetector
+        
+        base = (f"[network]\nboss_mac = {TARGET_MAC}\n{{mode}}\n[notification]\nservice_type = pushdeer\n"
+                "pushdeer_key = test_key\n[fingerprints]\nboss = hostname=Bosss-iPhone\n")
+        for mode, expected in (('', True), ('detection_mode = passive', False),
+                               ('[advanced]\nsighting_ttl = 60', False)):
+            config_file = os.path.join(temp_dir, 'config.ini')
+            with open(config_file, 'w', encoding='utf-8') as f:
+                f.write(base.format(mode=mode))
+            with patch.object(boss_detect.logger, 'warning') as warning:
+                detector = BossDetector(config_file)
+            detector.close()
+            warned = any('router' in str(call.args[0]) for call in warning.call_args_list)
+            assert warned == expected, f"{mode or '主动模式'} 下警告不正确: {warning.call_args_list}"
+        print("  ✓ 主动模式没有 router 后端时警告，被动模式或 sighting 后端监听时不警告")
+        
+        print("✅ 名称来源警告测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 名称来源警告测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def test_fingerprint_settings():
+    """测试 [fingerprints] 配置解析"""
+    print("\n测试指纹配置...")
+    try:
+        from fingerprint import FingerprintRule
+        from settings import SettingsError, parse_settings
+        
+        def parse(text):
+            config = configparser.ConfigParser()
+            config.read_string(text)
+            return parse_settings(config)
+        
+        base = (f"[network]\nboss_mac = {TARGET_MAC.upper()}\n[notification]\nservice_type = pushdeer\n"
+                "pushdeer_key = test_key\n[advanced]\noui_file = /usr/share/ieee-data/oui.txt, mam.csv\n")
+        settings = parse(base + "[fingerprints]\nboss = hostname=Bosss-iPhone, vendor_class=android-dhcp-13\n")
+        assert settings.detector.fingerprints == ((TARGET_MAC, FingerprintRule("bosss-iphone", None, "android-dhcp-13")),)
+        assert settings.detector.oui_files == ("/usr/share/ieee-data/oui.txt", "mam.csv")
+        assert parse(base).detector.fingerprints == ()
+        print("  ✓ 单目标模式使用 boss 作为目标名称")
+        
+        multi = (base + "[targets]\nmanager = 11:22:33:44:55:66\n[fingerprints]\nmanager = mdns=managers-pixel\n")
+        assert parse(multi).detector.fingerprints == (("11:22:33:44:55:66", FingerprintRule(None, "managers-pixel", None)),)
+        for bad in ("[fingerprints]\nnobody = hostname=x\n", "[fingerprints]\nboss = serial=1\n"):
+            try:
+                parse(base + bad)
+                raise AssertionError(f"应拒绝: {bad!r}")
+            except SettingsError as e:
+                print(f"  ✓ 拒绝无效配置: {e}")
+        
+        print("✅ 指纹配置测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 指纹配置测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 设备指纹功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("OUI数据库", test_oui_database()))
+    results.append(("指纹索引", test_fingerprint_index()))
+    results.append(("检测器随机MAC匹配", test_detector_random_mac()))
+    results.append(("被动监听指纹学习", test_passive_random_mac()))
+    results.append(("并发读取", test_concurrent_reads()))
+    results.append(("名称来源警告", test_no_name_source_warning()))
+    results.append(("指纹配置", test_fingerprint_settings()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有设备指纹功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
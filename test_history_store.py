@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+测试在线历史记录
+Test presence history store and time-range queries
+"""
+import sys
+import os
+import io
+import time
+import shutil
+import tempfile
+from contextlib import redirect_stdout
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+MAC = "aa:bb:cc:dd:ee:ff"
+HOUR = 3600
+
+
+def test_sessions_and_dwell():
+    """测试在线时段、总在线时长和到达时间分布"""
+    print("测试时段查询...")
+    directory = tempfile.mkdtemp()
+    try:
+        from history_store import HistoryStore
+        
+        store = HistoryStore(os.path.join(directory, 'history.db'))
+        base = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+        for ts, kind in [(8, 'arrival'), (12, 'departure'), (13, 'arrival'), (18, 'departure'),
+                         (33, 'arrival'), (36, 'departure'), (57, 'arrival')]:
+            store.record_transition(MAC, kind, "192.168.1.100", "boss", timestamp=base + ts * HOUR)
+        store.record_transition("11:22:33:44:55:66", 'arrival', timestamp=base + 9 * HOUR)
+        store.close()
+        
+        sessions = store.sessions(MAC, base + 10 * HOUR, base + 40 * HOUR)
+        assert sessions == [(base + 10 * HOUR, base + 12 * HOUR), (base + 13 * HOUR, base + 18 * HOUR),
+                            (base + 33 * HOUR, base + 36 * HOUR)], f"时段不正确: {sessions}"
+        print("  ✓ 跨越查询起点的时段被截取")
+        
+        dwell = store.dwell_time(MAC, base, base + 48 * HOUR)
+        assert dwell == 12 * HOUR, f"总时长不正确: {dwell / HOUR}小时"
+        dwell = store.dwell_time(MAC, base, base + 60 * HOUR, now=base + 59 * HOUR)
+        assert dwell == 14 * HOUR, f"仍在线的时段应计算到当前时间: {dwell / HOUR}小时"
+        print("  ✓ 总在线时长正确")
+        
+        histogram = store.arrival_histogram(MAC, base, base + 60 * HOUR)
+        assert histogram[8] == 1 and histogram[9] == 2 and histogram[13] == 1 and sum(histogram) == 4, histogram
+        print("  ✓ 到达时间分布正确")
+        
+        print("✅ 时段查询测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 时段查询测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_batched_writes():
+    """测试写入只入队，由后台线程批量提交"""
+    print("\n测试批量写入...")
+    directory = tempfile.mkdtemp()
+    try:
+        from history_store import HistoryStore, connect
+        
+        path = os.path.join(directory, 'history.db')
+        store = HistoryStore(path, batch_size=1000)
+        start = time.perf_counter()
+        for i in range(10000):
+            store.record_probe(MAC, i % 2, "192.168.1.100", timestamp=i)
+        elapsed = time.perf_counter() - start
+        assert elapsed < 0.5, f"记录1万条探测结果耗时过长: {elapsed:.2f}s"
+        
+        store.flush()
+        conn = connect(path)
+        assert conn.execute('SELECT COUNT(*) FROM probes').fetchone()[0] == 10000
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        conn.close()
+        store.close()
+        print(f"  ✓ 1万条记录入队耗时 {elapsed * 1000:.0f}ms，全部写入WAL数据库")
+        
+        print("✅ 批量写入测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 批量写入测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_query_speed_with_million_rows():
+    """测试百万行数据下的查询速度"""
+    print("\n测试百万行查询...")
+    directory = tempfile.mkdtemp()
+    try:
+        from history_store import HistoryStore, connect
+        
+        path = os.path.join(directory, 'history.db')
+        conn = connect(path)
+        macs = [f"02:00:00:00:{i // 256:02x}:{i % 256:02x}" for i in range(500)]
+        with conn:
+            conn.executemany('INSERT INTO probes VALUES (?, ?, 1, NULL)',
+                             ((i * 0.6, macs[i % 500]) for i in range(500000)))
+            conn.executemany('INSERT INTO transitions VALUES (?, ?, NULL, ?, NULL)',
+                             ((i * 3.0, macs[i % 500], 'arrival' if (i // 500) % 2 == 0 else 'departure')
+                              for i in range(500000)))
+        conn.close()
+        
+        store = HistoryStore(path)
+        start = time.perf_counter()
+        sessions = store.sessions(macs[7], 500000, 500000 + 7 * 86400)
+        dwell = store.dwell_time(macs[7], 0, 3000000)
+        histogram = store.arrival_histogram(macs[7], 0, 3000000)
+        elapsed = time.perf_counter() - start
+        
+        assert sessions and dwell > 0 and sum(histogram) == 500
+        assert elapsed < 0.5, f"查询耗时过长: {elapsed:.2f}s"
+        print(f"  ✓ 100万行数据中查询时段、总时长和分布共耗时 {elapsed * 1000:.0f}ms")
+        
+        print("✅ 百万行查询测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 百万行查询测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_cli():
+    """测试命令行查询"""
+    print("\n测试命令行...")
+    directory = tempfile.mkdtemp()
+    try:
+        from history_store import HistoryStore, main as cli_main
+        
+        path = os.path.join(directory, 'history.db')
+        store = HistoryStore(path)
+        now = time.time()
+        store.record_transition(MAC, 'arrival', timestamp=now - 3 * HOUR)
+        store.record_transition(MAC, 'departure', timestamp=now - HOUR)
+        store.close()
+        
+        output = io.StringIO()
+        with redirect_stdout(output):
+            assert cli_main(['--db', path, 'sessions', '--mac', 'AA-BB-CC-DD-EE-FF', '--since', '1d']) == 0
+            assert cli_main(['--db', path, 'dwell', '--mac', MAC, '--since', '1d']) == 0
+        text = output.getvalue()
+        assert "共 1 个在线时段" in text and "总在线时长: 2小时0分钟" in text, text
+        print("  ✓ sessions/dwell 命令输出正确")
+        
+        print("✅ 命令行测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 命令行测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 在线历史记录测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("时段查询", test_sessions_and_dwell()))
+    results.append(("批量写入", test_batched_writes()))
+    results.append(("百万行查询", test_query_speed_with_million_rows()))
+    results.append(("命令行", test_cli()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有在线历史记录测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -86,6 +86,7 @@ notification_cooldown = 300
             
             # 测试到达通知
             detector._send_notification('192.168.1.100', is_arrival=True)
+            detector.dispatcher.join()
             call_args = mock_service.send.call_args
             assert call_args is not None, "应该调用了send方法"
             title, message = call_args[0]
@@ -98,6 +99,7 @@ notification_cooldown = 300
             
             # 测试离开通知
             detector._send_notification('192.168.1.100', is_arrival=False)
+            detector.dispatcher.join()
             call_args = mock_service.send.call_args
             assert call_args is not None, "应该调用了send方法"
             title, message = call_args[0]
@@ -175,6 +177,7 @@ notification_cooldown = 0
                     detector.last_known_ip = ip
                     detector.detection_count = 0
                     detector._send_notification(ip, is_arrival=True)
+                    detector.dispatcher.join()
             
             assert mock_service.send.call_count == 1, "应该发送一次到达通知"
             arrival_call = mock_service.send.call_args_list[0]
@@ -192,6 +195,7 @@ notification_cooldown = 0
             if not is_online and detector.boss_online:
                 detector.boss_online = False
                 detector._send_notification(detector.last_known_ip, is_arrival=False)
+                detector.dispatcher.join()
                 detector.last_known_ip = None
             
             assert mock_service.send.call_count == 1, "应该发送一次离开通知"
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+测试运行指标功能
+Test metrics registry and /metrics endpoint
+"""
+import sys
+import os
+import time
+import shutil
+import socket
+import tempfile
+import urllib.request
+import urllib.error
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample(text, series):
+    """从指标文本中取出某条时间序列的值"""
+    for line in text.splitlines():
+        if line.startswith(series + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+def test_registry_render():
+    """测试指标注册与文本格式"""
+    print("测试指标文本格式...")
+    try:
+        from metrics import MetricsRegistry
+        
+        registry = MetricsRegistry()
+        requests_total = registry.counter('demo_requests_total', '请求数', ('path',))
+        requests_total.labels('/a').inc()
+        requests_total.labels(path='/a').inc(2)
+        requests_total.labels('say "hi"').inc()
+        registry.gauge('demo_online', '在线数').set(3)
+        latency = registry.histogram('demo_seconds', '耗时', buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            latency.observe(value)
+        
+        assert registry.counter('demo_requests_total', '请求数', ('path',)) is requests_total, "重复注册应返回同一指标"
+        try:
+            registry.gauge('demo_requests_total', '请求数')
+            raise AssertionError("不同类型同名指标应报错")
+        except ValueError:
+            pass
+        
+        text = registry.render()
+        assert '# TYPE demo_requests_total counter' in text
+        assert sample(text, 'demo_requests_total{path="/a"}') == 3
+        assert sample(text, 'demo_requests_total{path="say \\"hi\\""}') == 1, "标签值中的引号应转义"
+        assert sample(text, 'demo_online') == 3
+        print("  ✓ 计数器与仪表输出正确")
+        
+        assert '# TYPE demo_seconds histogram' in text
+        assert sample(text, 'demo_seconds_bucket{le="0.1"}') == 2, "桶上界应包含等于上界的值"
+        assert sample(text, 'demo_seconds_bucket{le="1"}') == 3, "桶计数应累计"
+        assert sample(text, 'demo_seconds_bucket{le="+Inf"}') == 4
+        assert sample(text, 'demo_seconds_count') == 4
+        assert abs(sample(text, 'demo_seconds_sum') - 2.65) < 1e-9
+        print("  ✓ 直方图累计桶、总和与计数正确")
+        
+        print("✅ 指标文本格式测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 指标文本格式测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_metrics_endpoint():
+    """测试 /metrics HTTP服务"""
+    print("\n测试 /metrics 服务...")
+    try:
+        from metrics import MetricsRegistry, start_metrics_server, stop_metrics_server
+        
+        registry = MetricsRegistry()
+        registry.counter('demo_total', '示例').inc(5)
+        server = start_metrics_server(0, registry=registry)
+        try:
+            host, port = server.server_address
+            assert host == '127.0.0.1', "默认只监听本机"
+            with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=5) as response:
+                assert response.status == 200
+                assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+                text = response.read().decode('utf-8')
+            assert sample(text, 'demo_total') == 5, text
+            print("  ✓ /metrics 返回Prometheus文本")
+            
+            try:
+                urllib.request.urlopen(f'http://{host}:{port}/other', timeout=5)
+                raise AssertionError("其他路径应返回404")
+            except urllib.error.HTTPError as e:
+                assert e.code == 404
+            print("  ✓ 其他路径返回404")
+        finally:
+            stop_metrics_server(server)
+        
+        server = start_metrics_server(port, registry=registry)
+        try:
+            with urllib.request.urlopen(f'http://{host}:{port}/metrics', timeout=5) as response:
+                assert sample(response.read().decode('utf-8'), 'demo_total') == 5
+        finally:
+            stop_metrics_server(server)
+        print("  ✓ 停止后可在同一端口重新启动")
+        
+        print("✅ /metrics 服务测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ /metrics 服务测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_metrics_reload():
+    """测试重新加载 [metrics] 配置后在同一端口重新启动服务"""
+    print("\n测试重新加载指标服务...")
+    directory = tempfile.mkdtemp()
+    detector = None
+    try:
+        from boss_detect import BossDetector
+        from settings import load_settings
+        
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        
+        path = os.path.join(directory, 'config.ini')
+        config = ("[network]\nboss_mac = aa:bb:cc:dd:ee:ff\n[notification]\nservice_type = pushdeer\n"
+                  "pushdeer_key = test_key\n[metrics]\nport = {port}\nbind = {bind}\n")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(config.format(port=port, bind='127.0.0.1'))
+        
+        with patch('boss_detect.NetworkDetector') as mock_detector_class, \
+             patch('boss_detect.create_notification_service'):
+            mock_detector_class.return_value = Mock()
+            detector = BossDetector(path)
+            first = detector.metrics_server
+            assert first is not None
+            
+            # localhost 与 127.0.0.1 是同一地址，配置变化但端口相同
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(config.format(port=port, bind='localhost'))
+            assert 'metrics_server' in detector.apply_settings(load_settings(path))
+            assert detector.metrics_server is not None and detector.metrics_server is not first, "应在同一端口重新启动"
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+                assert response.status == 200
+            print("  ✓ 原服务的socket已关闭，新服务在同一端口响应 /metrics")
+        
+        print("✅ 重新加载指标服务测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 重新加载指标服务测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if detector is not None:
+            detector.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def test_instrumentation():
+    """测试扫描、探测与通知的埋点"""
+    print("\n测试埋点...")
+    try:
+        from metrics import REGISTRY
+        from network_detector import NetworkDetector
+        from notification_queue import NotificationDispatcher
+        
+        before = REGISTRY.render()
+        detector = NetworkDetector("aa:bb:cc:dd:ee:ff")
+        devices = [("192.168.1.%d" % i, "00:11:22:33:44:%02x" % i) for i in range(1, 8)]
+        with patch.object(detector, '_sweep', return_value=iter(devices)):
+            assert len(list(detector.scan_network_iter("192.168.1.0/24"))) == 7
+        detector._record_tier('ping', True, time.perf_counter())
+        detector._record_tier('ping', False, time.perf_counter())
+        
+        service = Mock()
+        service.send.return_value = False
+        service.__class__.__name__ = 'WebhookNotification'
+        dispatcher = NotificationDispatcher(workers=1, max_retries=1, retry_backoff=0, dead_letter_file='')
+        dispatcher.submit(service, "标题", "内容")
+        dispatcher.join()
+        dispatcher.stop()
+        after = REGISTRY.render()
+        
+        def delta(series):
+            return (sample(after, series) or 0) - (sample(before, series) or 0)
+        
+        assert delta('boss_detect_sweep_seconds_count') == 1, "完整扫描应记录一次耗时"
+        assert delta('boss_detect_devices_seen_sum') == 7, "应记录发现的设备数"
+        assert delta('boss_detect_devices_seen_bucket{le="10"}') == 1
+        print("  ✓ 扫描耗时与设备数已记录")
+        
+        assert delta('boss_detect_probe_seconds_count{tier="ping",result="hit"}') == 1
+        assert delta('boss_detect_probe_seconds_count{tier="ping",result="miss"}') == 1
+        print("  ✓ 探测层级耗时按命中/未命中记录")
+        
+        assert delta('boss_detect_notification_send_seconds_count{channel="webhook",result="failure"}') == 2
+        assert delta('boss_detect_notification_failures_total{channel="webhook"}') == 2, "重试也应计入失败"
+        assert delta('boss_detect_notification_dead_letters_total') == 1
+        print("  ✓ 通知耗时、失败与死信已记录")
+        
+        print("✅ 埋点测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 埋点测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_overhead():
+    """测量埋点开销"""
+    print("\n测量埋点开销...")
+    try:
+        from metrics import MetricsRegistry
+        
+        registry = MetricsRegistry()
+        histogram = registry.histogram('demo_seconds', '耗时', ('tier', 'result'))
+        rounds = 100000
+        
+        started = time.perf_counter()
+        for i in range(rounds):
+            histogram.labels('ping', 'hit').observe(0.003)
+        per_observe = (time.perf_counter() - started) / rounds
+        
+        started = time.perf_counter()
+        for i in range(rounds):
+            time.perf_counter() - started
+        baseline = (time.perf_counter() - started) / rounds
+        
+        # 一轮检测最多约6次记录 (各探测层级 + 扫描 + 设备数 + 本轮耗时)
+        per_cycle = (per_observe - baseline) * 6
+        print(f"  单次记录 {per_observe * 1e6:.2f}µs，每轮约 {per_cycle * 1e6:.1f}µs")
+        assert per_observe < 20e-6, f"单次记录开销过大: {per_observe * 1e6:.1f}µs"
+        assert per_cycle < 100e-6, "每轮开销应小于10ms探测耗时的1%"
+        print("  ✓ 埋点开销可忽略")
+        
+        print("✅ 埋点开销测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 埋点开销测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 运行指标功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("指标文本格式", test_registry_render()))
+    results.append(("/metrics服务", test_metrics_endpoint()))
+    results.append(("重新加载指标服务", test_metrics_reload()))
+    results.append(("埋点", test_instrumentation()))
+    results.append(("埋点开销", test_overhead()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有运行指标功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+测试多接口并行扫描功能
+Test multi-interface concurrent scanning
+"""
+import sys
+import os
+import time
+import threading
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _vlans():
+    """三个VLAN子接口"""
+    from interfaces import InterfaceInfo
+    return [InterfaceInfo(f"eth0.{vlan}", f"02:00:00:00:00:{vlan:02x}", f"10.0.{vlan}.1", f"10.0.{vlan}.0/24")
+            for vlan in (10, 20, 30)]
+
+
+def test_list_interfaces():
+    """测试通过 if_nameindex 枚举可扫描的接口"""
+    print("测试接口枚举...")
+    try:
+        from interfaces import list_interfaces, IFF_UP, IFF_LOOPBACK
+        
+        flags = {"lo": IFF_UP | IFF_LOOPBACK, "eth0": IFF_UP, "eth0.10": IFF_UP, "eth0.20": 0, "ifb0": IFF_UP}
+        addresses = {
+            "lo": ("00:00:00:00:00:00", "127.0.0.1", "255.0.0.0"),
+            "eth0": ("02:00:00:00:00:01", "192.168.1.2", "255.255.255.0"),
+            "eth0.10": ("02:00:00:00:00:01", "10.0.10.1", "255.255.254.0"),
+            "eth0.20": ("02:00:00:00:00:01", "10.0.20.1", "255.255.255.0"),
+        }
+        
+        def interface_info(name):
+            if name not in addresses:
+                raise OSError(99, "Cannot assign requested address")
+            return addresses[name]
+        
+        with patch('socket.if_nameindex', return_value=[(i, name) for i, name in enumerate(flags, 1)]), \
+             patch('interfaces.get_interface_flags', side_effect=flags.get), \
+             patch('interfaces.get_interface_info', side_effect=interface_info):
+            interfaces = list_interfaces()
+            assert [info.name for info in interfaces] == ["eth0", "eth0.10"], f"枚举结果不正确: {interfaces}"
+            assert interfaces[1].network == "10.0.10.0/23"
+            print("  ✓ 跳过回环、未启用和没有IPv4地址的接口")
+            
+            assert [info.name for info in list_interfaces(["eth0.20", "ifb0"])] == ["eth0.20"]
+            print("  ✓ 指定接口时不要求已启用，无法读取的接口被跳过")
+        
+        print("✅ 接口枚举测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 接口枚举测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_parallel_interfaces():
+    """测试每个接口一个扫描线程并合并结果"""
+    print("\n测试多接口并行扫描...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(None, scan_interfaces=["all"], sweep_rate=500)
+        calls = []
+        threads = set()
+        
+        def scan_shard(shard, inter=0, on_reply=None, interface=None):
+            calls.append((shard, interface))
+            threads.add(threading.current_thread().name)
+            time.sleep(0.3)
+            vlan = shard.split('.')[2]
+            return [(f"10.0.{vlan}.50", f"aa:bb:cc:dd:ee:{vlan}"), ("10.0.0.1", "00:11:22:33:44:01")]
+        
+        with patch('network_detector.list_interfaces', return_value=_vlans()), \
+             patch.object(detector, '_scan_shard', side_effect=scan_shard):
+            start = time.monotonic()
+            devices = detector.scan_network()
+            elapsed = time.monotonic() - start
+        
+        assert sorted(calls) == [("10.0.10.0/24", "eth0.10"), ("10.0.20.0/24", "eth0.20"),
+                                 ("10.0.30.0/24", "eth0.30")], f"接口与网段不对应: {calls}"
+        assert elapsed < 0.8, f"各接口应并行扫描，实际 {elapsed:.2f}s"
+        assert len(devices) == 4, f"重复应答应合并: {devices}"
+        assert detector.device_table.get("aa:bb:cc:dd:ee:20").ip == "10.0.20.50"
+        print(f"  ✓ 3个接口并行扫描耗时 {elapsed:.2f}s，结果合并到同一设备清单")
+        
+        stats = detector.get_interface_stats()
+        assert sorted(stats) == ["eth0.10", "eth0.20", "eth0.30"]
+        assert stats["eth0.10"]["sweeps"] == 1 and stats["eth0.10"]["devices"] == 2
+        assert stats["eth0.10"]["last_duration"] >= 0.3 and stats["eth0.10"]["rate_limit"] == 500
+        print("  ✓ 每个接口单独统计扫描耗时、设备数和限速")
+        
+        print("✅ 多接口并行扫描测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 多接口并行扫描测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ranges_and_unicast_routing():
+    """测试配置网段分配到所在接口，单播探测从对应接口发出"""
+    print("\n测试网段与接口对应...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(None, network_interface="eth0", scan_interfaces=["eth0.10", "eth0.20"],
+                                   scan_ranges=["10.0.10.0/25", "10.0.20.0/24", "172.16.0.0/24"])
+        with patch('network_detector.list_interfaces', return_value=_vlans()[:2]):
+            jobs = detector._interface_jobs()
+        assert jobs == {"eth0.10": ["10.0.10.0/25"], "eth0.20": ["10.0.20.0/24"], "eth0": ["172.16.0.0/24"]}, jobs
+        print("  ✓ 网段分配给所在接口，其余网段从默认接口发出")
+        
+        sent = []
+        
+        def srp(packets, timeout, verbose, iface):
+            sent.append((iface, sorted(packet.pdst for packet in packets)))
+            return [[]]
+        
+        scapy = SimpleNamespace(Ether=lambda dst: Mock(__truediv__=lambda self, arp: arp),
+                                ARP=lambda pdst: SimpleNamespace(pdst=pdst), srp=srp)
+        with patch('network_detector.load_scapy', return_value=scapy):
+            detector.unicast_arp({"10.0.10.5": "aa:bb:cc:dd:ee:01", "10.0.20.5": "aa:bb:cc:dd:ee:01",
+                                  "172.16.0.5": "aa:bb:cc:dd:ee:01"})
+        assert sorted(sent, key=str) == [("eth0", ["172.16.0.5"]), ("eth0.10", ["10.0.10.5"]),
+                                         ("eth0.20", ["10.0.20.5"])], f"出口接口不正确: {sent}"
+        print("  ✓ 单播ARP按IP所在网段选择出口接口")
+        
+        detector = NetworkDetector(None)
+        with patch('network_detector.get_default_interface', return_value=None), \
+             patch('network_detector.list_interfaces', return_value=_vlans()), \
+             patch('socket.socket') as mock_socket:
+            assert detector._get_local_network_range() == "10.0.10.0/24"
+            assert not mock_socket.called, "离线网段不应依赖外网连通性"
+        print("  ✓ 没有默认路由时使用第一个可用接口的网段")
+        
+        print("✅ 网段与接口对应测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 网段与接口对应测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 多接口扫描功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("接口枚举", test_list_interfaces()))
+    results.append(("多接口并行扫描", test_parallel_interfaces()))
+    results.append(("网段与接口对应", test_ranges_and_unicast_routing()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有多接口扫描功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
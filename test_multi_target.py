@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+测试多目标检测功能
+Test multi-target detection
+"""
+import sys
+import os
+import tempfile
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_CONTENT = """[network]
+boss_mac =
+scan_interval = 30
+network_interface =
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+notification_title = 🚨 老板来了！
+notification_message = 老板在线
+leave_notification_title = ✅ 老板离开了！
+leave_notification_message = 老板离线
+
+[notification_manager]
+service_type = webhook
+webhook_url = https://example.com/manager
+notification_title = 🚨 经理来了！
+
+[advanced]
+confirmation_count = 1
+notification_cooldown = 0
+
+[targets]
+boss = AA-BB-CC-DD-EE-FF, 192.168.1.100
+manager = 11:22:33:44:55:66, , notification_manager
+"""
+
+
+def _write_config(content):
+    """写入临时配置文件并返回路径"""
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False, encoding='utf-8') as f:
+        f.write(content)
+        return f.name
+
+
+def test_match_targets_single_sweep():
+    """测试一次扫描通过MAC/IP索引匹配多个目标"""
+    print("测试多目标单次扫描匹配...")
+    try:
+        from network_detector import NetworkDetector
+
+        detector = NetworkDetector(None)
+        boss, manager, other = object(), object(), object()
+        mac_index = {"aa:bb:cc:dd:ee:ff": boss, "11:22:33:44:55:66": manager}
+        ip_index = {"192.168.1.50": other}
+
+        devices = [
+            ("192.168.1.100", "AA:BB:CC:DD:EE:FF"),
+            ("192.168.1.50", "99:99:99:99:99:99"),
+            ("192.168.1.1", "00:00:00:00:00:01"),
+        ]
+        with patch.object(detector, 'scan_network', return_value=devices) as mock_scan:
+            found = detector.match_targets(mac_index, ip_index)
+
+        assert mock_scan.call_count == 1, "应该只扫描一次"
+        assert found == {boss: "192.168.1.100", other: "192.168.1.50"}, f"匹配结果不正确: {found}"
+        print("  ✓ 一次扫描匹配到2个目标")
+
+        print("✅ 多目标单次扫描匹配测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 多目标单次扫描匹配测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_per_target_state_and_routing():
+    """测试每个目标独立的状态与通知路由"""
+    print("\n测试每个目标独立的状态与通知路由...")
+    config_file = _write_config(CONFIG_CONTENT)
+
+    try:
+        from boss_detect import BossDetector
+
+        with patch('boss_detect.NetworkDetector') as mock_detector_class, \
+             patch('boss_detect.create_notification_service') as mock_notif:
+
+            services = {}
+
+            def make_service(service_type, **kwargs):
+                service = Mock()
+                service.send = Mock(return_value=True)
+                services[service_type] = service
+                return service
+
+            mock_notif.side_effect = make_service
+            mock_detector = Mock()
+            mock_detector_class.return_value = mock_detector
+
+            detector = BossDetector(config_file)
+            assert len(detector.targets) == 2, "应该加载2个目标"
+            boss = detector.mac_index["aa:bb:cc:dd:ee:ff"]
+            manager = detector.mac_index["11:22:33:44:55:66"]
+            assert boss.ip == "192.168.1.100" and manager.ip is None
+            assert manager.notification_section == "notification_manager"
+            print("  ✓ 目标配置加载正确")
+
+            # 场景1: 只有老板在线
+            mock_detector.match_targets = Mock(return_value={boss: "192.168.1.100"})
+            detector.check_targets(confirmation_count=1)
+            detector.dispatcher.join()
+            assert boss.online and not manager.online, "只有老板应该在线"
+            assert services['pushdeer'].send.call_count == 1
+            assert '老板来了' in services['pushdeer'].send.call_args[0][0]
+            print("  ✓ 老板到达通知通过 [notification] 发送")
+
+            # 场景2: 经理到达，老板离开
+            mock_detector.match_targets = Mock(return_value={manager: "192.168.1.101"})
+            detector.check_targets(confirmation_count=1)
+            detector.dispatcher.join()
+            assert manager.online and not boss.online
+            assert services['webhook'].send.call_count == 1
+            assert '经理来了' in services['webhook'].send.call_args[0][0]
+            assert '离开' in services['pushdeer'].send.call_args[0][0]
+            print("  ✓ 经理到达通知通过 [notification_manager] 发送")
+
+            assert mock_detector.match_targets.call_count == 1, "每轮只应扫描一次"
+
+        print("✅ 目标状态与通知路由测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 目标状态与通知路由测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(config_file):
+            os.remove(config_file)
+
+
+def test_departing_target_keeps_fast_probe():
+    """测试有目标待确认离开时，多目标循环仍按基础间隔快速复查"""
+    print("\n测试待确认离开的目标...")
+    content = CONFIG_CONTENT.replace("notification_cooldown = 0", "notification_cooldown = 0\ndeparture_count = 3")
+    config_file = _write_config(content)
+
+    try:
+        from boss_detect import BossDetector
+        from presence_state import LEAVING
+
+        with patch('boss_detect.NetworkDetector') as mock_detector_class, \
+             patch('boss_detect.create_notification_service'):
+
+            mock_detector = Mock()
+            mock_detector_class.return_value = mock_detector
+            detector = BossDetector(config_file)
+            boss = detector.mac_index["aa:bb:cc:dd:ee:ff"]
+
+            # 第一轮老板到达，第二轮漏检进入待确认离开
+            rounds = [{boss: "192.168.1.100"}, {}]
+            mock_detector.match_targets = Mock(side_effect=lambda *args, **kwargs: rounds.pop(0))
+            observed = []
+
+            def wait(seconds):
+                if not rounds:
+                    raise KeyboardInterrupt
+
+            with patch.object(detector.scheduler, 'observe', side_effect=lambda **kwargs: observed.append(kwargs)), \
+                 patch.object(detector, '_wait', side_effect=wait):
+                detector._run_multi()
+            detector.dispatcher.stop()
+
+            assert boss.presence.status == LEAVING, f"老板应处于待确认离开: {boss.presence.status}"
+            assert observed[-1] == {'changed': False, 'pending': True}, f"待确认离开时应视为待确认: {observed}"
+            print("  ✓ 待确认离开的目标让调度器保持基础间隔")
+
+        print("✅ 待确认离开的目标测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 待确认离开的目标测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(config_file):
+            os.remove(config_file)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 多目标检测功能测试")
+    print("=" * 60)
+
+    results = []
+
+    results.append(("单次扫描匹配", test_match_targets_single_sweep()))
+    results.append(("目标状态与通知路由", test_per_target_state_and_routing()))
+    results.append(("待确认离开的目标", test_departing_target_keeps_fast_probe()))
+
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+
+    print("=" * 60)
+
+    if all_passed:
+        print("🎉 所有多目标检测功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+测试邻居表读取功能
+Test native neighbor table reader
+"""
+import sys
+import os
+import socket
+import struct
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'proc_net_arp')
+
+
+def test_parse_proc_arp_fixture():
+    """测试解析 /proc/net/arp fixture 文件"""
+    print("测试解析 /proc/net/arp...")
+    try:
+        from neighbor_table import read_proc_arp
+        
+        table = read_proc_arp(FIXTURE)
+        assert table["aa:bb:cc:dd:ee:ff"] == ("192.168.1.100", "reachable"), "MAC应转换为小写"
+        assert table["11:22:33:44:55:66"] == ("192.168.1.102", "incomplete")
+        assert table["00:11:22:33:44:fe"] == ("192.168.1.254", "permanent")
+        assert table["66:77:88:99:aa:bb"] == ("10.0.0.7", "reachable")
+        assert "00:00:00:00:00:00" not in table, "空MAC应被忽略"
+        assert len(table) == 5, f"条目数不正确: {len(table)}"
+        print(f"  ✓ 解析出 {len(table)} 个条目")
+        
+        print("✅ 解析 /proc/net/arp 测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 解析 /proc/net/arp 测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_parse_netlink_messages():
+    """测试解析 RTM_NEWNEIGH 消息"""
+    print("\n测试解析rtnetlink消息...")
+    try:
+        from neighbor_table import (_parse_netlink_messages, NLMSG_HEADER, NDMSG, RTATTR,
+                                    RTM_NEWNEIGH, NLMSG_DONE, NDA_DST, NDA_LLADDR)
+        
+        def attr(attr_type, payload):
+            data = RTATTR.pack(RTATTR.size + len(payload), attr_type) + payload
+            return data + b'\0' * (-len(data) % 4)
+        
+        def neigh(ip, mac, state):
+            body = (NDMSG.pack(socket.AF_INET, 0, 0, 2, state, 0, 1)
+                    + attr(NDA_DST, socket.inet_aton(ip))
+                    + attr(NDA_LLADDR, bytes.fromhex(mac.replace(':', ''))))
+            return NLMSG_HEADER.pack(NLMSG_HEADER.size + len(body), RTM_NEWNEIGH, 2, 1, 0) + body
+        
+        data = neigh("192.168.1.100", "aa:bb:cc:dd:ee:ff", 0x04) + neigh("192.168.1.1", "00:11:22:33:44:01", 0x02)
+        table = {}
+        assert _parse_netlink_messages(data, table) is False, "未收到DONE不应结束"
+        assert table == {
+            "aa:bb:cc:dd:ee:ff": ("192.168.1.100", "stale"),
+            "00:11:22:33:44:01": ("192.168.1.1", "reachable"),
+        }, f"解析结果不正确: {table}"
+        
+        done = NLMSG_HEADER.pack(NLMSG_HEADER.size + 4, NLMSG_DONE, 2, 1, 0) + struct.pack('=i', 0)
+        assert _parse_netlink_messages(done, table) is True, "收到DONE应结束"
+        print("  ✓ 邻居消息解析正确")
+        
+        print("✅ 解析rtnetlink消息测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 解析rtnetlink消息测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_detector_uses_neighbor_table():
+    """测试检测器通过邻居表检查ARP缓存"""
+    print("\n测试检测器ARP缓存检查...")
+    try:
+        from neighbor_table import read_proc_arp
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector("AA-BB-CC-DD-EE-FF", neighbor_backend='proc')
+        with patch('network_detector.read_neighbor_table', side_effect=lambda backend: read_proc_arp(FIXTURE)), \
+             patch('subprocess.run') as mock_run:
+            assert detector._check_arp_cache("AA-BB-CC-DD-EE-FF") == (True, "192.168.1.100")
+            assert detector._check_arp_cache("11:22:33:44:55:66") == (False, None), "incomplete状态应视为未找到"
+            assert detector._check_arp_cache("ff:ff:ff:ff:ff:ff") == (False, None)
+            assert mock_run.call_count == 0, "不应fork子进程"
+        print("  ✓ 无需fork即可查询ARP缓存")
+        
+        print("✅ 检测器ARP缓存检查测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 检测器ARP缓存检查测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 邻居表读取功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("/proc/net/arp解析", test_parse_proc_arp_fixture()))
+    results.append(("rtnetlink解析", test_parse_netlink_messages()))
+    results.append(("检测器ARP缓存检查", test_detector_uses_neighbor_table()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有邻居表读取功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+测试通知合并功能
+Test coalesced/batched notifications
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_CONTENT = """[network]
+boss_mac = aa:bb:cc:dd:ee:ff
+scan_interval = 30
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+notification_title = 🚨 老板来了！
+notification_message = 老板在线
+leave_notification_title = ✅ 老板离开了！
+leave_notification_message = 老板离线
+
+[advanced]
+notification_cooldown = 300
+
+[dispatch]
+batch_window = 0.2
+"""
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """本地Webhook桩，记录收到的请求体"""
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.received.append(json.loads(body))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def _event(subject, kind, timestamp):
+    from notification_batch import NotificationEvent
+    title = f"{subject}来了" if kind == 'arrival' else f"{subject}走了"
+    return NotificationEvent(subject, kind, title, f"{title}详情", "192.168.1.100", "aa:bb:cc:dd:ee:ff", timestamp)
+
+
+def test_build_digest():
+    """测试摘要以每个目标的最后一个事件作为最终状态"""
+    print("测试生成摘要...")
+    try:
+        from notification_batch import build_digest
+        
+        title, message, batch = build_digest([_event("boss", "arrival", 1)])
+        assert (title, message) == ("boss来了", "boss来了详情"), "单个事件应保持原样"
+        assert len(batch) == 1
+        
+        events = [_event("boss", "arrival", 1), _event("boss", "departure", 2), _event("boss", "arrival", 3)]
+        title, message, batch = build_digest(events)
+        assert title == "boss来了", f"标题应为最终状态: {title}"
+        assert "到达 → 离开 → 到达（最终: 到达）" in message, message
+        assert [item['kind'] for item in batch] == ['arrival', 'departure', 'arrival']
+        
+        title, message, batch = build_digest(events + [_event("manager", "departure", 4)])
+        assert title == "📋 2个目标状态变化", title
+        assert "manager走了详情" in message and "boss来了详情" in message
+        print("  ✓ 抖动事件合并为最终状态")
+        
+        print("✅ 生成摘要测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 生成摘要测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_one_request_per_channel():
+    """测试窗口内的事件对每个渠道只发送一次请求"""
+    print("\n测试每个渠道一次请求...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.received = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        from notification import WebhookNotification
+        from notification_queue import NotificationDispatcher
+        from notification_batch import NotificationCoalescer
+        
+        dispatcher = NotificationDispatcher(dead_letter_file='')
+        coalescer = NotificationCoalescer(dispatcher, window=0.2)
+        chat, audit = WebhookNotification(url + "/chat"), WebhookNotification(url + "/audit")
+        delivered = []
+        
+        for i, kind in enumerate(["arrival", "departure", "arrival", "departure"]):
+            coalescer.add(chat, _event("boss", kind, i), on_success=lambda: delivered.append("chat"))
+        coalescer.add(audit, _event("manager", "arrival", 5))
+        
+        time.sleep(0.4)
+        dispatcher.join()
+        assert len(server.received) == 2, f"每个渠道应只收到一次请求: {len(server.received)}"
+        payload = next(p for p in server.received if len(p['batch']) == 4)
+        assert payload['title'] == "boss走了", "应送达最终状态"
+        assert [item['kind'] for item in payload['batch']] == ["arrival", "departure", "arrival", "departure"]
+        assert delivered == ["chat"] * 4, "所有事件的回调都应被调用"
+        dispatcher.stop()
+        print("  ✓ 5个事件合并为2个请求，payload包含batch数组")
+        
+        print("✅ 每个渠道一次请求测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 每个渠道一次请求测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        server.shutdown()
+
+
+def test_final_state_not_suppressed():
+    """测试开启合并后冷却时间不再吞掉最终状态"""
+    print("\n测试最终状态送达...")
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False, encoding='utf-8') as f:
+        config_file = f.name
+        f.write(CONFIG_CONTENT)
+    
+    try:
+        from boss_detect import BossDetector
+        
+        with patch('boss_detect.NetworkDetector'), \
+             patch('boss_detect.create_notification_service') as mock_notif:
+            mock_service = Mock()
+            mock_service.send_batch = Mock(return_value=True)
+            mock_notif.return_value = mock_service
+            
+            detector = BossDetector(config_file)
+            detector._send_notification('192.168.1.100', is_arrival=True)
+            detector._send_notification('192.168.1.100', is_arrival=False)
+            detector.coalescer.flush_all()
+            detector.dispatcher.join()
+            detector.dispatcher.stop()
+        
+        assert mock_service.send_batch.call_count == 1, "应合并为一条摘要"
+        title, message, batch = mock_service.send_batch.call_args[0]
+        assert '离开' in title, f"应送达最终的离开状态: {title}"
+        assert len(batch) == 2
+        assert detector.last_notification_time is not None
+        print("  ✓ 冷却期内的离开通知作为最终状态送达")
+        
+        print("✅ 最终状态送达测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 最终状态送达测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(config_file):
+            os.remove(config_file)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 通知合并功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("生成摘要", test_build_digest()))
+    results.append(("每个渠道一次请求", test_one_request_per_channel()))
+    results.append(("最终状态送达", test_final_state_not_suppressed()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有通知合并功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+测试通知分发队列
+Test asynchronous notification dispatch queue against a local stub HTTP server
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """本地Webhook桩: 按 statuses 依次返回状态码，可设置响应延迟"""
+    
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(server.delay)
+        with server.lock:
+            server.received.append(json.loads(body))
+            status = server.statuses.pop(0) if server.statuses else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(delay=0, statuses=None):
+    """启动本地桩服务器，返回 (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.delay = delay
+    server.statuses = list(statuses or [])
+    server.received = []
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/hook"
+
+
+def test_submit_does_not_block():
+    """测试慢速接口不阻塞调用方"""
+    print("测试入队不阻塞...")
+    server, url = start_stub(delay=1.0)
+    try:
+        from notification import WebhookNotification
+        from notification_queue import NotificationDispatcher
+        
+        dispatcher = NotificationDispatcher(workers=2, dead_letter_file='')
+        sent = []
+        start = time.monotonic()
+        assert dispatcher.submit(WebhookNotification(url), "老板来了", "msg", on_success=lambda: sent.append(1))
+        elapsed = time.monotonic() - start
+        assert elapsed < 0.2, f"入队应立即返回，实际耗时 {elapsed:.2f}s"
+        print(f"  ✓ 入队耗时 {elapsed * 1000:.1f}ms，接口响应需要1秒")
+        
+        dispatcher.join()
+        assert sent == [1], "发送成功后应调用回调"
+        assert server.received[0]['title'] == "老板来了"
+        dispatcher.stop()
+        print("  ✓ 后台线程完成发送")
+        
+        print("✅ 入队不阻塞测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 入队不阻塞测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        server.shutdown()
+
+
+def test_retry_with_backoff():
+    """测试失败后指数退避重试"""
+    print("\n测试退避重试...")
+    server, url = start_stub(statuses=[500, 503])
+    try:
+        from notification import WebhookNotification
+        from notification_queue import NotificationDispatcher
+        
+        dispatcher = NotificationDispatcher(workers=1, max_retries=3, retry_backoff=0.05, dead_letter_file='')
+        assert [dispatcher.retry_delay(n) for n in (1, 2, 3)] == [0.05, 0.1, 0.2], "等待时间应逐次翻倍"
+        
+        dispatcher.submit(WebhookNotification(url), "老板来了", "msg")
+        dispatcher.join()
+        assert len(server.received) == 3, f"应尝试3次: {len(server.received)}"
+        assert dispatcher.sent == 1 and dispatcher.failed == 0
+        dispatcher.stop()
+        print("  ✓ 两次失败后第三次发送成功")
+        
+        print("✅ 退避重试测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 退避重试测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        server.shutdown()
+
+
+def test_dead_letter():
+    """测试重试耗尽和队列满时写入死信文件"""
+    print("\n测试死信文件...")
+    server, url = start_stub(delay=0.3, statuses=[500] * 10)
+    # 死信文件所在目录不存在时应自动创建
+    dead_letter_file = os.path.join(tempfile.mkdtemp(), 'data', 'dead.jsonl')
+    try:
+        from notification import WebhookNotification
+        from notification_queue import NotificationDispatcher, read_dead_letters
+        
+        dispatcher = NotificationDispatcher(workers=1, queue_size=1, max_retries=1, retry_backoff=0.01,
+                                            dead_letter_file=dead_letter_file)
+        service = WebhookNotification(url)
+        assert dispatcher.submit(service, "第一条", "msg", label="boss")
+        time.sleep(0.1)  # 等待线程取走第一条
+        assert dispatcher.submit(service, "第二条", "msg")
+        assert not dispatcher.submit(service, "第三条", "msg"), "队列满时应拒绝入队"
+        dispatcher.join()
+        dispatcher.stop()
+        
+        records = read_dead_letters(dead_letter_file)
+        by_title = {record['title']: record for record in records}
+        assert set(by_title) == {"第一条", "第二条", "第三条"}, f"死信记录不正确: {list(by_title)}"
+        assert by_title["第一条"]['attempts'] == 2 and by_title["第一条"]['label'] == "boss"
+        assert by_title["第一条"]['service'] == "WebhookNotification"
+        assert by_title["第三条"]['attempts'] == 0 and by_title["第三条"]['error'] == "通知队列已满"
+        print(f"  ✓ 死信文件记录了 {len(records)} 条通知")
+        
+        print("✅ 死信文件测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 死信文件测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        server.shutdown()
+        if os.path.exists(dead_letter_file):
+            os.remove(dead_letter_file)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 通知分发队列测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("入队不阻塞", test_submit_does_not_block()))
+    results.append(("退避重试", test_retry_with_backoff()))
+    results.append(("死信文件", test_dead_letter()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有通知分发队列测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+测试通知服务的HTTP连接复用
+Test pooled keep-alive sessions for notification senders
+"""
+import sys
+import os
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 桩服务器，记录每个请求来自哪个客户端连接"""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.delay)
+        self.server.connections.append(self.client_address)
+        body = json.dumps({"code": 0}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(delay=0):
+    """启动本地桩服务器，返回 (server, url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    server.delay = delay
+    server.connections = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/push"
+
+
+def test_connection_reused():
+    """测试多次发送复用同一个TCP连接"""
+    print("测试连接复用...")
+    server, url = start_stub()
+    try:
+        from notification import WebhookNotification, PushDeerNotification
+        
+        webhook = WebhookNotification(url)
+        for i in range(3):
+            assert webhook.send("老板来了", f"第{i}次"), "发送应成功"
+        assert len(server.connections) == 3
+        assert len(set(server.connections)) == 1, f"应复用同一连接: {set(server.connections)}"
+        print("  ✓ Webhook 3次发送只建立1个连接")
+        
+        pushdeer = PushDeerNotification("test_key")
+        pushdeer.api_url = url
+        assert pushdeer.send("老板来了", "msg") and pushdeer.send("老板走了", "msg")
+        assert len(set(server.connections[3:])) == 1
+        print("  ✓ PushDeer 2次发送只建立1个连接")
+        
+        webhook.close()
+        pushdeer.close()
+        print("✅ 连接复用测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 连接复用测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        server.shutdown()
+
+
+def test_timeouts_and_pool_size():
+    """测试可配置的超时和连接池大小"""
+    print("\n测试超时与连接池配置...")
+    server, url = start_stub(delay=1.0)
+    try:
+        from notification import create_notification_service
+        
+        service = create_notification_service("webhook", webhook_url=url, pool_size=8,
+                                              connect_timeout=1, read_timeout=0.2)
+        adapter = service._get_session().get_adapter(url)
+        assert adapter._pool_maxsize == 8, f"连接池大小不正确: {adapter._pool_maxsize}"
+        
+        start = time.monotonic()
+        assert service.send("老板来了", "msg") is False, "读取超时应判定发送失败"
+        elapsed = time.monotonic() - start
+        assert elapsed < 0.8, f"应在读取超时后返回，实际耗时 {elapsed:.2f}s"
+        service.close()
+        print(f"  ✓ 读取超时0.2秒，{elapsed:.2f}秒后返回")
+        
+        print("✅ 超时与连接池配置测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 超时与连接池配置测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        server.shutdown()
+
+
+def test_http2_fallback():
+    """测试未安装httpx[http2]时回退到HTTP/1.1"""
+    print("\n测试HTTP/2回退...")
+    try:
+        import requests
+        from notification import WebhookNotification
+        
+        try:
+            import httpx, h2  # noqa: F401
+            print("  - 已安装httpx[http2]，跳过回退测试")
+            return True
+        except ImportError:
+            pass
+        
+        service = WebhookNotification("http://127.0.0.1:9/hook", http2=True)
+        assert isinstance(service._get_session(), requests.Session), "应回退到requests会话"
+        assert service.http2 is False
+        service.close()
+        print("  ✓ 回退到HTTP/1.1会话")
+        
+        print("✅ HTTP/2回退测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ HTTP/2回退测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 通知连接复用测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("连接复用", test_connection_reused()))
+    results.append(("超时与连接池配置", test_timeouts_and_pool_size()))
+    results.append(("HTTP/2回退", test_http2_fallback()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有通知连接复用测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+测试被动在线检测功能（通过回放pcap文件）
+Test passive presence detection by replaying pcap files
+"""
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MAC = "aa:bb:cc:dd:ee:ff"
+OTHER_MAC = "11:22:33:44:55:66"
+
+
+def _write_pcap(packets):
+    """写入临时pcap文件并返回路径"""
+    from scapy.all import wrpcap
+    
+    with tempfile.NamedTemporaryFile(suffix='.pcap', delete=False) as f:
+        pcap_file = f.name
+    wrpcap(pcap_file, packets)
+    return pcap_file
+
+
+def _build_packets():
+    """构造一组ARP/DHCP/mDNS报文"""
+    from scapy.all import ARP, BOOTP, DHCP, Ether, IP, UDP
+    
+    packets = []
+    
+    # 其他设备的ARP，应被忽略
+    other = Ether(src=OTHER_MAC, dst="ff:ff:ff:ff:ff:ff")/ARP(hwsrc=OTHER_MAC, psrc="192.168.1.20", pdst="192.168.1.1")
+    other.time = 1000.0
+    packets.append(other)
+    
+    # 目标设备连接Wi-Fi后的DHCP请求
+    dhcp = (Ether(src=TARGET_MAC, dst="ff:ff:ff:ff:ff:ff")/IP(src="0.0.0.0", dst="255.255.255.255")
+            /UDP(sport=68, dport=67)/BOOTP(chaddr=bytes.fromhex(TARGET_MAC.replace(':', '')))
+            /DHCP(options=[("message-type", "request"), ("requested_addr", "192.168.1.100"), "end"]))
+    dhcp.time = 1001.0
+    packets.append(dhcp)
+    
+    # 目标设备随后的ARP
+    arp = Ether(src=TARGET_MAC, dst="ff:ff:ff:ff:ff:ff")/ARP(hwsrc=TARGET_MAC, psrc="192.168.1.100", pdst="192.168.1.1")
+    arp.time = 1002.0
+    packets.append(arp)
+    
+    # 目标设备的mDNS
+    mdns = Ether(src=TARGET_MAC, dst="01:00:5e:00:00:fb")/IP(src="192.168.1.100", dst="224.0.0.251")/UDP(sport=5353, dport=5353)
+    mdns.time = 1010.0
+    packets.append(mdns)
+    
+    return packets
+
+
+def test_bpf_filter():
+    """测试BPF过滤器构建"""
+    print("测试BPF过滤器构建...")
+    try:
+        from presence_sniffer import build_bpf_filter
+        
+        bpf_filter = build_bpf_filter(["AA-BB-CC-DD-EE-FF"])
+        assert "arp" in bpf_filter and "port 67" in bpf_filter and "port 5353" in bpf_filter
+        assert "ether src aa:bb:cc:dd:ee:ff" in bpf_filter, f"过滤器缺少MAC: {bpf_filter}"
+        print(f"  ✓ {bpf_filter}")
+        
+        print("✅ BPF过滤器构建测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ BPF过滤器构建测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_replay_arrival():
+    """测试回放pcap时第一个报文即触发上线"""
+    print("\n测试回放pcap触发上线...")
+    pcap_file = _write_pcap(_build_packets())
+    
+    try:
+        from presence_sniffer import PassivePresenceEngine
+        
+        engine = PassivePresenceEngine([TARGET_MAC])
+        count = engine.replay(pcap_file)
+        assert count == 4, f"应该回放4个报文，实际 {count}"
+        
+        event = engine.wait_event(timeout=0)
+        assert event is not None, "应该产生上线事件"
+        assert event.kind == 'arrive' and event.mac == TARGET_MAC
+        assert event.ip == "192.168.1.100", f"应该从DHCP请求中取得IP: {event.ip}"
+        assert event.timestamp == 1001.0, "应该在第一个DHCP报文时上线"
+        print(f"  ✓ 上线事件: {event}")
+        
+        assert engine.wait_event(timeout=0) is None, "后续报文不应重复产生事件"
+        assert engine.last_seen[TARGET_MAC] == 1010.0
+        assert OTHER_MAC not in engine.last_seen, "其他设备应被忽略"
+        
+        print("✅ 回放pcap触发上线测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 回放pcap触发上线测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(pcap_file):
+            os.remove(pcap_file)
+
+
+def test_departure_confirmation():
+    """测试静默超时后才通过主动探测确认离线"""
+    print("\n测试离线确认...")
+    pcap_file = _write_pcap(_build_packets())
+    
+    try:
+        from presence_sniffer import PassivePresenceEngine
+        
+        probes = []
+        still_online = [True]
+        
+        def confirm(mac, ip):
+            probes.append((mac, ip))
+            return still_online[0]
+        
+        engine = PassivePresenceEngine([TARGET_MAC], confirm_departure=confirm, departure_timeout=60)
+        engine.replay(pcap_file)
+        engine.wait_event(timeout=0)
+        
+        # 未超时，不应主动探测
+        assert engine.check_departures(now=1050.0) == []
+        assert probes == [], "未超时不应主动探测"
+        
+        # 超时但探测仍在线
+        assert engine.check_departures(now=1100.0) == []
+        assert probes == [(TARGET_MAC, "192.168.1.100")]
+        assert engine.wait_event(timeout=0) is None
+        print("  ✓ 静默但主动探测在线，不产生离线事件")
+        
+        # 超时且探测失败
+        still_online[0] = False
+        assert engine.check_departures(now=1200.0) == [TARGET_MAC]
+        event = engine.wait_event(timeout=0)
+        assert event is not None and event.kind == 'depart', f"应该产生离线事件: {event}"
+        print(f"  ✓ 离线事件: {event}")
+        
+        print("✅ 离线确认测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 离线确认测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(pcap_file):
+            os.remove(pcap_file)
+
+
+def test_sighting_from_sniffer():
+    """测试被动监听到的报文记录到设备清单，探测链的 sighting 后端据此判定在线"""
+    print("\n测试被动监听发现...")
+    try:
+        from scapy.all import ARP, Ether
+        from network_detector import NetworkDetector
+        from presence_sniffer import PassivePresenceEngine
+        
+        detector = NetworkDetector(TARGET_MAC, sighting_ttl=60, probe_chain=['sighting'])
+        engine = PassivePresenceEngine([TARGET_MAC], device_table=detector.device_table)
+        assert detector.is_target_online() == (False, None), "没有报文时不应判定在线"
+        
+        engine.handle_packet(Ether(src=OTHER_MAC, dst="ff:ff:ff:ff:ff:ff")
+                             /ARP(hwsrc=OTHER_MAC, psrc="192.168.1.20", pdst="192.168.1.1"))
+        engine.handle_packet(Ether(src=TARGET_MAC, dst="ff:ff:ff:ff:ff:ff")
+                             /ARP(hwsrc=TARGET_MAC, psrc="192.168.1.100", pdst="192.168.1.1"))
+        assert detector.device_table.get(OTHER_MAC) is None, "未跟踪的设备不应记录"
+        assert detector.is_target_online() == (True, "192.168.1.100"), "监听到目标的报文后 sighting 应命中"
+        print("  ✓ 监听到的ARP报文让 sighting 后端命中")
+        
+        # 主动模式: sighting 后端自己在后台监听
+        with patch.object(PassivePresenceEngine, 'start') as start, \
+             patch.object(PassivePresenceEngine, 'stop') as stop:
+            detector = NetworkDetector(TARGET_MAC, sighting_ttl=60, probe_chain=['sighting'],
+                                       backend_options={'sighting': {'sniff': True}})
+            backend = detector.probe_chain.get('sighting')
+            assert detector.is_target_online() == (False, None)
+            start.assert_called_once()
+            engine = backend._engine
+            assert engine.device_table is detector.device_table and engine.macs == {TARGET_MAC}
+            engine.handle_packet(Ether(src=TARGET_MAC, dst="ff:ff:ff:ff:ff:ff")
+                                 /ARP(hwsrc=TARGET_MAC, psrc="192.168.1.101", pdst="192.168.1.1"))
+            assert detector.is_target_online() == (True, "192.168.1.101"), "后台监听到的报文应让 sighting 命中"
+            start.assert_called_once()
+            detector.probe_chain.close()
+            stop.assert_called_once()
+        print("  ✓ 主动模式下 sighting 后端首次探测时启动后台监听，关闭探测链时停止")
+        
+        with patch.object(PassivePresenceEngine, 'start', side_effect=ImportError("No module named 'scapy'")):
+            detector = NetworkDetector(TARGET_MAC, sighting_ttl=60, probe_chain=['sighting'],
+                                       backend_options={'sighting': {'sniff': True}})
+            assert detector.is_target_online() == (False, None)
+            assert detector.is_target_online() == (False, None)
+            assert not detector.probe_chain.get('sighting').sniff, "无法抓包时不应每轮重试"
+        print("  ✓ 无法抓包时只使用扫描结果")
+        
+        print("✅ 被动监听发现测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 被动监听发现测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 被动在线检测功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("BPF过滤器", test_bpf_filter()))
+    results.append(("回放pcap上线", test_replay_arrival()))
+    results.append(("离线确认", test_departure_confirmation()))
+    results.append(("被动监听发现", test_sighting_from_sniffer()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有被动在线检测功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+测试在线状态机
+Test hysteresis-based presence state machine
+"""
+import sys
+import os
+import time
+import tempfile
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_CONTENT = """[network]
+boss_mac = aa:bb:cc:dd:ee:ff
+scan_interval = 30
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+notification_title = 🚨 老板来了！
+notification_message = 老板在线
+
+[advanced]
+confirmation_count = 2
+notification_cooldown = 0
+departure_count = 3
+departure_grace = 0
+"""
+
+
+def _run(state, observations, policy, start=0.0, step=10.0):
+    """依次输入检测结果，返回 (最终状态, [(时间, 事件), ...])"""
+    from presence_state import transition
+    events = []
+    now = start
+    for seen in observations:
+        state, event = transition(state, seen, now, policy)
+        if event:
+            events.append((now, event))
+        now += step
+    return state, events
+
+
+def test_arrival_hysteresis():
+    """测试到达需要连续确认"""
+    print("测试到达确认...")
+    try:
+        from presence_state import INITIAL_STATE, PresencePolicy, PENDING, PRESENT, ABSENT
+        
+        policy = PresencePolicy(arrive_after=3, leave_after=1, grace_period=0)
+        state, events = _run(INITIAL_STATE, [True, True], policy)
+        assert state.status == PENDING and state.hits == 2 and events == []
+        
+        state, events = _run(state, [False], policy)
+        assert state.status == ABSENT and state.hits == 0, "漏检一次应重新计数"
+        
+        state, events = _run(state, [True, True, True], policy, start=100)
+        assert state.status == PRESENT and events == [(120, 'arrival')], f"事件不正确: {events}"
+        print("  ✓ 连续3次检测到才确认到达")
+        
+        print("✅ 到达确认测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 到达确认测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_departure_hysteresis():
+    """测试离开需要连续漏检并超过宽限时间"""
+    print("\n测试离开确认...")
+    try:
+        from presence_state import PresenceState, PresencePolicy, PRESENT, LEAVING, ABSENT
+        
+        present = PresenceState(PRESENT, 0, 0, 0.0)
+        policy = PresencePolicy(arrive_after=1, leave_after=2, grace_period=60)
+        
+        state, events = _run(present, [False, True], policy, start=10)
+        assert state.status == PRESENT and events == [], "离开确认前再次检测到，应恢复在线且不产生事件"
+        
+        state, events = _run(present, [False, False], policy, start=10)
+        assert state.status == LEAVING and state.misses == 2 and events == [], "未超过宽限时间不应离开"
+        
+        state, events = _run(present, [False, False, False, False, False, False], policy, start=10)
+        assert state.status == ABSENT and events == [(60, 'departure')], f"事件不正确: {events}"
+        assert state.last_seen == 0.0, "应保留最后一次检测到的时间"
+        print("  ✓ 连续2次漏检且超过60秒宽限才确认离开")
+        
+        print("✅ 离开确认测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 离开确认测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_bulk_advance():
+    """测试批量推进大量目标"""
+    print("\n测试批量推进...")
+    try:
+        from presence_state import PresencePolicy, advance, is_online
+        
+        policy = PresencePolicy(arrive_after=1, leave_after=1, grace_period=0)
+        keys = [f"dev{i}" for i in range(10000)]
+        states = {}
+        
+        start = time.perf_counter()
+        states, events = advance(states, set(keys), 0, policy)
+        before = dict(states)
+        states, events2 = advance(states, set(keys[:5000]), 10, policy)
+        elapsed = time.perf_counter() - start
+        
+        assert len(events) == 10000 and all(event == 'arrival' for _, event in events)
+        assert len(events2) == 5000 and all(event == 'departure' for _, event in events2)
+        assert sum(is_online(state) for state in states.values()) == 5000
+        assert all(is_online(state) for state in before.values()), "输入的状态不应被修改"
+        assert elapsed < 1.0, f"1万个目标两轮推进耗时过长: {elapsed:.2f}s"
+        print(f"  ✓ 1万个目标两轮推进耗时 {elapsed * 1000:.0f}ms")
+        
+        print("✅ 批量推进测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 批量推进测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_detector_ignores_single_miss():
+    """测试检测器单次漏检不发送离开通知"""
+    print("\n测试检测器离开确认...")
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.ini', delete=False, encoding='utf-8') as f:
+        config_file = f.name
+        f.write(CONFIG_CONTENT)
+    
+    try:
+        from boss_detect import BossDetector
+        
+        with patch('boss_detect.NetworkDetector'), \
+             patch('boss_detect.create_notification_service') as mock_notif:
+            mock_service = Mock()
+            mock_service.send = Mock(return_value=True)
+            mock_notif.return_value = mock_service
+            
+            detector = BossDetector(config_file)
+            policy = detector._presence_policy(2)
+            for seen in [True, True, False, True, False, False]:
+                detector._update_boss(seen, '192.168.1.100' if seen else None, policy)
+            detector.dispatcher.join()
+            assert detector.boss_online, "漏检次数未达到3次，应仍在线"
+            assert mock_service.send.call_count == 1, "只应发送到达通知"
+            
+            detector._update_boss(False, None, policy)
+            detector.dispatcher.join()
+            assert not detector.boss_online
+            assert mock_service.send.call_count == 2
+            assert '离开' in mock_service.send.call_args[0][0]
+            detector.dispatcher.stop()
+        print("  ✓ 连续3次漏检后才发送离开通知")
+        
+        print("✅ 检测器离开确认测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 检测器离开确认测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if os.path.exists(config_file):
+            os.remove(config_file)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 在线状态机测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("到达确认", test_arrival_hysteresis()))
+    results.append(("离开确认", test_departure_hysteresis()))
+    results.append(("批量推进", test_bulk_advance()))
+    results.append(("检测器离开确认", test_detector_ignores_single_miss()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有在线状态机测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
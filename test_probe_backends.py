@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+测试可插拔探测后端
+Test pluggable probe backends and probe chain
+"""
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MAC = "aa:bb:cc:dd:ee:ff"
+
+CONFIG_TEMPLATE = """[network]
+boss_mac = {mac}
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+
+[advanced]
+probe_chain = {chain}
+"""
+
+
+def test_registry_and_default_chain():
+    """测试注册表与默认探测链顺序"""
+    print("测试注册表与默认探测链...")
+    try:
+        from probe_backends import BACKENDS, ProbeBackend, ProbeChain, default_chain, register_backend
+        
+        assert default_chain() == ['sighting', 'ping', 'arp_cache', 'arp'], f"默认顺序不正确: {default_chain()}"
+        costs = [BACKENDS[name].cost for name in default_chain()]
+        assert costs == sorted(costs), "默认探测链应按声明开销从低到高排列"
+        print(f"  ✓ 默认探测链: {' → '.join(default_chain())}")
+        
+        @register_backend
+        class RouterStub(ProbeBackend):
+            name = 'router_stub'
+            cost = 0
+            latency = 0.01
+            default = False
+            
+            def probe(self, ip_range=None):
+                return True, "192.168.1.50"
+        
+        try:
+            assert 'router_stub' in BACKENDS and 'router_stub' not in default_chain(), "default=False 的后端不应默认启用"
+            chain = ProbeChain.build(None, ['router_stub', 'arp'])
+            assert chain.names == ['router_stub', 'arp']
+            assert chain.run() == (True, "192.168.1.50", 'router_stub')
+            print("  ✓ 自定义后端注册后可在探测链中使用")
+        finally:
+            BACKENDS.pop('router_stub')
+        
+        try:
+            ProbeChain.build(None, ['ping', 'carrier_pigeon'])
+            raise AssertionError("未知后端应报错")
+        except ValueError as e:
+            assert 'carrier_pigeon' in str(e)
+        print("  ✓ 未知后端报错")
+        
+        print("✅ 注册表与默认探测链测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 注册表与默认探测链测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_chain_stops_early():
+    """测试按配置顺序执行，发现目标即停止，并记录各后端耗时"""
+    print("\n测试探测链提前停止...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC, target_ip="192.168.1.100", probe_chain=['arp_cache', 'ping', 'arp'])
+        with patch.object(detector, '_check_arp_cache', return_value=(True, "192.168.1.100")) as mock_cache, \
+             patch.object(detector, '_ping_host', return_value=True) as mock_ping, \
+             patch.object(detector, '_find_by_arp') as mock_arp:
+            assert detector.is_target_online() == (True, "192.168.1.100")
+        
+        assert mock_cache.call_count == 1 and mock_ping.call_count == 1, "arp_cache 应先执行并ping验证"
+        assert mock_arp.call_count == 0, "命中后不应执行后面的后端"
+        stats = detector.get_tier_stats()
+        assert stats['arp_cache']['hits'] == 1 and 'ping' not in stats and 'arp' not in stats, stats
+        assert detector._candidate_ips()[0] == "192.168.1.100", "命中的IP应成为单播候选"
+        print("  ✓ 按配置顺序执行，命中即停止")
+        
+        detector = NetworkDetector(TARGET_MAC)
+        with patch.object(detector, '_check_arp_cache', side_effect=OSError("boom")), \
+             patch.object(detector, '_find_by_arp', return_value=(True, "192.168.1.7")):
+            assert detector.is_target_online() == (True, "192.168.1.7"), "后端出错时应继续执行后续后端"
+        stats = detector.get_tier_stats()
+        assert 'sighting' not in stats and 'ping' not in stats, "跳过的后端不应计入统计"
+        assert stats['arp_cache']['attempts'] == 1 and stats['arp_cache']['hits'] == 0
+        assert stats['arp']['hits'] == 1
+        print("  ✓ 跳过的后端不计入统计，出错的后端视为未命中")
+        
+        print("✅ 探测链提前停止测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 探测链提前停止测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_config_chain():
+    """测试从配置文件读取探测链"""
+    print("\n测试配置探测链...")
+    directory = tempfile.mkdtemp()
+    try:
+        from boss_detect import BossDetector
+        
+        config_file = os.path.join(directory, 'config.ini')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(mac=TARGET_MAC, chain='arp_cache, arp'))
+        with patch('boss_detect.create_notification_service'):
+            detector = BossDetector(config_file)
+        assert detector.network_detector.probe_chain.names == ['arp_cache', 'arp']
+        print("  ✓ 按配置顺序创建探测链")
+        
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(mac=TARGET_MAC, chain='ping, telepathy'))
+        with patch('boss_detect.create_notification_service'):
+            try:
+                BossDetector(config_file)
+                raise AssertionError("未知后端应退出")
+            except SystemExit:
+                pass
+        print("  ✓ 未知后端时退出")
+        
+        print("✅ 配置探测链测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 配置探测链测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 探测后端功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("注册表与默认探测链", test_registry_and_default_chain()))
+    results.append(("探测链提前停止", test_chain_stops_early()))
+    results.append(("配置探测链", test_config_chain()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有探测后端功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
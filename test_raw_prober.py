@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+测试原始套接字探测功能
+Test raw socket ICMP/ARP prober
+"""
+import sys
+import os
+import time
+import socket
+import threading
+from unittest.mock import patch, MagicMock
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SRC_MAC = "02:00:00:00:00:01"
+SRC_IP = "192.168.1.2"
+
+
+def test_templates_match_scapy():
+    """测试预构建模板与scapy构建的报文一致"""
+    print("测试报文模板...")
+    try:
+        from scapy.all import ARP, Ether, ICMP, Raw
+        from raw_prober import build_icmp_template, patch_icmp, build_arp_template, patch_arp, ICMP_PAYLOAD
+        
+        template = build_icmp_template(0x1234)
+        for seq in (1, 2, 65535):
+            expected = bytes(ICMP(type=8, id=0x1234, seq=seq)/Raw(ICMP_PAYLOAD))
+            assert bytes(patch_icmp(template, seq)) == expected, f"ICMP序号{seq}的报文不一致"
+        print("  ✓ ICMP模板填入序号后与scapy一致")
+        
+        template = build_arp_template(SRC_MAC, SRC_IP)
+        for ip in ("192.168.1.100", "192.168.1.200"):
+            expected = bytes(Ether(dst="ff:ff:ff:ff:ff:ff", src=SRC_MAC)/ARP(hwsrc=SRC_MAC, psrc=SRC_IP, pdst=ip))
+            assert bytes(patch_arp(template, ip)) == expected, f"ARP {ip} 的报文不一致"
+        unicast = bytes(patch_arp(template, "192.168.1.100", "aa:bb:cc:dd:ee:ff"))
+        assert unicast[:6] == bytes.fromhex("aabbccddeeff"), "单播ARP目的MAC不正确"
+        print("  ✓ ARP模板填入目标IP后与scapy一致")
+        
+        print("✅ 报文模板测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 报文模板测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_parse_replies():
+    """测试解析ICMP/ARP应答"""
+    print("\n测试应答解析...")
+    try:
+        from scapy.all import ARP, Ether, ICMP, IP
+        from raw_prober import parse_icmp_reply, parse_arp_reply
+        
+        reply = bytes(IP(src="192.168.1.100", dst=SRC_IP)/ICMP(type=0, id=0x1234, seq=7))
+        assert parse_icmp_reply(reply, has_ip_header=True) == (0x1234, 7)
+        assert parse_icmp_reply(reply[20:], has_ip_header=False) == (0x1234, 7)
+        request = bytes(ICMP(type=8, id=0x1234, seq=7))
+        assert parse_icmp_reply(request, has_ip_header=False) is None, "回显请求不应视为应答"
+        print("  ✓ ICMP应答解析正确")
+        
+        frame = bytes(Ether(dst=SRC_MAC, src="aa:bb:cc:dd:ee:ff")
+                      /ARP(op=2, hwsrc="aa:bb:cc:dd:ee:ff", psrc="192.168.1.100", hwdst=SRC_MAC, pdst=SRC_IP))
+        assert parse_arp_reply(frame) == ("192.168.1.100", "aa:bb:cc:dd:ee:ff")
+        request = bytes(Ether(dst="ff:ff:ff:ff:ff:ff", src=SRC_MAC)/ARP(hwsrc=SRC_MAC, psrc=SRC_IP, pdst="192.168.1.100"))
+        assert parse_arp_reply(request) is None, "ARP请求不应视为应答"
+        print("  ✓ ARP应答解析正确")
+        
+        print("✅ 应答解析测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 应答解析测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ping_matches_sequence():
+    """测试ping复用同一个套接字并按序号匹配应答"""
+    print("\n测试ping序号匹配...")
+    try:
+        from scapy.all import ICMP
+        from raw_prober import RawProber
+        
+        sock = MagicMock()
+        replies = []
+        
+        def sendto(data, addr):
+            seq = int.from_bytes(bytes(data[6:8]), 'big')
+            # 先返回一个过期序号的应答，再返回正确的应答
+            replies.append((bytes(ICMP(type=0, id=1, seq=(seq - 1) & 0xffff)), (addr[0], 0)))
+            replies.append((bytes(ICMP(type=0, id=1, seq=seq)), (addr[0], 0)))
+        
+        sock.sendto.side_effect = sendto
+        sock.recvfrom.side_effect = lambda size: replies.pop(0)
+        
+        with patch('socket.socket', return_value=sock) as mock_socket, \
+             patch('select.select', side_effect=lambda r, w, x, t: (r, [], [])):
+            prober = RawProber("eth0")
+            assert prober.ping("192.168.1.100") is True
+            assert prober.ping("192.168.1.100") is True
+            assert mock_socket.call_count == 1, "应复用同一个ICMP套接字"
+            assert replies == [], "过期序号的应答应被跳过"
+        print("  ✓ 两次ping复用同一套接字，跳过过期应答")
+        
+        print("✅ ping序号匹配测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ ping序号匹配测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+class FakePacketSocket:
+    """用 socketpair 的一端模拟绑定到接口的AF_PACKET套接字"""
+    
+    def __init__(self, sock):
+        self.sock = sock
+    
+    def bind(self, address):
+        pass
+    
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def test_concurrent_arp_probes():
+    """测试多个分片同时探测时并行等待应答，应答按IP分发给对应的分片"""
+    print("\n测试并发ARP探测...")
+    try:
+        from scapy.all import ARP, Ether
+        from raw_prober import RawProber
+        
+        local, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        answering = {"10.0.%d.1" % shard: "aa:bb:cc:dd:ee:%02x" % shard for shard in range(4)}
+        
+        def respond():
+            # 只应答每个分片中的第一个IP，其余IP等待超时
+            while True:
+                try:
+                    frame = peer.recv(2048)
+                except OSError:
+                    return
+                ip = socket.inet_ntoa(frame[38:42])
+                if ip in answering:
+                    mac = answering[ip]
+                    peer.send(bytes(Ether(dst=SRC_MAC, src=mac)
+                                    /ARP(op=2, hwsrc=mac, psrc=ip, hwdst=SRC_MAC, pdst=SRC_IP)))
+        
+        threading.Thread(target=respond, daemon=True).start()
+        with patch('socket.socket', return_value=FakePacketSocket(local)), \
+             patch('raw_prober.get_interface_info', return_value=(SRC_MAC, SRC_IP, None)):
+            prober = RawProber("eth0")
+            results = {}
+            
+            def probe(shard):
+                results[shard] = prober.arp_probe([f"10.0.{shard}.{host}" for host in range(1, 5)], timeout=0.5)
+            
+            threads = [threading.Thread(target=probe, args=(shard,)) for shard in range(4)]
+            start = time.monotonic()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.monotonic() - start
+            prober.close()
+        peer.close()
+        
+        for shard in range(4):
+            ip = "10.0.%d.1" % shard
+            assert results[shard] == [(ip, answering[ip])], f"分片{shard}的应答不正确: {results[shard]}"
+        print("  ✓ 应答按IP分发给发出请求的分片")
+        assert elapsed < 1.2, f"4个0.5秒的分片应并行等待，实际耗时 {elapsed:.2f}s"
+        print(f"  ✓ 4个0.5秒超时的分片总耗时 {elapsed:.2f}s")
+        
+        print("✅ 并发ARP探测测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 并发ARP探测测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_detector_falls_back_without_permission():
+    """测试没有原始套接字权限时回退到scapy"""
+    print("\n测试权限不足时回退...")
+    try:
+        from network_detector import NetworkDetector, load_scapy
+        
+        detector = NetworkDetector("aa:bb:cc:dd:ee:ff", use_raw_prober=True)
+        with patch('raw_prober.RawProber.arp_scan', side_effect=PermissionError(1, "Operation not permitted")), \
+             patch.object(load_scapy(), 'srp', return_value=([], [])) as mock_srp:
+            assert detector.scan_network("192.168.1.0/30") == []
+            assert mock_srp.call_count == 1, "应回退到scapy扫描"
+        assert detector.use_raw_prober is False, "失败后应关闭原始套接字探测"
+        print("  ✓ 回退到scapy扫描")
+        
+        print("✅ 权限不足回退测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 权限不足回退测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 原始套接字探测功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("报文模板", test_templates_match_scapy()))
+    results.append(("应答解析", test_parse_replies()))
+    results.append(("ping序号匹配", test_ping_matches_sequence()))
+    results.append(("并发ARP探测", test_concurrent_arp_probes()))
+    results.append(("权限不足回退", test_detector_falls_back_without_permission()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有原始套接字探测功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
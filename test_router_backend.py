@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+测试路由器探测后端
+Test router/AP backend against local stub servers
+"""
+import sys
+import os
+import json
+import shutil
+import socket
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MAC = "aa:bb:cc:dd:ee:ff"
+
+
+def mac_of(i):
+    return "02:00:00:00:%02x:%02x" % (i >> 8, i & 0xff)
+
+
+class UbusHandler(BaseHTTPRequestHandler):
+    """ubus JSON-RPC 桩: 支持登录、会话过期、hostapd get_clients 和 luci-rpc getDHCPLeases"""
+    
+    protocol_version = 'HTTP/1.1'
+    state = None
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        state = self.state
+        state['posts'] += 1
+        state['peers'].add(self.client_address)
+        calls = body if isinstance(body, list) else [body]
+        replies = [dict(jsonrpc='2.0', id=call['id'], result=self.handle_call(*call['params'])) for call in calls]
+        data = json.dumps(replies if isinstance(body, list) else replies[0]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def handle_call(self, sid, obj, method, args):
+        state = self.state
+        if (obj, method) == ('session', 'login'):
+            if args.get('password') != 'secret':
+                return [6]
+            state['logins'] += 1
+            state['sid'] = f"session{state['logins']}"
+            return [0, {'ubus_rpc_session': state['sid']}]
+        if sid != state['sid']:
+            return [6]
+        if method == 'get_clients':
+            return [0, {'clients': {mac.upper(): {'authorized': True} for mac in state['clients'].get(obj, [])}}]
+        if (obj, method) == ('luci-rpc', 'getDHCPLeases'):
+            return [0, {'dhcp_leases': [{'macaddr': mac, 'ipaddr': ip} for mac, ip in state['leases'].items()]}]
+        return [3]
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def start_ubus(clients, leases):
+    """启动ubus桩，返回 (server, url, state)"""
+    state = {'posts': 0, 'logins': 0, 'sid': None, 'peers': set(), 'clients': clients, 'leases': leases}
+    handler = type('Handler', (UbusHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/ubus', state
+
+
+def start_snmp_agent(rows):
+    """启动SNMP v2c桩 (只实现GETBULK)，返回 (socket, port, state)"""
+    from router_backend import decode_message, encode_message, PDU_RESPONSE, END_OF_MIB_VIEW
+    
+    rows = sorted(rows)
+    state = {'requests': 0}
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    
+    def serve():
+        while True:
+            try:
+                data, address = sock.recvfrom(65535)
+            except OSError:
+                return
+            community, _, request_id, _, max_repetitions, varbinds = decode_message(data)
+            state['requests'] += 1
+            start = varbinds[0][0]
+            reply = [row for row in rows if row[0] > start][:max_repetitions]
+            if len(reply) < max_repetitions:
+                reply.append(((reply[-1][0] if reply else start), (END_OF_MIB_VIEW, b'')))
+            sock.sendto(encode_message(community, PDU_RESPONSE, request_id, 0, 0, reply), address)
+    
+    threading.Thread(target=serve, daemon=True).start()
+    return sock, sock.getsockname()[1], state
+
+
+def test_ber_roundtrip():
+    """测试SNMP报文编解码"""
+    print("测试SNMP报文编解码...")
+    try:
+        from router_backend import (decode_message, encode_message, PDU_GETBULK, BER_NULL, BER_OCTET_STRING,
+                                    OID_FDB_ADDRESS)
+        
+        oid = OID_FDB_ADDRESS + (2, 0, 255, 128, 16384, 2 ** 31)
+        value = bytes(range(200))
+        message = encode_message('public', PDU_GETBULK, 70000, 0, 50,
+                                 [(oid, (BER_NULL, b'')), ((1, 3, 6), (BER_OCTET_STRING, value))])
+        community, tag, request_id, field1, field2, varbinds = decode_message(message)
+        assert (community, tag, request_id, field1, field2) == ('public', PDU_GETBULK, 70000, 0, 50)
+        assert varbinds == [(oid, (BER_NULL, b'')), ((1, 3, 6), (BER_OCTET_STRING, value))], varbinds
+        print("  ✓ 多字节子标识符和长格式长度编解码正确")
+        
+        print("✅ SNMP报文编解码测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ SNMP报文编解码测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_ubus_source():
+    """测试ubus批量读取、连接复用和会话过期重新登录"""
+    print("\n测试ubus数据源...")
+    server = None
+    try:
+        from router_backend import UbusSource, RouterError
+        
+        clients = {'hostapd.wlan0': [mac_of(i) for i in range(150)], 'hostapd.wlan1': [TARGET_MAC]}
+        leases = {TARGET_MAC: '192.168.1.100', mac_of(1): '192.168.1.11', 'de:ad:be:ef:00:01': '192.168.1.99'}
+        server, url, state = start_ubus(clients, leases)
+        
+        source = UbusSource(url, password='secret', interfaces=['hostapd.wlan0', 'hostapd.wlan1'])
+        with patch.dict(os.environ, {'NO_PROXY': '127.0.0.1'}):
+            table = source.fetch()
+            assert len(table) == 151, f"应返回所有关联终端: {len(table)}"
+            assert table[TARGET_MAC] == '192.168.1.100' and table[mac_of(1)] == '192.168.1.11'
+            assert table[mac_of(2)] is None, "没有租约的终端IP为None"
+            assert 'de:ad:be:ef:00:01' not in table, "只有租约、未关联的终端不算在线"
+            assert state['posts'] == 2, f"应只有登录和一次批量请求: {state['posts']}"
+            print("  ✓ 一次批量请求读取151个关联终端")
+            
+            source.fetch()
+            assert state['posts'] == 3 and state['logins'] == 1, "会话有效时不应重新登录"
+            state['sid'] = 'expired'
+            assert TARGET_MAC in source.fetch()
+            assert state['logins'] == 2, "会话过期后应重新登录"
+            assert len(state['peers']) == 1, f"应复用同一个连接: {state['peers']}"
+            print("  ✓ 复用长连接，会话过期后自动重新登录")
+            
+            leases_only = UbusSource(url, password='secret')
+            assert leases_only.fetch() == {mac: ip for mac, ip in leases.items()}, "未配置无线接口时以租约为准"
+            leases_only.close()
+            
+            wrong = UbusSource(url, password='wrong')
+            try:
+                wrong.fetch()
+                raise AssertionError("密码错误应报错")
+            except RouterError:
+                pass
+            wrong.close()
+            print("  ✓ 仅租约模式与登录失败")
+        source.close()
+        
+        print("✅ ubus数据源测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ ubus数据源测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+def test_snmp_source():
+    """测试SNMP遍历转发表和ARP表"""
+    print("\n测试SNMP数据源...")
+    sock = None
+    try:
+        from router_backend import SnmpSource, OID_FDB_ADDRESS, OID_NET_TO_MEDIA, BER_OCTET_STRING, BER_INTEGER
+        
+        rows = []
+        for i in range(120):
+            mac = bytes.fromhex(mac_of(i).replace(':', ''))
+            rows.append((OID_FDB_ADDRESS + tuple(mac), (BER_OCTET_STRING, mac)))
+            # 转发表的下一列 (dot1dTpFdbPort)，遍历应在此停止
+            rows.append((OID_FDB_ADDRESS[:-1] + (2,) + tuple(mac), (BER_INTEGER, b'\x01')))
+            if i < 100:
+                rows.append((OID_NET_TO_MEDIA + (2, 192, 168, 1, i + 10), (BER_OCTET_STRING, mac)))
+        sock, port, state = start_snmp_agent(rows)
+        
+        source = SnmpSource('127.0.0.1', port=port, max_repetitions=50)
+        table = source.fetch()
+        assert len(table) == 120, f"转发表条目数不正确: {len(table)}"
+        assert table[mac_of(5)] == '192.168.1.15', "应从ipNetToMediaTable补全IP"
+        assert table[mac_of(110)] is None, "ARP表中没有的终端IP为None"
+        assert state['requests'] == 6, f"每次GETBULK返回50条，应共6次请求: {state['requests']}"
+        source.close()
+        print(f"  ✓ {state['requests']} 次GETBULK读取120个终端")
+        
+        print("✅ SNMP数据源测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ SNMP数据源测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+def test_dnsmasq_source():
+    """测试dnsmasq租约文件"""
+    print("\n测试dnsmasq租约...")
+    directory = tempfile.mkdtemp()
+    try:
+        from router_backend import DnsmasqLeaseSource
+        
+        path = os.path.join(directory, 'dhcp.leases')
+        with open(path, 'w') as f:
+            f.write(f"2000 {TARGET_MAC.upper()} 192.168.1.100 phone 01:aa:bb:cc:dd:ee:ff\n"
+                    f"500 {mac_of(1)} 192.168.1.11 old *\n"
+                    f"0 {mac_of(2)} 192.168.1.12 printer *\n"
+                    "duid 00:01:00:01:aa:bb:cc:dd\n")
+        source = DnsmasqLeaseSource(path, clock=lambda: 1000)
+        with patch.object(DnsmasqLeaseSource, 'parse', wraps=DnsmasqLeaseSource.parse) as mock_parse:
+            assert source.fetch() == {TARGET_MAC: '192.168.1.100', mac_of(2): '192.168.1.12'}, "过期租约应忽略"
+            source.fetch()
+            assert mock_parse.call_count == 1, "文件未变化时不应重新解析"
+            with open(path, 'a') as f:
+                f.write(f"3000 {mac_of(3)} 192.168.1.13 laptop *\n")
+            assert mac_of(3) in source.fetch() and mock_parse.call_count == 2, "文件变化后应重新解析"
+        print("  ✓ 过期租约被忽略，文件变化时才重新解析")
+        
+        print("✅ dnsmasq租约测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ dnsmasq租约测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_router_backend():
+    """测试缓存、故障回退、权威模式和多目标匹配"""
+    print("\n测试路由器后端...")
+    try:
+        from network_detector import NetworkDetector
+        from router_backend import RouterSource, RouterError
+        
+        class FakeSource(RouterSource):
+            name = 'fake'
+            
+            def __init__(self, table):
+                self.table = table
+                self.fetch = Mock(side_effect=lambda: dict(self.table))
+        
+        good = FakeSource({TARGET_MAC: None, mac_of(1): '192.168.1.11'})
+        broken = FakeSource({})
+        broken.fetch.side_effect = RouterError("down")
+        now = [0.0]
+        detector = NetworkDetector(TARGET_MAC, target_ip='192.168.1.100', probe_chain=['router', 'arp'],
+                                   backend_options={'router': {'sources': [good, broken], 'ttl': 10,
+                                                               'clock': lambda: now[0]}})
+        router = detector.probe_chain.get('router')
+        with patch.object(detector, '_find_by_arp') as mock_arp:
+            assert detector.is_target_online() == (True, '192.168.1.100'), "只有MAC时应使用已知IP"
+            now[0] = 5
+            detector.is_target_online()
+            assert good.fetch.call_count == 1, "TTL内应使用缓存"
+            assert broken.fetch.call_count == 2, "失败的数据源每次都应重试"
+            now[0] = 11
+            detector.is_target_online()
+            assert good.fetch.call_count == 2, "TTL过期后应刷新"
+            assert mock_arp.call_count == 0
+        assert detector.device_table.get(mac_of(1)).ip == '192.168.1.11', "带IP的条目应合并到设备清单"
+        print("  ✓ TTL缓存生效，单个数据源故障不影响结果")
+        
+        good.table = {}
+        now[0] = 30
+        with patch.object(detector, '_find_by_arp', return_value=(True, '192.168.1.55')) as mock_arp:
+            assert detector.is_target_online() == (True, '192.168.1.55'), "非权威模式下应继续ARP探测"
+            router.authoritative = True
+            now[0] = 50
+            assert detector.is_target_online() == (False, None)
+            assert mock_arp.call_count == 1, "权威模式下路由器表未命中即停止"
+            good.fetch.side_effect = RouterError("down")
+            now[0] = 70
+            assert detector.is_target_online() == (True, '192.168.1.55'), "路由器不可用时应回退到ARP"
+        print("  ✓ 权威模式未命中即停止，路由器不可用时回退")
+        
+        good.fetch.side_effect = lambda: dict(good.table)
+        good.table = {mac_of(i): f'10.0.{i >> 8}.{i & 0xff}' for i in range(300)}
+        targets = {mac_of(i): f'target{i}' for i in range(0, 300, 3)}
+        now[0] = 100
+        multi = NetworkDetector(None, probe_chain=['router', 'arp'],
+                                backend_options={'router': {'sources': [good], 'clock': lambda: now[0]}})
+        with patch.object(multi, 'scan_network') as mock_scan:
+            found = multi.match_targets(targets)
+            assert len(found) == 100 and found['target3'] == '10.0.0.3'
+            assert mock_scan.call_count == 0, "全部目标都在路由器表中时不应扫描"
+            targets[TARGET_MAC] = 'missing'
+            mock_scan.return_value = [('192.168.1.100', TARGET_MAC)]
+            found = multi.match_targets(targets)
+            assert found['missing'] == '192.168.1.100' and mock_scan.call_count == 1, "缺少的目标应通过扫描补全"
+        print("  ✓ 多目标模式一次读取路由器表匹配100个目标")
+        
+        print("✅ 路由器后端测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 路由器后端测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 路由器探测后端测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("SNMP报文编解码", test_ber_roundtrip()))
+    results.append(("ubus数据源", test_ubus_source()))
+    results.append(("SNMP数据源", test_snmp_source()))
+    results.append(("dnsmasq租约", test_dnsmasq_source()))
+    results.append(("路由器后端", test_router_backend()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有路由器探测后端测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+测试自适应扫描调度功能
+Test adaptive scan scheduler
+"""
+import sys
+import os
+from datetime import datetime
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+    
+    def __init__(self, start):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_fixed_interval():
+    """测试未开启自适应时间隔固定"""
+    print("测试固定间隔...")
+    try:
+        from scheduler import ScanScheduler
+        
+        scheduler = ScanScheduler(base_interval=30)
+        for changed, pending in [(False, False), (True, False), (False, True), (False, False)]:
+            scheduler.observe(changed=changed, pending=pending)
+            assert scheduler.next_interval() == 30, "固定模式下间隔应始终为scan_interval"
+        print("  ✓ 间隔始终为30秒")
+        
+        print("✅ 固定间隔测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 固定间隔测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_fast_probe_and_backoff():
+    """测试等待确认时快速扫描，稳定后指数退避"""
+    print("\n测试快速扫描与退避...")
+    try:
+        from scheduler import ScanScheduler
+        
+        clock = FakeClock(datetime(2024, 1, 3, 10, 0).timestamp())
+        scheduler = ScanScheduler(base_interval=30, min_interval=5, max_interval=120,
+                                  backoff_factor=2, fast_window=60, clock=clock)
+        
+        # 检测到设备，等待确认
+        scheduler.observe(pending=True)
+        assert scheduler.next_interval() == 5, "等待确认时应快速扫描"
+        print("  ✓ 等待确认时间隔5秒")
+        
+        # 确认到达后的快速窗口
+        clock.advance(5)
+        scheduler.observe(changed=True)
+        assert scheduler.next_interval() == 5
+        clock.advance(59)
+        scheduler.observe()
+        assert scheduler.next_interval() == 5, "状态变化后的快速窗口内应继续快速扫描"
+        print("  ✓ 状态变化后60秒内保持快速扫描")
+        
+        # 窗口结束后开始退避
+        clock.advance(1)
+        intervals = []
+        for _ in range(5):
+            scheduler.observe()
+            intervals.append(scheduler.next_interval())
+            clock.advance(intervals[-1])
+        assert intervals == [30, 60, 120, 120, 120], f"退避序列不正确: {intervals}"
+        print(f"  ✓ 稳定后退避: {intervals}")
+        
+        # 新的检测立即恢复快速扫描
+        scheduler.observe(pending=True)
+        assert scheduler.next_interval() == 5
+        scheduler.observe()
+        clock.advance(1000)
+        assert scheduler.next_interval() == 30, "退避应从scan_interval重新开始"
+        print("  ✓ 新检测后重置退避")
+        
+        print("✅ 快速扫描与退避测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 快速扫描与退避测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_work_hours():
+    """测试工作时间之外使用最大间隔"""
+    print("\n测试工作时间...")
+    try:
+        from scheduler import ScanScheduler, parse_work_hours
+        
+        periods = parse_work_hours("mon-fri 08:30-19:00; sat 10:00-12:00")
+        assert periods[0] == ({0, 1, 2, 3, 4}, 510, 1140)
+        assert periods[1] == ({5}, 600, 720)
+        assert parse_work_hours("fri-mon 09:00-10:00")[0][0] == {4, 5, 6, 0}, "应支持跨周末的范围"
+        print("  ✓ 工作时间解析正确")
+        
+        clock = FakeClock(datetime(2024, 1, 3, 10, 0).timestamp())  # 周三 10:00
+        scheduler = ScanScheduler(base_interval=30, min_interval=5, max_interval=600,
+                                  backoff_factor=1, work_hours="mon-fri 08:30-19:00", clock=clock)
+        assert scheduler.next_interval() == 30, "工作时间内使用正常间隔"
+        
+        clock.now = datetime(2024, 1, 3, 22, 0).timestamp()  # 周三 22:00
+        assert scheduler.next_interval() == 600, "下班后应使用最大间隔"
+        clock.now = datetime(2024, 1, 6, 10, 0).timestamp()  # 周六 10:00
+        assert scheduler.next_interval() == 600, "周末应使用最大间隔"
+        
+        scheduler.observe(pending=True)
+        assert scheduler.next_interval() == 5, "工作时间外检测到设备也应快速确认"
+        print("  ✓ 工作时间外使用最大间隔")
+        
+        try:
+            parse_work_hours("weekdays 9-18")
+            assert False, "无效配置应抛出ValueError"
+        except ValueError:
+            pass
+        
+        print("✅ 工作时间测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 工作时间测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 自适应扫描调度功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("固定间隔", test_fixed_interval()))
+    results.append(("快速扫描与退避", test_fast_probe_and_backoff()))
+    results.append(("工作时间", test_work_hours()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有自适应扫描调度功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+测试配置解析与热加载功能
+Test typed settings and config hot reload
+"""
+import sys
+import os
+import shutil
+import tempfile
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_TEMPLATE = """[network]
+boss_mac =
+scan_interval = {interval}
+scan_ranges = {ranges}
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+notification_title = 🚨 老板来了！
+notification_message = 老板在线
+
+[notification_manager]
+service_type = webhook
+webhook_url = {manager_url}
+notification_title = 🚨 经理来了！
+
+[advanced]
+confirmation_count = 1
+notification_cooldown = {cooldown}
+reload_interval = 0
+
+[dispatch]
+workers = 3
+
+[targets]
+boss = AA-BB-CC-DD-EE-FF, 192.168.1.100
+manager = 11:22:33:44:55:66, , notification_manager
+{extra}
+"""
+
+
+def _config(interval=30, ranges='', manager_url='https://example.com/manager', cooldown=300, extra=''):
+    return CONFIG_TEMPLATE.format(interval=interval, ranges=ranges, manager_url=manager_url,
+                                  cooldown=cooldown, extra=extra)
+
+
+def _write(path, content):
+    """写入配置文件，并推进修改时间，保证监视器能看到变化"""
+    stat = os.stat(path) if os.path.exists(path) else None
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    if stat is not None:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_parse_settings():
+    """测试解析为不可变的类型化配置"""
+    print("测试配置解析...")
+    directory = tempfile.mkdtemp()
+    try:
+        from settings import load_settings, SettingsError
+        
+        path = os.path.join(directory, 'config.ini')
+        _write(path, _config(ranges='10.0.0.0/20, 10.1.0.7/24'))
+        settings = load_settings(path)
+        
+        assert settings.network.scan_interval == 30 and settings.network.boss_mac is None
+        assert settings.network.scan_ranges == ('10.0.0.0/20', '10.1.0.0/24')
+        assert settings.advanced.notification_cooldown == 300
+        assert [target.mac for target in settings.targets] == ["aa:bb:cc:dd:ee:ff", "11:22:33:44:55:66"]
+        print("  ✓ 数值、网段和MAC已解析为对应类型")
+        
+        manager = settings.notifications['notification_manager']
+        assert manager.title == '🚨 经理来了！' and manager.message == '老板在线', "未配置的内容应沿用 [notification]"
+        assert manager.pool_size == 3, "连接池大小默认等于 [dispatch] workers"
+        assert settings.dispatch.dead_letter_file == 'data/notifications.dead.jsonl', "死信文件默认放在 data 目录"
+        print("  ✓ 自定义通知节沿用 [notification] 的设置")
+        
+        for mutate in (lambda: setattr(settings, 'network', None),
+                       lambda: settings.notifications.__setitem__('notification', None)):
+            try:
+                mutate()
+                raise AssertionError("配置对象不应可修改")
+            except (AttributeError, TypeError):
+                pass
+        assert load_settings(path) == settings, "相同的配置文件应得到相等的配置"
+        print("  ✓ 配置对象不可修改，可直接比较")
+        
+        for content, expected in ((_config(interval='abc'), 'scan_interval'),
+                                  (_config(manager_url=''), 'Webhook URL'),
+                                  (_config(ranges='10.0.0.0/33'), '扫描网段')):
+            _write(path, content)
+            try:
+                load_settings(path)
+                raise AssertionError(f"应拒绝无效配置: {expected}")
+            except SettingsError as e:
+                assert expected in str(e), f"错误信息不正确: {e}"
+        print("  ✓ 无效配置抛出 SettingsError 并指出配置项")
+        
+        print("✅ 配置解析测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 配置解析测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_watcher():
+    """测试按修改时间检测配置文件变化"""
+    print("\n测试配置文件监视...")
+    directory = tempfile.mkdtemp()
+    try:
+        from settings import SettingsWatcher
+        
+        path = os.path.join(directory, 'config.ini')
+        _write(path, _config())
+        received = []
+        watcher = SettingsWatcher(path, received.append, interval=0.05)
+        
+        assert watcher.check() is None and not received, "文件未变化时不应重新解析"
+        
+        _write(path, _config(interval='abc'))
+        assert watcher.check() is None and not received, "解析失败时应继续使用原配置"
+        print("  ✓ 未变化或解析失败时不触发回调")
+        
+        _write(path, _config(cooldown=60))
+        watcher.start()
+        for _ in range(100):
+            if received:
+                break
+            watcher._stop.wait(0.05)
+        watcher.stop()
+        assert len(received) == 1 and received[0].advanced.notification_cooldown == 60
+        print("  ✓ 后台线程发现修改并回调新配置")
+        
+        print("✅ 配置文件监视测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 配置文件监视测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_hot_reload():
+    """测试只重建受影响的组件，在线状态不丢失"""
+    print("\n测试配置热加载...")
+    directory = tempfile.mkdtemp()
+    try:
+        from boss_detect import BossDetector
+        from settings import load_settings
+        
+        path = os.path.join(directory, 'config.ini')
+        _write(path, _config())
+        
+        services = []
+        
+        def make_service(service_type, **kwargs):
+            service = Mock()
+            service.send = Mock(return_value=True)
+            service.kwargs = kwargs
+            services.append(service)
+            return service
+        
+        with patch('boss_detect.NetworkDetector') as mock_detector_class, \
+             patch('boss_detect.create_notification_service', side_effect=make_service):
+            mock_detector_class.return_value = Mock()
+            detector = BossDetector(path)
+            boss = detector.mac_index["aa:bb:cc:dd:ee:ff"]
+            detector.network_detector.match_targets = Mock(return_value={boss: "192.168.1.100"})
+            detector.check_targets(detector.settings.advanced.confirmation_count)
+            detector.dispatcher.join()
+            assert boss.online and len(services) == 1
+            
+            network_detector, dispatcher, pushdeer = detector.network_detector, detector.dispatcher, services[0]
+            detector._get_notification_service('notification_manager')
+            webhook = services[1]
+            
+            # 修改经理的Webhook、冷却时间，并新增一个目标
+            _write(path, _config(manager_url='https://example.com/new', cooldown=60,
+                                 extra='intern = 22:33:44:55:66:77'))
+            detector._queue_settings(load_settings(path))
+            detector._apply_pending_settings()
+            
+            assert detector.settings.advanced.notification_cooldown == 60
+            assert detector.network_detector is network_detector, "网络检测器不应重建"
+            assert detector.dispatcher is dispatcher, "分发队列不应重建"
+            assert detector.notification_service is pushdeer, "未变化的通知服务应保留"
+            assert detector.mac_index["aa:bb:cc:dd:ee:ff"] is boss and boss.online, "已在线的目标应保留状态"
+            assert "22:33:44:55:66:77" in detector.mac_index
+            webhook.close.assert_called_once()
+            assert detector._get_notification_service('notification_manager').kwargs['webhook_url'] == 'https://example.com/new'
+            print("  ✓ 只重建变化的通知渠道和目标列表，在线状态保留")
+            
+            # 网段变化时重建检测器并继承设备清单
+            _write(path, _config(ranges='10.0.0.0/24', manager_url='https://example.com/new', cooldown=60,
+                                 extra='intern = 22:33:44:55:66:77'))
+            rebuilt = detector.apply_settings(load_settings(path))
+            assert rebuilt == ['network_detector'], f"重建组件不正确: {rebuilt}"
+            detector.network_detector.inherit_state.assert_called_once_with(network_detector)
+            network_detector.probe_chain.close.assert_called_once()
+            print("  ✓ 网段变化时重建检测器并继承设备清单")
+            
+            # 新检测器创建失败时保持原配置
+            previous = detector.settings
+            mock_detector_class.side_effect = ValueError("未知探测后端: telepathy")
+            _write(path, _config(ranges='10.0.1.0/24', cooldown=5))
+            assert detector.apply_settings(load_settings(path)) == []
+            assert detector.settings is previous and detector.settings.advanced.notification_cooldown == 60
+            print("  ✓ 新配置无法应用时保持原配置")
+        
+        detector.dispatcher.stop()
+        print("✅ 配置热加载测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 配置热加载测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 配置热加载功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("配置解析", test_parse_settings()))
+    results.append(("配置文件监视", test_watcher()))
+    results.append(("配置热加载", test_hot_reload()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有配置热加载功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+测试启动性能 - 通过 python -X importtime 检查导入耗时预算
+Test import-time budgets
+"""
+import sys
+import os
+import subprocess
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# 各模块的累计导入耗时预算(毫秒)，导入 scapy.all 会直接超出预算
+IMPORT_BUDGETS_MS = {
+    "notification": 400,
+    "network_detector": 250,
+    "boss_detect": 500,
+}
+
+
+def _importtime(module):
+    """
+    用 -X importtime 导入模块
+    
+    Returns:
+        tuple: (该模块的累计导入耗时毫秒, 导入的模块名集合)
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=HERE, timeout=60)
+    cumulative = None
+    modules = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[0].strip().isdigit():
+            continue
+        name = parts[2].strip()
+        modules.add(name)
+        if name == module:
+            cumulative = int(parts[1]) / 1000
+    return cumulative, modules
+
+
+def test_no_scapy_on_import():
+    """测试导入各模块时不会加载scapy"""
+    print("测试导入时不加载scapy...")
+    try:
+        for module in IMPORT_BUDGETS_MS:
+            _, modules = _importtime(module)
+            loaded = sorted(name for name in modules if name.startswith("scapy"))
+            assert not loaded, f"导入 {module} 时加载了scapy: {loaded[:5]}"
+            print(f"  ✓ {module}")
+        
+        print("✅ 导入时不加载scapy测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 导入时不加载scapy测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_import_budgets():
+    """测试各模块导入耗时在预算内"""
+    print("\n测试导入耗时预算...")
+    try:
+        for module, budget in IMPORT_BUDGETS_MS.items():
+            cumulative, _ = _importtime(module)
+            assert cumulative is not None, f"未找到 {module} 的导入耗时"
+            print(f"  {module}: {cumulative:.1f}ms (预算 {budget}ms)")
+            assert cumulative <= budget, f"{module} 导入耗时 {cumulative:.1f}ms 超出预算 {budget}ms"
+        
+        print("✅ 导入耗时预算测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 导入耗时预算测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_load_scapy_only_needed_layers():
+    """测试按需加载scapy时只导入需要的协议层"""
+    print("\n测试按需加载scapy...")
+    try:
+        code = ("import sys, network_detector; network_detector.load_scapy(); "
+                "print('scapy.all' in sys.modules, 'scapy.layers.all' in sys.modules)")
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                cwd=HERE, timeout=60)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["False", "False"], f"不应加载全部协议层: {result.stdout}"
+        print("  ✓ 只加载了 scapy.layers.l2 / scapy.layers.inet")
+        
+        print("✅ 按需加载scapy测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 按需加载scapy测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 启动性能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("导入时不加载scapy", test_no_scapy_on_import()))
+    results.append(("导入耗时预算", test_import_budgets()))
+    results.append(("按需加载scapy", test_load_scapy_only_needed_layers()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有启动性能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+测试状态持久化功能
+Test persisted detector state across restarts
+"""
+import sys
+import os
+import json
+import shutil
+import tempfile
+from unittest.mock import Mock, patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG_TEMPLATE = """[network]
+boss_mac = {mac}
+scan_interval = 30
+
+[notification]
+service_type = pushdeer
+pushdeer_key = test_key
+notification_title = 🚨 老板来了！
+notification_message = 老板在线
+
+[advanced]
+confirmation_count = 2
+notification_cooldown = 0
+
+[state]
+state_file = {state_file}
+max_age = 900
+"""
+
+
+def test_atomic_snapshot():
+    """测试快照原子写入、读取和过期检查"""
+    print("测试快照读写...")
+    directory = tempfile.mkdtemp()
+    try:
+        from state_store import StateStore
+        
+        path = os.path.join(directory, 'state.json')
+        now = [1000.0]
+        store = StateStore(path, max_age=60, clock=lambda: now[0])
+        assert store.load() is None, "文件不存在时应返回None"
+        
+        assert store.save({'boss': {'last_known_ip': '192.168.1.100'}})
+        assert os.listdir(directory) == ['state.json'], f"不应残留临时文件: {os.listdir(directory)}"
+        data = store.load()
+        assert data['boss']['last_known_ip'] == '192.168.1.100' and data['saved_at'] == 1000.0
+        print("  ✓ 写入后可读取，无临时文件残留")
+        
+        now[0] = 1061.0
+        assert store.load() is None, "超过max_age的快照应视为过期"
+        print("  ✓ 过期快照被忽略")
+        
+        with open(path, 'w') as f:
+            f.write('{"boss": ')
+        assert store.load() is None, "损坏的快照应被忽略"
+        print("  ✓ 损坏快照被忽略")
+        
+        print("✅ 快照读写测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 快照读写测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def _make_detector(config_file):
+    """创建通知服务和网络检测器均为mock的检测器"""
+    from boss_detect import BossDetector
+    with patch('boss_detect.NetworkDetector') as mock_detector_class, \
+         patch('boss_detect.create_notification_service') as mock_notif:
+        service = Mock()
+        service.send = Mock(return_value=True)
+        mock_notif.return_value = service
+        mock_detector_class.return_value = Mock()
+        detector = BossDetector(config_file)
+    return detector, service
+
+
+def test_warm_restart():
+    """测试重启后恢复在线状态，不重复发送到达通知"""
+    print("\n测试热重启...")
+    directory = tempfile.mkdtemp()
+    config_file = os.path.join(directory, 'config.ini')
+    state_file = os.path.join(directory, 'state.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(CONFIG_TEMPLATE.format(mac='AA-BB-CC-DD-EE-FF', state_file=state_file))
+    
+    try:
+        detector, service = _make_detector(config_file)
+        policy = detector._presence_policy(2)
+        detector._update_boss(True, '192.168.1.100', policy)
+        detector._update_boss(True, '192.168.1.100', policy)
+        detector.dispatcher.join()
+        detector.dispatcher.stop()
+        assert service.send.call_count == 1 and detector.boss_online
+        
+        with open(state_file) as f:
+            saved = json.load(f)
+        assert saved['boss']['presence']['status'] == 'present'
+        assert saved['boss']['last_notification_time'] is not None, "通知发送成功后应保存冷却时间"
+        print("  ✓ 状态变化后写入快照")
+        
+        restarted, service = _make_detector(config_file)
+        assert restarted.boss_online and restarted.last_known_ip == '192.168.1.100'
+        assert restarted.last_notification_time is not None
+        restarted.network_detector.remember_ip.assert_called_once_with('192.168.1.100')
+        
+        restarted._update_boss(True, '192.168.1.100', restarted._presence_policy(2))
+        restarted.dispatcher.join()
+        restarted.dispatcher.stop()
+        assert service.send.call_count == 0, "重启后不应重复发送到达通知"
+        print("  ✓ 重启后直接恢复在线，无需重新确认")
+        
+        print("✅ 热重启测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 热重启测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_stable_state_refreshed():
+    """测试状态长时间不变时仍定期刷新快照，重启后不会因快照过期重复通知"""
+    print("\n测试稳定状态刷新快照...")
+    directory = tempfile.mkdtemp()
+    config_file = os.path.join(directory, 'config.ini')
+    state_file = os.path.join(directory, 'state.json')
+    with open(config_file, 'w', encoding='utf-8') as f:
+        f.write(CONFIG_TEMPLATE.format(mac='AA-BB-CC-DD-EE-FF', state_file=state_file))
+    
+    try:
+        import time
+        
+        detector, service = _make_detector(config_file)
+        # 假时钟从 1900 秒前开始，每轮前进 100 秒，最后一轮与重启时的真实时间相近
+        now = [time.time() - 1900]
+        detector.state_store.clock = lambda: now[0]
+        policy = detector._presence_policy(2)
+        detector._update_boss(True, '192.168.1.100', policy)
+        detector._update_boss(True, '192.168.1.100', policy)
+        detector.dispatcher.join()
+        assert service.send.call_count == 1 and detector.boss_online
+        
+        writes = 0
+        for _ in range(19):
+            now[0] += 100
+            saved_at = detector.state_store.saved_at
+            detector._update_boss(True, '192.168.1.100', policy)
+            writes += detector.state_store.saved_at != saved_at
+        detector.dispatcher.stop()
+        assert 0 < writes < 19, f"稳定在线时应每 max_age/2 秒刷新一次快照，实际写入 {writes} 次"
+        print(f"  ✓ 持续在线 {19 * 100} 秒 (max_age=900)，快照刷新 {writes} 次")
+        
+        restarted, service = _make_detector(config_file)
+        assert restarted.boss_online and restarted.last_known_ip == '192.168.1.100', "快照不应被当作过期丢弃"
+        restarted._update_boss(True, '192.168.1.100', restarted._presence_policy(2))
+        restarted.dispatcher.join()
+        restarted.dispatcher.stop()
+        assert service.send.call_count == 0, "重启后不应重复发送到达通知"
+        print("  ✓ 重启后恢复在线，不重复通知")
+        
+        print("✅ 稳定状态刷新快照测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 稳定状态刷新快照测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_snapshot_for_other_mac_ignored():
+    """测试配置的MAC改变后不恢复旧状态"""
+    print("\n测试MAC不符...")
+    directory = tempfile.mkdtemp()
+    config_file = os.path.join(directory, 'config.ini')
+    state_file = os.path.join(directory, 'state.json')
+    try:
+        from state_store import StateStore
+        
+        StateStore(state_file).save({'boss': {
+            'mac': 'aa:bb:cc:dd:ee:ff',
+            'presence': {'status': 'present', 'hits': 0, 'misses': 0, 'last_seen': 1.0},
+            'last_known_ip': '192.168.1.100',
+            'last_notification_time': None,
+        }, 'targets': {}})
+        with open(config_file, 'w', encoding='utf-8') as f:
+            f.write(CONFIG_TEMPLATE.format(mac='11:22:33:44:55:66', state_file=state_file))
+        
+        detector, _ = _make_detector(config_file)
+        detector.dispatcher.stop()
+        assert not detector.boss_online and detector.last_known_ip is None
+        print("  ✓ 其他设备的快照被忽略")
+        
+        print("✅ MAC不符测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ MAC不符测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 状态持久化功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("快照读写", test_atomic_snapshot()))
+    results.append(("热重启", test_warm_restart()))
+    results.append(("稳定状态刷新", test_stable_state_refreshed()))
+    results.append(("MAC不符", test_snapshot_for_other_mac_ignored()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有状态持久化功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+测试大网段分片扫描功能
+Test sharded sweeps for large subnets
+"""
+import sys
+import os
+import time
+import threading
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_split_ranges():
+    """测试网段拆分"""
+    print("测试网段拆分...")
+    try:
+        from sweep import split_ranges, parse_ranges
+        
+        shards = split_ranges(["10.0.0.0/20"])
+        assert len(shards) == 16 and shards[0] == "10.0.0.0/24" and shards[-1] == "10.0.15.0/24"
+        print("  ✓ /20 拆分为16个/24分片")
+        
+        shards = split_ranges(["10.0.0.0/23", "10.0.1.0/24", "192.168.1.0/30"])
+        assert shards == ["10.0.0.0/24", "10.0.1.0/24", "192.168.1.0/30"], f"重复分片应去重: {shards}"
+        assert len(split_ranges(["10.0.0.0/16"], shard_prefix=22)) == 64
+        print("  ✓ 重叠网段去重，小网段不拆分")
+        
+        assert parse_ranges(" 10.0.0.5/20, 192.168.1.0/24 ,") == ["10.0.0.0/20", "192.168.1.0/24"]
+        try:
+            parse_ranges("10.0.0.0/33")
+            assert False, "无效网段应抛出ValueError"
+        except ValueError:
+            pass
+        print("  ✓ 网段配置解析正确")
+        
+        print("✅ 网段拆分测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 网段拆分测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_parallel_streaming():
+    """测试分片并行扫描且结果边收边返回"""
+    print("\n测试并行流式扫描...")
+    try:
+        from sweep import ShardedSweeper
+        
+        active = []
+        peak = [0]
+        lock = threading.Lock()
+        
+        def scan_shard(shard, inter, on_reply):
+            with lock:
+                active.append(shard)
+                peak[0] = max(peak[0], len(active))
+            if shard == "10.0.0.0/24":
+                # 支持流式回调的分片：应答立即返回
+                on_reply("10.0.0.7", "aa:bb:cc:dd:ee:ff")
+                time.sleep(0.5)
+                result = [("10.0.0.7", "aa:bb:cc:dd:ee:ff")]
+            else:
+                time.sleep(0.3)
+                result = [(shard.replace("0/24", "1"), "00:00:00:00:00:01")]
+            with lock:
+                active.remove(shard)
+            return result
+        
+        sweeper = ShardedSweeper(scan_shard, max_workers=4, rate_limit=1000)
+        assert sweeper._inter(4) == 0.004, "每个分片的发包间隔应按全局速率分摊"
+        
+        start = time.monotonic()
+        iterator = sweeper.sweep(["10.0.0.0/22"])
+        first = next(iterator)
+        first_latency = time.monotonic() - start
+        devices = [first] + list(iterator)
+        elapsed = time.monotonic() - start
+        
+        assert first == ("10.0.0.7", "aa:bb:cc:dd:ee:ff"), f"第一个结果应为流式应答: {first}"
+        assert first_latency < 0.2, f"流式应答应立即返回，实际 {first_latency:.2f}s"
+        assert len(devices) == 4, f"重复的应答应去重: {devices}"
+        assert peak[0] == 4, f"4个分片应并行扫描，实际并发 {peak[0]}"
+        assert elapsed < 0.8, f"总耗时应接近最慢分片，实际 {elapsed:.2f}s"
+        print(f"  ✓ 首个应答 {first_latency * 1000:.0f}ms，总耗时 {elapsed:.2f}s")
+        
+        print("✅ 并行流式扫描测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 并行流式扫描测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_detector_ranges():
+    """测试检测器的扫描网段来源"""
+    print("\n测试扫描网段来源...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(None, network_interface="eth1")
+        with patch('network_detector.get_interface_info', return_value=("02:00:00:00:00:01", "10.1.2.3", "255.255.240.0")):
+            assert detector._get_local_network_range() == "10.1.0.0/20", "应根据子网掩码得出网段"
+        print("  ✓ 由接口地址和子网掩码得出 10.1.0.0/20")
+        
+        detector = NetworkDetector(None, scan_ranges=["10.0.0.0/23", "10.9.0.0/24"])
+        scanned = []
+        
+        def scan_shard(shard, inter=0, on_reply=None):
+            scanned.append(shard)
+            return [(shard.replace("0/24", "9"), "00:00:00:00:00:09")]
+        
+        with patch.object(detector, '_scan_shard', side_effect=scan_shard):
+            devices = detector.scan_network()
+        assert sorted(scanned) == ["10.0.0.0/24", "10.0.1.0/24", "10.9.0.0/24"], f"分片不正确: {scanned}"
+        assert len(devices) == 3
+        print("  ✓ 配置的多个网段拆分为3个分片")
+        
+        print("✅ 扫描网段来源测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 扫描网段来源测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_early_return_on_target():
+    """测试发现目标后不再等待其余分片"""
+    print("\n测试发现目标即返回...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector("aa:bb:cc:dd:ee:ff", scan_ranges=["10.0.0.0/22"], sweep_workers=4)
+        
+        def scan_shard(shard, inter=0, on_reply=None):
+            if shard == "10.0.2.0/24":
+                return [("10.0.2.50", "AA:BB:CC:DD:EE:FF")]
+            time.sleep(1.5)
+            return []
+        
+        with patch.object(detector, '_scan_shard', side_effect=scan_shard), \
+             patch.object(detector, '_check_arp_cache', return_value=(False, None)):
+            start = time.monotonic()
+            result = detector.is_target_online()
+            elapsed = time.monotonic() - start
+        
+        assert result == (True, "10.0.2.50"), f"结果不正确: {result}"
+        assert elapsed < 1.0, f"发现目标后应立即返回，实际 {elapsed:.2f}s"
+        print(f"  ✓ 耗时 {elapsed:.2f}s，未等待其余1.5秒的分片")
+        
+        print("✅ 发现目标即返回测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 发现目标即返回测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 大网段分片扫描功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("网段拆分", test_split_ranges()))
+    results.append(("并行流式扫描", test_parallel_streaming()))
+    results.append(("扫描网段来源", test_detector_ranges()))
+    results.append(("发现目标即返回", test_early_return_on_target()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有大网段分片扫描功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+测试分层探测功能
+Test tiered unicast re-probe before full sweep
+"""
+import sys
+import os
+from unittest.mock import patch
+
+# 添加当前目录到路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_MAC = "aa:bb:cc:dd:ee:ff"
+
+
+def test_unicast_hit_skips_sweep():
+    """测试单播ARP命中最近IP时不扫描全网段"""
+    print("测试单播命中跳过全网段扫描...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC)
+        detector.remember_ip("192.168.1.100")
+        with patch('network_detector.read_neighbor_table', return_value={}), \
+             patch.object(detector, 'unicast_arp', return_value=[("192.168.1.100", TARGET_MAC)]) as mock_unicast, \
+             patch.object(detector, 'scan_network_iter') as mock_sweep:
+            result = detector.is_target_online()
+        
+        assert result == (True, "192.168.1.100"), f"结果不正确: {result}"
+        assert mock_unicast.call_args[0][0] == {"192.168.1.100": TARGET_MAC}, "应以目标MAC为目的地址探测候选IP"
+        assert mock_sweep.call_count == 0, "单播命中后不应扫描全网段"
+        stats = detector.get_tier_stats()
+        assert stats['unicast']['hits'] == 1 and stats['unicast']['hit_rate'] == 1.0
+        assert 'sweep' not in stats
+        print("  ✓ 单播命中，未执行全网段扫描")
+        
+        print("✅ 单播命中测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 单播命中测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_sweep_after_misses():
+    """测试连续未命中N轮后才扩大到全网段扫描"""
+    print("\n测试未命中后扩大扫描...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC, sweep_after_misses=3)
+        detector.remember_ip("192.168.1.100")
+        with patch('network_detector.read_neighbor_table', return_value={}), \
+             patch.object(detector, 'unicast_arp', return_value=[]), \
+             patch.object(detector, 'scan_network_iter',
+                          side_effect=lambda ip_range, stop=None: iter([("192.168.1.123", TARGET_MAC)])) as mock_sweep:
+            results = [detector.is_target_online() for _ in range(3)]
+        
+        assert results[:2] == [(False, None)] * 2, f"前两轮不应扫描: {results}"
+        assert results[2] == (True, "192.168.1.123"), f"第三轮应扫描发现目标: {results}"
+        assert mock_sweep.call_count == 1, f"应只扫描一次: {mock_sweep.call_count}"
+        assert detector._candidate_ips()[0] == "192.168.1.123", "新IP应成为首选候选"
+        
+        stats = detector.get_tier_stats()
+        assert stats['unicast']['attempts'] == 3 and stats['unicast']['hits'] == 0
+        assert stats['sweep']['attempts'] == 1 and stats['sweep']['hits'] == 1
+        print("  ✓ 连续3轮未命中后才扫描全网段")
+        
+        print("✅ 未命中后扩大扫描测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 未命中后扩大扫描测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_no_candidates_sweeps():
+    """测试没有候选IP时直接扫描全网段"""
+    print("\n测试无候选IP...")
+    try:
+        from network_detector import NetworkDetector
+        
+        detector = NetworkDetector(TARGET_MAC, sweep_after_misses=5)
+        with patch('network_detector.read_neighbor_table', return_value={}), \
+             patch.object(detector, 'unicast_arp') as mock_unicast, \
+             patch.object(detector, 'scan_network_iter', return_value=iter([])) as mock_sweep:
+            result = detector.is_target_online()
+        
+        assert result == (False, None), f"结果不正确: {result}"
+        assert mock_unicast.call_count == 0, "没有候选IP时不应发送单播"
+        assert mock_sweep.call_count == 1, "没有候选IP时应直接扫描"
+        print("  ✓ 首次检测直接扫描全网段")
+        
+        print("✅ 无候选IP测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 无候选IP测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def test_unicast_packet():
+    """测试scapy回退时发送的是单播ARP"""
+    print("\n测试单播ARP报文...")
+    try:
+        from network_detector import NetworkDetector, load_scapy
+        
+        detector = NetworkDetector(TARGET_MAC)
+        scapy = load_scapy()
+        with patch.object(scapy, 'srp', return_value=([], [])) as mock_srp:
+            assert detector.probe_mac(TARGET_MAC, "192.168.1.100") is False
+        
+        packets = mock_srp.call_args[0][0]
+        assert len(packets) == 1
+        assert packets[0][scapy.Ether].dst == TARGET_MAC, "目的MAC应为目标MAC而非广播"
+        assert packets[0][scapy.ARP].pdst == "192.168.1.100"
+        print("  ✓ 单播ARP目的地址为目标MAC")
+        
+        print("✅ 单播ARP报文测试通过")
+        return True
+    except Exception as e:
+        print(f"❌ 单播ARP报文测试失败: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def main():
+    """运行所有测试"""
+    print("=" * 60)
+    print("Boss Detect - 分层探测功能测试")
+    print("=" * 60)
+    
+    results = []
+    
+    results.append(("单播命中", test_unicast_hit_skips_sweep()))
+    results.append(("未命中后扩大扫描", test_sweep_after_misses()))
+    results.append(("无候选IP", test_no_candidates_sweeps()))
+    results.append(("单播ARP报文", test_unicast_packet()))
+    
+    print("\n" + "=" * 60)
+    print("测试结果汇总")
+    print("=" * 60)
+    
+    all_passed = True
+    for name, result in results:
+        status = "✅ 通过" if result else "❌ 失败"
+        print(f"{name}: {status}")
+        if not result:
+            all_passed = False
+    
+    print("=" * 60)
+    
+    if all_passed:
+        print("🎉 所有分层探测功能测试通过！")
+        return 0
+    else:
+        print("⚠️  部分测试失败，请检查错误信息")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())